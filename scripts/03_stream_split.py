@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式数据划分（03_preprocess.py 的单遍版本）
+按内容哈希把每条数据分配到 train/val/test，多进程并行写出JSONL分片；
+评测集用 bottom-k 哈希抽样，不需要全量打乱；
+数据源追加新数据后重新运行，只处理新增部分
+"""
+import os
+import sys
+import json
+import argparse
+from multiprocessing import Pool
+from tqdm import tqdm
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.prompt_builder import format_question
+from src.splitting import (
+    BottomK, assign_split, iter_source_range, row_key, source_units, split_ranges
+)
+
+MANIFEST = "manifest.json"
+EVAL_CANDIDATES = "eval_candidates.jsonl"
+
+
+def process_range(task):
+    """处理一个区间（子进程）：划分并写出分片，返回计数和评测候选"""
+    source, start, end, out_dir, part_name, ratios, eval_k, eval_salt = task
+
+    writers = {name: open(f"{out_dir}/{name}/{part_name}.jsonl", 'w', encoding='utf-8')
+               for name, _ in ratios}
+    counts = {name: 0 for name, _ in ratios}
+    sampler = BottomK(eval_k)
+
+    for item in iter_source_range(source, start, end):
+        record = {
+            "instruction": item.get("instruction") or "",
+            "input": item.get("input") or "",
+            "output": item.get("output") or ""
+        }
+        split = assign_split(record, ratios)
+        writers[split].write(json.dumps(record, ensure_ascii=False) + '\n')
+        counts[split] += 1
+        if split == "test":
+            sampler.add(row_key(record, eval_salt), record)
+
+    for f in writers.values():
+        f.close()
+
+    return {
+        "part": part_name,
+        "start": start,
+        "end": end,
+        "counts": counts,
+        "eval": sampler.items()
+    }
+
+
+def load_manifest(out_dir):
+    path = f"{out_dir}/{MANIFEST}"
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_eval_candidates(out_dir, k):
+    sampler = BottomK(k)
+    path = f"{out_dir}/{EVAL_CANDIDATES}"
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                sampler.add(entry["key"], entry["row"])
+    return sampler
+
+
+def remove_previous_output(out_dir, manifest):
+    """删除上一次运行写出的分片（--force 时使用）"""
+    for part in manifest.get("parts", []):
+        for name in manifest["counts"]:
+            path = f"{out_dir}/{name}/{part['part']}.jsonl"
+            if os.path.exists(path):
+                os.remove(path)
+    for name in (MANIFEST, EVAL_CANDIDATES):
+        if os.path.exists(f"{out_dir}/{name}"):
+            os.remove(f"{out_dir}/{name}")
+
+
+def write_eval_files(out_dir, candidates, eval_sizes):
+    """按哈希顺序取前N条写出评测集（格式同03_preprocess.py）"""
+    os.makedirs(f"{out_dir}/evaluation", exist_ok=True)
+    ordered = candidates.items()
+    for n in eval_sizes:
+        eval_list = []
+        for idx, (_, row) in enumerate(ordered[:n]):
+            eval_list.append({
+                "id": idx,
+                "instruction": row["instruction"],
+                "input": row["input"],
+                "output": row["output"],
+                "full_question": format_question(row["instruction"], row["input"])
+            })
+        path = f"{out_dir}/evaluation/eval_{n}.json"
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(eval_list, f, ensure_ascii=False, indent=2)
+        print(f"  ✓ {path} ({len(eval_list)} 条)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='流式哈希数据划分')
+    parser.add_argument('--source', type=str, default='data/raw/tcm_sft',
+                        help='原始数据：save_to_disk目录或JSONL文件')
+    parser.add_argument('--output_dir', type=str, default='data/split',
+                        help='输出目录（train/val/test分片、评测集、manifest）')
+    parser.add_argument('--val_ratio', type=float, default=0.02)
+    parser.add_argument('--test_ratio', type=float, default=0.03)
+    parser.add_argument('--eval_sizes', type=int, nargs='+', default=[100, 500],
+                        help='从测试集抽取的评测集大小')
+    parser.add_argument('--seed', type=int, default=42,
+                        help='评测抽样的哈希盐')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--num_shards', type=int, default=None,
+                        help='本次写出的分片数（默认等于进程数）')
+    parser.add_argument('--force', action='store_true',
+                        help='忽略已有manifest，从头重新划分')
+
+    args = parser.parse_args()
+
+    ratios = [
+        ["train", 1 - args.val_ratio - args.test_ratio],
+        ["val", args.val_ratio],
+        ["test", args.test_ratio]
+    ]
+    eval_max = max(args.eval_sizes)
+    eval_salt = f"eval-{args.seed}"
+
+    print("=" * 60)
+    print("🔧 流式哈希数据划分")
+    print("=" * 60)
+    print(f"数据源: {args.source}")
+    print(f"输出目录: {args.output_dir}")
+    print(f"划分比例: " + " / ".join(f"{n} {r:.0%}" for n, r in ratios))
+
+    units, total = source_units(args.source)
+    print(f"数据源大小: {total:,} {'行' if units == 'rows' else '字节'}")
+
+    settings = {
+        "source": os.path.abspath(args.source),
+        "units": units,
+        "ratios": ratios,
+        "eval_salt": eval_salt,
+        "eval_max": eval_max
+    }
+
+    # 增量检查
+    manifest = load_manifest(args.output_dir)
+    if manifest is not None and args.force:
+        print("⚠️  --force: 删除上一次的划分结果")
+        remove_previous_output(args.output_dir, manifest)
+        manifest = None
+
+    if manifest is not None:
+        changed = [k for k, v in settings.items() if manifest["settings"].get(k) != v]
+        if changed:
+            print(f"✗ 划分设置与已有结果不一致: {', '.join(changed)}")
+            print("💡 使用 --force 重新划分")
+            sys.exit(1)
+        if total < manifest["processed"]:
+            print(f"✗ 数据源比上次处理时更小（{total:,} < {manifest['processed']:,}），不是追加")
+            print("💡 使用 --force 重新划分")
+            sys.exit(1)
+        start = manifest["processed"]
+        print(f"✓ 发现已有划分，已处理 {start:,}，本次增量处理 {total - start:,}")
+    else:
+        manifest = {"settings": settings, "processed": 0, "parts": [],
+                    "counts": {name: 0 for name, _ in ratios}, "generations": 0}
+        start = 0
+
+    for name, _ in ratios:
+        os.makedirs(f"{args.output_dir}/{name}", exist_ok=True)
+
+    candidates = load_eval_candidates(args.output_dir, eval_max)
+
+    if start < total:
+        generation = manifest["generations"]
+        ranges = split_ranges(start, total, args.num_shards or args.workers)
+        tasks = [
+            (args.source, s, e, args.output_dir, f"part-{generation:03d}-{i:05d}",
+             ratios, eval_max, eval_salt)
+            for i, (s, e) in enumerate(ranges)
+        ]
+
+        print(f"\n🔄 {len(tasks)} 个区间, {args.workers} 个进程...")
+        with Pool(args.workers) as pool:
+            for result in tqdm(pool.imap_unordered(process_range, tasks), total=len(tasks), desc="划分"):
+                for key, row in result.pop("eval"):
+                    candidates.add(key, row)
+                for name, n in result["counts"].items():
+                    manifest["counts"][name] += n
+                manifest["parts"].append(result)
+
+        manifest["parts"].sort(key=lambda p: p["part"])
+        manifest["processed"] = total
+        manifest["generations"] = generation + 1
+
+        # 先写候选再写manifest，中断时下次会从头重做本次增量
+        with open(f"{args.output_dir}/{EVAL_CANDIDATES}", 'w', encoding='utf-8') as f:
+            for key, row in candidates.items():
+                f.write(json.dumps({"key": key, "row": row}, ensure_ascii=False) + '\n')
+        with open(f"{args.output_dir}/{MANIFEST}", 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+    else:
+        print("✓ 没有新增数据")
+
+    print("\n🎯 写出评测集...")
+    write_eval_files(args.output_dir, candidates, sorted(args.eval_sizes))
+
+    print("\n数据集规模:")
+    all_rows = sum(manifest["counts"].values())
+    for name, n in manifest["counts"].items():
+        print(f"  {name}: {n:,} 条 ({n / all_rows * 100 if all_rows else 0:.1f}%)")
+    print(f"  分片: {len(manifest['parts'])} × {len(ratios)}")
+
+    print("\n" + "=" * 60)
+    print("✅ 划分完成！")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
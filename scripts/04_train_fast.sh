@@ -6,18 +6,9 @@ pkill -9 -f torchrun 2>/dev/null || true
 sleep 2
 
 # ========== 使用已有的30%数据 ==========
-# 如果已经创建了 train_30p.jsonl 就用它，否则创建
+# 如果已经创建了 train_30p.jsonl 就用它，否则分层抽样创建
 if [ ! -f data/jsonl/train_30p.jsonl ]; then
-    python << 'PY'
-import random
-random.seed(42)
-with open('data/jsonl/train.jsonl', 'r') as f:
-    lines = f.readlines()
-sampled = random.sample(lines, len(lines) // 3)
-with open('data/jsonl/train_30p.jsonl', 'w') as f:
-    f.writelines(sampled)
-print(f"✓ 创建30%数据: {len(sampled):,} 条")
-PY
+    python scripts/sample_subsets.py --fractions 0.3 --format sharegpt --dataset_info ""
 fi
 
 # ========== 修复配置文件 ==========
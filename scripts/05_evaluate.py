@@ -9,9 +9,13 @@ import sys
 import argparse
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from src.data_parallel import DataParallelEvaluator
 from src.evaluator import ModelEvaluator, load_eval_data, save_results
+from src.eval_source import shard_eval_data
 from src.metrics import calculate_all_metrics, save_metrics, print_metrics
 from src.prompt_builder import build_zero_shot_prompt, build_cot_prompt
+from src.result_store import save_run_config
+from src.self_consistency import summarize_votes
 
 # API配置
 API_CONFIG = {
@@ -25,27 +29,85 @@ API_CONFIG = {
 # 本地模型配置
 LOCAL_CONFIG = {
     "model_path": "Qwen/Qwen2.5-7B-Instruct",
-    "lora_path": "./models/checkpoints/qwen2.5-7b-tcm-lora"
+    "lora_path": "./models/checkpoints/qwen2.5-7b-tcm-lora",
+    # 合并LoRA权重的缓存目录（首次运行时生成，设为None则使用PeftModel）
+    "merged_cache": None,
+    # local-onnx模式的ONNX导出缓存目录
+    "onnx_cache": "./models/onnx"
 }
 
 
 def main():
     parser = argparse.ArgumentParser(description='中医模型评测（支持并发）')
     parser.add_argument('--mode', type=str, default='api', 
-                        choices=['local', 'api'],
-                        help='评测模式: local(本地LoRA) 或 api(使用API)')
+                        choices=['local', 'local-cpu', 'local-onnx', 'api'],
+                        help='评测模式: local(本地LoRA) / local-cpu(CPU推理，默认int8动态量化) / '
+                             'local-onnx(ONNX Runtime CPU推理) / api(使用API)')
+    parser.add_argument('--model_path', type=str, default=None,
+                        help='本地基座模型路径（默认LOCAL_CONFIG）')
+    parser.add_argument('--lora_path', type=str, default=None,
+                        help='本地LoRA路径（默认LOCAL_CONFIG；为空字符串时只评测基座模型）')
+    parser.add_argument('--merged_cache', type=str, default=None,
+                        help='合并LoRA权重的缓存目录（如 ./models/merged，首次运行时生成；默认LOCAL_CONFIG，None为PeftModel）')
     parser.add_argument('--eval_file', type=str, default='data/evaluation/eval_100.json',
-                        help='评测数据文件路径')
+                        help='评测数据路径（.json/.jsonl/.parquet 或 save_to_disk目录，后三者按需读取）')
+    parser.add_argument('--split', type=str, default='test',
+                        help='评测数据为DatasetDict目录时使用的划分')
+    parser.add_argument('--start', type=int, default=0,
+                        help='只评测 [start, end) 区间的样本（结果写到 rows{start}-{end} 子目录）')
+    parser.add_argument('--end', type=int, default=None)
+    parser.add_argument('--num_shards', type=int, default=1,
+                        help='把评测数据均分为num_shards份，只评测第shard_id份（结果写到 shard{shard_id}of{num_shards} 子目录）')
+    parser.add_argument('--shard_id', type=int, default=0)
     parser.add_argument('--output_dir', type=str, default='outputs/predictions',
                         help='输出目录')
     parser.add_argument('--parallel', type=int, default=1,
                         help='并发数（仅API模式有效，推荐10）')
+    parser.add_argument('--result_format', type=str, default='parquet',
+                        choices=['parquet', 'jsonl.zst', 'json'],
+                        help='结果文件格式（parquet/jsonl.zst只保存生成字段和得分，读取时关联评测集）')
+    parser.add_argument('--draft_model', type=str, default=None,
+                        help='投机解码的draft小模型路径（仅local模式，与基座共用tokenizer；设置后改为贪心解码）')
+    parser.add_argument('--prompt_lookup', action='store_true',
+                        help='不用draft模型，在prompt中查找n-gram做投机解码（仅local模式，适合照抄输入较多的任务）')
+    parser.add_argument('--num_draft_tokens', type=int, default=5,
+                        help='投机解码每轮提议的token数')
+    parser.add_argument('--compile', action='store_true',
+                        help='使用静态KV缓存 + torch.compile 解码（仅local模式，启动时预热编译）')
+    parser.add_argument('--max_cache_len', type=int, default=6144,
+                        help='静态KV缓存长度（最长prompt + max_tokens）')
+    parser.add_argument('--cpu_precision', type=str, default='int8', choices=['int8', 'bf16', 'fp32'],
+                        help='local-cpu模式的权重精度')
+    parser.add_argument('--num_threads', type=int, default=None,
+                        help='local-cpu/local-onnx模式的线程数（默认物理核数）')
+    parser.add_argument('--numa_node', type=int, default=None,
+                        help='local-cpu/local-onnx模式绑定的NUMA节点（多路服务器建议设置）')
+    parser.add_argument('--onnx_int8', action='store_true',
+                        help='local-onnx模式使用int8动态量化后的ONNX图')
+    parser.add_argument('--kv_cache_bits', type=int, default=None, choices=[8, 4],
+                        help='KV缓存量化位数（仅local/local-cpu模式，长CoT生成时节省显存）')
+    parser.add_argument('--kv_offload', action='store_true',
+                        help='把较早的KV块卸载到CPU内存（仅local/local-cpu模式）')
+    parser.add_argument('--kv_block_size', type=int, default=128,
+                        help='保持原精度的最近token数（压缩/卸载的块大小）')
+    parser.add_argument('--extract_answer', action='store_true',
+                        help='CoT评测只对<答案>标签中的内容打分（默认对完整输出打分）；比较不同运行时需一致')
+    parser.add_argument('--self_consistency', type=int, default=1,
+                        help='CoT自洽采样数k（仅local/local-cpu模式；>1时共享prefill采样k条推理，按答案重叠投票，需要--extract_answer）')
+    parser.add_argument('--sc_temperature', type=float, default=0.7,
+                        help='自洽采样的温度')
+    parser.add_argument('--data_parallel', type=int, default=1,
+                        help='本地模式的评测进程数（每个进程绑定一张GPU或一组CPU核、各加载一份模型）')
+    parser.add_argument('--devices', type=str, default=None,
+                        help='数据并行使用的GPU编号（如 4,5,6,7；cpu为按CPU核分组），默认全部可见GPU；local-cpu/local-onnx模式固定按CPU核分组')
     parser.add_argument('--skip_zero_shot', action='store_true',
                         help='跳过零样本评测')
     parser.add_argument('--skip_cot', action='store_true',
                         help='跳过CoT评测')
     
     args = parser.parse_args()
+    if args.self_consistency > 1 and not args.extract_answer and not args.skip_cot:
+        parser.error("--self_consistency 按提取的<答案>投票，需要同时设置 --extract_answer（与k=1的运行按同一方式打分）")
     
     print("=" * 60)
     print("🚀 中医模型评测系统（并发版）")
@@ -56,25 +118,68 @@ def main():
     print(f"并发数: {args.parallel}")
     print("")
     
+    # 区间/分片评测写到各自的子目录，多个分片进程共用同一个 --output_dir 时不会互相覆盖
+    part = []
+    if args.start or args.end is not None:
+        part.append(f"rows{args.start}-{'end' if args.end is None else args.end}")
+    if args.num_shards > 1:
+        part.append(f"shard{args.shard_id}of{args.num_shards}")
+    part = "_".join(part)
+    zero_shot_dir = f"{args.output_dir}/zero_shot" + (f"/{part}" if part else "")
+    cot_dir = f"{args.output_dir}/cot" + (f"/{part}" if part else "")
+    
     # 创建输出目录
-    os.makedirs(f"{args.output_dir}/zero_shot", exist_ok=True)
-    os.makedirs(f"{args.output_dir}/cot", exist_ok=True)
+    os.makedirs(zero_shot_dir, exist_ok=True)
+    os.makedirs(cot_dir, exist_ok=True)
     
     # 加载评测数据
     print("📂 加载评测数据...")
-    eval_data = load_eval_data(args.eval_file)
+    eval_data = load_eval_data(args.eval_file, args.split)
+    if args.start or args.end is not None:
+        eval_data = eval_data[args.start:args.end]
+    if args.num_shards > 1:
+        eval_data = shard_eval_data(eval_data, args.num_shards, args.shard_id)
+        print(f"分片: {args.shard_id + 1}/{args.num_shards}")
     print(f"✓ 已加载 {len(eval_data)} 条评测数据\n")
     
     # 初始化评测器
-    if args.mode == "local":
-        evaluator = ModelEvaluator(
-            mode="local",
-            model_path=LOCAL_CONFIG["model_path"],
-            lora_path=LOCAL_CONFIG["lora_path"]
+    local_config = dict(
+        LOCAL_CONFIG,
+        model_path=args.model_path or LOCAL_CONFIG["model_path"],
+        # --lora_path '' 表示只评测基座模型
+        lora_path=LOCAL_CONFIG["lora_path"] if args.lora_path is None else (args.lora_path or None)
+    )
+    if args.mode in ("local", "local-cpu", "local-onnx"):
+        evaluator_kwargs = dict(
+            mode=args.mode,
+            model_path=local_config["model_path"],
+            lora_path=local_config["lora_path"],
+            merged_cache=args.merged_cache or LOCAL_CONFIG["merged_cache"],
+            draft_model_path=args.draft_model,
+            num_draft_tokens=args.num_draft_tokens,
+            prompt_lookup=args.prompt_lookup,
+            compile_decode=args.compile,
+            max_cache_len=args.max_cache_len,
+            cpu_precision=args.cpu_precision,
+            num_threads=args.num_threads,
+            numa_node=args.numa_node,
+            onnx_cache=LOCAL_CONFIG["onnx_cache"],
+            onnx_int8=args.onnx_int8,
+            kv_cache_bits=args.kv_cache_bits,
+            kv_offload=args.kv_offload,
+            kv_block_size=args.kv_block_size,
+            self_consistency=args.self_consistency,
+            sc_temperature=args.sc_temperature
         )
-        # 本地模式强制单线程
+        if args.data_parallel > 1:
+            # 每个进程一份模型，样本从共享队列动态领取
+            evaluator = DataParallelEvaluator(
+                args.data_parallel, evaluator_kwargs, args.devices.split(",") if args.devices else None
+            )
+        else:
+            evaluator = ModelEvaluator(**evaluator_kwargs)
+            print("⚠️  本地模式单进程评测（多GPU/多核可用 --data_parallel）")
         num_workers = 1
-        print("⚠️  本地模式仅支持单线程评测")
     else:
         evaluator = ModelEvaluator(
             mode="api",
@@ -82,6 +187,27 @@ def main():
         )
         num_workers = args.parallel
     
+    run_config = {
+        "mode": args.mode,
+        "model": API_CONFIG["model_name"] if args.mode == "api" else local_config,
+        "eval_file": args.eval_file,
+        "start": args.start,
+        "end": args.end,
+        "num_shards": args.num_shards,
+        "shard_id": args.shard_id,
+        "draft_model": args.draft_model,
+        "prompt_lookup": args.prompt_lookup,
+        "compile": args.compile,
+        "cpu_precision": args.cpu_precision if args.mode == "local-cpu" else None,
+        "onnx_int8": args.onnx_int8 if args.mode == "local-onnx" else None,
+        "kv_cache_bits": args.kv_cache_bits,
+        "kv_offload": args.kv_offload,
+        "data_parallel": args.data_parallel if args.mode != "api" else None,
+        "self_consistency": args.self_consistency,
+        "sc_temperature": args.sc_temperature if args.self_consistency > 1 else None,
+        "num_draft_tokens": args.num_draft_tokens if args.draft_model or args.prompt_lookup else None
+    }
+    
     # ========================================
     # 零样本评测
     # ========================================
@@ -101,14 +227,18 @@ def main():
         # 保存结果
         save_results(
             zero_shot_results,
-            f"{args.output_dir}/zero_shot/predictions.json"
+            f"{zero_shot_dir}/predictions.{args.result_format}",
+            eval_file=args.eval_file
         )
+        save_run_config(zero_shot_dir, dict(run_config, prompt="zero_shot", max_tokens=2048))
         
         # 计算指标
         zero_shot_metrics = calculate_all_metrics(zero_shot_results)
+        if evaluator.speculative_stats:
+            zero_shot_metrics["speculative"] = evaluator.speculative_stats
         save_metrics(
             zero_shot_metrics,
-            f"{args.output_dir}/zero_shot/metrics.json"
+            f"{zero_shot_dir}/metrics.json"
         )
         print_metrics(zero_shot_metrics, "零样本评测结果")
     
@@ -125,20 +255,31 @@ def main():
             prompt_builder=build_cot_prompt,
             mode_name="CoT",
             max_tokens=4096,
-            num_workers=num_workers
+            num_workers=num_workers,
+            is_cot=args.extract_answer
         )
         
         # 保存结果
         save_results(
             cot_results,
-            f"{args.output_dir}/cot/predictions.json"
+            f"{cot_dir}/predictions.{args.result_format}",
+            eval_file=args.eval_file
         )
+        save_run_config(cot_dir, dict(run_config, prompt="cot", max_tokens=4096,
+                                      extract_answer=args.extract_answer))
         
         # 计算指标
         cot_metrics = calculate_all_metrics(cot_results)
+        if evaluator.speculative_stats:
+            cot_metrics["speculative"] = evaluator.speculative_stats
+        votes = summarize_votes(cot_results)
+        if votes:
+            cot_metrics["self_consistency"] = votes
+            print(f"自洽投票: k={votes['num_samples']}，平均一致度 {votes['avg_agreement']:.4f}，"
+                  f"答案完全一致 {votes['unanimous_ratio']:.1%}")
         save_metrics(
             cot_metrics,
-            f"{args.output_dir}/cot/metrics.json"
+            f"{cot_dir}/metrics.json"
         )
         print_metrics(cot_metrics, "CoT评测结果")
     
@@ -172,10 +313,13 @@ def main():
         
         print("-" * 70)
     
+    if isinstance(evaluator, DataParallelEvaluator):
+        evaluator.close()
+    
     print("\n" + "=" * 60)
     print("✅ 评测完成！")
     print("=" * 60)
-    print(f"\n结果保存在: {args.output_dir}/")
+    print(f"\n结果保存在: {args.output_dir}/" + (f"（{part} 子目录）" if part else ""))
     print("\n下一步:")
     print("  1. 查看详细结果: cat outputs/predictions/zero_shot/metrics.json")
     print("  2. 运行完整评测: python scripts/05_evaluate.py --eval_file data/evaluation/eval_500.json --parallel 10")
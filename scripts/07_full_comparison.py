@@ -7,11 +7,15 @@ import os
 import sys
 import argparse
 import json
+import random
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from src.data_parallel import DataParallelEvaluator
 from src.evaluator import ModelEvaluator, load_eval_data, save_results
-from src.metrics import calculate_all_metrics, save_metrics, print_metrics
+from src.metrics import calculate_all_metrics, save_metrics, print_metrics, calculate_token_f1
 from src.prompt_builder import build_zero_shot_prompt, build_cot_prompt
+from src.result_store import save_run_config
+from src.sequential import PairedSequentialTest, active_arms, compute_savings
 
 # API配置
 API_CONFIG = {
@@ -25,7 +29,9 @@ API_CONFIG = {
 # 本地LoRA配置
 LOCAL_CONFIG = {
     "model_path": "/home/zhayi/.cache/modelscope/hub/models/Qwen/Qwen2___5-7B-Instruct",
-    "lora_path": "./models/checkpoints/qwen2.5-7b-tcm-lora"
+    "lora_path": "./models/checkpoints/qwen2.5-7b-tcm-lora",
+    # 合并LoRA权重的缓存目录（首次运行时生成，设为None则使用PeftModel）
+    "merged_cache": None
 }
 
 
@@ -34,7 +40,8 @@ def run_experiment(
     eval_data,
     experiment_name,
     output_base_dir,
-    num_workers=10
+    num_workers=10,
+    eval_file=None
 ):
     """运行单个实验（零样本+CoT）"""
     print("\n" + "=" * 70)
@@ -58,7 +65,9 @@ def run_experiment(
         is_cot=False  # 零样本模式
     )
     
-    save_results(zero_shot_results, f"{exp_dir}/zero_shot/predictions.json")
+    save_results(zero_shot_results, f"{exp_dir}/zero_shot/predictions.parquet", eval_file)
+    save_run_config(f"{exp_dir}/zero_shot", {"experiment": experiment_name, "prompt": "zero_shot",
+                                              "eval_file": eval_file, "max_tokens": 2048})
     zero_shot_metrics = calculate_all_metrics(zero_shot_results)
     save_metrics(zero_shot_metrics, f"{exp_dir}/zero_shot/metrics.json")
     print_metrics(zero_shot_metrics, f"{experiment_name} - 零样本")
@@ -79,7 +88,9 @@ def run_experiment(
         is_cot=True  # ✨ CoT模式，会提取<答案>标签
     )
     
-    save_results(cot_results, f"{exp_dir}/cot/predictions.json")
+    save_results(cot_results, f"{exp_dir}/cot/predictions.parquet", eval_file)
+    save_run_config(f"{exp_dir}/cot", {"experiment": experiment_name, "prompt": "cot",
+                                        "eval_file": eval_file, "max_tokens": 4096})
     cot_metrics = calculate_all_metrics(cot_results)
     save_metrics(cot_metrics, f"{exp_dir}/cot/metrics.json")
     print_metrics(cot_metrics, f"{experiment_name} - CoT")
@@ -157,16 +168,253 @@ def print_final_comparison(all_results):
     print("=" * 80)
 
 
+def build_arms(api_evaluator, lora_evaluator, num_workers):
+    """构建序贯评测的实验组"""
+    arms = {}
+    if api_evaluator is not None:
+        arms['api_zero_shot'] = {
+            'label': 'API基线-零样本', 'evaluator': api_evaluator,
+            'prompt_builder': build_zero_shot_prompt, 'max_tokens': 2048,
+            'is_cot': False, 'num_workers': num_workers
+        }
+        arms['api_cot'] = {
+            'label': 'API基线-CoT(提取)', 'evaluator': api_evaluator,
+            'prompt_builder': build_cot_prompt, 'max_tokens': 4096,
+            'is_cot': True, 'num_workers': num_workers
+        }
+    if lora_evaluator is not None:
+        arms['lora_zero_shot'] = {
+            'label': 'LoRA微调-零样本', 'evaluator': lora_evaluator,
+            'prompt_builder': build_zero_shot_prompt, 'max_tokens': 2048,
+            'is_cot': False, 'num_workers': 1
+        }
+        arms['lora_cot'] = {
+            'label': 'LoRA微调-CoT(提取)', 'evaluator': lora_evaluator,
+            'prompt_builder': build_cot_prompt, 'max_tokens': 4096,
+            'is_cot': True, 'num_workers': 1
+        }
+    return arms
+
+
+# 序贯模式下的对比（对照组, 实验组）
+SEQUENTIAL_COMPARISONS = [
+    ('微调效果-零样本', 'api_zero_shot', 'lora_zero_shot'),
+    ('微调效果-CoT', 'api_cot', 'lora_cot'),
+    ('CoT效果-API', 'api_zero_shot', 'api_cot'),
+    ('CoT效果-LoRA', 'lora_zero_shot', 'lora_cot'),
+]
+
+
+def run_sequential_experiment(arms, eval_data, output_base_dir, args):
+    """
+    序贯评测：打乱顺序后按批次配对评测，每个对比结论明确后即停止
+
+    Args:
+        arms: 实验组配置（build_arms的返回值）
+        eval_data: 评测数据
+        output_base_dir: 输出目录
+        args: 命令行参数（seq_*）
+
+    Returns:
+        序贯评测摘要
+    """
+    print("\n" + "=" * 70)
+    print("🧪 序贯评测（结论明确后提前停止）")
+    print("=" * 70)
+
+    tests = [
+        PairedSequentialTest(
+            name, a, b,
+            alpha=args.seq_alpha,
+            margin=args.seq_margin,
+            min_items=args.seq_min_items,
+            target_items=args.seq_min_items * 4
+        )
+        for name, a, b in SEQUENTIAL_COMPARISONS
+        if a in arms and b in arms
+    ]
+    if not tests:
+        print("⚠️  至少需要两个实验组才能进行对比")
+        return {}
+
+    # 打乱顺序，保证任意前缀都是随机样本
+    order = list(eval_data)
+    random.Random(args.seed).shuffle(order)
+
+    arm_results = {name: [] for name in arms}
+    arm_f1 = {name: [] for name in arms}
+    pos = 0
+
+    while pos < len(order):
+        running = active_arms(tests)
+        if not running:
+            break
+
+        chunk = order[pos:pos + args.seq_batch]
+        for name in running:
+            arm = arms[name]
+            chunk_results = arm['evaluator'].batch_evaluate(
+                eval_data=chunk,
+                prompt_builder=arm['prompt_builder'],
+                mode_name=f"序贯-{arm['label']}",
+                max_tokens=arm['max_tokens'],
+                num_workers=arm['num_workers'],
+                is_cot=arm['is_cot']
+            )
+            arm_results[name].extend(chunk_results)
+            arm_f1[name].extend(
+                calculate_token_f1(r.get('prediction', ''), item['output'])['f1']
+                for r, item in zip(chunk_results, chunk)
+            )
+
+        for i in range(pos, pos + len(chunk)):
+            for test in tests:
+                if test.decision is None:
+                    test.update(arm_f1[test.arm_a][i], arm_f1[test.arm_b][i])
+                    test.check()
+        pos += len(chunk)
+
+        print(f"\n📈 已评测 {pos}/{len(order)} 条:")
+        for test in tests:
+            b = test.bounds()
+            status = test.decision or "继续"
+            print(f"  {test.name:<16} ΔF1={b['mean']:+.4f} "
+                  f"[{b['lower']:+.4f}, {b['upper']:+.4f}]  {status}")
+
+    # 保存每组结果
+    seq_dir = f"{output_base_dir}/sequential"
+    arm_avg_time = {}
+    arm_metrics = {}
+    for name, results in arm_results.items():
+        if not results:
+            continue
+        os.makedirs(f"{seq_dir}/{name}", exist_ok=True)
+        save_results(results, f"{seq_dir}/{name}/predictions.parquet", args.eval_file)
+        save_run_config(f"{seq_dir}/{name}", {"experiment": "sequential", "arm": name,
+                                              "eval_file": args.eval_file, "max_tokens": arms[name]['max_tokens'],
+                                              "seed": args.seed})
+        metrics = calculate_all_metrics(results)
+        save_metrics(metrics, f"{seq_dir}/{name}/metrics.json")
+        arm_metrics[name] = metrics
+        arm_avg_time[name] = metrics['avg_inference_time']
+
+    reports = [test.report(len(order)) for test in tests]
+    savings = compute_savings(
+        {name: len(results) for name, results in arm_results.items()},
+        arm_avg_time,
+        len(order)
+    )
+
+    print("\n" + "=" * 80)
+    print("📊 序贯评测结论")
+    print("=" * 80)
+    print(f"\n{'对比':<16} {'结论':>10} {'所需样本':>10} {'ΔF1':>10} {'置信区间':>20}")
+    print("-" * 80)
+    for r in reports:
+        ci = f"[{r['ci_lower']:+.3f}, {r['ci_upper']:+.3f}]"
+        print(f"{r['name']:<16} {r['decision']:>10} "
+              f"{r['items_used']:>5}/{r['total_items']:<4} {r['f1_diff']:>+10.4f} {ci:>20}")
+    print("-" * 80)
+    for name, s in savings['per_arm'].items():
+        print(f"  {arms[name]['label']:<20} 评测 {s['items_evaluated']:>4} 条, "
+              f"跳过 {s['items_skipped']:>4} 条, 预计节省 {s['est_time_saved']:.0f}秒")
+    print(f"\n调用次数: {savings['calls_used']}/{savings['calls_full']} "
+          f"(节省 {savings['calls_saved_ratio']:.1%}), "
+          f"预计节省推理时间 {savings['est_time_saved'] / 3600:.2f} 小时")
+
+    summary = {
+        'eval_file': args.eval_file,
+        'total_samples': len(order),
+        'seed': args.seed,
+        'comparisons': reports,
+        'savings': savings,
+        'arm_metrics': arm_metrics
+    }
+    with open(f"{seq_dir}/sequential_summary.json", 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ 序贯评测摘要已保存: {seq_dir}/sequential_summary.json")
+
+    return summary
+
+
+def build_lora_evaluator(args):
+    """本地LoRA评测器（--data_parallel大于1时为多进程数据并行）"""
+    evaluator_kwargs = dict(
+        mode="local",
+        model_path=LOCAL_CONFIG["model_path"],
+        lora_path=LOCAL_CONFIG["lora_path"],
+        merged_cache=args.merged_cache or LOCAL_CONFIG["merged_cache"]
+    )
+    if args.data_parallel > 1:
+        return DataParallelEvaluator(
+            args.data_parallel, evaluator_kwargs, args.devices.split(",") if args.devices else None
+        )
+    return ModelEvaluator(**evaluator_kwargs)
+
+
+def summarize_experiments(output_dir, eval_file):
+    """
+    根据已有的 metrics.json 汇总 summary.json（API与LoRA分开运行时使用）
+
+    Returns:
+        汇总的实验数
+    """
+    summary = {
+        'eval_file': eval_file,
+        'total_samples': None,
+        'experiments': {}
+    }
+    for exp_name in ('api_baseline', 'lora_finetuned'):
+        metrics = {}
+        for arm in ('zero_shot', 'cot'):
+            path = f"{output_dir}/{exp_name}/{arm}/metrics.json"
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    metrics[arm] = json.load(f)
+        if len(metrics) == 2:
+            summary['experiments'][exp_name] = metrics
+            summary['total_samples'] = metrics['zero_shot']['total_samples']
+
+    with open(f"{output_dir}/summary.json", 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    print(f"✅ 已汇总 {len(summary['experiments'])} 组实验: {output_dir}/summary.json")
+    return len(summary['experiments'])
+
+
 def main():
     parser = argparse.ArgumentParser(description='完整对比实验（CoT答案提取版）')
     parser.add_argument('--eval_file', type=str, default='data/evaluation/eval_100.json')
     parser.add_argument('--output_dir', type=str, default='outputs/comparison_v2')
     parser.add_argument('--parallel', type=int, default=10)
+    parser.add_argument('--data_parallel', type=int, default=1,
+                        help='LoRA评测的进程数（每个进程绑定一张GPU或一组CPU核、各加载一份模型）')
+    parser.add_argument('--merged_cache', type=str, default=None,
+                        help='合并LoRA权重的缓存目录（如 ./models/merged，首次运行时生成；默认LOCAL_CONFIG，None为PeftModel）')
+    parser.add_argument('--devices', type=str, default=None,
+                        help='数据并行使用的GPU编号（如 4,5,6,7；cpu为按CPU核分组），默认全部可见GPU')
     parser.add_argument('--skip_api', action='store_true')
     parser.add_argument('--skip_lora', action='store_true')
-    
+    parser.add_argument('--summarize', action='store_true',
+                        help='不评测，只根据已有的metrics.json汇总summary.json')
+    parser.add_argument('--sequential', action='store_true',
+                        help='序贯评测：配对F1差值结论明确后提前停止')
+    parser.add_argument('--seq_alpha', type=float, default=0.05,
+                        help='序贯检验显著性水平')
+    parser.add_argument('--seq_margin', type=float, default=0.02,
+                        help='判定持平的F1差值范围')
+    parser.add_argument('--seq_min_items', type=int, default=30,
+                        help='每个对比最少样本数')
+    parser.add_argument('--seq_batch', type=int, default=10,
+                        help='每批评测的样本数（两次检查之间）')
+    parser.add_argument('--seed', type=int, default=42,
+                        help='序贯评测的打乱种子')
+
     args = parser.parse_args()
     
+    if args.summarize:
+        summarize_experiments(args.output_dir, args.eval_file)
+        return
+    
     print("=" * 80)
     print("🚀 完整对比实验系统 v2（CoT答案提取）")
     print("=" * 80)
@@ -180,7 +428,20 @@ def main():
     print("📂 加载评测数据...")
     eval_data = load_eval_data(args.eval_file)
     print(f"✓ 已加载 {len(eval_data)} 条数据\n")
-    
+
+    if args.sequential:
+        api_evaluator = None
+        lora_evaluator = None
+        if not args.skip_api:
+            api_evaluator = ModelEvaluator(mode="api", api_config=API_CONFIG)
+        if not args.skip_lora:
+            lora_evaluator = build_lora_evaluator(args)
+        arms = build_arms(api_evaluator, lora_evaluator, args.parallel)
+        run_sequential_experiment(arms, eval_data, args.output_dir, args)
+        if isinstance(lora_evaluator, DataParallelEvaluator):
+            lora_evaluator.close()
+        return
+
     all_results = {}
     
     # 实验1: API基线
@@ -191,27 +452,31 @@ def main():
             eval_data=eval_data,
             experiment_name="api_baseline",
             output_base_dir=args.output_dir,
-            num_workers=args.parallel
+            num_workers=args.parallel,
+            eval_file=args.eval_file
         )
     
     # 实验2: LoRA微调
     if not args.skip_lora:
-        lora_evaluator = ModelEvaluator(
-            mode="local",
-            model_path=LOCAL_CONFIG["model_path"],
-            lora_path=LOCAL_CONFIG["lora_path"]
-        )
+        lora_evaluator = build_lora_evaluator(args)
         all_results['lora_finetuned'] = run_experiment(
             evaluator=lora_evaluator,
             eval_data=eval_data,
             experiment_name="lora_finetuned",
             output_base_dir=args.output_dir,
-            num_workers=1
+            num_workers=1,
+            eval_file=args.eval_file
         )
+        if isinstance(lora_evaluator, DataParallelEvaluator):
+            lora_evaluator.close()
     
+    # 只跑了一组实验时不写summary.json：流水线中两组实验并行运行，由 --summarize 阶段统一汇总
+    if args.skip_api or args.skip_lora:
+        print(f"\n✅ 实验结果已保存到 {args.output_dir}/（汇总请运行 --summarize）")
+        return
+
     # 最终对比
-    if not args.skip_api and not args.skip_lora:
-        print_final_comparison(all_results)
+    print_final_comparison(all_results)
     
     # 保存完整结果
     summary = {
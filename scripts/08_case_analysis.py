@@ -4,21 +4,23 @@
 详细案例分析
 对比零样本和CoT的实际回答质量
 """
-import json
+import os
 import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.result_store import load_results
+
+ARMS = ("api_baseline/zero_shot", "api_baseline/cot", "lora_finetuned/zero_shot", "lora_finetuned/cot")
 
 def analyze_cases(result_dir, num_cases=10):
     """分析典型案例"""
     
-    # 加载4组结果
-    with open(f"{result_dir}/api_baseline/zero_shot/predictions.json", 'r') as f:
-        api_zs = json.load(f)
-    with open(f"{result_dir}/api_baseline/cot/predictions.json", 'r') as f:
-        api_cot = json.load(f)
-    with open(f"{result_dir}/lora_finetuned/zero_shot/predictions.json", 'r') as f:
-        lora_zs = json.load(f)
-    with open(f"{result_dir}/lora_finetuned/cot/predictions.json", 'r') as f:
-        lora_cot = json.load(f)
+    # 加载4组结果（第一组只读取前num_cases条，问题和参考答案从评测集关联；其余按样本id配对）
+    api_zs = load_results(f"{result_dir}/{ARMS[0]}", ["id", "full_question", "reference", "prediction"], limit=num_cases)
+    api_cot, lora_zs, lora_cot = (
+        {r["id"]: r for r in load_results(f"{result_dir}/{arm}", ["id", "prediction"])} for arm in ARMS[1:]
+    )
+    missing = {"prediction": ""}
     
     print("=" * 80)
     print("📋 典型案例对比分析")
@@ -28,6 +30,10 @@ def analyze_cases(result_dir, num_cases=10):
         print(f"\n{'='*80}")
         print(f"案例 {i+1}")
         print(f"{'='*80}")
+        item_id = api_zs[i]['id']
+        api_cot_pred = api_cot.get(item_id, missing)['prediction']
+        lora_zs_pred = lora_zs.get(item_id, missing)['prediction']
+        lora_cot_pred = lora_cot.get(item_id, missing)['prediction']
         
         print(f"\n【问题】")
         print(f"{api_zs[i]['full_question'][:200]}...")
@@ -38,14 +44,14 @@ def analyze_cases(result_dir, num_cases=10):
         print(f"\n【API零样本】({len(api_zs[i]['prediction'])}字)")
         print(f"{api_zs[i]['prediction'][:300]}...")
         
-        print(f"\n【API-CoT】({len(api_cot[i]['prediction'])}字)")
-        print(f"{api_cot[i]['prediction'][:300]}...")
+        print(f"\n【API-CoT】({len(api_cot_pred)}字)")
+        print(f"{api_cot_pred[:300]}...")
         
-        print(f"\n【LoRA零样本】({len(lora_zs[i]['prediction'])}字)")
-        print(f"{lora_zs[i]['prediction'][:300]}...")
+        print(f"\n【LoRA零样本】({len(lora_zs_pred)}字)")
+        print(f"{lora_zs_pred[:300]}...")
         
-        print(f"\n【LoRA-CoT】({len(lora_cot[i]['prediction'])}字)")
-        print(f"{lora_cot[i]['prediction'][:300]}...")
+        print(f"\n【LoRA-CoT】({len(lora_cot_pred)}字)")
+        print(f"{lora_cot_pred[:300]}...")
         
         print(f"\n{'='*80}")
         input("按Enter查看下一个案例...")
@@ -54,24 +60,21 @@ def analyze_cases(result_dir, num_cases=10):
 def length_analysis(result_dir):
     """分析回答长度"""
     
-    with open(f"{result_dir}/api_baseline/zero_shot/predictions.json", 'r') as f:
-        api_zs = json.load(f)
-    with open(f"{result_dir}/api_baseline/cot/predictions.json", 'r') as f:
-        api_cot = json.load(f)
-    with open(f"{result_dir}/lora_finetuned/zero_shot/predictions.json", 'r') as f:
-        lora_zs = json.load(f)
-    with open(f"{result_dir}/lora_finetuned/cot/predictions.json", 'r') as f:
-        lora_cot = json.load(f)
+    # 只需要回答长度；参考答案长度取自评测集
+    api_zs = load_results(f"{result_dir}/{ARMS[0]}", ["reference", "prediction_chars"])
+    api_cot, lora_zs, lora_cot = (
+        load_results(f"{result_dir}/{arm}", ["prediction_chars"]) for arm in ARMS[1:]
+    )
     
     print("\n" + "=" * 80)
     print("📏 回答长度分析")
     print("=" * 80)
     
     ref_len = sum(len(item['reference']) for item in api_zs) / len(api_zs)
-    api_zs_len = sum(len(item['prediction']) for item in api_zs) / len(api_zs)
-    api_cot_len = sum(len(item['prediction']) for item in api_cot) / len(api_cot)
-    lora_zs_len = sum(len(item['prediction']) for item in lora_zs) / len(lora_zs)
-    lora_cot_len = sum(len(item['prediction']) for item in lora_cot) / len(lora_cot)
+    api_zs_len = sum(item['prediction_chars'] for item in api_zs) / len(api_zs)
+    api_cot_len = sum(item['prediction_chars'] for item in api_cot) / len(api_cot)
+    lora_zs_len = sum(item['prediction_chars'] for item in lora_zs) / len(lora_zs)
+    lora_cot_len = sum(item['prediction_chars'] for item in lora_cot) / len(lora_cot)
     
     print(f"\n{'组别':<20} {'平均长度':>10} {'与参考答案比':>15}")
     print("-" * 50)
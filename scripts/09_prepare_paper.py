@@ -6,12 +6,23 @@
 """
 import json
 import os
+import sys
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib
 matplotlib.use('Agg')
 plt.rcParams['font.sans-serif'] = ['SimHei']
 plt.rcParams['axes.unicode_minus'] = False
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.result_store import load_results
+
+ARMS = [
+    ('API基线', '零样本', 'api_baseline/zero_shot'),
+    ('API基线', 'CoT', 'api_baseline/cot'),
+    ('LoRA微调', '零样本', 'lora_finetuned/zero_shot'),
+    ('LoRA微调', 'CoT', 'lora_finetuned/cot'),
+]
 
 def create_main_results_table(summary_file, output_dir):
     """创建主要结果表格"""
@@ -151,6 +162,34 @@ def create_comparison_plot(summary_file, output_dir):
     print(f"✓ ROUGE对比图: {output_dir}/rouge_comparison.png")
 
 
+def create_length_table(result_dir, output_dir):
+    """创建回答长度与逐条F1分布表（只读取 prediction_chars、f1 两列）"""
+    
+    rows = []
+    for model, prompt, arm in ARMS:
+        if not os.path.isdir(f"{result_dir}/{arm}"):
+            continue
+        df = pd.DataFrame(load_results(f"{result_dir}/{arm}", ["prediction_chars", "f1"]))
+        rows.append({
+            '模型': model,
+            'Prompt': prompt,
+            '平均长度(字)': f"{df['prediction_chars'].mean():.0f}",
+            '长度中位数(字)': f"{df['prediction_chars'].median():.0f}",
+            'F1中位数': f"{df['f1'].median():.4f}",
+            'F1=0占比(%)': f"{(df['f1'] == 0).mean() * 100:.1f}"
+        })
+    
+    if not rows:
+        print(f"⚠️  {result_dir} 下没有逐条结果，跳过长度分析表")
+        return None
+    
+    df = pd.DataFrame(rows)
+    df.to_csv(f"{output_dir}/length_analysis.csv", index=False, encoding='utf-8-sig')
+    print(f"✓ 回答长度分析表: {output_dir}/length_analysis.csv")
+    
+    return df
+
+
 def generate_paper_outline(output_dir):
     """生成论文大纲"""
     
@@ -400,6 +439,8 @@ def main():
     parser = argparse.ArgumentParser(description='准备论文材料')
     parser.add_argument('--summary', type=str, default='outputs/comparison_100/summary.json',
                         help='实验结果摘要文件')
+    parser.add_argument('--result_dir', type=str, default=None,
+                        help='逐条结果所在目录（默认与summary同目录）')
     parser.add_argument('--output_dir', type=str, default='outputs/paper_materials',
                         help='输出目录')
     
@@ -419,7 +460,11 @@ def main():
     print("\n生成对比图表...")
     create_comparison_plot(args.summary, args.output_dir)
     
-    # 3. 生成论文大纲
+    # 3. 生成回答长度分析表
+    print("\n生成回答长度分析表...")
+    create_length_table(args.result_dir or os.path.dirname(args.summary), args.output_dir)
+    
+    # 4. 生成论文大纲
     print("\n生成论文大纲...")
     generate_paper_outline(args.output_dir)
     
@@ -431,6 +476,7 @@ def main():
     print(f"  - {args.output_dir}/main_results.tex    # LaTeX表格")
     print(f"  - {args.output_dir}/f1_comparison.png   # F1对比图")
     print(f"  - {args.output_dir}/rouge_comparison.png # ROUGE对比图")
+    print(f"  - {args.output_dir}/length_analysis.csv # 回答长度分析表")
     print(f"  - {args.output_dir}/paper_outline.md    # 论文大纲")
     print(f"\n下一步:")
     print(f"  1. 查看案例分析: python scripts/08_case_analysis.py outputs/comparison_100")
@@ -1,12 +1,16 @@
 #!/usr/bin/env python3
 """查看CoT答案提取效果"""
-import json
+import os
 import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-result_file = sys.argv[1] if len(sys.argv) > 1 else "outputs/comparison_v2/api_baseline/cot/predictions.json"
+from src.result_store import load_results
 
-with open(result_file, 'r') as f:
-    results = json.load(f)
+result_file = sys.argv[1] if len(sys.argv) > 1 else "outputs/comparison_v2/api_baseline/cot"
+
+# 统计只需要标签列；展示的前3个案例再读取文本列
+results = load_results(result_file, ["has_answer_tags"])
+cases = load_results(result_file, ["full_question", "reference", "raw_prediction", "prediction", "has_answer_tags"], limit=3)
 
 print("=" * 80)
 print("🔍 CoT答案提取效果检查")
@@ -20,8 +24,8 @@ print(f"未使用标签: {len(results)-has_tags_count} ({(len(results)-has_tags_
 print("\n" + "=" * 80)
 print("查看前3个案例:")
 
-for i in range(min(3, len(results))):
-    item = results[i]
+for i in range(len(cases)):
+    item = cases[i]
     print(f"\n{'='*80}")
     print(f"案例 {i+1}")
     print(f"{'='*80}")
@@ -32,7 +36,7 @@ for i in range(min(3, len(results))):
     print(f"\n【参考答案】")
     print(f"{item['reference'][:150]}...")
     
-    if 'raw_prediction' in item:
+    if item.get('raw_prediction') is not None:
         print(f"\n【完整CoT输出】({len(item['raw_prediction'])}字)")
         print(f"{item['raw_prediction'][:300]}...")
         
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+构建快速评测核心子集
+按任务类型+答案长度分层，并利用历史运行的逐条F1选出
+平均指标最能代表完整评测集的小子集，同时给出实测保真度
+"""
+import os
+import sys
+import json
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.evaluator import load_eval_data
+from src.coreset import CoresetSelector, find_prediction_files, load_item_scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description='构建分层核心评测子集')
+    parser.add_argument('--pool_file', type=str, default='data/evaluation/eval_500.json',
+                        help='完整评测集（子集将从中选出）')
+    parser.add_argument('--runs', type=str, nargs='*', default=['outputs'],
+                        help='历史运行的结果文件（predictions.parquet / .json）或其所在目录（递归查找）')
+    parser.add_argument('--size', type=int, default=100,
+                        help='子集大小')
+    parser.add_argument('--output', type=str, default='data/evaluation/eval_100_coreset.json',
+                        help='子集输出路径')
+    parser.add_argument('--restarts', type=int, default=20)
+    parser.add_argument('--iterations', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=42)
+
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🎯 构建分层核心评测子集")
+    print("=" * 60)
+
+    pool = load_eval_data(args.pool_file)
+    print(f"✓ 完整评测集: {len(pool)} 条 ({args.pool_file})")
+
+    files = find_prediction_files(args.runs)
+    scores = load_item_scores(files)
+    scores = {run: s for run, s in scores.items() if s}
+    print(f"✓ 历史运行: {len(scores)} 个")
+    for run, s in scores.items():
+        print(f"  - {run}: {len(s)} 条逐条分数")
+
+    selector = CoresetSelector(pool, scores, seed=args.seed)
+    if len(selector.pool) < args.size:
+        print(f"✗ 所有运行都有分数的样本只有 {len(selector.pool)} 条，少于子集大小 {args.size}")
+        print("💡 请在完整评测集上至少运行一次评测，或减少 --runs")
+        sys.exit(1)
+    if len(selector.pool) < len(pool):
+        print(f"⚠️  仅 {len(selector.pool)}/{len(pool)} 条在所有运行中都有分数，子集将从中选出")
+
+    print(f"\n🔄 选择 {args.size} 条...")
+    selected = selector.select(args.size, restarts=args.restarts, iterations=args.iterations)
+    fit = selector.fidelity(selected)
+    held_out = selector.held_out_fidelity(
+        args.size, restarts=args.restarts, iterations=args.iterations
+    )
+    first_k_err, random_err = selector.baseline_fidelity(args.size)
+
+    # 分层分布
+    print(f"\n{'分层':<28} {'完整集':>8} {'子集':>8}")
+    print("-" * 48)
+    strata = selector.strata_summary(selected)
+    for h, c in strata.items():
+        print(f"{h:<28} {c['pool']:>8} {c['subset']:>8}")
+
+    # 保真度
+    if scores:
+        print(f"\n{'运行':<45} {'完整F1':>8} {'子集F1':>8} {'误差':>8}")
+        print("-" * 72)
+        for run, v in fit['per_run'].items():
+            print(f"{run:<45} {v['full']:>8.4f} {v['subset']:>8.4f} {v['abs_error']:>8.4f}")
+        print("-" * 72)
+        print(f"拟合误差（参与选择的运行）: 平均 {fit['mean_abs_error']:.4f}, 最大 {fit['max_abs_error']:.4f}")
+        if held_out:
+            print(f"留一运行误差（预测新运行）: 平均 {held_out['mean_abs_error']:.4f}, "
+                  f"最大 {held_out['max_abs_error']:.4f}")
+        print(f"对照 - 前{args.size}条: {first_k_err:.4f}, 随机分层抽样: {random_err:.4f}")
+        print(f"运行排序一致率: {fit['rank_agreement']:.1%}")
+    else:
+        print("\n⚠️  没有历史分数，仅按比例分层随机抽样")
+
+    # 保存子集（保留原id，便于与历史运行对齐）
+    selected_set = set(selected)
+    subset = [item for item in selector.pool if item['id'] in selected_set]
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(subset, f, ensure_ascii=False, indent=2)
+    print(f"\n✓ 子集已保存: {args.output}")
+
+    report = {
+        'pool_file': args.pool_file,
+        'pool_size': len(selector.pool),
+        'subset_size': len(subset),
+        'runs': sorted(scores),
+        'strata': strata,
+        'fit': fit,
+        'held_out': held_out,
+        'baseline': {'first_k': first_k_err, 'random_stratified': random_err},
+        'ids': [item['id'] for item in subset]
+    }
+    report_path = os.path.splitext(args.output)[0] + '_report.json'
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✓ 保真度报告: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
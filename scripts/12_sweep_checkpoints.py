@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+训练检查点扫描评测（学习曲线）
+基座模型只加载一次，依次热切换各 checkpoint-* adapter 评测，输出 F1-训练步数 曲线
+"""
+import os
+import sys
+import json
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.checkpoint_sweep import find_checkpoints, sweep_checkpoints
+from src.evaluator import ModelEvaluator, load_eval_data
+from src.prompt_builder import build_zero_shot_prompt, build_cot_prompt
+
+PROMPTS = {
+    "zero_shot": (build_zero_shot_prompt, "零样本", 2048, False),
+    "cot": (build_cot_prompt, "CoT", 4096, True),
+}
+
+
+def plot_curve(curve, output_path, title):
+    """绘制 F1-训练步数 学习曲线"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    plt.rcParams['font.sans-serif'] = ['SimHei', 'Arial Unicode MS', 'DejaVu Sans']
+    plt.rcParams['axes.unicode_minus'] = False
+
+    steps = [p["step"] for p in curve]
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.plot(steps, [p["avg_f1"] for p in curve], marker='o', color='#1f77b4', label='平均F1')
+    ax.set_xlabel('训练步数', fontsize=12)
+    ax.set_ylabel('平均F1分数', fontsize=12)
+    ax.set_title(title, fontsize=14, fontweight='bold')
+    ax.grid(alpha=0.3)
+    ax.legend(fontsize=11)
+    plt.tight_layout()
+    plt.savefig(output_path, dpi=300, bbox_inches='tight')
+    plt.close(fig)
+    print(f"✓ 学习曲线: {output_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='训练检查点扫描评测')
+    parser.add_argument('--model_path', type=str, default='Qwen/Qwen2.5-7B-Instruct')
+    parser.add_argument('--run_dir', type=str, default='./models/checkpoints/qwen2.5-7b-tcm-lora',
+                        help='训练输出目录（包含 checkpoint-* 子目录）')
+    parser.add_argument('--eval_file', type=str, default='data/evaluation/eval_100.json')
+    parser.add_argument('--split', type=str, default='test')
+    parser.add_argument('--prompt', type=str, default='zero_shot', choices=list(PROMPTS))
+    parser.add_argument('--max_tokens', type=int, default=None, help='默认零样本2048、CoT 4096')
+    parser.add_argument('--steps', type=int, nargs='*', default=None, help='只评测这些step的检查点')
+    parser.add_argument('--every', type=int, default=1, help='每隔几个检查点评测一次')
+    parser.add_argument('--no_final', action='store_true', help='不评测run_dir根目录的最终adapter')
+    parser.add_argument('--output_dir', type=str, default='outputs/checkpoint_sweep')
+    parser.add_argument('--no_plot', action='store_true', help='不绘制学习曲线')
+
+    args = parser.parse_args()
+    prompt_builder, mode_name, max_tokens, is_cot = PROMPTS[args.prompt]
+    max_tokens = args.max_tokens or max_tokens
+    output_dir = os.path.join(args.output_dir, args.prompt)
+
+    print("=" * 60)
+    print("📈 训练检查点扫描评测")
+    print("=" * 60)
+
+    checkpoints = find_checkpoints(args.run_dir, include_final=not args.no_final)
+    if args.steps:
+        checkpoints = [c for c in checkpoints if c[0] in set(args.steps)]
+    checkpoints = checkpoints[::args.every]
+    if not checkpoints:
+        print(f"✗ {args.run_dir} 下没有找到可评测的检查点")
+        sys.exit(1)
+    print(f"检查点: {len(checkpoints)} 个 (step {', '.join(str(s) for s, _ in checkpoints)})")
+
+    eval_data = load_eval_data(args.eval_file, args.split)
+    print(f"✓ 已加载 {len(eval_data)} 条评测数据\n")
+
+    # 基座模型只加载一次，先挂载第一个检查点
+    evaluator = ModelEvaluator(
+        mode="local",
+        model_path=args.model_path,
+        lora_path=checkpoints[0][1]
+    )
+
+    curve = sweep_checkpoints(
+        evaluator, checkpoints, eval_data, prompt_builder, mode_name,
+        max_tokens=max_tokens, is_cot=is_cot,
+        output_dir=output_dir, eval_file=args.eval_file
+    )
+
+    os.makedirs(output_dir, exist_ok=True)
+    with open(f"{output_dir}/learning_curve.json", 'w', encoding='utf-8') as f:
+        json.dump(curve, f, ensure_ascii=False, indent=2)
+    print(f"\n✓ 学习曲线数据: {output_dir}/learning_curve.json")
+
+    print(f"\n{'step':>8} {'平均F1':>10} {'精确匹配':>10} {'推理(秒/条)':>12} {'切换(秒)':>10}")
+    print("-" * 56)
+    for p in curve:
+        print(f"{p['step']:>8} {p['avg_f1']:>10.4f} {p['exact_match']:>10.2%} "
+              f"{p['avg_inference_time']:>12.2f} {p['swap_time']:>10.2f}")
+    print("-" * 56)
+    best = max(curve, key=lambda p: p["avg_f1"])
+    print(f"最佳检查点: step={best['step']} (F1={best['avg_f1']:.4f})")
+
+    eval_time = sum(p["eval_time"] for p in curve)
+    swap_time = sum(p["swap_time"] for p in curve)
+    print(f"总耗时: 模型加载 {evaluator.load_time:.1f}秒 + adapter切换 {swap_time:.1f}秒 "
+          f"+ 评测 {eval_time:.1f}秒（{len(curve)}个检查点）")
+
+    if not args.no_plot:
+        plot_curve(curve, f"{output_dir}/learning_curve.png", f"{mode_name} F1 学习曲线")
+
+    print("\n" + "=" * 60)
+    print("✅ 扫描完成！")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全量数据质量审计（check_download.py / check_data_quality.py 的列式版本）
+基于pyarrow.compute，每个划分单遍扫描：
+空字段、长度分位数、instruction模板频次、非中文占比、精确重复，输出JSON报告
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+from tqdm import tqdm
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data_audit import FIELDS, SplitAuditor, iter_batches, list_splits
+from src.task_types import TASK_TYPES
+
+
+def python_baseline(path, batch_size):
+    """逐行Python实现相同的统计（空字段、汉字数、精确重复），用于对比耗时和核对结果"""
+    empty = {f: 0 for f in FIELDS}
+    cjk = {f: 0 for f in FIELDS}
+    rows = set()
+    n = 0
+    for batch in iter_batches(path, batch_size):
+        for x in batch.to_pylist():
+            n += 1
+            values = []
+            for f in FIELDS:
+                text = (x.get(f) or '').strip()
+                values.append(text)
+                if not text:
+                    empty[f] += 1
+                cjk[f] += sum(1 for c in text if '\u4000' <= c <= '\u9fff')
+            rows.add(tuple(values))
+    return {"empty": empty, "cjk": cjk, "duplicate_rows": n - len(rows)}
+
+
+def print_report(name, report):
+    n = report["rows"]
+    print(f"\n📊 {name}: {n:,} 条")
+    if n == 0:
+        return
+    print(f"  {'字段':<12} {'空':>10} {'空比例':>8} {'纯空白':>8} {'均值':>7} {'P50':>6} {'P99':>7} {'最大':>8} {'中文占比':>8} {'非中文行':>9}")
+    for field in FIELDS:
+        s = report["fields"][field]
+        ln = s["length"]
+        print(f"  {field:<12} {s['empty']:>10,} {s['empty_ratio']:>8.1%} {s['whitespace_only']:>8,} "
+              f"{ln['mean']:>7.0f} {ln['p50']:>6.0f} {ln['p99']:>7.0f} {ln['max']:>8,} "
+              f"{s['cjk_char_ratio']:>8.1%} {s['non_cjk_rows']:>9,}")
+
+    print("  任务类型:")
+    for task, count in report["task_types"].items():
+        print(f"    {TASK_TYPES[task]:<12} {count:>10,} ({count / n:.1%})")
+
+    d = report["duplicates"]
+    print(f"  精确重复: {d['duplicate_rows']:,} 条 ({d['duplicate_ratio']:.1%}), "
+          f"{d['duplicate_groups']:,} 组, 最大组 {d['largest_group']:,} 条")
+    print(f"  同一问题不同答案: {d['conflicting_prompts']:,} 个问题")
+
+    print(f"  高频instruction（共 {report['distinct_instructions']:,} 种）:")
+    for entry in report["top_instructions"][:10]:
+        text = entry["instruction"].replace("\n", " ") if entry["instruction"] else "(空)"
+        print(f"    {entry['count']:>10,} ({entry['ratio']:>5.1%})  {text[:50]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='全量数据质量审计')
+    parser.add_argument('--sources', type=str, nargs='+', default=['data/raw/tcm_sft'],
+                        help='save_to_disk目录（含DatasetDict）、JSONL或Parquet文件')
+    parser.add_argument('--output', type=str, default='outputs/data_audit.json')
+    parser.add_argument('--batch_size', type=int, default=65536)
+    parser.add_argument('--top_templates', type=int, default=20)
+    parser.add_argument('--non_cjk_threshold', type=float, default=0.5,
+                        help='非中文字符占比超过该值的行计为非中文行')
+    parser.add_argument('--benchmark_python', action='store_true',
+                        help='同时用逐行Python实现相同统计，对比耗时并核对结果')
+
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🔍 全量数据质量审计")
+    print("=" * 60)
+
+    splits = [s for source in args.sources for s in list_splits(source)]
+    reports = {}
+    for name, path in splits:
+        auditor = SplitAuditor(args.top_templates, args.non_cjk_threshold)
+        t0 = time.time()
+        for batch in tqdm(iter_batches(path, args.batch_size), desc=name, unit="批"):
+            auditor.update(batch)
+        auditor.resolve_templates(iter_batches(path, args.batch_size))
+        report = auditor.report()
+        elapsed = time.time() - t0
+        report["path"] = path
+        report["elapsed"] = elapsed
+        report["rows_per_sec"] = report["rows"] / elapsed if elapsed else 0.0
+        print_report(name, report)
+        print(f"  耗时: {elapsed:.1f}秒 ({report['rows_per_sec']:,.0f} 条/秒)")
+
+        if args.benchmark_python:
+            t0 = time.time()
+            baseline = python_baseline(path, args.batch_size)
+            py_elapsed = time.time() - t0
+            fields = report["fields"]
+            match = (
+                all(baseline["empty"][f] == fields[f]["empty"] for f in FIELDS) and
+                all(baseline["cjk"][f] == fields[f]["cjk_chars"] for f in FIELDS) and
+                baseline["duplicate_rows"] == report["duplicates"]["duplicate_rows"]
+            )
+            report["benchmark"] = {"python_elapsed": py_elapsed, "arrow_elapsed": elapsed,
+                                   "speedup": py_elapsed / elapsed if elapsed else 0.0,
+                                   "results_match": match}
+            print(f"  逐行Python实现: {py_elapsed:.1f}秒, 加速 {py_elapsed / elapsed:.1f}x, "
+                  f"结果{'一致' if match else '不一致'}")
+        reports[name] = report
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(reports, f, ensure_ascii=False, indent=2)
+    print(f"\n✓ 报告: {args.output}")
+
+    print("\n" + "=" * 60)
+    print("✅ 审计完成！")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+静态KV缓存 + torch.compile 解码基准测试
+对比 默认动态缓存(model.generate) / 静态缓存(不编译) / 静态缓存+编译 的稳态解码速度，
+编译耗时单独统计；CPU上也可运行
+"""
+import os
+import sys
+import time
+import argparse
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.compiled_engine import CompiledDecoder
+from src.evaluator import load_eval_data
+from src.prompt_builder import build_zero_shot_prompt
+
+DTYPES = {"bfloat16": torch.bfloat16, "float16": torch.float16, "float32": torch.float32}
+
+
+def timed(fn):
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+    t0 = time.time()
+    out = fn()
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+    return out, time.time() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='静态KV缓存 + 编译解码基准测试')
+    parser.add_argument('--model_path', type=str, default='Qwen/Qwen2.5-7B-Instruct')
+    parser.add_argument('--lora_path', type=str, default='', help='LoRA路径（为空只测基座模型）')
+    parser.add_argument('--eval_file', type=str, default='data/evaluation/eval_100.json')
+    parser.add_argument('--num_samples', type=int, default=10)
+    parser.add_argument('--max_tokens', type=int, default=256)
+    parser.add_argument('--max_cache_len', type=int, default=4096)
+    parser.add_argument('--dtype', type=str, default='bfloat16', choices=list(DTYPES))
+
+    args = parser.parse_args()
+    dtype = DTYPES[args.dtype]
+
+    print("=" * 60)
+    print("⚡ 静态KV缓存 + 编译解码基准测试")
+    print("=" * 60)
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model_path, trust_remote_code=True)
+    model = AutoModelForCausalLM.from_pretrained(args.model_path, torch_dtype=dtype, device_map="auto",
+                                                 trust_remote_code=True)
+    if args.lora_path:
+        from peft import PeftModel
+        model = PeftModel.from_pretrained(model, args.lora_path, torch_dtype=dtype)
+    model.eval()
+
+    prompts = [
+        tokenizer(build_zero_shot_prompt(item["full_question"]), return_tensors="pt").input_ids
+        for item in load_eval_data(args.eval_file)[:args.num_samples]
+    ]
+    prompts = [p for p in prompts if p.shape[1] + args.max_tokens <= args.max_cache_len]
+    print(f"设备: {model.device}，dtype={args.dtype}，样本数: {len(prompts)}，max_tokens={args.max_tokens}\n")
+
+    def hf_generate(ids):
+        return model.generate(
+            input_ids=ids.to(model.device),
+            attention_mask=torch.ones_like(ids).to(model.device),
+            max_new_tokens=args.max_tokens,
+            do_sample=False,
+            repetition_penalty=1.1,
+            pad_token_id=tokenizer.pad_token_id,
+            eos_token_id=tokenizer.eos_token_id
+        )
+
+    engines = {"动态缓存": None}
+    compile_times = {"动态缓存": 0.0}
+    for name, compile in (("静态缓存", False), ("静态缓存+编译", True)):
+        engine = CompiledDecoder(model, args.max_cache_len, compile=compile)
+        compile_times[name] = engine.warmup()
+        engines[name] = engine
+        print(f"✓ {name} 预热{'编译' if compile else ''}: {compile_times[name]:.1f}秒")
+    with torch.no_grad():
+        hf_generate(prompts[0][:, :8])
+
+    rows = {}
+    reference = []
+    for name, engine in engines.items():
+        total_time, total_tokens, identical = 0.0, 0, 0
+        for i, ids in enumerate(prompts):
+            with torch.no_grad():
+                if engine is None:
+                    output, elapsed = timed(lambda: hf_generate(ids))
+                else:
+                    output, elapsed = timed(lambda: engine.generate(
+                        ids, args.max_tokens, repetition_penalty=1.1, eos_token_id=tokenizer.eos_token_id
+                    ))
+            output = output.cpu()
+            if engine is None:
+                reference.append(output)
+            else:
+                identical += int(torch.equal(output, reference[i]))
+            total_time += elapsed
+            total_tokens += output.shape[1] - ids.shape[1]
+        rows[name] = (total_tokens / total_time, compile_times[name], identical)
+
+    print(f"\n{'方式':<16} {'token/秒':>10} {'加速':>8} {'编译/预热(秒)':>14} {'贪心一致':>10}")
+    print("-" * 64)
+    base = rows["动态缓存"][0]
+    for name, (speed, compile_time, identical) in rows.items():
+        same = "-" if name == "动态缓存" else f"{identical}/{len(prompts)}"
+        print(f"{name:<16} {speed:>10.1f} {speed / base:>7.2f}x {compile_time:>14.1f} {same:>10}")
+    print("-" * 64)
+
+    print("\n" + "=" * 60)
+    print("✅ 测试完成！")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CPU推理基准测试
+对比 fp32 / bf16 / int8动态量化 的加载时间、解码速度(token/秒)和峰值内存(RSS)；
+每种精度在独立子进程中运行，峰值内存互不影响
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PRECISIONS = ["fp32", "bf16", "int8"]
+
+
+def run_worker(args):
+    """子进程：加载一种精度的模型并测速，结果以JSON输出到最后一行"""
+    import torch
+    from transformers import AutoTokenizer
+    from src.cpu_engine import configure_cpu, load_cpu_model
+    from src.prompt_builder import build_zero_shot_prompt
+
+    cpu = configure_cpu(args.num_threads, args.numa_node)
+    tokenizer = AutoTokenizer.from_pretrained(args.model_path, trust_remote_code=True)
+    t0 = time.time()
+    model = load_cpu_model(args.model_path, args.lora_path or None, args.worker)
+    load_time = time.time() - t0
+
+    inputs = tokenizer(build_zero_shot_prompt(args.question), return_tensors="pt")
+    kwargs = dict(max_new_tokens=args.new_tokens, min_new_tokens=args.new_tokens, do_sample=False,
+                  repetition_penalty=1.1, pad_token_id=tokenizer.pad_token_id)
+    with torch.no_grad():
+        model.generate(**inputs, max_new_tokens=4, do_sample=False, pad_token_id=tokenizer.pad_token_id)
+        times = []
+        for _ in range(args.runs):
+            t0 = time.time()
+            outputs = model.generate(**inputs, **kwargs)
+            times.append(time.time() - t0)
+    tokens = outputs[0][inputs.input_ids.shape[1]:].tolist()
+
+    print(json.dumps({
+        "precision": args.worker,
+        "threads": cpu["num_threads"],
+        "load_time": load_time,
+        "tokens_per_sec": len(tokens) / min(times),
+        # Linux下ru_maxrss单位为KB
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "tokens": tokens
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CPU推理基准测试（fp32 / bf16 / int8）')
+    parser.add_argument('--model_path', type=str, default='Qwen/Qwen2.5-0.5B-Instruct')
+    parser.add_argument('--lora_path', type=str, default='', help='LoRA路径（为空只测基座模型）')
+    parser.add_argument('--precisions', type=str, nargs='+', default=PRECISIONS, choices=PRECISIONS)
+    parser.add_argument('--question', type=str, default='麻黄的功效是什么？')
+    parser.add_argument('--new_tokens', type=int, default=64)
+    parser.add_argument('--runs', type=int, default=3, help='重复次数（取最快一次）')
+    parser.add_argument('--num_threads', type=int, default=None, help='默认物理核数')
+    parser.add_argument('--numa_node', type=int, default=None)
+    parser.add_argument('--worker', type=str, default=None, help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+    if args.worker:
+        run_worker(args)
+        return
+
+    print("=" * 60)
+    print("🖥️  CPU推理基准测试")
+    print("=" * 60)
+    print(f"模型: {args.model_path} {'+ ' + args.lora_path if args.lora_path else ''}")
+
+    results = []
+    for precision in args.precisions:
+        print(f"⏳ 测试 {precision} ...")
+        cmd = [sys.executable, os.path.abspath(__file__), '--worker', precision,
+               '--model_path', args.model_path, '--lora_path', args.lora_path,
+               '--question', args.question, '--new_tokens', str(args.new_tokens), '--runs', str(args.runs)]
+        if args.num_threads:
+            cmd += ['--num_threads', str(args.num_threads)]
+        if args.numa_node is not None:
+            cmd += ['--numa_node', str(args.numa_node)]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"✗ {precision} 失败:\n{proc.stderr[-2000:]}")
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    if not results:
+        sys.exit(1)
+    reference = results[0]
+    print(f"\n线程数: {reference['threads']}，生成 {args.new_tokens} 个token")
+    print(f"\n{'精度':<8} {'加载(秒)':>10} {'token/秒':>10} {'加速':>8} {'峰值RSS(MB)':>12} {'与' + reference['precision'] + '一致':>10}")
+    print("-" * 66)
+    for r in results:
+        same = sum(a == b for a, b in zip(r["tokens"], reference["tokens"]))
+        print(f"{r['precision']:<8} {r['load_time']:>10.1f} {r['tokens_per_sec']:>10.1f} "
+              f"{r['tokens_per_sec'] / reference['tokens_per_sec']:>7.2f}x {r['peak_rss_mb']:>12.0f} "
+              f"{same:>6}/{len(reference['tokens'])}")
+    print("-" * 66)
+
+    print("\n" + "=" * 60)
+    print("✅ 测试完成！")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
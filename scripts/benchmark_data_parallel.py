@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据并行评测扩展性测试
+对不同进程数分别启动 DataParallelEvaluator，统计评测吞吐（条/秒，不含模型加载）、加速比和并行效率，
+并检查结果是否按评测集顺序合并；CPU上可用小模型测试（--devices cpu）
+"""
+import os
+import sys
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data_parallel import DataParallelEvaluator
+from src.evaluator import load_eval_data
+from src.metrics import calculate_all_metrics
+from src.prompt_builder import build_zero_shot_prompt, build_cot_prompt
+
+PROMPTS = {"zero_shot": build_zero_shot_prompt, "cot": build_cot_prompt}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数据并行评测扩展性测试')
+    parser.add_argument('--mode', type=str, default='local', choices=['local', 'local-cpu', 'local-onnx'])
+    parser.add_argument('--model_path', type=str, default='Qwen/Qwen2.5-7B-Instruct')
+    parser.add_argument('--lora_path', type=str, default='./models/checkpoints/qwen2.5-7b-tcm-lora')
+    parser.add_argument('--eval_file', type=str, default='data/evaluation/eval_100.json')
+    parser.add_argument('--num_samples', type=int, default=None, help='只测前N条（默认全部）')
+    parser.add_argument('--prompt', type=str, default='zero_shot', choices=list(PROMPTS))
+    parser.add_argument('--max_tokens', type=int, default=256)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='要测试的进程数')
+    parser.add_argument('--devices', type=str, default=None, help='GPU编号（如 4,5,6,7）或 cpu')
+
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("⚖️  数据并行评测扩展性测试")
+    print("=" * 60)
+
+    eval_data = load_eval_data(args.eval_file)[:args.num_samples]
+    print(f"样本数: {len(eval_data)}，prompt={args.prompt}，max_tokens={args.max_tokens}\n")
+    evaluator_kwargs = dict(mode=args.mode, model_path=args.model_path, lora_path=args.lora_path or None)
+
+    rows = []
+    for n in args.workers:
+        evaluator = DataParallelEvaluator(n, evaluator_kwargs, args.devices.split(",") if args.devices else None)
+        results = evaluator.batch_evaluate(eval_data, PROMPTS[args.prompt], f"{n}进程", args.max_tokens,
+                                           is_cot=args.prompt == "cot")
+        evaluator.close()
+        in_order = [r["id"] for r in results] == [item["id"] for item in eval_data]
+        metrics = calculate_all_metrics(results)
+        rows.append((n, evaluator.last_wall, evaluator.load_time, metrics["avg_f1"], in_order))
+
+    print(f"\n{'进程数':>6} {'耗时(秒)':>10} {'条/秒':>8} {'加速':>8} {'效率':>8} {'加载(秒)':>10} {'F1':>8} {'顺序':>6}")
+    print("-" * 74)
+    for n, elapsed, load_time, f1, in_order in rows:
+        speedup = rows[0][1] / elapsed
+        print(f"{n:>6} {elapsed:>10.1f} {len(eval_data) / elapsed:>8.2f} {speedup:>7.2f}x "
+              f"{speedup * rows[0][0] / n:>7.0%} {load_time:>10.1f} {f1:>8.4f} {'✓' if in_order else '✗':>6}")
+    print("-" * 74)
+
+    print("\n" + "=" * 60)
+    print("✅ 测试完成！")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+压缩KV缓存基准测试（长CoT生成）
+在评测集上用CoT prompt对比 默认缓存 / int8 / int4 / CPU卸载 的峰值显存、KV缓存占用、解码速度和答案F1，
+各配置均为贪心解码，F1变化相对默认缓存计算
+"""
+import os
+import sys
+import time
+import argparse
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.evaluator import load_eval_data
+from src.kv_cache import CompressedKVCache, describe_kv_cache, dynamic_cache_nbytes
+from src.metrics import calculate_token_f1
+from src.prompt_builder import build_cot_prompt, extract_answer_from_cot
+
+DTYPES = {"bfloat16": torch.bfloat16, "float16": torch.float16, "float32": torch.float32}
+# 配置名 -> (量化位数, 是否卸载)
+CONFIGS = {
+    "default": (None, False),
+    "int8": (8, False),
+    "int4": (4, False),
+    "offload": (None, True),
+    "int8+offload": (8, True),
+    "int4+offload": (4, True),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='压缩KV缓存基准测试')
+    parser.add_argument('--model_path', type=str, default='Qwen/Qwen2.5-7B-Instruct')
+    parser.add_argument('--lora_path', type=str, default='./models/checkpoints/qwen2.5-7b-tcm-lora',
+                        help='为空字符串时只测基座模型')
+    parser.add_argument('--eval_file', type=str, default='data/evaluation/eval_100.json')
+    parser.add_argument('--num_samples', type=int, default=None, help='只测前N条（默认全部）')
+    parser.add_argument('--max_tokens', type=int, default=4096)
+    parser.add_argument('--configs', type=str, nargs='+', default=["default", "int8", "int4", "int8+offload"],
+                        choices=list(CONFIGS))
+    parser.add_argument('--block_size', type=int, default=128, help='保持原精度的最近token数')
+    parser.add_argument('--dtype', type=str, default='bfloat16', choices=list(DTYPES))
+
+    args = parser.parse_args()
+    dtype = DTYPES[args.dtype]
+    cuda = torch.cuda.is_available()
+
+    print("=" * 60)
+    print("🗜️  压缩KV缓存基准测试")
+    print("=" * 60)
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model_path, trust_remote_code=True)
+    model = AutoModelForCausalLM.from_pretrained(args.model_path, torch_dtype=dtype, device_map="auto",
+                                                 trust_remote_code=True)
+    if args.lora_path:
+        from peft import PeftModel
+        model = PeftModel.from_pretrained(model, args.lora_path, torch_dtype=dtype)
+    model.eval()
+    eval_data = load_eval_data(args.eval_file)[:args.num_samples]
+    print(f"设备: {model.device}，样本数: {len(eval_data)}，max_tokens={args.max_tokens}，"
+          f"block_size={args.block_size}\n")
+
+    prompts = [tokenizer(build_cot_prompt(item["full_question"]), return_tensors="pt").to(model.device)
+               for item in eval_data]
+    with torch.no_grad():
+        model.generate(**prompts[0], max_new_tokens=4, do_sample=False, pad_token_id=tokenizer.pad_token_id)
+
+    rows = {}
+    for name in args.configs:
+        nbits, offload = CONFIGS[name]
+        total_time, total_tokens, f1_sum, kv_peak = 0.0, 0, 0.0, 0
+        if cuda:
+            torch.cuda.empty_cache()
+            torch.cuda.reset_peak_memory_stats()
+        for item, inputs in zip(eval_data, prompts):
+            cache = CompressedKVCache(model.config, nbits, offload, args.block_size) if nbits or offload else None
+            if cuda:
+                torch.cuda.synchronize()
+            t0 = time.time()
+            with torch.no_grad():
+                outputs = model.generate(
+                    **inputs,
+                    past_key_values=cache,
+                    max_new_tokens=args.max_tokens,
+                    do_sample=False,
+                    repetition_penalty=1.1,
+                    pad_token_id=tokenizer.pad_token_id,
+                    eos_token_id=tokenizer.eos_token_id,
+                    return_dict_in_generate=True
+                )
+            if cuda:
+                torch.cuda.synchronize()
+            total_time += time.time() - t0
+            new_tokens = outputs.sequences[0][inputs.input_ids.shape[1]:]
+            total_tokens += len(new_tokens)
+            kv_peak = max(kv_peak, cache.nbytes() if cache is not None else dynamic_cache_nbytes(outputs.past_key_values))
+            answer, _ = extract_answer_from_cot(tokenizer.decode(new_tokens, skip_special_tokens=True).strip())
+            f1_sum += calculate_token_f1(answer, item["output"])["f1"]
+        rows[name] = {
+            "tokens_per_sec": total_tokens / total_time,
+            "avg_tokens": total_tokens / len(eval_data),
+            "f1": f1_sum / len(eval_data),
+            "kv_mb": kv_peak / 2 ** 20,
+            "peak_mb": torch.cuda.max_memory_allocated() / 2 ** 20 if cuda else None,
+        }
+        print(f"✓ {describe_kv_cache(nbits, offload)}: {rows[name]['tokens_per_sec']:.1f} token/秒，F1 {rows[name]['f1']:.4f}")
+
+    base = rows[args.configs[0]]
+    print(f"\n{'配置':<14} {'峰值显存(MB)':>12} {'KV缓存(MB)':>11} {'token/秒':>10} {'平均长度':>8} {'F1':>8} {'ΔF1':>8}")
+    print("-" * 80)
+    for name, r in rows.items():
+        peak = f"{r['peak_mb']:.0f}" if r["peak_mb"] is not None else "-"
+        print(f"{name:<14} {peak:>12} {r['kv_mb']:>11.1f} {r['tokens_per_sec']:>10.1f} {r['avg_tokens']:>8.0f} "
+              f"{r['f1']:>8.4f} {r['f1'] - base['f1']:>+8.4f}")
+    print("-" * 80)
+    print(f"KV缓存为单条样本生成结束时的最大占用（含卸载到CPU的部分），ΔF1相对 {args.configs[0]}")
+
+    print("\n" + "=" * 60)
+    print("✅ 测试完成！")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
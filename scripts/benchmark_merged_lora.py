@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合并LoRA权重缓存 vs PeftModel 基准测试
+对比 启动时间（加载到可推理）和 每token解码延迟，并检查贪心解码结果是否一致
+"""
+import os
+import gc
+import sys
+import time
+import shutil
+import argparse
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.merged_cache import MARKER, load_merged_model, merged_checkpoint_dir
+from src.prompt_builder import build_zero_shot_prompt
+
+DTYPES = {"bfloat16": torch.bfloat16, "float16": torch.float16, "float32": torch.float32}
+
+
+def load_peft(model_path, lora_path, dtype):
+    from peft import PeftModel
+    base = AutoModelForCausalLM.from_pretrained(model_path, torch_dtype=dtype, device_map="auto",
+                                                trust_remote_code=True)
+    return PeftModel.from_pretrained(base, lora_path, torch_dtype=dtype)
+
+
+def decode_latency(model, tokenizer, prompt, new_tokens, runs):
+    """贪心生成固定数量的token，返回 (每token延迟秒, 生成的token id)"""
+    inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+    kwargs = dict(max_new_tokens=new_tokens, min_new_tokens=new_tokens, do_sample=False,
+                  pad_token_id=tokenizer.pad_token_id, eos_token_id=tokenizer.eos_token_id)
+    with torch.no_grad():
+        model.generate(**inputs, max_new_tokens=4, do_sample=False, pad_token_id=tokenizer.pad_token_id)
+        times = []
+        for _ in range(runs):
+            if torch.cuda.is_available():
+                torch.cuda.synchronize()
+            t0 = time.time()
+            outputs = model.generate(**inputs, **kwargs)
+            if torch.cuda.is_available():
+                torch.cuda.synchronize()
+            times.append(time.time() - t0)
+    generated = outputs[0][inputs.input_ids.shape[1]:].tolist()
+    return min(times) / len(generated), generated
+
+
+def release(model):
+    del model
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='合并LoRA权重缓存基准测试')
+    parser.add_argument('--model_path', type=str, default='Qwen/Qwen2.5-7B-Instruct')
+    parser.add_argument('--lora_path', type=str, default='./models/checkpoints/qwen2.5-7b-tcm-lora')
+    parser.add_argument('--cache_root', type=str, default='./models/merged')
+    parser.add_argument('--dtype', type=str, default='bfloat16', choices=list(DTYPES))
+    parser.add_argument('--new_tokens', type=int, default=128, help='每次生成的token数')
+    parser.add_argument('--runs', type=int, default=3, help='重复次数（取最快一次）')
+    parser.add_argument('--rebuild', action='store_true', help='删除已有缓存，同时测量首次合并耗时')
+
+    args = parser.parse_args()
+    dtype = DTYPES[args.dtype]
+
+    print("=" * 60)
+    print("⚡ 合并LoRA权重缓存基准测试")
+    print("=" * 60)
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model_path, trust_remote_code=True)
+    prompt = build_zero_shot_prompt("麻黄的功效是什么？")
+    report = {}
+
+    # 1. PeftModel
+    t0 = time.time()
+    model = load_peft(args.model_path, args.lora_path, dtype)
+    model.eval()
+    load_time = time.time() - t0
+    latency, peft_tokens = decode_latency(model, tokenizer, prompt, args.new_tokens, args.runs)
+    report["PeftModel"] = (load_time, latency)
+    release(model)
+
+    # 2. 合并权重（首次构建）
+    if args.rebuild:
+        for name in os.listdir(args.cache_root) if os.path.isdir(args.cache_root) else []:
+            if os.path.exists(os.path.join(args.cache_root, name, MARKER)):
+                shutil.rmtree(os.path.join(args.cache_root, name))
+        t0 = time.time()
+        cache_dir = merged_checkpoint_dir(args.model_path, args.lora_path, args.cache_root, dtype)
+        print(f"✓ 首次合并并保存: {time.time() - t0:.1f}秒")
+    else:
+        cache_dir = merged_checkpoint_dir(args.model_path, args.lora_path, args.cache_root, dtype)
+
+    # 3. 合并权重（从缓存加载）
+    t0 = time.time()
+    model = load_merged_model(args.model_path, args.lora_path, args.cache_root, dtype)
+    model.eval()
+    load_time = time.time() - t0
+    latency, merged_tokens = decode_latency(model, tokenizer, prompt, args.new_tokens, args.runs)
+    report["合并权重(缓存)"] = (load_time, latency)
+    release(model)
+
+    print(f"\n缓存目录: {cache_dir}")
+    print(f"\n{'方式':<16} {'启动时间':>10} {'每token延迟':>14} {'token/秒':>10}")
+    print("-" * 56)
+    for name, (load_time, latency) in report.items():
+        print(f"{name:<16} {load_time:>9.2f}s {latency * 1000:>12.2f}ms {1 / latency:>10.1f}")
+    print("-" * 56)
+    (peft_load, peft_lat), (merged_load, merged_lat) = report.values()
+    print(f"启动加速 {peft_load / merged_load:.2f}x，解码加速 {peft_lat / merged_lat:.2f}x")
+
+    same = sum(a == b for a, b in zip(peft_tokens, merged_tokens))
+    print(f"贪心解码一致: {same}/{len(peft_tokens)} 个token"
+          + ("" if same == len(peft_tokens) else "（低精度下合并的舍入误差可能导致个别token不同）"))
+
+    print("\n" + "=" * 60)
+    print("✅ 测试完成！")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
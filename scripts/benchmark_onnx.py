@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ONNX Runtime 推理基准测试
+对比 PyTorch CPU（fp32 / int8动态量化）与 ONNX Runtime（fp32 / int8）的加载时间、解码速度(token/秒)、
+峰值内存(RSS)和贪心输出一致性；ONNX导出/量化耗时单独统计，每种后端在独立子进程中运行
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BACKENDS = ["torch-fp32", "torch-int8", "onnx-fp32", "onnx-int8"]
+
+
+def run_worker(args):
+    """子进程：加载一种后端并测速，结果以JSON输出到最后一行"""
+    import torch
+    from transformers import AutoTokenizer
+    from src.cpu_engine import configure_cpu, load_cpu_model
+    from src.onnx_engine import load_onnx_model
+    from src.prompt_builder import build_zero_shot_prompt
+
+    cpu = configure_cpu(args.num_threads, args.numa_node)
+    tokenizer = AutoTokenizer.from_pretrained(args.model_path, trust_remote_code=True)
+    engine, precision = args.worker.split("-")
+    lora_path = args.lora_path or None
+    t0 = time.time()
+    if engine == "onnx":
+        model = load_onnx_model(args.model_path, lora_path, args.onnx_cache, precision == "int8", cpu["num_threads"])
+    else:
+        model = load_cpu_model(args.model_path, lora_path, precision)
+    load_time = time.time() - t0
+
+    input_ids = tokenizer(build_zero_shot_prompt(args.question), return_tensors="pt").input_ids
+
+    def generate(max_new_tokens):
+        if engine == "onnx":
+            return model.generate(input_ids, max_new_tokens, repetition_penalty=1.1,
+                                  eos_token_id=tokenizer.eos_token_id)
+        return model.generate(input_ids=input_ids, attention_mask=torch.ones_like(input_ids),
+                              max_new_tokens=max_new_tokens, do_sample=False, repetition_penalty=1.1,
+                              pad_token_id=tokenizer.pad_token_id, eos_token_id=tokenizer.eos_token_id)
+
+    with torch.no_grad():
+        generate(4)
+        times = []
+        for _ in range(args.runs):
+            t0 = time.time()
+            outputs = generate(args.new_tokens)
+            times.append(time.time() - t0)
+    tokens = outputs[0][input_ids.shape[1]:].tolist()
+
+    print(json.dumps({
+        "backend": args.worker,
+        "threads": cpu["num_threads"],
+        "load_time": load_time,
+        "tokens_per_sec": len(tokens) / min(times),
+        # Linux下ru_maxrss单位为KB
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "tokens": tokens
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ONNX Runtime推理基准测试')
+    parser.add_argument('--model_path', type=str, default='Qwen/Qwen2.5-0.5B-Instruct')
+    parser.add_argument('--lora_path', type=str, default='', help='LoRA路径（为空只测基座模型）')
+    parser.add_argument('--backends', type=str, nargs='+', default=BACKENDS, choices=BACKENDS)
+    parser.add_argument('--onnx_cache', type=str, default='models/onnx')
+    parser.add_argument('--question', type=str, default='麻黄的功效是什么？')
+    parser.add_argument('--new_tokens', type=int, default=64)
+    parser.add_argument('--runs', type=int, default=3, help='重复次数（取最快一次）')
+    parser.add_argument('--num_threads', type=int, default=None, help='默认物理核数')
+    parser.add_argument('--numa_node', type=int, default=None)
+    parser.add_argument('--worker', type=str, default=None, help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+    if args.worker:
+        run_worker(args)
+        return
+
+    print("=" * 60)
+    print("🧩 ONNX Runtime推理基准测试")
+    print("=" * 60)
+    print(f"模型: {args.model_path} {'+ ' + args.lora_path if args.lora_path else ''}")
+
+    # 先在主进程中导出/量化，避免计入子进程的加载时间
+    onnx_backends = [b for b in args.backends if b.startswith("onnx")]
+    if onnx_backends:
+        from src.onnx_engine import META_FILE, onnx_model_dir
+        t0 = time.time()
+        model_dir = onnx_model_dir(args.model_path, args.lora_path or None, args.onnx_cache,
+                                   int8="onnx-int8" in onnx_backends)
+        with open(os.path.join(model_dir, META_FILE), 'r', encoding='utf-8') as f:
+            export_time = json.load(f)["export_time"]
+        print(f"✓ ONNX就绪: {model_dir}（导出 {export_time:.1f}秒，本次准备 {time.time() - t0:.1f}秒）")
+
+    results = []
+    for backend in args.backends:
+        print(f"⏳ 测试 {backend} ...")
+        cmd = [sys.executable, os.path.abspath(__file__), '--worker', backend,
+               '--model_path', args.model_path, '--lora_path', args.lora_path, '--onnx_cache', args.onnx_cache,
+               '--question', args.question, '--new_tokens', str(args.new_tokens), '--runs', str(args.runs)]
+        if args.num_threads:
+            cmd += ['--num_threads', str(args.num_threads)]
+        if args.numa_node is not None:
+            cmd += ['--numa_node', str(args.numa_node)]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"✗ {backend} 失败:\n{proc.stderr[-2000:]}")
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    if not results:
+        sys.exit(1)
+    reference = results[0]
+    print(f"\n线程数: {reference['threads']}，最多生成 {args.new_tokens} 个token")
+    print(f"\n{'后端':<12} {'加载(秒)':>10} {'token/秒':>10} {'加速':>8} {'峰值RSS(MB)':>12} {'与' + reference['backend'] + '一致':>14}")
+    print("-" * 74)
+    for r in results:
+        same = sum(a == b for a, b in zip(r["tokens"], reference["tokens"]))
+        print(f"{r['backend']:<12} {r['load_time']:>10.1f} {r['tokens_per_sec']:>10.1f} "
+              f"{r['tokens_per_sec'] / reference['tokens_per_sec']:>7.2f}x {r['peak_rss_mb']:>12.0f} "
+              f"{same:>8}/{len(reference['tokens'])}")
+    print("-" * 74)
+
+    print("\n" + "=" * 60)
+    print("✅ 测试完成！")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
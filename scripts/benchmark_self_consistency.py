@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CoT自洽采样基准测试
+同一模型依次用 k=1,3,5 评测CoT：k=1为默认的单条采样（temperature=0.1），k>1为共享prefill采样k条、按答案重叠投票；
+对比F1、精确匹配、答案标签率、平均延迟（相对k=1的倍数）和投票一致度，并给出k条中最好一条的F1（上限）
+"""
+import os
+import sys
+import json
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.evaluator import ModelEvaluator, load_eval_data
+from src.metrics import calculate_all_metrics, calculate_token_f1
+from src.prompt_builder import build_cot_prompt
+from src.self_consistency import summarize_votes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CoT自洽采样基准测试')
+    parser.add_argument('--mode', type=str, default='local', choices=['local', 'local-cpu'])
+    parser.add_argument('--model_path', type=str, default='Qwen/Qwen2.5-7B-Instruct')
+    parser.add_argument('--lora_path', type=str, default='./models/checkpoints/qwen2.5-7b-tcm-lora')
+    parser.add_argument('--merged_cache', type=str, default=None, help='合并LoRA权重的缓存目录')
+    parser.add_argument('--eval_file', type=str, default='data/evaluation/eval_100.json')
+    parser.add_argument('--num_samples', type=int, default=None, help='只测前N条（默认全部）')
+    parser.add_argument('--max_tokens', type=int, default=4096)
+    parser.add_argument('--ks', type=int, nargs='+', default=[1, 3, 5], help='自洽采样数')
+    parser.add_argument('--sc_temperature', type=float, default=0.7)
+    parser.add_argument('--output', type=str, default='outputs/self_consistency.json')
+
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🗳️  CoT自洽采样基准测试")
+    print("=" * 60)
+
+    eval_data = load_eval_data(args.eval_file)[:args.num_samples]
+    evaluator = ModelEvaluator(
+        mode=args.mode,
+        model_path=args.model_path,
+        lora_path=args.lora_path or None,
+        merged_cache=args.merged_cache,
+        sc_temperature=args.sc_temperature
+    )
+    print(f"样本数: {len(eval_data)}，max_tokens={args.max_tokens}，采样温度 {args.sc_temperature}\n")
+
+    rows = {}
+    for k in args.ks:
+        evaluator.self_consistency = k
+        results = evaluator.batch_evaluate(eval_data, build_cot_prompt, f"k={k}", args.max_tokens, is_cot=True)
+        metrics = calculate_all_metrics(results)
+        votes = summarize_votes(results)
+        oracle = [
+            max(calculate_token_f1(a, r["reference"])["f1"] for a in r["sc_answers"]) if r.get("sc_answers")
+            else r.get("f1", 0.0)
+            for r in results
+        ]
+        rows[k] = {
+            "avg_f1": metrics["avg_f1"],
+            "exact_match": metrics["exact_match"],
+            "tag_rate": sum(1 for r in results if r.get("has_answer_tags")) / len(results),
+            "avg_inference_time": metrics["avg_inference_time"],
+            "oracle_f1": sum(oracle) / len(oracle),
+            "avg_agreement": votes["avg_agreement"] if votes else None,
+        }
+
+    base = rows[args.ks[0]]
+    print(f"\n{'k':>3} {'F1':>8} {'ΔF1':>8} {'best-of-k F1':>13} {'精确匹配':>8} {'标签率':>8} "
+          f"{'延迟(秒)':>9} {'延迟倍数':>8} {'一致度':>8}")
+    print("-" * 90)
+    for k, r in rows.items():
+        agreement = f"{r['avg_agreement']:.4f}" if r["avg_agreement"] is not None else "-"
+        print(f"{k:>3} {r['avg_f1']:>8.4f} {r['avg_f1'] - base['avg_f1']:>+8.4f} {r['oracle_f1']:>13.4f} "
+              f"{r['exact_match']:>8.2%} {r['tag_rate']:>8.1%} {r['avg_inference_time']:>9.2f} "
+              f"{r['avg_inference_time'] / base['avg_inference_time']:>7.2f}x {agreement:>8}")
+    print("-" * 90)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({"eval_file": args.eval_file, "sc_temperature": args.sc_temperature,
+                   "results": {str(k): r for k, r in rows.items()}}, f, ensure_ascii=False, indent=2)
+    print(f"✓ 结果已保存: {args.output}")
+
+    print("\n" + "=" * 60)
+    print("✅ 测试完成！")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+投机解码基准测试
+在评测集上对比 普通贪心解码 与 投机解码（prompt lookup / draft模型）的速度，
+按任务类型统计接受率和加速比，并逐条检查输出是否一致
+"""
+import os
+import sys
+import time
+import argparse
+from collections import defaultdict
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.evaluator import load_eval_data
+from src.prompt_builder import build_zero_shot_prompt, build_cot_prompt
+from src.speculative import DraftModelProposer, PromptLookupProposer, SpeculativeDecoder
+from src.task_types import TASK_TYPES, classify_instruction
+
+DTYPES = {"bfloat16": torch.bfloat16, "float16": torch.float16, "float32": torch.float32}
+PROMPTS = {"zero_shot": build_zero_shot_prompt, "cot": build_cot_prompt}
+
+
+def load_model(model_path, lora_path, dtype):
+    model = AutoModelForCausalLM.from_pretrained(model_path, torch_dtype=dtype, device_map="auto",
+                                                 trust_remote_code=True)
+    if lora_path:
+        from peft import PeftModel
+        model = PeftModel.from_pretrained(model, lora_path, torch_dtype=dtype)
+    return model.eval()
+
+
+def timed(fn):
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+    t0 = time.time()
+    out = fn()
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+    return out, time.time() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='投机解码基准测试')
+    parser.add_argument('--model_path', type=str, default='Qwen/Qwen2.5-7B-Instruct')
+    parser.add_argument('--lora_path', type=str, default='./models/checkpoints/qwen2.5-7b-tcm-lora',
+                        help='为空字符串时只测基座模型')
+    parser.add_argument('--draft_model', type=str, default=None,
+                        help='draft小模型（如Qwen/Qwen2.5-0.5B-Instruct），不设置则只测prompt lookup')
+    parser.add_argument('--no_prompt_lookup', action='store_true', help='不测prompt lookup')
+    parser.add_argument('--max_ngram', type=int, default=3, help='prompt lookup查找的最长n-gram')
+    parser.add_argument('--eval_file', type=str, default='data/evaluation/eval_500.json')
+    parser.add_argument('--num_samples', type=int, default=None, help='只测前N条（默认全部）')
+    parser.add_argument('--prompt', type=str, default='zero_shot', choices=list(PROMPTS))
+    parser.add_argument('--max_tokens', type=int, default=256)
+    parser.add_argument('--num_draft_tokens', type=int, nargs='+', default=[3, 5, 8])
+    parser.add_argument('--repetition_penalty', type=float, default=1.1)
+    parser.add_argument('--dtype', type=str, default='bfloat16', choices=list(DTYPES))
+
+    args = parser.parse_args()
+    dtype = DTYPES[args.dtype]
+
+    print("=" * 60)
+    print("⚡ 投机解码基准测试")
+    print("=" * 60)
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model_path, trust_remote_code=True)
+    model = load_model(args.model_path, args.lora_path, dtype)
+    eval_data = load_eval_data(args.eval_file)[:args.num_samples]
+    print(f"目标模型: {args.model_path} {'+ ' + args.lora_path if args.lora_path else ''}")
+
+    decoders = {}
+    if not args.no_prompt_lookup:
+        for k in args.num_draft_tokens:
+            decoders[f"lookup k={k}"] = SpeculativeDecoder(model, PromptLookupProposer(args.max_ngram), k)
+    if args.draft_model:
+        print(f"Draft模型: {args.draft_model}")
+        draft = load_model(args.draft_model, None, dtype)
+        for k in args.num_draft_tokens:
+            decoders[f"draft k={k}"] = SpeculativeDecoder(model, DraftModelProposer(draft), k)
+    print(f"样本数: {len(eval_data)}，max_tokens={args.max_tokens}，dtype={args.dtype}\n")
+
+    # 任务类型 -> 方法 -> 累计 {time, tokens, proposed, accepted, steps, identical}
+    table = defaultdict(lambda: defaultdict(lambda: defaultdict(float)))
+
+    # 预热
+    warm = tokenizer("预热", return_tensors="pt").to(model.device)
+    model.generate(**warm, max_new_tokens=4, do_sample=False, pad_token_id=tokenizer.pad_token_id)
+    for decoder in decoders.values():
+        decoder.generate(warm.input_ids, 4, tokenizer.eos_token_id)
+
+    for i, item in enumerate(eval_data):
+        task = classify_instruction(item.get("instruction"))
+        inputs = tokenizer(PROMPTS[args.prompt](item["full_question"]), return_tensors="pt").to(model.device)
+
+        with torch.no_grad():
+            reference, elapsed = timed(lambda: model.generate(
+                **inputs,
+                max_new_tokens=args.max_tokens,
+                do_sample=False,
+                repetition_penalty=args.repetition_penalty,
+                pad_token_id=tokenizer.pad_token_id,
+                eos_token_id=tokenizer.eos_token_id
+            ))
+        base = table[task]["贪心"]
+        base["items"] += 1
+        base["time"] += elapsed
+        base["tokens"] += reference.shape[1] - inputs.input_ids.shape[1]
+
+        for name, decoder in decoders.items():
+            (output, stats), elapsed = timed(lambda: decoder.generate(
+                inputs.input_ids, args.max_tokens, tokenizer.eos_token_id, args.repetition_penalty
+            ))
+            row = table[task][name]
+            row["items"] += 1
+            row["time"] += elapsed
+            row["tokens"] += stats["new_tokens"]
+            row["proposed"] += stats["proposed"]
+            row["accepted"] += stats["accepted"]
+            row["steps"] += stats["steps"]
+            row["identical"] += int(torch.equal(output.cpu(), reference.cpu()))
+        print(f"  [{i + 1}/{len(eval_data)}] {TASK_TYPES[task]}")
+
+    print(f"\n{'任务类型':<12} {'方法':<12} {'条数':>5} {'token/秒':>10} {'加速':>7} {'接受率':>8} "
+          f"{'token/前向':>10} {'一致':>6}")
+    print("-" * 82)
+    for task, methods in table.items():
+        base_speed = methods["贪心"]["tokens"] / methods["贪心"]["time"]
+        for name, s in methods.items():
+            speed = s["tokens"] / s["time"]
+            rate = f"{s['accepted'] / s['proposed']:.1%}" if s["proposed"] else "-"
+            per_step = f"{s['tokens'] / s['steps']:.2f}" if s["steps"] else "-"
+            identical = f"{int(s['identical'])}/{int(s['items'])}" if name != "贪心" else "-"
+            print(f"{TASK_TYPES[task]:<12} {name:<12} {int(s['items']):>5} {speed:>10.1f} "
+                  f"{speed / base_speed:>6.2f}x {rate:>8} {per_step:>10} {identical:>6}")
+        print("-" * 82)
+
+    print("\n" + "=" * 60)
+    print("✅ 测试完成！")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
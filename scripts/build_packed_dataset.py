@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+构建预分词、序列打包的训练集
+多进程分词 + 窗口内装箱，写出可内存映射的分片；
+输出目录按 分词器/模板/seq_len/数据源 的指纹命名，已存在则直接复用
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+from multiprocessing import Pool
+
+import numpy as np
+from tqdm import tqdm
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.packing import (
+    FIELDS, PackedDataset, PackedShardWriter, WindowPacker, packing_fingerprint
+)
+from src.splitting import expand_sources, iter_source_range, source_units, split_ranges
+from src.token_stats import load_tokenizer, padding_ratio
+
+_tokenizer = None
+
+
+def init_worker(model_path):
+    global _tokenizer
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    _tokenizer = load_tokenizer(model_path)
+
+
+def pack_range(task):
+    """分词并打包一个区间，写出一个分片（子进程）"""
+    task_id, source, start, end, shard_dir, seq_len, window, batch_size, drop_long = task
+    writer = PackedShardWriter(shard_dir, seq_len)
+    packer = WindowPacker(_tokenizer, writer, seq_len, window, batch_size, drop_long)
+    for item in iter_source_range(source, start, end):
+        packer.add(item)
+    packer.flush()
+
+    stats = dict(packer.stats, rows=writer.close()["rows"])
+    return task_id, stats, np.array(packer.lengths, dtype=np.int32)
+
+
+def export_arrow(packed_dir: str, arrow_dir: str):
+    """导出为datasets.save_to_disk格式（可作为LLaMA-Factory的--tokenized_path）"""
+    from datasets import Dataset, Features, Sequence, Value
+
+    ds = PackedDataset(packed_dir)
+
+    def gen():
+        for i in range(len(ds)):
+            yield {k: v.tolist() for k, v in ds[i].items()}
+
+    features = Features({k: Sequence(Value("int32")) for k in FIELDS})
+    Dataset.from_generator(gen, features=features).save_to_disk(arrow_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='构建预分词、序列打包的训练集')
+    parser.add_argument('--source', type=str, default='data/jsonl/train.jsonl',
+                        help='save_to_disk目录、JSONL文件或JSONL分片目录')
+    parser.add_argument('--model_path', type=str, default='Qwen/Qwen2.5-7B-Instruct',
+                        help='tokenizer路径')
+    parser.add_argument('--output_root', type=str, default='data/packed')
+    parser.add_argument('--dataset_name', type=str, default='tcm_train')
+    parser.add_argument('--seq_len', type=int, default=2048, help='打包后的序列长度（对应cutoff_len）')
+    parser.add_argument('--drop_long', action='store_true', help='丢弃超长样本（默认截断）')
+    parser.add_argument('--window', type=int, default=20000, help='每次装箱的样本数')
+    parser.add_argument('--batch_size', type=int, default=1000, help='每次批量tokenize的条数')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--num_shards', type=int, default=None)
+    parser.add_argument('--train_batch_size', type=int, default=4,
+                        help='per_device_train_batch_size（用于估算打包前的padding占比）')
+    parser.add_argument('--export_arrow', action='store_true',
+                        help='同时导出datasets格式，供LLaMA-Factory --tokenized_path 使用')
+    parser.add_argument('--force', action='store_true', help='忽略已有结果重新构建')
+
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("📦 构建打包训练集")
+    print("=" * 60)
+    print(f"数据源: {args.source}")
+    print(f"Tokenizer: {args.model_path}")
+    print(f"序列长度: {args.seq_len}")
+
+    sources = expand_sources(args.source)
+    tokenizer = load_tokenizer(args.model_path)
+    fingerprint = packing_fingerprint(tokenizer, sources, args.seq_len, not args.drop_long)[:12]
+    output_dir = f"{args.output_root}/{args.dataset_name}-{fingerprint}"
+    print(f"输出目录: {output_dir}")
+
+    if os.path.exists(f"{output_dir}/manifest.json") and not args.force:
+        with open(f"{output_dir}/manifest.json", 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        print(f"\n✓ 分词器、模板和数据源均未变化，复用已有结果（{manifest['rows']:,} 条序列）")
+        if args.export_arrow and not os.path.exists(f"{output_dir}/arrow"):
+            export_arrow(output_dir, f"{output_dir}/arrow")
+            print(f"✓ datasets格式: {output_dir}/arrow")
+        return
+
+    if os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir)
+
+    sizes = [source_units(s)[1] for s in sources]
+    total_units = sum(sizes)
+    num_shards = args.num_shards or args.workers * 4
+    ranges = []
+    for source, n in zip(sources, sizes):
+        parts = max(1, round(num_shards * n / total_units)) if total_units else 1
+        for start, end in split_ranges(0, n, parts):
+            ranges.append((source, start, end))
+
+    shard_names = [f"shard-{i:05d}" for i in range(len(ranges))]
+    tasks = [
+        (i, s, a, b, f"{output_dir}/{shard_names[i]}", args.seq_len, args.window, args.batch_size, args.drop_long)
+        for i, (s, a, b) in enumerate(ranges)
+    ]
+
+    t0 = time.time()
+    results = [None] * len(tasks)
+    with Pool(args.workers, initializer=init_worker, initargs=(args.model_path,)) as pool:
+        for task_id, stats, lengths in tqdm(pool.imap_unordered(pack_range, tasks), total=len(tasks), desc="分词+打包"):
+            results[task_id] = (stats, lengths)
+    elapsed = time.time() - t0
+
+    totals = {k: sum(r[0][k] for r in results) for k in ("samples", "tokens", "truncated", "dropped", "rows")}
+    lengths = np.concatenate([r[1] for r in results])
+    rng = np.random.RandomState(0)
+    pad_before = padding_ratio(lengths[rng.permutation(len(lengths))], args.train_batch_size, args.seq_len)
+    capacity = totals["rows"] * args.seq_len
+    pad_after = 1 - totals["tokens"] / capacity if capacity else 0.0
+
+    manifest = {
+        "dataset_name": args.dataset_name,
+        "source": args.source,
+        "sources": sources,
+        "model_path": args.model_path,
+        "fingerprint": fingerprint,
+        "seq_len": args.seq_len,
+        "truncate": not args.drop_long,
+        "shards": shard_names,
+        "padding_ratio_before": pad_before,
+        "padding_ratio_after": pad_after,
+        "elapsed": elapsed,
+        **totals
+    }
+    with open(f"{output_dir}/manifest.json", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    print(f"\n✓ {totals['samples']:,} 条样本 → {totals['rows']:,} 条序列，耗时 {elapsed:.1f}秒")
+    print(f"  截断: {totals['truncated']:,} 条, 丢弃: {totals['dropped']:,} 条")
+    print(f"  平均每条序列 {totals['samples'] / max(totals['rows'], 1):.1f} 个样本")
+    print(f"  padding占比: {pad_before:.1%}（batch={args.train_batch_size}, 动态padding）→ {pad_after:.1%}（打包）")
+
+    if args.export_arrow:
+        export_arrow(output_dir, f"{output_dir}/arrow")
+        print(f"✓ datasets格式: {output_dir}/arrow")
+        print("  训练时使用: --tokenized_path", f"{output_dir}/arrow", "--neat_packing")
+
+    print("\n" + "=" * 60)
+    print("✅ 构建完成！")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MinHash-LSH 近似去重与评测集污染检查
+
+流程（各阶段多进程并行，内存占用与数据规模无关）:
+  1. 按区间计算MinHash签名，签名与分带哈希落盘（按哈希分区）
+  2. 按分区找同桶候选，用签名估计Jaccard验证
+  3. 并查集合并成重复簇，每簇保留行号最小的一条
+  4. 写出去重后的训练集、重复簇列表、eval_100/eval_500 污染报告
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+from collections import defaultdict, Counter
+from multiprocessing import Pool
+
+import numpy as np
+from tqdm import tqdm
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.dataset_export import ShardWriter, dataset_info_entry, format_record, update_dataset_info
+from src.dedup import (
+    MinHasher, band_hashes, bucket_groups, dedup_text, is_empty,
+    optimal_bands, UnionFind
+)
+from src.splitting import expand_sources, iter_source_range, source_units, split_ranges
+from src.task_types import TASK_TYPES, classify_instruction
+
+# 评测样本在同桶中最多与多少条训练数据逐一比较
+MAX_EVAL_COMPARE = 200
+
+
+def save_task_signatures(work_dir, task_id, signatures, bands, rows, num_partitions):
+    """保存签名，并把分带哈希按分区排序后落盘"""
+    np.save(f"{work_dir}/sig_{task_id:05d}.npy", signatures)
+
+    n = signatures.shape[0]
+    keep = ~is_empty(signatures)
+    hashes = band_hashes(signatures, bands, rows)
+    local = np.repeat(np.arange(n, dtype=np.int64), bands).reshape(n, bands)
+    band_idx = np.tile(np.arange(bands, dtype=np.int64), (n, 1))
+    keys = np.stack([band_idx[keep].ravel(), hashes[keep].ravel(), local[keep].ravel()], axis=1)
+
+    partition = keys[:, 1] % num_partitions
+    order = np.argsort(partition, kind="stable")
+    keys = keys[order]
+    offsets = np.searchsorted(partition[order], np.arange(num_partitions + 1))
+    np.save(f"{work_dir}/bands_{task_id:05d}.npy", keys)
+    np.save(f"{work_dir}/bands_{task_id:05d}_offsets.npy", offsets)
+
+
+def signature_range(task):
+    """阶段1：计算一个区间的签名（子进程）"""
+    source, start, end, task_id, work_dir, hasher_args, bands, rows, num_partitions = task
+    hasher = MinHasher(**hasher_args)
+    signatures = [hasher.signature(dedup_text(item)) for item in iter_source_range(source, start, end)]
+    signatures = np.stack(signatures) if signatures else np.zeros((0, hasher.num_perm), dtype=np.uint32)
+    save_task_signatures(work_dir, task_id, signatures, bands, rows, num_partitions)
+    return task_id, signatures.shape[0]
+
+
+class SignatureStore:
+    """按全局行号读取签名（内存映射）"""
+
+    def __init__(self, work_dir, task_offsets):
+        self.work_dir = work_dir
+        self.task_offsets = np.asarray(task_offsets)
+        self._cache = {}
+
+    def get(self, gid):
+        t = int(np.searchsorted(self.task_offsets, gid, side="right") - 1)
+        if t not in self._cache:
+            self._cache[t] = np.load(f"{self.work_dir}/sig_{t:05d}.npy", mmap_mode="r")
+        return np.asarray(self._cache[t][gid - self.task_offsets[t]])
+
+
+def find_edges(task):
+    """阶段2：处理一个哈希分区，返回验证通过的相似对（子进程）"""
+    work_dir, partition, task_offsets, num_train, threshold = task
+    store = SignatureStore(work_dir, task_offsets)
+
+    keys = []
+    for t in range(len(task_offsets) - 1):
+        offsets = np.load(f"{work_dir}/bands_{t:05d}_offsets.npy")
+        seg = np.load(f"{work_dir}/bands_{t:05d}.npy", mmap_mode="r")[offsets[partition]:offsets[partition + 1]]
+        seg = np.array(seg)
+        seg[:, 2] += task_offsets[t]
+        keys.append(seg)
+    keys = np.concatenate(keys) if keys else np.zeros((0, 3), dtype=np.int64)
+
+    train_edges = {}
+    eval_edges = {}
+    for group in bucket_groups(keys):
+        group = np.unique(group)
+        train = group[group < num_train]
+        evals = group[group >= num_train]
+
+        # 训练集内部：与组内第一条比较，传递性由并查集保证
+        if len(train) > 1:
+            first = store.get(int(train[0]))
+            for gid in train[1:]:
+                pair = (int(train[0]), int(gid))
+                if pair in train_edges:
+                    continue
+                j = float(np.mean(store.get(int(gid)) == first))
+                if j >= threshold:
+                    train_edges[pair] = j
+
+        # 评测集 vs 训练集：逐一比较
+        if len(evals) and len(train):
+            train_sigs = [(int(g), store.get(int(g))) for g in train[:MAX_EVAL_COMPARE]]
+            for e in evals:
+                sig_e = store.get(int(e))
+                for g, sig_g in train_sigs:
+                    pair = (int(e), g)
+                    if pair in eval_edges:
+                        continue
+                    j = float(np.mean(sig_e == sig_g))
+                    if j >= threshold:
+                        eval_edges[pair] = j
+
+    return train_edges, eval_edges
+
+
+def write_dedup_range(task):
+    """阶段4：写出去重后的区间，并收集需要展示的样本文本（子进程）"""
+    source, start, end, shard_path, drop, wanted, offset = task
+    drop = set(drop.tolist())
+    wanted = set(wanted.tolist())
+    writer = ShardWriter(shard_path) if shard_path else None
+    samples = {}
+    kept = 0
+    for local, item in enumerate(iter_source_range(source, start, end)):
+        if local in wanted:
+            samples[offset + local] = {
+                "instruction": (item.get("instruction") or "")[:100],
+                "input": (item.get("input") or "")[:100],
+                "output": (item.get("output") or "")[:100]
+            }
+        if local in drop:
+            continue
+        kept += 1
+        if writer:
+            writer.write(format_record(item, "alpaca"))
+    if writer:
+        writer.close()
+    return kept, samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MinHash-LSH 近似去重与评测集污染检查')
+    parser.add_argument('--train', type=str, default='data/jsonl/train.jsonl',
+                        help='训练数据：save_to_disk目录、JSONL文件或JSONL分片目录')
+    parser.add_argument('--eval_files', type=str, nargs='*',
+                        default=['data/evaluation/eval_100.json', 'data/evaluation/eval_500.json'])
+    parser.add_argument('--output_dir', type=str, default='data/dedup')
+    parser.add_argument('--threshold', type=float, default=0.8, help='Jaccard相似度阈值')
+    parser.add_argument('--num_perm', type=int, default=128)
+    parser.add_argument('--ngram', type=int, default=5)
+    parser.add_argument('--tokenizer', type=str, default='char', choices=['char', 'jieba'])
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--num_shards', type=int, default=None,
+                        help='区间数（默认进程数×4；越多单进程内存越小）')
+    parser.add_argument('--num_partitions', type=int, default=64,
+                        help='LSH哈希分区数（越多阶段2单进程内存越小）')
+    parser.add_argument('--skip_write', action='store_true',
+                        help='只输出重复簇和污染报告，不写去重后的训练集')
+    parser.add_argument('--dataset_name', type=str, default='tcm_train_dedup')
+    parser.add_argument('--dataset_info', type=str, default='config/dataset_info.json',
+                        help='要更新的dataset_info.json（设为空字符串则不更新）')
+    parser.add_argument('--keep_work', action='store_true', help='保留中间签名文件')
+
+    args = parser.parse_args()
+
+    bands, rows = optimal_bands(args.num_perm, args.threshold)
+    hasher_args = {"num_perm": args.num_perm, "ngram": args.ngram, "tokenizer": args.tokenizer}
+
+    print("=" * 60)
+    print("🔍 MinHash-LSH 近似去重")
+    print("=" * 60)
+    print(f"训练数据: {args.train}")
+    print(f"阈值: {args.threshold}, 签名: {args.num_perm}, 分带: {bands}×{rows}, "
+          f"{args.ngram}-gram ({args.tokenizer})")
+
+    work_dir = f"{args.output_dir}/work"
+    os.makedirs(work_dir, exist_ok=True)
+    timings = {}
+
+    # ---------- 阶段1：签名 ----------
+    t0 = time.time()
+    sources = expand_sources(args.train)
+    sizes = [source_units(s)[1] for s in sources]
+    total_units = sum(sizes)
+    num_shards = args.num_shards or args.workers * 4
+
+    ranges = []
+    for source, n in zip(sources, sizes):
+        parts = max(1, round(num_shards * n / total_units)) if total_units else 1
+        for start, end in split_ranges(0, n, parts):
+            ranges.append((source, start, end))
+
+    tasks = [
+        (source, start, end, i, work_dir, hasher_args, bands, rows, args.num_partitions)
+        for i, (source, start, end) in enumerate(ranges)
+    ]
+    task_rows = [0] * len(tasks)
+    with Pool(args.workers) as pool:
+        for task_id, n in tqdm(pool.imap_unordered(signature_range, tasks), total=len(tasks), desc="计算签名"):
+            task_rows[task_id] = n
+    num_train = sum(task_rows)
+
+    # 评测集作为额外的区间追加在训练集之后
+    hasher = MinHasher(**hasher_args)
+    eval_sets = {}
+    for path in args.eval_files:
+        if not os.path.exists(path):
+            print(f"⚠️  评测集不存在，跳过: {path}")
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        sigs = np.stack([hasher.signature(dedup_text(item)) for item in data])
+        task_id = len(task_rows)
+        save_task_signatures(work_dir, task_id, sigs, bands, rows, args.num_partitions)
+        eval_sets[path] = {"data": data, "task": task_id, "offset": sum(task_rows)}
+        task_rows.append(len(data))
+
+    task_offsets = np.concatenate([[0], np.cumsum(task_rows)]).astype(np.int64)
+    timings["signatures"] = time.time() - t0
+    print(f"✓ 训练集 {num_train:,} 条, 评测集 {sum(len(v['data']) for v in eval_sets.values())} 条 "
+          f"({timings['signatures']:.1f}秒)")
+
+    # ---------- 阶段2：LSH候选 + 验证 ----------
+    t0 = time.time()
+    train_edges = {}
+    eval_edges = {}
+    partition_tasks = [
+        (work_dir, p, task_offsets.tolist(), num_train, args.threshold)
+        for p in range(args.num_partitions)
+    ]
+    with Pool(args.workers) as pool:
+        for te, ee in tqdm(pool.imap_unordered(find_edges, partition_tasks),
+                           total=len(partition_tasks), desc="LSH分区"):
+            for pair, j in te.items():
+                train_edges[pair] = max(j, train_edges.get(pair, 0.0))
+            for pair, j in ee.items():
+                eval_edges[pair] = max(j, eval_edges.get(pair, 0.0))
+    timings["lsh"] = time.time() - t0
+    print(f"✓ 相似对: 训练集内 {len(train_edges):,}, 评测-训练 {len(eval_edges):,} "
+          f"({timings['lsh']:.1f}秒)")
+
+    # ---------- 阶段3：重复簇 ----------
+    t0 = time.time()
+    uf = UnionFind(num_train)
+    for a, b in train_edges:
+        uf.union(a, b)
+
+    clusters = defaultdict(list)
+    for gid in {g for pair in train_edges for g in pair}:
+        clusters[uf.find(gid)].append(gid)
+    drop = np.array(sorted(g for root, members in clusters.items() for g in members if g != root),
+                    dtype=np.int64)
+    timings["clusters"] = time.time() - t0
+    print(f"✓ 重复簇: {len(clusters):,} 个, 可删除 {len(drop):,} 条 "
+          f"({len(drop) / num_train * 100 if num_train else 0:.2f}%)")
+
+    # 污染：每个评测样本的匹配训练数据
+    contamination = defaultdict(list)
+    for (e, g), j in eval_edges.items():
+        contamination[e].append((g, j))
+
+    # ---------- 阶段4：写出 ----------
+    t0 = time.time()
+    wanted = set(clusters.keys())
+    for matches in contamination.values():
+        wanted.update(g for g, _ in sorted(matches, key=lambda x: -x[1])[:3])
+    wanted = np.array(sorted(wanted), dtype=np.int64)
+
+    dedup_dir = f"{args.output_dir}/{args.dataset_name}"
+    if not args.skip_write:
+        os.makedirs(dedup_dir, exist_ok=True)
+        for old in os.listdir(dedup_dir):
+            if old.startswith("part-"):
+                os.remove(os.path.join(dedup_dir, old))
+
+    write_tasks = []
+    for i, (source, start, end) in enumerate(ranges):
+        lo, hi = task_offsets[i], task_offsets[i + 1]
+        task_drop = drop[(drop >= lo) & (drop < hi)] - lo
+        task_wanted = wanted[(wanted >= lo) & (wanted < hi)] - lo
+        shard = None if args.skip_write else f"{dedup_dir}/part-{i:05d}.jsonl"
+        write_tasks.append((source, start, end, shard, task_drop, task_wanted, int(lo)))
+
+    kept = 0
+    samples = {}
+    with Pool(args.workers) as pool:
+        for k, s in tqdm(pool.imap_unordered(write_dedup_range, write_tasks),
+                         total=len(write_tasks), desc="写出"):
+            kept += k
+            samples.update(s)
+    timings["write"] = time.time() - t0
+
+    # 重复簇列表（按大小降序）
+    with open(f"{args.output_dir}/clusters.jsonl", 'w', encoding='utf-8') as f:
+        for root, members in sorted(clusters.items(), key=lambda x: -len(x[1])):
+            f.write(json.dumps({
+                "representative": root,
+                "size": len(members),
+                "rows": sorted(members),
+                "sample": samples.get(root)
+            }, ensure_ascii=False) + '\n')
+
+    # 污染报告
+    report = {}
+    for path, info in eval_sets.items():
+        items = []
+        by_task = Counter()
+        contaminated_by_task = Counter()
+        for idx, item in enumerate(info["data"]):
+            task_type = classify_instruction(item.get("instruction", ""))
+            by_task[task_type] += 1
+            matches = sorted(contamination.get(info["offset"] + idx, []), key=lambda x: -x[1])
+            if not matches:
+                continue
+            contaminated_by_task[task_type] += 1
+            items.append({
+                "id": item["id"],
+                "task_type": task_type,
+                "question": item.get("full_question", "")[:100],
+                "reference": item.get("output", "")[:100],
+                "max_jaccard": matches[0][1],
+                "num_matches": len(matches),
+                "matches": [{"train_row": g, "jaccard": j, "sample": samples.get(g)} for g, j in matches[:3]]
+            })
+        report[path] = {
+            "total": len(info["data"]),
+            "contaminated": len(items),
+            "rate": len(items) / len(info["data"]) if info["data"] else 0.0,
+            "by_task": {
+                t: {"total": by_task[t], "contaminated": contaminated_by_task[t]}
+                for t in TASK_TYPES if by_task[t]
+            },
+            "items": items
+        }
+
+    summary = {
+        "train": args.train,
+        "threshold": args.threshold,
+        "num_perm": args.num_perm,
+        "bands": bands,
+        "rows": rows,
+        "ngram": args.ngram,
+        "tokenizer": args.tokenizer,
+        "train_rows": num_train,
+        "clusters": len(clusters),
+        "duplicates_removed": int(len(drop)),
+        "kept": kept,
+        "timings": timings,
+        "contamination": {p: {k: v for k, v in r.items() if k != "items"} for p, r in report.items()}
+    }
+    with open(f"{args.output_dir}/contamination_report.json", 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    with open(f"{args.output_dir}/summary.json", 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    if not args.skip_write and args.dataset_info:
+        dataset_dir = os.path.dirname(os.path.abspath(args.dataset_info))
+        rel = os.path.relpath(os.path.abspath(dedup_dir), dataset_dir)
+        update_dataset_info(args.dataset_info, {args.dataset_name: dataset_info_entry(rel, "alpaca")})
+        print(f"✓ 已更新 {args.dataset_info}: {args.dataset_name} -> {rel}")
+
+    if not args.keep_work:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"\n📊 去重结果:")
+    print(f"  训练集: {num_train:,} → {kept:,} 条")
+    print(f"  重复簇: {len(clusters):,} 个 ({args.output_dir}/clusters.jsonl)")
+    print(f"\n🧪 评测集污染:")
+    for path, r in report.items():
+        print(f"  {path}: {r['contaminated']}/{r['total']} ({r['rate']:.1%})")
+        for t, c in r["by_task"].items():
+            print(f"    {TASK_TYPES[t]:<12} {c['contaminated']}/{c['total']}")
+    print(f"\n⏱️  耗时: " + ", ".join(f"{k} {v:.1f}秒" for k, v in timings.items()))
+
+    print("\n" + "=" * 60)
+    print("✅ 去重完成！")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多进程导出LLaMA-Factory训练数据（convert_to_jsonl.py 的并行版本）
+支持 alpaca / sharegpt 格式、zstd压缩（仅归档）、每个分片的行索引，并自动更新 dataset_info.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from multiprocessing import Pool
+from tqdm import tqdm
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.dataset_export import (
+    FORMATS, ShardWriter, dataset_info_entry, format_record,
+    shard_suffix, update_dataset_info
+)
+from src.splitting import expand_sources, iter_source_range, source_units, split_ranges
+
+
+def export_range(task):
+    """导出一个区间为一个分片（子进程）"""
+    source, start, end, shard_path, index_path, fmt, compress, level = task
+    writer = ShardWriter(shard_path, compress=compress, level=level)
+    for item in iter_source_range(source, start, end):
+        writer.write(format_record(item, fmt))
+    return writer.close(index_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='并行导出LLaMA-Factory数据集')
+    parser.add_argument('--source', type=str, default='data/processed/train',
+                        help='数据源：save_to_disk目录、JSONL文件或JSONL分片目录')
+    parser.add_argument('--name', type=str, default='tcm_train',
+                        help='数据集名称（dataset_info.json中的键，也是输出子目录名）')
+    parser.add_argument('--output_dir', type=str, default='data/jsonl')
+    parser.add_argument('--format', type=str, default='alpaca', choices=FORMATS)
+    parser.add_argument('--compress', type=str, default=None, choices=['zstd'],
+                        help='分片压缩格式（需要zstandard）')
+    parser.add_argument('--level', type=int, default=3, help='zstd压缩级别')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--num_shards', type=int, default=None,
+                        help='分片数（默认等于进程数的4倍，便于负载均衡）')
+    parser.add_argument('--dataset_info', type=str, default='config/dataset_info.json',
+                        help='要更新的dataset_info.json（设为空字符串则不更新；压缩输出时不更新）')
+
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"🔄 并行导出: → {args.format} JSONL" + (" (zstd)" if args.compress else ""))
+    print("=" * 60)
+
+    sources = expand_sources(args.source)
+    sizes = [source_units(s) for s in sources]
+    total = sum(n for _, n in sizes)
+    num_shards = args.num_shards or args.workers * 4
+    print(f"数据源: {args.source} ({len(sources)} 个文件/目录)")
+    print(f"进程数: {args.workers}, 分片数: ~{num_shards}")
+
+    shard_dir = f"{args.output_dir}/{args.name}"
+    index_dir = f"{args.output_dir}/{args.name}.index"
+    os.makedirs(shard_dir, exist_ok=True)
+    os.makedirs(index_dir, exist_ok=True)
+    # 清理旧分片，避免LLaMA-Factory加载到上次残留的文件
+    for old in os.listdir(shard_dir):
+        if old.startswith("part-"):
+            os.remove(os.path.join(shard_dir, old))
+
+    suffix = shard_suffix(args.compress)
+    tasks = []
+    for source, (_, n) in zip(sources, sizes):
+        parts = max(1, round(num_shards * n / total)) if total else 1
+        for start, end in split_ranges(0, n, parts):
+            i = len(tasks)
+            tasks.append((
+                source, start, end,
+                f"{shard_dir}/part-{i:05d}{suffix}",
+                f"{index_dir}/part-{i:05d}.idx",
+                args.format, args.compress, args.level
+            ))
+
+    start_time = time.time()
+    with Pool(args.workers) as pool:
+        shards = list(tqdm(pool.imap(export_range, tasks), total=len(tasks), desc="导出分片"))
+    elapsed = time.time() - start_time
+
+    lines = sum(s["lines"] for s in shards)
+    size = sum(s["bytes"] for s in shards)
+
+    with open(f"{index_dir}/index.json", 'w', encoding='utf-8') as f:
+        json.dump({
+            "name": args.name,
+            "format": args.format,
+            "compress": args.compress,
+            "source": args.source,
+            "lines": lines,
+            "shards": shards
+        }, f, ensure_ascii=False, indent=2)
+
+    if args.compress:
+        # LLaMA-Factory不能直接读取.jsonl.zst，压缩分片只用于归档/传输
+        print(f"⚠️  压缩分片仅用于归档，未更新 {args.dataset_info or 'dataset_info.json'}；训练前请导出未压缩的JSONL")
+    elif args.dataset_info:
+        dataset_dir = os.path.dirname(os.path.abspath(args.dataset_info))
+        rel = os.path.relpath(os.path.abspath(shard_dir), dataset_dir)
+        update_dataset_info(args.dataset_info, {args.name: dataset_info_entry(rel, args.format)})
+        print(f"✓ 已更新 {args.dataset_info}: {args.name} -> {rel}")
+
+    print(f"\n📊 导出统计:")
+    print(f"  行数: {lines:,}")
+    print(f"  分片: {len(shards)} 个 ({shard_dir}/)")
+    print(f"  大小: {size / 1024 / 1024:.1f} MB")
+    print(f"  耗时: {elapsed:.1f} 秒 ({lines / elapsed if elapsed else 0:,.0f} 行/秒)")
+    print(f"  索引: {index_dir}/")
+
+    print("\n" + "=" * 60)
+    print("✅ 导出完成！")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多数据源按比例流式混合（中医SFT + COIG-CQIA 等）
+按权重确定性交错各数据源，边读边去重、按长度过滤，
+写出JSONL分片（并更新dataset_info.json）或打包分片（见 build_packed_dataset.py）
+内存占用：固定大小的Bloom过滤器（--dedup_capacity/--dedup_error）+ 打乱缓冲区（--shuffle_buffer条）；
+all_exhausted 时每条第一轮被判为重复的样本另需8字节记录序号，与重复条数成正比
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+from array import array
+
+from tqdm import tqdm
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.dataset_export import (
+    FORMATS, ShardWriter, dataset_info_entry, format_record, shard_suffix, update_dataset_info
+)
+from src.mixture import BloomFilter, LengthFilter, MixtureScheduler, ShuffleBuffer, parse_sources, source_stream
+from src.splitting import row_key
+
+
+class JsonlSink:
+    """按条数切分的JSONL分片"""
+
+    def __init__(self, out_dir, fmt, compress, shard_size):
+        self.out_dir = out_dir
+        self.fmt = fmt
+        self.compress = compress
+        self.shard_size = shard_size
+        self.shards = []
+        self.writer = None
+
+    def write(self, item):
+        if self.writer is None:
+            path = f"{self.out_dir}/part-{len(self.shards):05d}{shard_suffix(self.compress)}"
+            self.writer = ShardWriter(path, compress=self.compress)
+        self.writer.write(format_record(item, self.fmt))
+        if self.writer.lines >= self.shard_size:
+            self._close_shard()
+
+    def _close_shard(self):
+        self.shards.append(self.writer.close())
+        self.writer = None
+
+    def close(self):
+        if self.writer is not None:
+            self._close_shard()
+        return {"shards": self.shards, "lines": sum(s["lines"] for s in self.shards)}
+
+
+class PackedSink:
+    """打包分片（每shard_size条样本一个分片，PackedDataset可直接读取）"""
+
+    def __init__(self, out_dir, tokenizer, seq_len, window, shard_size, drop_long):
+        from src.packing import PackedShardWriter, WindowPacker
+        self._writer_cls = PackedShardWriter
+        self.out_dir = out_dir
+        self.seq_len = seq_len
+        self.shard_size = shard_size
+        self.shards = []
+        self.rows = 0
+        self.count = 0
+        self.packer = WindowPacker(tokenizer, self._new_writer(), seq_len, window, drop_long=drop_long)
+
+    def _new_writer(self):
+        self.shards.append(f"shard-{len(self.shards):05d}")
+        return self._writer_cls(f"{self.out_dir}/{self.shards[-1]}", self.seq_len)
+
+    def write(self, item):
+        self.packer.add(item)
+        self.count += 1
+        if self.count % self.shard_size == 0:
+            self.packer.flush()
+            self.rows += self.packer.writer.close()["rows"]
+            self.packer.writer = self._new_writer()
+
+    def close(self):
+        self.packer.flush()
+        self.rows += self.packer.writer.close()["rows"]
+        stats = dict(self.packer.stats, rows=self.rows)
+        capacity = self.rows * self.seq_len
+        stats["padding_ratio"] = 1 - stats["tokens"] / capacity if capacity else 0.0
+        manifest = {"seq_len": self.seq_len, "shards": self.shards, **stats}
+        with open(f"{self.out_dir}/manifest.json", 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        return stats
+
+
+def same_path(a, b):
+    return os.path.realpath(a) == os.path.realpath(b)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多数据源按比例流式混合')
+    parser.add_argument('--sources', type=str, default='tcm=data/processed/train:0.9,coig=data/raw/coig:0.1',
+                        help='名称=路径:权重，逗号分隔；路径可以是save_to_disk目录、JSONL文件或JSONL分片目录'
+                             '（中医数据请用划分后的训练集，原始语料中含val/test样本）')
+    parser.add_argument('--eval_source', type=str, default='data/raw/tcm_sft',
+                        help='评测集划分所用的原始语料（03_preprocess/03_stream_split的输入），'
+                             '混合中直接使用它会把val/test样本泄漏到训练集')
+    parser.add_argument('--name', type=str, default='tcm_mix',
+                        help='数据集名称（dataset_info.json中的键，也是输出子目录名）')
+    parser.add_argument('--output_dir', type=str, default='data/jsonl')
+    parser.add_argument('--total', type=int, default=None, help='输出条数上限')
+    parser.add_argument('--stopping', type=str, default='first_exhausted',
+                        choices=['first_exhausted', 'all_exhausted'],
+                        help='first_exhausted: 任一数据源读完即停止；all_exhausted: 较小的数据源循环使用直到全部读完'
+                             '（每条第一轮被判为重复的样本额外占用8字节内存；一整轮没有输出的数据源会被移出）')
+    parser.add_argument('--format', type=str, default='alpaca', choices=FORMATS)
+    parser.add_argument('--compress', type=str, default=None, choices=['zstd'])
+    parser.add_argument('--shard_size', type=int, default=100000, help='每个分片的样本数')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--shuffle_buffer', type=int, default=10000, help='打乱缓冲区大小（1表示不打乱）')
+    # 去重
+    parser.add_argument('--no_dedup', action='store_true', help='关闭跨数据源精确去重')
+    parser.add_argument('--dedup_capacity', type=int, default=10_000_000, help='预计的最大样本数（决定Bloom过滤器大小）')
+    parser.add_argument('--dedup_error', type=float, default=1e-4, help='误判率')
+    # 长度过滤
+    parser.add_argument('--min_chars', type=int, default=1)
+    parser.add_argument('--max_chars', type=int, default=None)
+    parser.add_argument('--max_tokens', type=int, default=None, help='按模板后的token数过滤（需要--model_path）')
+    # 打包输出
+    parser.add_argument('--packed', action='store_true', help='输出打包分片而不是JSONL')
+    parser.add_argument('--model_path', type=str, default='Qwen/Qwen2.5-7B-Instruct', help='tokenizer路径')
+    parser.add_argument('--seq_len', type=int, default=2048)
+    parser.add_argument('--window', type=int, default=20000)
+    parser.add_argument('--packed_root', type=str, default='data/packed')
+    parser.add_argument('--dataset_info', type=str, default='config/dataset_info.json',
+                        help='要更新的dataset_info.json（设为空字符串则不更新；打包或压缩输出时不更新）')
+
+    args = parser.parse_args()
+    sources = parse_sources(args.sources)
+
+    print("=" * 60)
+    print("🔀 多数据源流式混合")
+    print("=" * 60)
+    for name, path, weight in sources:
+        print(f"  {name:<10} {weight:>6.1%}  {path}")
+    for name, path, _ in sources:
+        if same_path(path, args.eval_source):
+            print(f"⚠️  {name}: {path} 是评测集划分所用的原始语料，其中包含val/test样本，混合后会泄漏到训练集；"
+                  f"请改用划分后的训练集（如 data/processed/train）")
+
+    tokenizer = None
+    overhead = 0
+    if args.packed or args.max_tokens:
+        from src.token_stats import load_tokenizer, template_overhead
+        tokenizer = load_tokenizer(args.model_path)
+        overhead = template_overhead(tokenizer)
+
+    out_dir = f"{args.packed_root if args.packed else args.output_dir}/{args.name}"
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    os.makedirs(out_dir)
+
+    if args.packed:
+        sink = PackedSink(out_dir, tokenizer, args.seq_len, args.window, args.shard_size, drop_long=False)
+    else:
+        sink = JsonlSink(out_dir, args.format, args.compress, args.shard_size)
+
+    length_filter = LengthFilter(args.min_chars, args.max_chars, tokenizer, args.max_tokens, overhead)
+    stats = {name: {"read": 0, "filtered": 0, "duplicate": 0, "emitted": 0, "epochs": 1} for name, _, _ in sources}
+    streams = [source_stream(path, length_filter, stats[name]) for name, path, _ in sources]
+    # 每个数据源第一轮中被判为重复的序号（只有all_exhausted会循环使用，后续轮次跳过同样的样本）。
+    # 第一轮按递增顺序记录，后续轮次用游标顺序比对：每条重复样本占8字节
+    dropped = [array('q') for _ in sources]
+    cursors = [0] * len(sources)
+    ordinals = [0] * len(sources)
+    epoch_emitted = [0] * len(sources)
+    exhausted = set()
+
+    bloom = None if args.no_dedup else BloomFilter(args.dedup_capacity, args.dedup_error)
+    scheduler = MixtureScheduler([w for _, _, w in sources])
+    shuffle = ShuffleBuffer(args.shuffle_buffer, args.seed)
+
+    t0 = time.time()
+    emitted = 0
+    pbar = tqdm(total=args.total, desc="混合", unit="条")
+    done = False
+    while not done and (args.total is None or emitted < args.total):
+        i = scheduler.next()
+        if i is None:
+            break
+        name, path, _ = sources[i]
+        while True:
+            try:
+                item = next(streams[i])
+            except StopIteration:
+                item = None
+                exhausted.add(i)
+                if args.stopping == 'first_exhausted' or len(exhausted) == len(sources):
+                    done = True
+                    break
+                if epoch_emitted[i] == 0:
+                    # 一整轮都被长度过滤或去重掉，再循环也不会有输出
+                    print(f"\n⚠️  {name}: 一整轮没有可输出的样本，移出混合")
+                    scheduler.remove(i)
+                    break
+                streams[i] = source_stream(path, length_filter, {"read": 0, "filtered": 0})
+                stats[name]["epochs"] += 1
+                epoch_emitted[i] = 0
+                ordinals[i] = 0
+                cursors[i] = 0
+                continue
+
+            ordinal = ordinals[i]
+            ordinals[i] += 1
+            if stats[name]["epochs"] == 1:
+                if bloom is not None and bloom.add(row_key(item)):
+                    if args.stopping == 'all_exhausted':
+                        dropped[i].append(ordinal)
+                    stats[name]["duplicate"] += 1
+                    continue
+            elif cursors[i] < len(dropped[i]) and dropped[i][cursors[i]] == ordinal:
+                cursors[i] += 1
+                continue
+            break
+        if done:
+            break
+        if item is None:
+            continue
+
+        stats[name]["emitted"] += 1
+        epoch_emitted[i] += 1
+        emitted += 1
+        pbar.update(1)
+        out = shuffle.push(item)
+        if out is not None:
+            sink.write(out)
+    pbar.close()
+
+    for item in shuffle.drain():
+        sink.write(item)
+    result = sink.close()
+    elapsed = time.time() - t0
+
+    print(f"\n{'数据源':<10} {'目标':>7} {'实际':>7} {'读取':>12} {'长度过滤':>10} {'重复':>10} {'输出':>12} {'轮数':>5}")
+    print("-" * 80)
+    for name, _, weight in sources:
+        s = stats[name]
+        actual = s["emitted"] / emitted if emitted else 0.0
+        print(f"{name:<10} {weight:>7.1%} {actual:>7.1%} {s['read']:>12,} {s['filtered']:>10,} "
+              f"{s['duplicate']:>10,} {s['emitted']:>12,} {s['epochs']:>5}")
+    print("-" * 80)
+    print(f"共输出 {emitted:,} 条，耗时 {elapsed:.1f}秒 ({emitted / elapsed if elapsed else 0:,.0f} 条/秒)")
+    if bloom is not None:
+        print(f"去重过滤器: {bloom.nbytes / 1024 / 1024:.1f} MB")
+
+    mixture = {
+        "name": args.name,
+        "sources": [{"name": n, "path": p, "weight": w, **stats[n]} for n, p, w in sources],
+        "stopping": args.stopping,
+        "seed": args.seed,
+        "shuffle_buffer": args.shuffle_buffer,
+        "dedup": not args.no_dedup,
+        "emitted": emitted,
+        "output": result,
+        "elapsed": elapsed
+    }
+    with open(f"{out_dir}/mixture.json", 'w', encoding='utf-8') as f:
+        json.dump(mixture, f, ensure_ascii=False, indent=2)
+
+    if args.packed:
+        print(f"✓ 打包分片: {out_dir}/（{result['rows']:,} 条序列, padding占比 {result['padding_ratio']:.1%}）")
+    else:
+        print(f"✓ JSONL分片: {out_dir}/（{len(result['shards'])} 个）")
+        if args.compress:
+            # LLaMA-Factory不能直接读取.jsonl.zst，压缩分片只用于归档/传输
+            print(f"⚠️  压缩分片仅用于归档，未更新 {args.dataset_info or 'dataset_info.json'}")
+        elif args.dataset_info:
+            dataset_dir = os.path.dirname(os.path.abspath(args.dataset_info))
+            rel = os.path.relpath(os.path.abspath(out_dir), dataset_dir)
+            update_dataset_info(args.dataset_info, {args.name: dataset_info_entry(rel, args.format)})
+            print(f"✓ 已更新 {args.dataset_info}: {args.name} -> {rel}")
+
+    print("\n" + "=" * 60)
+    print("✅ 混合完成！")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
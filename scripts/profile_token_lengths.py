@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全量训练集token长度统计
+多进程批量tokenize，逐条长度保存为npz（与数据集放在一起），
+按任务类型输出直方图和cutoff建议，并可导出过滤/分桶后的子集
+"""
+import os
+import sys
+import time
+import argparse
+from multiprocessing import Pool
+
+import numpy as np
+from tqdm import tqdm
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.dataset_export import ShardWriter, dataset_info_entry, format_record, update_dataset_info
+from src.splitting import expand_sources, iter_source_range, source_units, split_ranges
+from src.task_types import TASK_TYPES
+from src.token_stats import (
+    TASK_CODES, encode_lengths, load_tokenizer, padding_ratio, save_profile,
+    suggest_cutoff, summarize_lengths, template_overhead
+)
+
+_tokenizer = None
+
+
+def init_worker(model_path):
+    global _tokenizer
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    _tokenizer = load_tokenizer(model_path)
+
+
+def profile_range(task):
+    """统计一个区间的token长度（子进程）"""
+    task_id, source, start, end, batch_size = task
+    parts = []
+    batch = []
+    for item in iter_source_range(source, start, end):
+        batch.append(item)
+        if len(batch) >= batch_size:
+            parts.append(encode_lengths(_tokenizer, batch))
+            batch = []
+    if batch:
+        parts.append(encode_lengths(_tokenizer, batch))
+    if not parts:
+        empty = {"prompt": np.uint32, "response": np.uint32, "task": np.uint8}
+        return task_id, {k: np.zeros(0, dtype=t) for k, t in empty.items()}
+    return task_id, {k: np.concatenate([p[k] for p in parts]) for k in parts[0]}
+
+
+def emit_range(task):
+    """按长度写出分桶子集（子进程）"""
+    source, start, end, total, bucket_edges, shard_paths = task
+    writers = [ShardWriter(p) for p in shard_paths]
+    bucket = np.searchsorted(bucket_edges, total, side="left")
+    for local, item in enumerate(iter_source_range(source, start, end)):
+        b = bucket[local]
+        if b < len(writers):
+            writers[b].write(format_record(item, "alpaca"))
+    return [w.close() for w in writers]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='全量训练集token长度统计')
+    parser.add_argument('--source', type=str, default='data/jsonl/train.jsonl',
+                        help='save_to_disk目录、JSONL文件或JSONL分片目录')
+    parser.add_argument('--model_path', type=str, default='Qwen/Qwen2.5-7B-Instruct',
+                        help='tokenizer路径')
+    parser.add_argument('--output', type=str, default=None,
+                        help='长度文件路径（默认与数据集同目录: <source>.token_lengths.npz）')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--num_shards', type=int, default=None)
+    parser.add_argument('--batch_size', type=int, default=1000, help='每次批量tokenize的条数')
+    parser.add_argument('--cutoff', type=int, default=2048, help='训练cutoff_len')
+    parser.add_argument('--coverage', type=float, default=0.99, help='建议cutoff需要覆盖的样本比例')
+    parser.add_argument('--train_batch_size', type=int, default=4,
+                        help='per_device_train_batch_size（用于估算padding占比）')
+    parser.add_argument('--emit_filtered', action='store_true',
+                        help='导出总长度不超过cutoff的子集（丢弃会被截断的样本）')
+    parser.add_argument('--emit_buckets', type=str, default=None,
+                        help='按长度分桶导出，如 512,1024,2048 → _le512、_512to1024、_1024to2048'
+                             '（各桶互不重叠，超过最大桶的样本丢弃）')
+    parser.add_argument('--emit_dir', type=str, default='data/jsonl')
+    parser.add_argument('--dataset_name', type=str, default='tcm_train')
+    parser.add_argument('--dataset_info', type=str, default='config/dataset_info.json',
+                        help='要更新的dataset_info.json（设为空字符串则不更新）')
+
+    args = parser.parse_args()
+    output = args.output or args.source.rstrip('/') + ".token_lengths.npz"
+
+    print("=" * 60)
+    print("📏 Token长度统计")
+    print("=" * 60)
+    print(f"数据源: {args.source}")
+    print(f"Tokenizer: {args.model_path}")
+
+    sources = expand_sources(args.source)
+    sizes = [source_units(s)[1] for s in sources]
+    total_units = sum(sizes)
+    num_shards = args.num_shards or args.workers * 4
+
+    ranges = []
+    for source, n in zip(sources, sizes):
+        parts = max(1, round(num_shards * n / total_units)) if total_units else 1
+        for start, end in split_ranges(0, n, parts):
+            ranges.append((source, start, end))
+
+    overhead = template_overhead(load_tokenizer(args.model_path))
+    print(f"模板开销: {overhead} tokens/条")
+
+    t0 = time.time()
+    results = [None] * len(ranges)
+    tasks = [(i, s, a, b, args.batch_size) for i, (s, a, b) in enumerate(ranges)]
+    with Pool(args.workers, initializer=init_worker, initargs=(args.model_path,)) as pool:
+        for task_id, lengths in tqdm(pool.imap_unordered(profile_range, tasks), total=len(tasks), desc="Tokenize"):
+            results[task_id] = lengths
+    elapsed = time.time() - t0
+
+    lengths = {k: np.concatenate([r[k] for r in results]) for k in ("prompt", "response", "task")}
+    range_rows = [len(r["task"]) for r in results]
+    total = lengths["prompt"].astype(np.int64) + lengths["response"] + overhead
+    n = len(total)
+    print(f"✓ {n:,} 条, 耗时 {elapsed:.1f}秒 ({n / elapsed if elapsed else 0:,.0f} 条/秒)")
+
+    # 统计
+    overall = summarize_lengths(total, args.cutoff)
+    by_task = {}
+    for code, task in enumerate(TASK_CODES):
+        mask = lengths["task"] == code
+        if mask.any():
+            by_task[task] = summarize_lengths(total[mask], args.cutoff)
+
+    suggested = suggest_cutoff(total, args.coverage)
+    rng = np.random.RandomState(0)
+    shuffled = total[rng.permutation(n)]
+    pad_before = padding_ratio(shuffled, args.train_batch_size, args.cutoff)
+
+    print(f"\n{'任务类型':<14} {'数量':>10} {'均值':>8} {'P50':>7} {'P90':>7} {'P99':>7} {'最大':>8} {'>cutoff':>10}")
+    print("-" * 80)
+    for task, s in list(by_task.items()) + [("all", overall)]:
+        label = TASK_TYPES.get(task, "全部")
+        print(f"{label:<14} {s['count']:>10,} {s['mean']:>8.0f} {s['p50']:>7.0f} {s['p90']:>7.0f} "
+              f"{s['p99']:>7.0f} {s['max']:>8} {s['over_cutoff_ratio']:>9.2%}")
+    print("-" * 80)
+    print("\n直方图（全部）:")
+    for label, c in overall["histogram"].items():
+        bar = "█" * int(50 * c / n) if n else ""
+        print(f"  {label:>8}: {c:>10,} {bar}")
+    print(f"\n当前cutoff={args.cutoff}: {overall['over_cutoff']:,} 条会被截断 "
+          f"({overall['over_cutoff_ratio']:.2%}), 截掉 {overall['truncated_token_ratio']:.2%} 的token")
+    print(f"覆盖{args.coverage:.0%}样本的cutoff: {suggested}")
+    print(f"padding占比（batch={args.train_batch_size}, 随机顺序）: {pad_before:.1%}")
+
+    meta = {
+        "source": args.source,
+        "sources": sources,
+        "range_rows": range_rows,
+        "model_path": args.model_path,
+        "template_overhead": overhead,
+        "task_codes": TASK_CODES,
+        "cutoff": args.cutoff,
+        "suggested_cutoff": suggested,
+        "padding_ratio": pad_before,
+        "overall": overall,
+        "by_task": by_task,
+        "elapsed": elapsed
+    }
+
+    # 导出过滤/分桶子集
+    bucket_edges = None
+    if args.emit_buckets:
+        bucket_edges = sorted(int(x) for x in args.emit_buckets.split(','))
+    elif args.emit_filtered:
+        bucket_edges = [args.cutoff]
+
+    if bucket_edges:
+        # 各桶互不重叠：第一个桶为 (0, b0]，之后为 (前一个边界, b]
+        names = [f"{args.dataset_name}_le{b}" if i == 0 else f"{args.dataset_name}_{bucket_edges[i - 1]}to{b}"
+                 for i, b in enumerate(bucket_edges)]
+        for name in names:
+            os.makedirs(f"{args.emit_dir}/{name}", exist_ok=True)
+            for old in os.listdir(f"{args.emit_dir}/{name}"):
+                if old.startswith("part-"):
+                    os.remove(os.path.join(f"{args.emit_dir}/{name}", old))
+
+        offsets = np.concatenate([[0], np.cumsum(range_rows)])
+        emit_tasks = [
+            (s, a, b, total[offsets[i]:offsets[i + 1]], bucket_edges,
+             [f"{args.emit_dir}/{name}/part-{i:05d}.jsonl" for name in names])
+            for i, (s, a, b) in enumerate(ranges)
+        ]
+        with Pool(args.workers) as pool:
+            shard_stats = list(tqdm(pool.imap(emit_range, emit_tasks), total=len(emit_tasks), desc="导出子集"))
+
+        bucket_index = np.searchsorted(bucket_edges, total, side="left")
+        pad_parts = []
+        print(f"\n{'子集':<24} {'条数':>12} {'padding占比':>12}")
+        print("-" * 50)
+        for b, name in enumerate(names):
+            rows = sum(stats[b]["lines"] for stats in shard_stats)
+            subset = total[bucket_index == b]
+            pad = padding_ratio(subset[rng.permutation(len(subset))], args.train_batch_size, bucket_edges[b])
+            pad_parts.append((len(subset), pad))
+            print(f"{name:<24} {rows:>12,} {pad:>11.1%}")
+            if args.dataset_info:
+                dataset_dir = os.path.dirname(os.path.abspath(args.dataset_info))
+                rel = os.path.relpath(os.path.abspath(f"{args.emit_dir}/{name}"), dataset_dir)
+                update_dataset_info(args.dataset_info, {name: dataset_info_entry(rel, "alpaca")})
+        dropped = int((bucket_index >= len(bucket_edges)).sum())
+        kept = sum(c for c, _ in pad_parts)
+        pad_after = sum(c * p for c, p in pad_parts) / kept if kept else 0.0
+        print("-" * 50)
+        print(f"丢弃超长样本: {dropped:,} 条")
+        print(f"padding占比: {pad_before:.1%} → {pad_after:.1%}（按桶训练）")
+        meta["emitted"] = {"names": names, "bucket_edges": bucket_edges, "dropped": dropped,
+                           "padding_ratio_after": pad_after}
+
+    save_profile(output, lengths, meta)
+    print(f"\n✓ 逐条长度: {output}")
+    print(f"✓ 统计报告: {output.replace('.npz', '.json')}")
+
+    print("\n" + "=" * 60)
+    print("✅ 统计完成！")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+跨运行结果库
+  ingest  导入结果目录（递归查找，未变化的运行跳过）
+  runs    列出运行及汇总指标
+  regress 列出相对对照运行F1下降超过阈值的样本
+  tasks   最近N次运行的分任务F1
+"""
+import os
+import sys
+import time
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.results_catalog import ResultsCatalog
+from src.task_types import TASK_TYPES
+
+
+def cmd_ingest(catalog, args):
+    t0 = time.time()
+    stats = catalog.ingest_tree(args.paths, force=args.force)
+    print(f"✓ 导入 {stats['ingested']} 个运行，跳过未变化的 {stats['skipped']} 个 ({time.time() - t0:.2f}秒)")
+
+
+def cmd_runs(catalog, args):
+    runs = catalog.runs(last=args.last, pattern=args.pattern)
+    print(f"\n{'运行':<50} {'样本数':>8} {'平均F1':>8} {'ROUGE-L':>8} {'平均耗时':>8}")
+    print("-" * 88)
+    for r in runs:
+        m = r["metrics"]
+        rouge_l = m.get("rouge_scores", {}).get("rouge-l")
+        avg_time = m.get("avg_inference_time")
+        print(f"{r['name']:<50} {r['num_items']:>8} {r['avg_f1'] or 0:>8.4f} "
+              f"{rouge_l if rouge_l is not None else float('nan'):>8.4f} "
+              f"{avg_time if avg_time is not None else float('nan'):>8.2f}")
+
+
+def cmd_regress(catalog, args):
+    t0 = time.time()
+    try:
+        summary = catalog.compare(args.base, args.new, args.allow_mismatch)
+    except (KeyError, ValueError) as e:
+        print(f"✗ {e.args[0]}")
+        return
+    rows = catalog.regressions(args.base, args.new, args.threshold, args.limit, allow_mismatch=True)
+    elapsed = (time.time() - t0) * 1000
+    print(f"\n对照: {args.base}")
+    print(f"对比: {args.new}")
+    print(f"共同样本 {summary['n']} 条: 提升 {summary['improved'] or 0}, 下降 {summary['regressed'] or 0}, "
+          f"持平 {summary['tied'] or 0}, 平均ΔF1 {summary['mean_delta'] or 0:+.4f}")
+    print(f"\nF1下降超过 {args.threshold} 的样本（{len(rows)} 条，查询 {elapsed:.1f}ms）:")
+    print(f"{'样本id':>10} {'任务类型':<12} {'对照F1':>8} {'对比F1':>8} {'ΔF1':>8} {'长度变化':>14}")
+    print("-" * 68)
+    for r in rows:
+        task = TASK_TYPES.get(r["task_type"], r["task_type"])
+        print(f"{r['item_id']:>10} {task:<12} {r['base_f1']:>8.4f} {r['new_f1']:>8.4f} {r['delta']:>+8.4f} "
+              f"{r['base_chars'] or 0:>6}→{r['new_chars'] or 0:<6}")
+
+
+def cmd_tasks(catalog, args):
+    t0 = time.time()
+    table = catalog.per_task_f1(last=args.last, pattern=args.pattern)
+    elapsed = (time.time() - t0) * 1000
+    header = "".join(f"{TASK_TYPES[t]:>14}" for t in TASK_TYPES)
+    print(f"\n{'运行':<45}{header}")
+    print("-" * (45 + 14 * len(TASK_TYPES)))
+    for name, tasks in table.items():
+        cells = "".join(
+            f"{tasks[t]['f1']:>8.4f}({tasks[t]['n']:>4})" if t in tasks else f"{'-':>14}"
+            for t in TASK_TYPES
+        )
+        print(f"{name:<45}{cells}")
+    print(f"\n查询 {elapsed:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='跨运行结果库')
+    parser.add_argument('--db', type=str, default='outputs/results.db', help='SQLite数据库路径')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('ingest', help='导入结果目录')
+    p.add_argument('paths', nargs='*', default=['outputs'])
+    p.add_argument('--force', action='store_true', help='结果文件未变化也重新导入')
+
+    p = sub.add_parser('runs', help='列出运行')
+    p.add_argument('--last', type=int, default=None)
+    p.add_argument('--pattern', type=str, default=None, help='运行名称的LIKE模式，如 %%lora%%')
+
+    p = sub.add_parser('regress', help='F1回退的样本')
+    p.add_argument('--base', type=str, required=True, help='对照运行（名称或名称后缀）')
+    p.add_argument('--new', type=str, required=True, help='对比运行')
+    p.add_argument('--threshold', type=float, default=0.2)
+    p.add_argument('--limit', type=int, default=50)
+    p.add_argument('--allow_mismatch', action='store_true', help='两次运行的评测集不同时仍按样本id配对')
+
+    p = sub.add_parser('tasks', help='分任务F1')
+    p.add_argument('--last', type=int, default=20)
+    p.add_argument('--pattern', type=str, default=None)
+
+    args = parser.parse_args()
+
+    catalog = ResultsCatalog(args.db)
+    try:
+        {'ingest': cmd_ingest, 'runs': cmd_runs, 'regress': cmd_regress, 'tasks': cmd_tasks}[args.command](catalog, args)
+    finally:
+        catalog.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量运行流水线（下载 → 预处理 → 转JSONL → 训练 → 评测 → 论文材料）
+输入、参数和命令都没有变化的阶段直接跳过，互不依赖的阶段并行运行，
+最后输出各阶段耗时
+"""
+import os
+import sys
+import time
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.pipeline import PipelineRunner, load_pipeline
+
+STATUS_LABELS = {
+    "ran": "✓ 已运行",
+    "skipped": "- 跳过",
+    "failed": "✗ 失败",
+    "blocked": "✗ 上游失败",
+    "would_run": "▶ 需运行",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='增量运行流水线')
+    parser.add_argument('targets', nargs='*', help='要运行的阶段（连同上游），默认全部')
+    parser.add_argument('--config', type=str, default='config/pipeline.yaml')
+    parser.add_argument('--state_dir', type=str, default='.pipeline', help='指纹、哈希缓存和日志目录')
+    parser.add_argument('--jobs', type=int, default=2, help='同时运行的阶段数')
+    parser.add_argument('--force', type=str, nargs='*', default=[], help='强制重新运行的阶段')
+    parser.add_argument('--dry_run', action='store_true', help='只列出需要运行的阶段')
+
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🔁 增量流水线")
+    print("=" * 60)
+
+    stages = load_pipeline(args.config)
+    runner = PipelineRunner(stages, args.state_dir, args.jobs, args.force, args.dry_run)
+    order = runner.plan(args.targets)
+    print(f"阶段: {' → '.join(order)}")
+    print(f"并行数: {args.jobs}\n")
+
+    t0 = time.time()
+    results = runner.run(args.targets)
+    total = time.time() - t0
+
+    print(f"\n{'阶段':<14} {'状态':<12} {'耗时':>10} {'节省':>10}  说明")
+    print("-" * 70)
+    for name, r in results.items():
+        saved = f"{r['saved']:.1f}秒" if r.get("saved") else ""
+        elapsed = f"{r['elapsed']:.1f}秒" if r["status"] in ("ran", "failed") else ""
+        print(f"{name:<14} {STATUS_LABELS[r['status']]:<12} {elapsed:>10} {saved:>10}  {r.get('error', '')}")
+    print("-" * 70)
+    stage_time = sum(r["elapsed"] for r in results.values())
+    saved_time = sum(r.get("saved", 0.0) for r in results.values())
+    print(f"总耗时 {total:.1f}秒（各阶段合计 {stage_time:.1f}秒），跳过的阶段上次共用时 {saved_time:.1f}秒")
+
+    if any(r["status"] in ("failed", "blocked") for r in results.values()):
+        sys.exit(1)
+
+    print("\n" + "=" * 60)
+    print("✅ 流水线完成！")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
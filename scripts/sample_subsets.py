@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分层抽样构建训练子集（train_30p / train_50p）
+单遍扫描全量训练集，每条只保留 哈希值/分层/位置，不在内存中保存文本；
+按 任务类型×答案长度 分层，每层按比例取哈希值最小的样本（数量精确），
+再按位置读出写成JSONL，并更新dataset_info.json。
+同一seed下结果完全可复现，且较小的子集基本包含在较大的子集中
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from collections import Counter
+from multiprocessing import Pool
+
+import numpy as np
+from tqdm import tqdm
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.dataset_export import FORMATS, dataset_info_entry, format_record, update_dataset_info
+from src.splitting import (
+    expand_sources, iter_source_positions, read_source_rows, row_key, source_units,
+    split_ranges, stratified_bottom_k
+)
+from src.task_types import LENGTH_BUCKETS, TASK_TYPES, item_stratum
+
+STRATA = [f"{task}/{bucket}" for task in TASK_TYPES for bucket, _ in LENGTH_BUCKETS]
+
+
+def scan_range(task):
+    """扫描一个区间（子进程）：返回每条数据的哈希值、分层编号和位置"""
+    task_id, source_id, source, start, end, salt = task
+    keys, strata, positions = [], [], []
+    for position, item in iter_source_positions(source, start, end):
+        keys.append(row_key(item, salt))
+        strata.append(STRATA.index(item_stratum(item)))
+        positions.append(position)
+    return task_id, {
+        "key": np.array(keys, dtype=np.uint64),
+        "stratum": np.array(strata, dtype=np.uint8),
+        "source": np.full(len(keys), source_id, dtype=np.uint16),
+        "position": np.array(positions, dtype=np.int64)
+    }
+
+
+def write_subset(path, sources, rows, selected, fmt):
+    """按原始顺序写出被选中的数据"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for source_id, source in enumerate(sources):
+            positions = rows["position"][selected[rows["source"][selected] == source_id]]
+            for item in read_source_rows(source, positions.tolist()):
+                f.write(json.dumps(format_record(item, fmt), ensure_ascii=False) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分层抽样构建训练子集')
+    parser.add_argument('--source', type=str, default='data/jsonl/train.jsonl',
+                        help='save_to_disk目录、JSONL文件或JSONL分片目录')
+    parser.add_argument('--fractions', type=str, default='0.3,0.5', help='子集比例，逗号分隔')
+    parser.add_argument('--output_dir', type=str, default='data/jsonl')
+    parser.add_argument('--dataset_name', type=str, default='tcm_train')
+    parser.add_argument('--format', type=str, default='alpaca', choices=FORMATS)
+    parser.add_argument('--seed', type=int, default=42, help='哈希盐值，换seed得到另一组独立子集')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--num_shards', type=int, default=None)
+    parser.add_argument('--dataset_info', type=str, default='config/dataset_info.json',
+                        help='要更新的dataset_info.json（设为空字符串则不更新）')
+
+    args = parser.parse_args()
+    fractions = sorted(float(x) for x in args.fractions.split(','))
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    print("=" * 60)
+    print("🎯 分层抽样构建训练子集")
+    print("=" * 60)
+    print(f"数据源: {args.source}")
+    print(f"比例: {', '.join(f'{f:.0%}' for f in fractions)}")
+    print(f"Seed: {args.seed}")
+
+    sources = expand_sources(args.source)
+    sizes = [source_units(s)[1] for s in sources]
+    total_units = sum(sizes)
+    num_shards = args.num_shards or args.workers * 4
+    ranges = []
+    for source_id, (source, n) in enumerate(zip(sources, sizes)):
+        parts = max(1, round(num_shards * n / total_units)) if total_units else 1
+        for start, end in split_ranges(0, n, parts):
+            ranges.append((source_id, source, start, end))
+
+    # 1. 单遍扫描
+    t0 = time.time()
+    salt = f"subset:{args.seed}"
+    tasks = [(i, sid, s, a, b, salt) for i, (sid, s, a, b) in enumerate(ranges)]
+    results = [None] * len(tasks)
+    with Pool(args.workers) as pool:
+        for task_id, arrays in tqdm(pool.imap_unordered(scan_range, tasks), total=len(tasks), desc="扫描"):
+            results[task_id] = arrays
+    rows = {k: np.concatenate([r[k] for r in results]) for k in results[0]}
+    n = len(rows["key"])
+    print(f"✓ {n:,} 条, 耗时 {time.time() - t0:.1f}秒")
+
+    # 2. 抽样并写出
+    full_counts = Counter(rows["stratum"].tolist())
+    subsets = {}
+    entries = {}
+    for fraction in fractions:
+        pct = int(round(fraction * 100))
+        name = f"{args.dataset_name}_{pct}p"
+        path = f"{args.output_dir}/train_{pct}p.jsonl"
+        k = int(round(fraction * n))
+
+        t0 = time.time()
+        selected = stratified_bottom_k(rows["key"], rows["stratum"], k)
+        write_subset(path, sources, rows, selected, args.format)
+        subsets[name] = {"path": path, "rows": len(selected), "selected": selected}
+        print(f"✓ {name}: {len(selected):,} 条 → {path}（{time.time() - t0:.1f}秒）")
+
+        if args.dataset_info:
+            dataset_dir = os.path.dirname(os.path.abspath(args.dataset_info))
+            rel = os.path.relpath(os.path.abspath(path), dataset_dir)
+            entries[name] = dataset_info_entry(rel, args.format)
+
+    if entries:
+        update_dataset_info(args.dataset_info, entries)
+        print(f"✓ 已更新 {args.dataset_info}: {', '.join(entries)}")
+
+    # 3. 分层占比对照
+    names = list(subsets)
+    print(f"\n{'分层':<28} {'全量':>8}" + "".join(f" {name[-3:]:>8}" for name in names))
+    print("-" * (38 + 9 * len(names)))
+    sub_counts = {name: Counter(rows["stratum"][s["selected"]].tolist()) for name, s in subsets.items()}
+    for code, stratum in enumerate(STRATA):
+        if not full_counts[code]:
+            continue
+        line = f"{stratum:<28} {full_counts[code] / n:>8.2%}"
+        for name in names:
+            line += f" {sub_counts[name][code] / max(subsets[name]['rows'], 1):>8.2%}"
+        print(line)
+
+    if len(names) > 1:
+        for small, large in zip(names, names[1:]):
+            inside = np.isin(subsets[small]["selected"], subsets[large]["selected"]).mean()
+            print(f"\n{small} 包含在 {large} 中的比例: {inside:.2%}")
+
+    print("\n" + "=" * 60)
+    print("✅ 抽样完成！")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
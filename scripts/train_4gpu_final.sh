@@ -23,7 +23,7 @@ if 'tcm_train_50p' not in config:
     raise ValueError("配置中缺少 tcm_train_50p")
 
 # 检查数据文件
-data_file = f"data/jsonl/{config['tcm_train_50p']['file_name']}"
+data_file = os.path.join('config', config['tcm_train_50p']['file_name'])
 if not os.path.exists(data_file):
     raise FileNotFoundError(f"找不到数据文件: {data_file}")
 
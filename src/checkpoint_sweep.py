@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+训练检查点扫描评测
+基座模型只加载一次，依次热切换每个 checkpoint-* 的LoRA adapter并评测，
+各检查点复用同一份prompt分词结果，得到 F1 随训练步数变化的学习曲线
+"""
+import json
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.metrics import calculate_avg_f1, calculate_exact_match
+
+CHECKPOINT_PATTERN = re.compile(r"^checkpoint-(\d+)$")
+
+
+def _is_adapter_dir(path: str) -> bool:
+    return os.path.exists(os.path.join(path, "adapter_config.json"))
+
+
+def find_checkpoints(run_dir: str, include_final: bool = True) -> List[Tuple[int, str]]:
+    """
+    查找训练输出目录下的检查点
+
+    Returns:
+        [(step, adapter目录)]，按step排序；训练结束时保存在run_dir根目录的adapter
+        按 trainer_state.json 的 global_step 计入（与最后一个检查点step相同时不重复）
+    """
+    checkpoints = []
+    for name in os.listdir(run_dir):
+        match = CHECKPOINT_PATTERN.match(name)
+        path = os.path.join(run_dir, name)
+        if match and _is_adapter_dir(path):
+            checkpoints.append((int(match.group(1)), path))
+    checkpoints.sort()
+
+    state_file = os.path.join(run_dir, "trainer_state.json")
+    if include_final and _is_adapter_dir(run_dir) and os.path.exists(state_file):
+        with open(state_file, 'r', encoding='utf-8') as f:
+            step = json.load(f).get("global_step")
+        if step is not None and step not in {s for s, _ in checkpoints}:
+            checkpoints.append((step, run_dir))
+            checkpoints.sort()
+    return checkpoints
+
+
+def sweep_checkpoints(
+    evaluator,
+    checkpoints: List[Tuple[int, str]],
+    eval_data,
+    prompt_builder,
+    mode_name: str,
+    max_tokens: int = 2048,
+    is_cot: bool = False,
+    output_dir: Optional[str] = None,
+    eval_file: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    依次评测各检查点
+
+    Args:
+        evaluator: 已用 checkpoints[0] 初始化的本地ModelEvaluator（PeftModel，非合并权重）
+        checkpoints: find_checkpoints 的返回值
+        output_dir: 设置时每个检查点的逐条结果保存到 output_dir/checkpoint-<step>/
+
+    Returns:
+        学习曲线 [{step, checkpoint, avg_f1, exact_match, avg_inference_time, swap_time, eval_time}]
+    """
+    from src.evaluator import save_results
+    from src.result_store import save_run_config
+
+    if evaluator.prompt_cache is None:
+        evaluator.prompt_cache = {}
+
+    curve = []
+    for i, (step, path) in enumerate(checkpoints):
+        print(f"\n📍 检查点 step={step} ({i + 1}/{len(checkpoints)}): {path}")
+        swap_time = evaluator.swap_adapter(path, f"step-{step}") if i > 0 else 0.0
+
+        start_time = time.time()
+        results = evaluator.batch_evaluate(
+            eval_data=eval_data,
+            prompt_builder=prompt_builder,
+            mode_name=f"{mode_name}@{step}",
+            max_tokens=max_tokens,
+            is_cot=is_cot
+        )
+        eval_time = time.time() - start_time
+
+        point = {
+            "step": step,
+            "checkpoint": path,
+            "avg_f1": calculate_avg_f1(results),
+            "exact_match": calculate_exact_match(
+                [r["prediction"] for r in results], [r["reference"] for r in results]
+            ),
+            "avg_inference_time": sum(r["inference_time"] for r in results) / len(results) if results else 0.0,
+            "swap_time": swap_time,
+            "eval_time": eval_time
+        }
+        curve.append(point)
+        print(f"✓ step={step}: F1={point['avg_f1']:.4f}, EM={point['exact_match']:.2%}, "
+              f"切换 {swap_time:.1f}秒, 评测 {eval_time:.1f}秒")
+
+        if output_dir:
+            run_dir = os.path.join(output_dir, f"checkpoint-{step}")
+            os.makedirs(run_dir, exist_ok=True)
+            save_results(results, os.path.join(run_dir, "predictions.parquet"), eval_file=eval_file)
+            save_run_config(run_dir, {
+                "mode": "local",
+                "lora_path": path,
+                "step": step,
+                "eval_file": eval_file,
+                "prompt": mode_name,
+                "max_tokens": max_tokens
+            })
+    return curve
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+静态KV缓存 + torch.compile 解码引擎
+KV缓存按 最长prompt + max_tokens 一次性预分配，解码过程中张量形状不变；
+prefill按固定长度分块（如300 = 256 + 32 + 8 + 4×1，不补齐，StaticCache按顺序写入），
+每个分块长度和单token解码步各编译一次，启动时预热完成编译，之后逐token解码没有Python侧的缓存重分配
+"""
+import time
+from typing import Iterable, Optional, Union
+
+import torch
+from transformers import StaticCache
+from transformers.generation.logits_process import (
+    LogitsProcessorList,
+    RepetitionPenaltyLogitsProcessor,
+    TemperatureLogitsWarper,
+    TopPLogitsWarper,
+)
+
+# prefill分块长度（加上单token解码共5个形状，不超过dynamo默认的重编译上限8）
+PREFILL_CHUNKS = (512, 128, 32, 8)
+
+
+def build_logits_processors(temperature: float = 0.0, top_p: float = 1.0,
+                            repetition_penalty: float = 1.0) -> LogitsProcessorList:
+    """与 model.generate 相同顺序的logits处理（重复惩罚 → 温度 → top-p）；temperature为0时贪心"""
+    processors = LogitsProcessorList()
+    if repetition_penalty != 1.0:
+        processors.append(RepetitionPenaltyLogitsProcessor(repetition_penalty))
+    if temperature > 0:
+        processors.append(TemperatureLogitsWarper(temperature))
+        if top_p < 1.0:
+            processors.append(TopPLogitsWarper(top_p))
+    return processors
+
+
+def select_next_token(scores: torch.Tensor, do_sample: bool) -> torch.Tensor:
+    """按处理后的分数采样或取最大值，返回 (1, 1)"""
+    if do_sample:
+        return torch.multinomial(torch.softmax(scores, dim=-1), num_samples=1)
+    return scores.argmax(dim=-1, keepdim=True)
+
+
+def _as_row(t: torch.Tensor) -> torch.Tensor:
+    """转成stride为(n, 1)的 (1, n) 张量：dynamo按stride设置guard，切片直接传入会导致重编译"""
+    return t.reshape(-1).reshape(1, -1)
+
+
+class CompiledDecoder:
+    """静态KV缓存解码引擎（batch size 1）"""
+
+    def __init__(self, model, max_cache_len: int = 6144, prefill_chunks: Iterable[int] = PREFILL_CHUNKS,
+                 compile: bool = True):
+        """
+        Args:
+            model: 因果语言模型（PeftModel或合并后的模型）
+            max_cache_len: KV缓存长度（prompt + 生成部分不能超过）
+            prefill_chunks: prefill分块长度（剩余不足最小分块的部分逐token送入）
+            compile: 是否用torch.compile编译前向（False时只用静态缓存，便于对比）
+        """
+        self.model = model
+        self.max_cache_len = max_cache_len
+        self.chunks = sorted((c for c in prefill_chunks if c <= max_cache_len), reverse=True) + [1]
+        self.cache = StaticCache(config=model.config, max_cache_len=max_cache_len)
+        # 与缓存等长的attention mask（已写入的位置为1），形状固定，避免注意到未写入的位置
+        self.attention_mask = torch.zeros((1, max_cache_len), dtype=torch.long, device=model.device)
+        self.compile_time = 0.0
+        # 先不编译地跑一个token，完成StaticCache的延迟初始化（否则编译出的第一个图只对未初始化状态有效）
+        with torch.no_grad():
+            self._eager_forward(
+                torch.zeros((1, 1), dtype=torch.long, device=model.device),
+                torch.zeros(1, dtype=torch.long, device=model.device),
+                self.attention_mask
+            )
+        self._forward = self._eager_forward
+        if compile:
+            # GPU上用CUDA Graph减少kernel launch开销；CPU上用默认模式
+            mode = "reduce-overhead" if model.device.type == "cuda" else None
+            self._forward = torch.compile(self._eager_forward, mode=mode, dynamic=False)
+
+    def _eager_forward(self, input_ids: torch.Tensor, cache_position: torch.Tensor,
+                       attention_mask: torch.Tensor) -> torch.Tensor:
+        return self.model(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            cache_position=cache_position,
+            past_key_values=self.cache,
+            use_cache=True
+        ).logits
+
+    def fits(self, prompt_len: int, max_new_tokens: int) -> bool:
+        return prompt_len + max_new_tokens <= self.max_cache_len
+
+    def _prefill(self, ids: torch.Tensor) -> torch.Tensor:
+        """分块prefill（每次取不超过剩余长度的最大分块），返回最后一个token的logits"""
+        device = ids.device
+        prompt_len = ids.shape[1]
+        start = 0
+        while start < prompt_len:
+            size = next(c for c in self.chunks if c <= prompt_len - start)
+            self.attention_mask[:, start:start + size] = 1
+            logits = self._forward(
+                _as_row(ids[0, start:start + size]), torch.arange(start, start + size, device=device), self.attention_mask
+            )
+            start += size
+        return logits[:, -1].float()
+
+    @torch.no_grad()
+    def generate(
+        self,
+        input_ids: torch.Tensor,
+        max_new_tokens: int,
+        temperature: float = 0.0,
+        top_p: float = 1.0,
+        repetition_penalty: float = 1.0,
+        eos_token_id: Optional[Union[int, Iterable[int]]] = None
+    ) -> torch.Tensor:
+        """采样参数与 model.generate 相同（temperature为0时贪心），返回 prompt+生成部分 (1, L+n)"""
+        if isinstance(eos_token_id, int):
+            eos_token_id = [eos_token_id]
+        eos = set(eos_token_id or [])
+        device = self.model.device
+        ids = input_ids.to(device)
+        prompt_len = ids.shape[1]
+        if not self.fits(prompt_len, max_new_tokens):
+            raise ValueError(f"prompt({prompt_len}) + max_new_tokens({max_new_tokens}) 超过KV缓存长度 {self.max_cache_len}")
+
+        processors = build_logits_processors(temperature, top_p, repetition_penalty)
+
+        self.cache.reset()
+        self.attention_mask.zero_()
+        logits = self._prefill(ids)
+        for step in range(max_new_tokens):
+            token = select_next_token(processors(ids, logits), temperature > 0)
+            ids = torch.cat([ids, token.to(ids.dtype)], dim=1)
+            if int(token) in eos or step == max_new_tokens - 1:
+                break
+            position = prompt_len + step
+            self.attention_mask[:, position] = 1
+            logits = self._forward(
+                _as_row(token.to(ids.dtype)), torch.tensor([position], device=device), self.attention_mask
+            )[:, -1].float()
+        return ids
+
+    def warmup(self, decode_steps: int = 4) -> float:
+        """用覆盖全部分块长度的假prompt跑一次生成，触发全部编译；返回耗时（秒）"""
+        start_time = time.time()
+        length = min(sum(self.chunks), self.max_cache_len - decode_steps)
+        ids = torch.zeros((1, length), dtype=torch.long, device=self.model.device)
+        self.generate(ids, decode_steps)
+        self.compile_time = time.time() - start_time
+        return self.compile_time
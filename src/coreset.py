@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分层核心子集选择
+按任务类型+答案长度分层，利用历史运行的逐条分数，
+选出平均指标最接近完整评测集的小规模子集
+"""
+import os
+import random
+from collections import defaultdict
+from typing import List, Dict, Any, Tuple
+
+from src.result_store import RESULT_FILES, load_results
+from src.task_types import item_stratum
+
+
+def find_prediction_files(paths: List[str]) -> List[str]:
+    """展开路径：目录下递归查找结果文件（predictions.parquet / .jsonl.zst / .json）"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in RESULT_FILES:
+                    if name in names:
+                        files.append(os.path.join(root, name))
+                        break
+        elif os.path.exists(path):
+            files.append(path)
+    return sorted(files)
+
+
+def load_item_scores(prediction_files: List[str]) -> Dict[str, Dict[Any, float]]:
+    """
+    加载历史运行的逐条F1（列式结果文件只读取 id、f1 两列）
+
+    Returns:
+        {运行名: {样本id: f1}}
+    """
+    scores = {}
+    for path in prediction_files:
+        results = load_results(path, columns=["id", "f1"])
+        run_name = os.path.relpath(os.path.dirname(path))
+        scores[run_name] = {r["id"]: r["f1"] for r in results}
+    return scores
+
+
+def allocate(strata_sizes: Dict[str, int], k: int) -> Dict[str, int]:
+    """按比例分配各层样本数（最大余数法，保证总数恰好为k）"""
+    total = sum(strata_sizes.values())
+    quotas = {h: k * n / total for h, n in strata_sizes.items()}
+    alloc = {h: min(int(q), strata_sizes[h]) for h, q in quotas.items()}
+
+    remaining = k - sum(alloc.values())
+    order = sorted(quotas, key=lambda h: quotas[h] - int(quotas[h]), reverse=True)
+    while remaining > 0:
+        progressed = False
+        for h in order:
+            if remaining == 0:
+                break
+            if alloc[h] < strata_sizes[h]:
+                alloc[h] += 1
+                remaining -= 1
+                progressed = True
+        if not progressed:
+            break
+    return alloc
+
+
+class CoresetSelector:
+    """分层核心子集选择器"""
+
+    def __init__(
+        self,
+        pool: List[Dict[str, Any]],
+        scores: Dict[str, Dict[Any, float]],
+        seed: int = 42
+    ):
+        """
+        Args:
+            pool: 完整评测集（需包含id/instruction/output）
+            scores: 历史运行逐条分数 {运行名: {id: f1}}
+            seed: 随机种子
+        """
+        self.rng = random.Random(seed)
+        self.runs = sorted(scores)
+
+        # 只保留所有运行都有分数的样本
+        ids = [item["id"] for item in pool]
+        for run in self.runs:
+            ids = [i for i in ids if i in scores[run]]
+        id_set = set(ids)
+        self.pool = [item for item in pool if item["id"] in id_set]
+
+        self.strata = defaultdict(list)
+        for item in self.pool:
+            self.strata[item_stratum(item)].append(item["id"])
+
+        self.scores = scores
+        self.full_means = {
+            run: sum(scores[run][i] for i in ids) / len(ids) if ids else 0.0
+            for run in self.runs
+        }
+
+    def _loss(self, sums: Dict[str, float], k: int, runs: List[str]) -> float:
+        return sum((sums[r] / k - self.full_means[r]) ** 2 for r in runs)
+
+    def stratified_sample(self, k: int) -> List[Any]:
+        """按比例分层随机抽样"""
+        alloc = allocate({h: len(v) for h, v in self.strata.items()}, k)
+        selected = []
+        for h, n in alloc.items():
+            selected.extend(self.rng.sample(self.strata[h], n))
+        return selected
+
+    def select(
+        self,
+        k: int,
+        runs: List[str] = None,
+        restarts: int = 20,
+        iterations: int = 5000
+    ) -> List[Any]:
+        """
+        选择核心子集：分层抽样作为起点，层内交换样本以最小化
+        各运行上子集均值与完整均值的平方误差
+
+        Args:
+            k: 子集大小
+            runs: 参与优化的运行（默认全部）
+            restarts: 随机重启次数
+            iterations: 每次重启的交换尝试次数
+
+        Returns:
+            选中的样本id列表
+        """
+        runs = self.runs if runs is None else runs
+        if not runs:
+            return self.stratified_sample(k)
+
+        best, best_loss = None, float("inf")
+        for _ in range(restarts):
+            selected = set(self.stratified_sample(k))
+            sums = {r: sum(self.scores[r][i] for i in selected) for r in runs}
+            loss = self._loss(sums, k, runs)
+
+            # 层内交换，保持分层比例不变
+            inside = {h: [i for i in v if i in selected] for h, v in self.strata.items()}
+            outside = {h: [i for i in v if i not in selected] for h, v in self.strata.items()}
+            swappable = [h for h in self.strata if inside[h] and outside[h]]
+
+            for _ in range(iterations):
+                if not swappable:
+                    break
+                h = self.rng.choice(swappable)
+                a = self.rng.randrange(len(inside[h]))
+                b = self.rng.randrange(len(outside[h]))
+                i_out, i_in = inside[h][a], outside[h][b]
+
+                new_sums = {
+                    r: sums[r] - self.scores[r][i_out] + self.scores[r][i_in]
+                    for r in runs
+                }
+                new_loss = self._loss(new_sums, k, runs)
+                if new_loss < loss:
+                    inside[h][a], outside[h][b] = i_in, i_out
+                    sums, loss = new_sums, new_loss
+
+            if loss < best_loss:
+                best = sorted(i for v in inside.values() for i in v)
+                best_loss = loss
+
+        return best
+
+    def fidelity(self, selected: List[Any], runs: List[str] = None) -> Dict[str, Any]:
+        """子集均值与完整均值的偏差"""
+        runs = self.runs if runs is None else runs
+        per_run = {}
+        for r in runs:
+            sub = sum(self.scores[r][i] for i in selected) / len(selected)
+            per_run[r] = {
+                "subset": sub,
+                "full": self.full_means[r],
+                "abs_error": abs(sub - self.full_means[r])
+            }
+        errors = [v["abs_error"] for v in per_run.values()]
+        return {
+            "per_run": per_run,
+            "mean_abs_error": sum(errors) / len(errors) if errors else 0.0,
+            "max_abs_error": max(errors) if errors else 0.0,
+            "rank_agreement": self._rank_agreement(selected, runs)
+        }
+
+    def _rank_agreement(self, selected: List[Any], runs: List[str]) -> float:
+        """运行两两排序在子集与完整集上一致的比例"""
+        pairs = agree = 0
+        for a_idx in range(len(runs)):
+            for b_idx in range(a_idx + 1, len(runs)):
+                a, b = runs[a_idx], runs[b_idx]
+                sub_a = sum(self.scores[a][i] for i in selected)
+                sub_b = sum(self.scores[b][i] for i in selected)
+                pairs += 1
+                if (sub_a - sub_b) * (self.full_means[a] - self.full_means[b]) >= 0:
+                    agree += 1
+        return agree / pairs if pairs else 1.0
+
+    def held_out_fidelity(self, k: int, **select_kwargs) -> Dict[str, Any]:
+        """
+        留一运行验证：用其余运行选子集，在留出的运行上测误差
+        （反映子集对未来新运行的预测能力，而不是对已知运行的拟合）
+        """
+        if len(self.runs) < 2:
+            return {}
+        errors = {}
+        for held in self.runs:
+            train_runs = [r for r in self.runs if r != held]
+            selected = self.select(k, runs=train_runs, **select_kwargs)
+            errors[held] = self.fidelity(selected, runs=[held])["mean_abs_error"]
+        values = list(errors.values())
+        return {
+            "per_run": errors,
+            "mean_abs_error": sum(values) / len(values),
+            "max_abs_error": max(values)
+        }
+
+    def baseline_fidelity(self, k: int, trials: int = 200) -> Tuple[float, float]:
+        """
+        对照：前k条（原eval_100的做法）与纯随机分层抽样的平均误差
+        """
+        first_k = [item["id"] for item in self.pool[:k]]
+        first_k_err = self.fidelity(first_k)["mean_abs_error"] if self.runs else 0.0
+        random_errs = [
+            self.fidelity(self.stratified_sample(k))["mean_abs_error"]
+            for _ in range(trials)
+        ] if self.runs else [0.0]
+        return first_k_err, sum(random_errs) / len(random_errs)
+
+    def strata_summary(self, selected: List[Any]) -> Dict[str, Dict[str, int]]:
+        """各层在完整集与子集中的数量"""
+        chosen = set(selected)
+        return {
+            h: {"pool": len(v), "subset": sum(1 for i in v if i in chosen)}
+            for h, v in sorted(self.strata.items())
+        }
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CPU推理后端
+LoRA先合并进基座权重，再对全部Linear层（含合并后的LoRA权重）做动态int8量化；
+按物理核数设置线程数，可选绑定到一个NUMA节点（先绑核再加载模型，权重按first-touch分配在本节点内存）
+"""
+import glob
+import os
+import time
+from typing import List, Optional
+
+import torch
+from transformers import AutoModelForCausalLM
+
+CPU_PRECISIONS = ("int8", "bf16", "fp32")
+
+
+def _parse_cpulist(text: str) -> List[int]:
+    """解析 '0-3,8-11' 格式的CPU列表"""
+    cpus = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = part.split("-")
+            cpus.extend(range(int(lo), int(hi) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def numa_nodes() -> dict:
+    """{NUMA节点号: [CPU编号]}（非Linux或无NUMA信息时返回空字典）"""
+    nodes = {}
+    for path in sorted(glob.glob("/sys/devices/system/node/node[0-9]*/cpulist")):
+        node = int(os.path.basename(os.path.dirname(path))[4:])
+        with open(path) as f:
+            cpus = _parse_cpulist(f.read())
+        if cpus:
+            nodes[node] = cpus
+    return nodes
+
+
+def physical_core_count(cpus: Optional[List[int]] = None) -> int:
+    """给定CPU集合中的物理核数（超线程的兄弟逻辑核只计一次）"""
+    cpus = cpus if cpus is not None else sorted(os.sched_getaffinity(0))
+    cores = set()
+    for cpu in cpus:
+        path = f"/sys/devices/system/cpu/cpu{cpu}/topology/thread_siblings_list"
+        if os.path.exists(path):
+            with open(path) as f:
+                cores.add(min(_parse_cpulist(f.read())))
+        else:
+            cores.add(cpu)
+    return len(cores)
+
+
+def configure_cpu(num_threads: Optional[int] = None, numa_node: Optional[int] = None,
+                  interop_threads: int = 1) -> dict:
+    """
+    设置CPU亲和性和线程数（需在加载模型前调用）
+
+    Args:
+        num_threads: intra-op线程数，默认为可用CPU（绑定NUMA节点时为该节点）的物理核数
+        numa_node: 绑定到的NUMA节点；跨节点访存会明显拖慢解码，多路服务器建议绑定
+        interop_threads: inter-op线程数（逐token解码几乎没有可并行的算子，1即可）
+    """
+    if numa_node is not None:
+        nodes = numa_nodes()
+        if numa_node not in nodes:
+            raise ValueError(f"NUMA节点 {numa_node} 不存在（可用: {sorted(nodes)}）")
+        os.sched_setaffinity(0, nodes[numa_node])
+
+    cpus = sorted(os.sched_getaffinity(0))
+    num_threads = num_threads or physical_core_count(cpus)
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(interop_threads)
+    except RuntimeError:
+        # 已有并行任务运行过时不能再修改
+        pass
+    return {
+        "cpus": len(cpus),
+        "numa_node": numa_node,
+        "num_threads": torch.get_num_threads(),
+        "interop_threads": torch.get_num_interop_threads(),
+    }
+
+
+def quantize_linear_int8(model):
+    """对全部nn.Linear做动态int8量化（权重int8存储，激活运行时按batch量化）"""
+    from torch.ao.quantization import quantize_dynamic
+    return quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def load_cpu_model(model_path: str, lora_path: Optional[str] = None, precision: str = "int8",
+                   merged_cache: Optional[str] = None):
+    """
+    加载CPU推理模型
+
+    Args:
+        precision: int8（fp32权重合并后动态量化）/ bf16 / fp32
+        merged_cache: 合并权重缓存目录（见 src/merged_cache.py），设置时直接读取fp32合并权重
+    """
+    if precision not in CPU_PRECISIONS:
+        raise ValueError(f"不支持的精度: {precision}（可选: {', '.join(CPU_PRECISIONS)}）")
+    start_time = time.time()
+    dtype = torch.bfloat16 if precision == "bf16" else torch.float32
+
+    if lora_path and merged_cache:
+        from src.merged_cache import load_merged_model
+        model = load_merged_model(model_path, lora_path, merged_cache, dtype=dtype, device_map=None)
+    else:
+        model = AutoModelForCausalLM.from_pretrained(model_path, torch_dtype=dtype, trust_remote_code=True)
+        if lora_path:
+            from peft import PeftModel
+            # 合并后Linear层不再有LoRA旁路，量化时LoRA增量一并进入int8权重
+            model = PeftModel.from_pretrained(model, lora_path, torch_dtype=dtype).merge_and_unload()
+    model.eval()
+
+    if precision == "int8":
+        model = quantize_linear_int8(model)
+    print(f"✓ CPU模型就绪 ({precision}, {time.time() - start_time:.1f}秒)")
+    return model
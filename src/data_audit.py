@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+列式数据质量审计
+用pyarrow.compute按RecordBatch单遍处理整个数据集：
+空字段/纯空白字段、长度分位数、instruction模板频次、非中文占比、精确重复
+（高频模板的原文由第二遍读取查出，只算instruction列的哈希）
+"""
+import json
+import os
+from collections import Counter
+from typing import Dict, Any, Iterator, List, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from src.task_types import TASK_TYPES
+
+FIELDS = ("instruction", "input", "output")
+
+
+def list_splits(path: str) -> List[Tuple[str, str]]:
+    """
+    展开数据源为 [(划分名, 路径)]
+
+    DatasetDict目录展开为各个划分；save_to_disk目录、JSONL、Parquet文件各算一个划分
+    """
+    dict_file = os.path.join(path, "dataset_dict.json")
+    if os.path.isdir(path) and os.path.exists(dict_file):
+        with open(dict_file, 'r', encoding='utf-8') as f:
+            splits = json.load(f)["splits"]
+        return [(f"{os.path.basename(path.rstrip('/'))}/{s}", os.path.join(path, s)) for s in splits]
+    name = os.path.basename(path.rstrip('/'))
+    return [(name, path)]
+
+
+def iter_batches(path: str, batch_size: int = 65536) -> Iterator[pa.RecordBatch]:
+    """
+    逐批读取一个划分
+
+    save_to_disk目录直接内存映射其中的Arrow文件（不需要datasets）；
+    JSONL用pyarrow.json流式读取；Parquet按行组读取
+    """
+    if os.path.isdir(path):
+        with open(os.path.join(path, "state.json"), 'r', encoding='utf-8') as f:
+            files = [d["filename"] for d in json.load(f)["_data_files"]]
+        # datasets默认每1000行一个RecordBatch，合并成大批次以减少每批的固定开销
+        pending, rows = [], 0
+        for name in files:
+            with pa.memory_map(os.path.join(path, name)) as source:
+                for batch in pa.ipc.open_stream(source):
+                    pending.append(batch)
+                    rows += batch.num_rows
+                    if rows >= batch_size:
+                        yield pa.Table.from_batches(pending).combine_chunks().to_batches()[0]
+                        pending, rows = [], 0
+        if pending:
+            yield pa.Table.from_batches(pending).combine_chunks().to_batches()[0]
+    elif path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        yield from pq.ParquetFile(path).iter_batches(batch_size=batch_size)
+    else:
+        from pyarrow import json as pa_json
+        block_size = 16 << 20
+        reader = pa_json.open_json(path, read_options=pa_json.ReadOptions(block_size=block_size))
+        for batch in reader:
+            yield batch
+
+
+def string_column(batch: pa.RecordBatch, name: str) -> pa.Array:
+    """取字符串列，缺失的列和null都视为空字符串"""
+    if name not in batch.schema.names:
+        return pa.array([""] * batch.num_rows, type=pa.string())
+    col = batch.column(name)
+    if not pa.types.is_string(col.type) and not pa.types.is_large_string(col.type):
+        col = pc.cast(col, pa.string())
+    return pc.fill_null(col, "")
+
+
+def _char_class_table() -> np.ndarray:
+    """
+    UTF-8字节 -> 计数编码（低32位: 非空白字符的首字节；高32位: 汉字首字节）
+
+    汉字按 U+4000–U+9FFF 统计（三字节编码，首字节 0xE4–0xE9），覆盖常用CJK统一汉字
+    """
+    table = np.zeros(256, dtype=np.uint64)
+    for b in range(256):
+        visible = (b & 0xC0) != 0x80 and b not in (9, 10, 11, 12, 13, 32)
+        cjk = 0xE4 <= b <= 0xE9
+        table[b] = int(visible) | (int(cjk) << 32)
+    return table
+
+
+CHAR_CLASS = _char_class_table()
+
+
+def char_counts(arr: pa.Array) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    逐条统计非空白字符数和汉字数（直接在Arrow的offsets/data缓冲区上按字节查表求和，
+    比正则替换快数倍）
+
+    Returns:
+        (visible int64[n], cjk int64[n])
+    """
+    if not pa.types.is_large_string(arr.type):
+        arr = pc.cast(arr, pa.large_string())
+    n = len(arr)
+    _, offsets_buf, data_buf = arr.buffers()
+    offsets = np.frombuffer(offsets_buf, dtype=np.int64)[arr.offset:arr.offset + n + 1]
+    start = offsets[0]
+    codes = CHAR_CLASS[np.frombuffer(data_buf, dtype=np.uint8)[start:offsets[-1]]]
+    sums = np.zeros(n, dtype=np.uint64)
+    nonempty = np.diff(offsets) > 0
+    if nonempty.any():
+        sums[nonempty] = np.add.reduceat(codes, (offsets[:-1] - start)[nonempty])
+    return (sums & np.uint64(0xFFFFFFFF)).astype(np.int64), (sums >> np.uint64(32)).astype(np.int64)
+
+
+def _mix64(x: np.ndarray) -> np.ndarray:
+    """splitmix64的终混函数（原地修改并返回）"""
+    x ^= x >> np.uint64(30)
+    x *= np.uint64(0xBF58476D1CE4E5B9)
+    x ^= x >> np.uint64(27)
+    x *= np.uint64(0x94D049BB133111EB)
+    x ^= x >> np.uint64(31)
+    return x
+
+
+_WORD_KEYS = np.zeros(0, dtype=np.uint64)
+# 补齐到8字节整数倍用的填充串（按需补的字节数取）
+_PADDING = pa.array(["\0" * k for k in range(8)], type=pa.large_string())
+
+
+def _word_keys(num_words: int) -> np.ndarray:
+    """第k个8字节字的乘数（固定的奇数伪随机数，按需扩展）"""
+    global _WORD_KEYS
+    if len(_WORD_KEYS) < num_words:
+        with np.errstate(over="ignore"):
+            index = np.arange(1, max(num_words, 1024) + 1, dtype=np.uint64)
+            _WORD_KEYS = _mix64(index * np.uint64(0x9E3779B97F4A7C15)) | np.uint64(1)
+    return _WORD_KEYS
+
+
+def string_hashes(arr: pa.Array) -> np.ndarray:
+    """
+    逐条字符串的64位哈希（向量化，结果跨进程一致，用于计数重复）
+
+    先用Arrow把每条字符串补零到8字节的整数倍（每条都从对齐的位置开始），
+    数据缓冲区即可直接看作uint64数组：第k个字乘以第k个随机奇数后逐条求和，最后与字节长度混合
+
+    Returns:
+        uint64[n]
+    """
+    if not pa.types.is_large_string(arr.type):
+        arr = pc.cast(arr, pa.large_string())
+    n = len(arr)
+    lengths = pc.binary_length(arr).to_numpy(zero_copy_only=False).astype(np.int64)
+    padded = pc.binary_join_element_wise(arr, _PADDING.take(pa.array(-lengths % 8)),
+                                         pa.scalar("", type=pa.large_string()))
+    _, offsets_buf, data_buf = padded.buffers()
+    offsets = np.frombuffer(offsets_buf, dtype=np.int64)[padded.offset:padded.offset + n + 1]
+    sums = np.zeros(n, dtype=np.uint64)
+    nonempty = lengths > 0
+    with np.errstate(over="ignore"):
+        if nonempty.any():
+            words = np.frombuffer(data_buf, dtype=np.uint64, count=offsets[-1] // 8)[offsets[0] // 8:]
+            first = (offsets[:-1][nonempty] - offsets[0]) // 8
+            num_words = (lengths[nonempty] + 7) // 8
+            word_no = np.arange(len(words), dtype=np.int64)
+            word_no -= np.repeat(first, num_words)
+            sums[nonempty] = np.add.reduceat(words * _word_keys(int(num_words.max()))[word_no], first)
+        return _mix64(sums ^ lengths.astype(np.uint64) * np.uint64(0xD6E8FEB86659FD93))
+
+
+def classify_instructions(instruction: pa.Array) -> pa.Array:
+    """classify_instruction 的向量化版本，返回任务类型编号（TASK_TYPES的顺序）"""
+    codes = list(TASK_TYPES)
+    source = pc.or_(
+        pc.match_substring(instruction, "古文原文与出处"),
+        pc.and_(pc.match_substring(instruction, "出处"), pc.match_substring(instruction, "古文"))
+    )
+    translation = pc.or_(pc.match_substring(instruction, "翻译成现代文"),
+                         pc.match_substring(instruction, "翻译成古文"))
+    case = pc.starts_with(instruction, "基于输入的患者医案记录")
+    result = pc.if_else(case, codes.index("case_diagnosis"), codes.index("knowledge_qa"))
+    result = pc.if_else(translation, codes.index("translation"), result)
+    return pc.if_else(source, codes.index("source_lookup"), result)
+
+
+class SplitAuditor:
+    """单个划分的审计（逐批累积，最后汇总）"""
+
+    def __init__(self, top_templates: int = 20, non_cjk_threshold: float = 0.5):
+        self.top_templates = top_templates
+        self.non_cjk_threshold = non_cjk_threshold
+        self.rows = 0
+        self.empty = Counter()
+        self.whitespace_only = Counter()
+        self.lengths = {f: [] for f in FIELDS}
+        self.cjk_chars = Counter()
+        self.visible_chars = Counter()
+        self.non_cjk_rows = Counter()
+        self.task_counts = Counter()
+        self.field_hashes = {f: [] for f in FIELDS}
+        # 全局高频instruction的原文（按哈希），由 resolve_templates 第二遍读取时填充
+        self.template_texts = {}
+
+    def update(self, batch: pa.RecordBatch):
+        self.rows += batch.num_rows
+        trimmed = {}
+        for field in FIELDS:
+            col = string_column(batch, field)
+            raw_len = pc.utf8_length(col)
+            stripped = pc.utf8_trim_whitespace(col)
+            trimmed[field] = stripped
+            length = pc.utf8_length(stripped)
+            is_empty = pc.equal(length, 0)
+            self.empty[field] += pc.sum(is_empty).as_py() or 0
+            self.whitespace_only[field] += pc.sum(
+                pc.and_(is_empty, pc.greater(raw_len, 0))).as_py() or 0
+            self.lengths[field].append(length.to_numpy(zero_copy_only=False).astype(np.int32))
+
+            visible, cjk = char_counts(stripped)
+            self.cjk_chars[field] += int(cjk.sum())
+            self.visible_chars[field] += int(visible.sum())
+            # 非中文字符占比超过阈值的行（空字段不计）
+            non_cjk = (visible - cjk > visible * self.non_cjk_threshold) & (visible > 0)
+            self.non_cjk_rows[field] += int(non_cjk.sum())
+
+            self.field_hashes[field].append(string_hashes(stripped))
+
+        counts = pc.value_counts(classify_instructions(trimmed["instruction"]))
+        for entry in counts.to_pylist():
+            self.task_counts[list(TASK_TYPES)[entry["values"]]] += entry["counts"]
+
+    def top_instructions(self) -> Tuple[np.ndarray, np.ndarray, int]:
+        """全局instruction频次：(top哈希, 对应次数, 不同instruction数)"""
+        hashes = np.concatenate(self.field_hashes["instruction"])
+        inst_unique, inst_counts = np.unique(hashes, return_counts=True)
+        order = np.argsort(-inst_counts, kind="stable")[:self.top_templates]
+        return inst_unique[order], inst_counts[order], len(inst_unique)
+
+    def resolve_templates(self, batches: Iterator[pa.RecordBatch]):
+        """
+        第二遍读取：查出全局高频instruction的原文
+
+        只计算instruction列的哈希，全部找到后提前结束（高频模板通常在前几批就能找到）
+        """
+        if self.rows == 0:
+            return
+        wanted = set(self.top_instructions()[0].tolist()) - set(self.template_texts)
+        for batch in batches:
+            if not wanted:
+                break
+            col = pc.utf8_trim_whitespace(string_column(batch, "instruction"))
+            hashes = string_hashes(col)
+            hit = np.flatnonzero(np.isin(hashes, np.fromiter(wanted, dtype=np.uint64, count=len(wanted))))
+            for i in hit.tolist():
+                h = int(hashes[i])
+                if h in wanted:
+                    self.template_texts[h] = col[i].as_py()
+                    wanted.discard(h)
+
+    def report(self) -> Dict[str, Any]:
+        """汇总报告"""
+        n = self.rows
+        report = {"rows": n, "fields": {}}
+        if n == 0:
+            return report
+
+        lengths = {f: np.concatenate(self.lengths[f]) for f in FIELDS}
+        hashes = {f: np.concatenate(self.field_hashes[f]) for f in FIELDS}
+        total_len = lengths["instruction"] + lengths["input"] + lengths["output"]
+
+        for field in FIELDS:
+            q = np.percentile(lengths[field], [50, 90, 99, 99.9])
+            report["fields"][field] = {
+                "empty": int(self.empty[field]),
+                "empty_ratio": self.empty[field] / n,
+                "whitespace_only": int(self.whitespace_only[field]),
+                "length": {
+                    "mean": float(lengths[field].mean()),
+                    "p50": float(q[0]), "p90": float(q[1]), "p99": float(q[2]), "p99.9": float(q[3]),
+                    "max": int(lengths[field].max())
+                },
+                "cjk_chars": int(self.cjk_chars[field]),
+                "cjk_char_ratio": self.cjk_chars[field] / self.visible_chars[field] if self.visible_chars[field] else 0.0,
+                "non_cjk_rows": int(self.non_cjk_rows[field]),
+                "non_cjk_rows_ratio": self.non_cjk_rows[field] / n
+            }
+        q = np.percentile(total_len, [50, 90, 99, 99.9])
+        report["total_length"] = {
+            "mean": float(total_len.mean()),
+            "p50": float(q[0]), "p90": float(q[1]), "p99": float(q[2]), "p99.9": float(q[3]),
+            "max": int(total_len.max())
+        }
+        report["task_types"] = {t: int(self.task_counts[t]) for t in TASK_TYPES}
+
+        # 精确重复：整行 / 同一问题（instruction+input）
+        with np.errstate(over="ignore"):
+            prompt_hash = hashes["instruction"] * np.uint64(0x9E3779B97F4A7C15) ^ hashes["input"]
+            row_hash = prompt_hash * np.uint64(0x100000001B3) ^ hashes["output"]
+        row_unique, row_counts = np.unique(row_hash, return_counts=True)
+        prompt_unique = np.unique(prompt_hash)
+        pair_unique = np.unique(np.stack([prompt_hash, hashes["output"]], axis=1), axis=0)
+        prompts_of_pairs, answers_per_prompt = np.unique(pair_unique[:, 0], return_counts=True)
+        report["duplicates"] = {
+            "distinct_rows": int(len(row_unique)),
+            "duplicate_rows": int(n - len(row_unique)),
+            "duplicate_ratio": (n - len(row_unique)) / n,
+            "duplicate_groups": int((row_counts > 1).sum()),
+            "largest_group": int(row_counts.max()),
+            "distinct_prompts": int(len(prompt_unique)),
+            # 同一问题对应不同答案
+            "conflicting_prompts": int((answers_per_prompt > 1).sum())
+        }
+
+        # instruction模板频次（原文需先调用 resolve_templates）
+        top_hashes, top_counts, distinct = self.top_instructions()
+        report["distinct_instructions"] = int(distinct)
+        report["top_instructions"] = [
+            {"count": int(c), "ratio": float(c / n), "instruction": self.template_texts.get(int(h))}
+            for h, c in zip(top_hashes.tolist(), top_counts.tolist())
+        ]
+        return report
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多进程数据并行评测（本地模型）
+每个worker进程绑定一张GPU或一组CPU核、各自加载一份模型；样本逐条放入共享队列，由空闲的worker动态领取，
+结果按评测集顺序合并后交给主进程统一计算指标。batch_evaluate 与 ModelEvaluator 接口相同，可直接替换
+"""
+import multiprocessing as mp
+import os
+import queue
+import time
+import traceback
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from tqdm import tqdm
+
+_STOP = None
+
+
+def split_cpus(cpus: List[int], num_workers: int) -> List[List[int]]:
+    """把CPU列表切成num_workers个连续的核组（核数不足时每个worker一个核，轮流分配）"""
+    if num_workers >= len(cpus):
+        return [[cpus[i % len(cpus)]] for i in range(num_workers)]
+    size, extra = divmod(len(cpus), num_workers)
+    groups, start = [], 0
+    for i in range(num_workers):
+        end = start + size + (i < extra)
+        groups.append(cpus[start:end])
+        start = end
+    return groups
+
+
+def assign_devices(num_workers: int, devices: Optional[List[str]] = None,
+                   numa_node: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    为每个worker分配绑定：{"gpu": "4"} 或 {"cpus": [0, 1, ...]}
+
+    Args:
+        devices: GPU编号列表（如 ["4", "5", "6", "7"]，worker数多于GPU数时轮流共用）；
+                 为 ["cpu"] 时强制用CPU；不设置时有GPU用全部可见GPU，否则按CPU核分组
+        numa_node: CPU模式下只在该NUMA节点的核中分组
+    """
+    import torch
+
+    if devices == ["cpu"]:
+        devices = []
+    elif devices is None and torch.cuda.is_available():
+        visible = os.environ.get("CUDA_VISIBLE_DEVICES")
+        devices = visible.split(",") if visible else [str(i) for i in range(torch.cuda.device_count())]
+    if devices:
+        return [{"gpu": devices[i % len(devices)]} for i in range(num_workers)]
+
+    if numa_node is not None:
+        from src.cpu_engine import numa_nodes
+        cpus = numa_nodes()[numa_node]
+    else:
+        cpus = sorted(os.sched_getaffinity(0))
+    return [{"cpus": group} for group in split_cpus(cpus, num_workers)]
+
+
+def describe_binding(binding: Dict[str, Any]) -> str:
+    if "gpu" in binding:
+        return f"GPU {binding['gpu']}"
+    cpus = binding["cpus"]
+    return f"CPU {cpus[0]}-{cpus[-1]}" if len(cpus) > 1 else f"CPU {cpus[0]}"
+
+
+def _worker_main(worker_id: int, binding: Dict[str, Any], evaluator_kwargs: Dict[str, Any],
+                 task_queue, result_queue):
+    """worker进程：先绑定设备再加载模型，然后从共享队列逐条领取样本"""
+    if "gpu" in binding:
+        os.environ["CUDA_VISIBLE_DEVICES"] = str(binding["gpu"])
+    else:
+        os.environ["CUDA_VISIBLE_DEVICES"] = ""
+        os.sched_setaffinity(0, binding["cpus"])
+        evaluator_kwargs = dict(
+            evaluator_kwargs,
+            num_threads=evaluator_kwargs.get("num_threads") or len(binding["cpus"]),
+            numa_node=None
+        )
+    try:
+        import torch
+        from src.evaluator import ModelEvaluator
+
+        if "cpus" in binding:
+            torch.set_num_threads(evaluator_kwargs["num_threads"])
+        evaluator = ModelEvaluator(**evaluator_kwargs)
+    except Exception:
+        result_queue.put(("error", worker_id, traceback.format_exc()))
+        return
+    result_queue.put(("ready", worker_id, evaluator.load_time))
+
+    while True:
+        task = task_queue.get()
+        if task is _STOP:
+            break
+        idx, item, prompt_builder, max_tokens, is_cot = task
+        evaluator.speculative_stats = {}
+        result = evaluator.evaluate_item(idx, item, prompt_builder, max_tokens, is_cot)
+        result_queue.put(("result", worker_id, (idx, result, evaluator.speculative_stats)))
+
+
+class DataParallelEvaluator:
+    """多进程数据并行评测器"""
+
+    def __init__(self, num_workers: int, evaluator_kwargs: Dict[str, Any], devices: Optional[List[str]] = None):
+        """
+        Args:
+            num_workers: worker进程数（每个进程一份模型）
+            evaluator_kwargs: 传给每个worker中 ModelEvaluator 的参数（mode需为local/local-cpu/local-onnx）
+            devices: GPU编号列表，见 assign_devices（local-cpu/local-onnx模式固定按CPU核分组）
+        """
+        if evaluator_kwargs.get("mode") == "api":
+            raise ValueError("API模式请使用并发参数，不需要数据并行")
+        if evaluator_kwargs.get("mode") in ("local-cpu", "local-onnx"):
+            devices = ["cpu"]
+        self.mode = "local"
+        self.speculative_stats = {}
+        # 最近一次batch_evaluate的墙钟时间（不含模型加载）
+        self.last_wall = 0.0
+        self.bindings = assign_devices(num_workers, devices, evaluator_kwargs.get("numa_node"))
+
+        print(f"🔧 启动 {num_workers} 个评测进程: {', '.join(describe_binding(b) for b in self.bindings)}")
+        start_time = time.time()
+        # spawn：子进程重新初始化CUDA，且绑定设备/核在加载模型之前完成
+        ctx = mp.get_context("spawn")
+        self.task_queue = ctx.Queue()
+        self.result_queue = ctx.Queue()
+        self.processes = [
+            ctx.Process(target=_worker_main, args=(i, binding, evaluator_kwargs, self.task_queue, self.result_queue),
+                        daemon=True)
+            for i, binding in enumerate(self.bindings)
+        ]
+        for p in self.processes:
+            p.start()
+        for _ in self.processes:
+            self._get()
+        self.load_time = time.time() - start_time
+        print(f"✓ {num_workers} 个评测进程就绪 ({self.load_time:.1f}秒)")
+
+    def _get(self):
+        """取一条worker消息；worker异常退出或加载失败时报错，避免主进程一直等待"""
+        while True:
+            try:
+                kind, worker_id, payload = self.result_queue.get(timeout=5)
+            except queue.Empty:
+                dead = [p for p in self.processes if not p.is_alive()]
+                if dead:
+                    self.close()
+                    raise RuntimeError(f"评测进程异常退出（exitcode={dead[0].exitcode}）")
+                continue
+            if kind == "error":
+                self.close()
+                raise RuntimeError(f"评测进程 {worker_id} 加载模型失败:\n{payload}")
+            return kind, worker_id, payload
+
+    def batch_evaluate(
+        self,
+        eval_data: List[Dict[str, Any]],
+        prompt_builder,
+        mode_name: str,
+        max_tokens: int = 2048,
+        num_workers: int = 1,
+        is_cot: bool = False
+    ) -> List[Dict[str, Any]]:
+        """批量评测（num_workers仅为与ModelEvaluator接口一致，并行度由进程数决定）"""
+        print(f"\n🔄 开始{mode_name}评测 ({len(eval_data)}条)...")
+        print(f"数据并行: {len(self.processes)} 个进程")
+        if is_cot:
+            print("⚠️  CoT模式：将提取<答案>标签中的内容进行评测")
+
+        self.speculative_stats = {}
+        for idx in range(len(eval_data)):
+            self.task_queue.put((idx, dict(eval_data[idx]), prompt_builder, max_tokens, is_cot))
+
+        results = [None] * len(eval_data)
+        per_worker = Counter()
+        start_time = time.time()
+        with tqdm(total=len(eval_data), desc=f"{mode_name}评测") as pbar:
+            for _ in range(len(eval_data)):
+                _, worker_id, (idx, result, stats) = self._get()
+                results[idx] = result
+                per_worker[worker_id] += 1
+                for task_type, bucket in stats.items():
+                    total = self.speculative_stats.setdefault(task_type, {})
+                    for key, value in bucket.items():
+                        total[key] = total.get(key, 0) + value
+                pbar.update(1)
+        wall = self.last_wall = time.time() - start_time
+
+        print(f"\n{'进程':<6} {'设备':<14} {'条数':>6}")
+        print("-" * 30)
+        for i, binding in enumerate(self.bindings):
+            print(f"{i:<6} {describe_binding(binding):<14} {per_worker[i]:>6}")
+        print("-" * 30)
+        print(f"总耗时 {wall:.1f}秒，{len(eval_data) / wall:.2f} 条/秒")
+        if self.speculative_stats:
+            from src.speculative import print_acceptance_report
+            print_acceptance_report(self.speculative_stats)
+
+        if is_cot:
+            has_tags_count = sum(1 for r in results if r.get('has_answer_tags', False))
+            print(f"✓ {mode_name}评测完成 - {has_tags_count}/{len(results)} 条使用了答案标签")
+        else:
+            print(f"✓ {mode_name}评测完成")
+        return results
+
+    def close(self):
+        """通知worker退出并等待结束"""
+        for p in self.processes:
+            if p.is_alive():
+                self.task_queue.put(_STOP)
+        for p in self.processes:
+            p.join(timeout=30)
+            if p.is_alive():
+                p.terminate()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LLaMA-Factory 数据集导出工具
+alpaca / sharegpt 格式转换、分片写出（可选zstd压缩 + 行索引）、dataset_info.json 生成
+"""
+import json
+import os
+from array import array
+from typing import Dict, Any, Optional
+
+FORMATS = ("alpaca", "sharegpt")
+
+
+def training_query(item: Dict[str, Any]) -> str:
+    """训练时的用户输入（与LLaMA-Factory处理alpaca时的拼接方式一致：instruction + "\n" + input）"""
+    instruction = item.get("instruction") or ""
+    input_text = item.get("input") or ""
+    return "\n".join(part for part in (instruction, input_text) if part)
+
+
+def format_record(item: Dict[str, Any], fmt: str = "alpaca") -> Dict[str, Any]:
+    """
+    转换为LLaMA-Factory的数据格式
+
+    Args:
+        item: 包含instruction/input/output的数据
+        fmt: alpaca 或 sharegpt
+
+    Returns:
+        alpaca: {"instruction", "input", "output"}
+        sharegpt: {"conversations": [{"from": "human", ...}, {"from": "gpt", ...}]}
+    """
+    instruction = item.get("instruction") or ""
+    input_text = item.get("input") or ""
+    output = item.get("output") or ""
+
+    if fmt == "alpaca":
+        return {"instruction": instruction, "input": input_text, "output": output}
+
+    return {
+        "conversations": [
+            {"from": "human", "value": training_query(item)},
+            {"from": "gpt", "value": output}
+        ]
+    }
+
+
+def dataset_info_entry(file_name: str, fmt: str = "alpaca") -> Dict[str, Any]:
+    """生成dataset_info.json中的一项（file_name为目录时LLaMA-Factory会加载其中所有文件）"""
+    if fmt == "alpaca":
+        return {
+            "file_name": file_name,
+            "formatting": "alpaca",
+            "columns": {
+                "prompt": "instruction",
+                "query": "input",
+                "response": "output"
+            }
+        }
+    return {
+        "file_name": file_name,
+        "formatting": "sharegpt",
+        "columns": {
+            "messages": "conversations"
+        }
+    }
+
+
+def update_dataset_info(info_path: str, entries: Dict[str, Dict[str, Any]]):
+    """合并写入dataset_info.json（保留其他已有条目）"""
+    info = {}
+    if os.path.exists(info_path):
+        with open(info_path, 'r', encoding='utf-8') as f:
+            info = json.load(f)
+    info.update(entries)
+    with open(info_path, 'w', encoding='utf-8') as f:
+        json.dump(info, f, ensure_ascii=False, indent=2)
+        f.write('\n')
+
+
+class ShardWriter:
+    """
+    JSONL分片写出器
+
+    未压缩时记录每行的字节偏移；zstd压缩时每block_lines行压缩成一个独立帧，
+    记录每帧的偏移（多帧拼接仍是合法的zstd流，可被datasets/zstd直接读取）
+    """
+
+    def __init__(self, path: str, compress: Optional[str] = None, level: int = 3, block_lines: int = 1024):
+        self.path = path
+        self.compress = compress
+        self.block_lines = block_lines if compress == "zstd" else 1
+        self.offsets = array('Q')
+        self.lines = 0
+
+        if compress == "zstd":
+            try:
+                import zstandard
+            except ImportError:
+                raise ImportError("zstd压缩需要安装 zstandard: pip install zstandard")
+            self._cctx = zstandard.ZstdCompressor(level=level)
+            self._buf = []
+        elif compress is not None:
+            raise ValueError(f"不支持的压缩格式: {compress}")
+
+        self._f = open(path, 'wb')
+
+    def write(self, record: Dict[str, Any]):
+        data = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        if self.compress == "zstd":
+            self._buf.append(data)
+            if len(self._buf) >= self.block_lines:
+                self._flush_block()
+        else:
+            self.offsets.append(self._f.tell())
+            self._f.write(data)
+        self.lines += 1
+
+    def _flush_block(self):
+        if not self._buf:
+            return
+        self.offsets.append(self._f.tell())
+        self._f.write(self._cctx.compress(b''.join(self._buf)))
+        self._buf = []
+
+    def close(self, index_path: Optional[str] = None) -> Dict[str, Any]:
+        """关闭并写出索引（uint64偏移数组）"""
+        if self.compress == "zstd":
+            self._flush_block()
+        size = self._f.tell()
+        self._f.close()
+        if index_path:
+            with open(index_path, 'wb') as f:
+                self.offsets.tofile(f)
+        return {
+            "file": os.path.basename(self.path),
+            "lines": self.lines,
+            "bytes": size,
+            "block_lines": self.block_lines
+        }
+
+
+def shard_suffix(compress: Optional[str]) -> str:
+    return ".jsonl.zst" if compress == "zstd" else ".jsonl"
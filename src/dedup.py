@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MinHash-LSH 近似去重
+字符（或jieba词）n-gram 的 MinHash 签名 + 分带LSH找候选对，再用签名估计的Jaccard验证
+"""
+import zlib
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+
+from src.task_types import classify_instruction
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64(0xFFFFFFFF)
+EMPTY_HASH = 0xFFFFFFFF
+
+
+def dedup_text(item: Dict[str, Any]) -> str:
+    """
+    用于去重的文本
+
+    模板化任务（古文翻译/出处查找/医案）的instruction是固定模板，
+    对相似度没有区分作用，只比较input+output
+    """
+    instruction = (item.get("instruction") or "").strip()
+    input_text = (item.get("input") or "").strip()
+    output = (item.get("output") or "").strip()
+    if classify_instruction(instruction) == "knowledge_qa":
+        return f"{instruction}\n{input_text}\n{output}"
+    return f"{input_text}\n{output}"
+
+
+def optimal_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """
+    选择分带参数 (bands, rows)
+
+    LSH的S曲线拐点约为 (1/b)^(1/r)，取不超过阈值的最接近值，
+    候选对宁多勿少，多出的由Jaccard验证过滤
+    """
+    best = None
+    for b in range(1, num_perm + 1):
+        if num_perm % b:
+            continue
+        r = num_perm // b
+        knee = (1 / b) ** (1 / r)
+        if knee <= threshold and (best is None or knee > best[2]):
+            best = (b, r, knee)
+    if best is None:
+        return num_perm, 1
+    return best[0], best[1]
+
+
+class MinHasher:
+    """MinHash签名计算"""
+
+    def __init__(self, num_perm: int = 128, ngram: int = 5, tokenizer: str = "char", seed: int = 1):
+        """
+        Args:
+            num_perm: 哈希函数个数
+            ngram: n-gram长度（char为字符数，jieba为词数）
+            tokenizer: char 或 jieba
+            seed: 随机种子（所有进程必须相同）
+        """
+        self.num_perm = num_perm
+        self.ngram = ngram
+        self.tokenizer = tokenizer
+        rng = np.random.RandomState(seed)
+        # a < 2^31, x < 2^32，a*x+b 不会溢出uint64
+        self.a = rng.randint(1, 1 << 31, size=num_perm).astype(np.uint64)
+        self.b = rng.randint(0, 1 << 31, size=num_perm).astype(np.uint64)
+
+        if tokenizer == "jieba":
+            import jieba
+            self._cut = jieba.lcut
+        else:
+            self._cut = list
+
+    def shingles(self, text: str) -> set:
+        """n-gram集合（去掉空白）"""
+        tokens = [t for t in self._cut(text) if not t.isspace()]
+        if not tokens:
+            return set()
+        if len(tokens) <= self.ngram:
+            return {"".join(tokens)}
+        sep = " " if self.tokenizer == "jieba" else ""
+        return {sep.join(tokens[i:i + self.ngram]) for i in range(len(tokens) - self.ngram + 1)}
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash签名（uint32，长度num_perm）；空文本返回全EMPTY_HASH"""
+        shingles = self.shingles(text)
+        if not shingles:
+            return np.full(self.num_perm, EMPTY_HASH, dtype=np.uint32)
+        x = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        )
+        phv = ((x[:, None] * self.a + self.b) % MERSENNE_PRIME) & MAX_HASH
+        return phv.min(axis=0).astype(np.uint32)
+
+
+def band_hashes(signatures: np.ndarray, bands: int, rows: int) -> np.ndarray:
+    """
+    每个签名每个分带的哈希值
+
+    Args:
+        signatures: (n, num_perm) uint32
+
+    Returns:
+        (n, bands) int64
+    """
+    n = signatures.shape[0]
+    x = signatures[:, :bands * rows].reshape(n, bands, rows).astype(np.uint64)
+    h = np.full((n, bands), 0xCBF29CE484222325, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for j in range(rows):
+            h = (h ^ x[:, :, j]) * np.uint64(0x100000001B3)
+    return h.view(np.int64)
+
+
+def is_empty(signatures: np.ndarray) -> np.ndarray:
+    """签名是否来自空文本"""
+    return (signatures == EMPTY_HASH).all(axis=1)
+
+
+def estimate_jaccard(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    """用签名相同位置的比例估计Jaccard相似度"""
+    return float(np.mean(sig_a == sig_b))
+
+
+def bucket_groups(keys: np.ndarray) -> List[np.ndarray]:
+    """
+    按 (band, hash) 分组
+
+    Args:
+        keys: (m, 3) int64，列为 band, hash, 全局行号
+
+    Returns:
+        大小>=2的组，每组为全局行号数组
+    """
+    if len(keys) == 0:
+        return []
+    order = np.lexsort((keys[:, 1], keys[:, 0]))
+    keys = keys[order]
+    same = (keys[1:, 0] == keys[:-1, 0]) & (keys[1:, 1] == keys[:-1, 1])
+    boundaries = np.flatnonzero(~same) + 1
+    groups = np.split(keys[:, 2], boundaries)
+    return [g for g in groups if len(g) > 1]
+
+
+class UnionFind:
+    """并查集（数组实现）"""
+
+    def __init__(self, n: int):
+        self.parent = np.arange(n, dtype=np.int64)
+
+    def find(self, x: int) -> int:
+        root = x
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[x] != root:
+            self.parent[x], x = root, self.parent[x]
+        return int(root)
+
+    def union(self, a: int, b: int):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # 以较小行号为根，簇代表即为最早出现的一条
+            if ra < rb:
+                self.parent[rb] = ra
+            else:
+                self.parent[ra] = rb
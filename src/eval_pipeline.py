@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流水线评测
+把单条评测拆成若干阶段（构建prompt+分词 → 生成 → 解码+答案提取+打分），
+阶段之间用有界队列连接、各自在线程中运行：CPU阶段提前准备/事后处理，生成阶段不必等待；
+统计每个阶段的忙碌/等待时间，瓶颈一目了然
+"""
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+_DONE = object()
+
+
+class StageError:
+    """某个阶段处理失败的样本（后续阶段直接跳过）"""
+
+    def __init__(self, stage: str, error: Exception):
+        self.stage = stage
+        self.error = error
+
+
+class Stage:
+    """流水线阶段"""
+
+    def __init__(self, name: str, fn: Callable[[Any, Any], Any], workers: int = 1):
+        """
+        Args:
+            name: 阶段名称
+            fn: fn(item, payload) -> 新payload（第一个阶段的payload为None）
+            workers: 线程数（API生成可多线程并发，本地模型生成为1）
+        """
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.busy = 0.0       # 处理时间（所有线程合计）
+        self.starved = 0.0    # 等待上游的时间
+        self.blocked = 0.0    # 下游队列已满、等待放入的时间
+        self.items = 0
+        self._lock = threading.Lock()
+        self._finished = 0
+
+    def report(self, wall: float) -> Dict[str, Any]:
+        capacity = wall * self.workers
+        return {
+            "workers": self.workers,
+            "items": self.items,
+            "busy": self.busy,
+            "occupancy": self.busy / capacity if capacity else 0.0,
+            "starved": self.starved / capacity if capacity else 0.0,
+            "blocked": self.blocked / capacity if capacity else 0.0,
+            "avg_item_time": self.busy / self.items if self.items else 0.0,
+        }
+
+
+class StagedPipeline:
+    """按阶段运行的流水线，结果按完成顺序产出 (序号, 样本, 结果或StageError, 各阶段耗时)"""
+
+    def __init__(self, stages: List[Stage], queue_size: int = 8):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.wall = 0.0
+
+    def _worker(self, stage: Stage, q_in: queue.Queue, q_out: queue.Queue):
+        while True:
+            t0 = time.time()
+            envelope = q_in.get()
+            waited = time.time() - t0
+            if envelope is _DONE:
+                # 让同阶段的其他线程也能看到结束标记；最后一个线程通知下游
+                q_in.put(_DONE)
+                with stage._lock:
+                    stage._finished += 1
+                    last = stage._finished == stage.workers
+                if last:
+                    q_out.put(_DONE)
+                return
+
+            idx, item, payload, timings = envelope
+            t1 = time.time()
+            if not isinstance(payload, StageError):
+                try:
+                    payload = stage.fn(item, payload)
+                except Exception as e:
+                    payload = StageError(stage.name, e)
+            busy = time.time() - t1
+            timings[stage.name] = busy
+
+            t2 = time.time()
+            q_out.put((idx, item, payload, timings))
+            with stage._lock:
+                stage.starved += waited
+                stage.busy += busy
+                stage.blocked += time.time() - t2
+                stage.items += 1
+
+    def run(self, items: Iterable[Any]) -> Iterator[Tuple[int, Any, Any, Dict[str, float]]]:
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        threads = []
+        for i, stage in enumerate(self.stages):
+            for _ in range(stage.workers):
+                t = threading.Thread(target=self._worker, args=(stage, queues[i], queues[i + 1]), daemon=True)
+                t.start()
+                threads.append(t)
+
+        def feed():
+            for idx, item in enumerate(items):
+                queues[0].put((idx, item, None, {}))
+            queues[0].put(_DONE)
+
+        feeder = threading.Thread(target=feed, daemon=True)
+        t0 = time.time()
+        feeder.start()
+        while True:
+            envelope = queues[-1].get()
+            if envelope is _DONE:
+                break
+            yield envelope
+        self.wall = time.time() - t0
+        feeder.join()
+        for t in threads:
+            t.join()
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        return {stage.name: stage.report(self.wall) for stage in self.stages}
+
+
+def print_stage_report(report: Dict[str, Dict[str, Any]], wall: float):
+    """打印各阶段占用情况（占用率最高的阶段即瓶颈）"""
+    print(f"\n{'阶段':<10} {'线程':>4} {'条数':>6} {'平均耗时':>10} {'占用':>7} {'等上游':>7} {'等下游':>7}")
+    print("-" * 60)
+    for name, r in report.items():
+        print(f"{name:<10} {r['workers']:>4} {r['items']:>6} {r['avg_item_time']:>9.3f}s "
+              f"{r['occupancy']:>7.1%} {r['starved']:>7.1%} {r['blocked']:>7.1%}")
+    print("-" * 60)
+    if report:
+        bottleneck = max(report, key=lambda n: report[n]["occupancy"])
+        print(f"总耗时 {wall:.1f}秒，瓶颈阶段: {bottleneck}")
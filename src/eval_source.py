@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+评测数据源（按需读取）
+支持 JSON / JSONL / Arrow(save_to_disk) / Parquet，按下标懒加载单条数据，
+full_question 在读取时用 format_question 生成；可按下标区间切分为多个分片。
+除JSON外不会把整个评测集读入内存，可直接评测完整的 data/processed/test
+"""
+import bisect
+import json
+import mmap
+import os
+from array import array
+from collections.abc import Sequence
+from typing import Dict, Any, Optional
+
+from src.prompt_builder import format_question
+from src.splitting import split_ranges
+
+
+def to_eval_item(row: Dict[str, Any], index: int) -> Dict[str, Any]:
+    """把一行原始数据转换为评测格式（见 data/evaluation/FORMAT.md）"""
+    instruction = row.get("instruction") or ""
+    input_text = row.get("input") or ""
+    item = dict(row)
+    item["id"] = row.get("id", index)
+    item["instruction"] = instruction
+    item["input"] = input_text
+    item["output"] = row.get("output") or ""
+    item["full_question"] = row.get("full_question") or format_question(instruction, input_text)
+    return item
+
+
+def shard_eval_data(data: Sequence, num_shards: int, shard_id: int) -> Sequence:
+    """
+    把评测数据（list或EvalSource）均分为num_shards个连续区间，返回第shard_id个
+
+    样本数少于分片数时，多出来的分片为空
+    """
+    ranges = split_ranges(0, len(data), num_shards)
+    if shard_id >= len(ranges):
+        return data[len(data):]
+    start, end = ranges[shard_id]
+    return data[start:end]
+
+
+class EvalSource(Sequence):
+    """
+    评测数据源基类：子类实现 _num_rows 和 _read_row
+
+    下标区间 [start, end) 表示当前视图，shard/select 返回共享底层数据的新视图
+    """
+
+    def __init__(self, path: str, start: int = 0, end: Optional[int] = None):
+        self.path = path
+        self.start = start
+        self.end = end
+
+    def _num_rows(self) -> int:
+        raise NotImplementedError
+
+    def _read_row(self, index: int) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def _view(self, start: int, end: int) -> "EvalSource":
+        view = object.__new__(type(self))
+        view.__dict__.update(self.__dict__)
+        view.start, view.end = start, end
+        return view
+
+    @property
+    def _stop(self) -> int:
+        return self._num_rows() if self.end is None else min(self.end, self._num_rows())
+
+    def __len__(self) -> int:
+        return max(0, self._stop - self.start)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return self._view(self.start + start, self.start + stop)
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        index = self.start + idx
+        return to_eval_item(self._read_row(index), index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def select(self, start: int, end: int) -> "EvalSource":
+        """按下标区间选取（相对当前视图）"""
+        return self[start:end]
+
+    def shard(self, num_shards: int, shard_id: int) -> "EvalSource":
+        """均分为num_shards个连续区间，返回第shard_id个"""
+        return shard_eval_data(self, num_shards, shard_id)
+
+
+class JsonEvalSource(EvalSource):
+    """JSON数组文件（eval_100.json / eval_500.json，文件较小，整体读入）"""
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            self._rows = json.load(f)
+
+    def _num_rows(self) -> int:
+        return len(self._rows)
+
+    def _read_row(self, index: int) -> Dict[str, Any]:
+        return self._rows[index]
+
+
+class JsonlEvalSource(EvalSource):
+    """JSONL文件：扫描一遍建立行偏移索引（每行8字节），按偏移从mmap读取"""
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._offsets = array('Q')
+        with open(path, 'rb') as f:
+            position = 0
+            for line in f:
+                if line.strip():
+                    self._offsets.append(position)
+                position += len(line)
+        self._file = open(path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if position else None
+
+    def _num_rows(self) -> int:
+        return len(self._offsets)
+
+    def _read_row(self, index: int) -> Dict[str, Any]:
+        start = self._offsets[index]
+        end = self._mm.find(b'\n', start)
+        return json.loads(self._mm[start:end if end != -1 else len(self._mm)])
+
+
+class ArrowEvalSource(EvalSource):
+    """save_to_disk目录（load_from_disk为内存映射，按行读取）"""
+
+    def __init__(self, path: str, split: str = "test"):
+        super().__init__(path)
+        from datasets import load_from_disk, DatasetDict
+        ds = load_from_disk(path)
+        if isinstance(ds, DatasetDict):
+            ds = ds[split]
+        self._ds = ds
+
+    def _num_rows(self) -> int:
+        return len(self._ds)
+
+    def _read_row(self, index: int) -> Dict[str, Any]:
+        return self._ds[index]
+
+
+class ParquetEvalSource(EvalSource):
+    """Parquet文件：按行组读取，缓存当前行组"""
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        import pyarrow.parquet as pq
+        self._pf = pq.ParquetFile(path)
+        meta = self._pf.metadata
+        self._group_starts = [0]
+        for i in range(meta.num_row_groups):
+            self._group_starts.append(self._group_starts[-1] + meta.row_group(i).num_rows)
+        self._cached_group = None
+        self._cached_rows = None
+
+    def _num_rows(self) -> int:
+        return self._group_starts[-1]
+
+    def _read_row(self, index: int) -> Dict[str, Any]:
+        group = bisect.bisect_right(self._group_starts, index) - 1
+        if group != self._cached_group:
+            self._cached_rows = self._pf.read_row_group(group).to_pylist()
+            self._cached_group = group
+        return self._cached_rows[index - self._group_starts[group]]
+
+
+def open_eval_source(path: str, split: str = "test") -> EvalSource:
+    """
+    按路径类型打开评测数据源
+
+    Args:
+        path: .json / .jsonl / .parquet 文件，或save_to_disk目录
+        split: 目录为DatasetDict时使用的划分
+    """
+    if os.path.isdir(path):
+        return ArrowEvalSource(path, split)
+    if path.endswith(".jsonl"):
+        return JsonlEvalSource(path)
+    if path.endswith(".parquet"):
+        return ParquetEvalSource(path)
+    return JsonEvalSource(path)
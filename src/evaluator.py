@@ -3,10 +3,10 @@
 """
 评测工具类（支持并发 + CoT答案提取）
 """
+import os
 import json
 import time
 from typing import List, Dict, Any, Tuple
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import torch
 from transformers import AutoTokenizer, AutoModelForCausalLM
 from peft import PeftModel
@@ -16,33 +16,129 @@ from tqdm import tqdm
 class ModelEvaluator:
     """模型评测器"""
     
-    def __init__(self, mode="local", model_path=None, lora_path=None, api_config=None):
-        """初始化评测器"""
-        self.mode = mode
+    def __init__(self, mode="local", model_path=None, lora_path=None, api_config=None, merged_cache=None,
+                 draft_model_path=None, num_draft_tokens=5, prompt_lookup=False,
+                 compile_decode=False, max_cache_len=6144,
+                 cpu_precision="int8", num_threads=None, numa_node=None,
+                 onnx_cache="models/onnx", onnx_int8=False,
+                 kv_cache_bits=None, kv_offload=False, kv_block_size=128,
+                 self_consistency=1, sc_temperature=0.7):
+        """
+        初始化评测器
+        
+        Args:
+            merged_cache: 合并LoRA权重的缓存目录（如 models/merged）；设置后加载合并后的模型，
+                          不设置则用PeftModel挂载adapter
+            draft_model_path: 投机解码的draft小模型（需与基座模型共用tokenizer，如Qwen2.5-0.5B-Instruct）；
+                              设置后本地生成改为贪心投机解码
+            num_draft_tokens: 每轮draft提议的token数
+            prompt_lookup: 不用draft模型，改为在prompt中查找n-gram提议（与draft_model_path二选一）
+            compile_decode: 使用静态KV缓存 + torch.compile 的解码引擎（启动时预热编译）
+            max_cache_len: 静态KV缓存长度（prompt + max_tokens，超出的样本回退到普通generate）
+            cpu_precision: local-cpu模式的权重精度（int8动态量化 / bf16 / fp32）
+            num_threads: local-cpu模式的线程数（默认物理核数）
+            numa_node: local-cpu模式绑定的NUMA节点
+            onnx_cache: local-onnx模式的ONNX导出缓存目录（按基座模型+adapter指纹区分，首次使用时导出）
+            onnx_int8: local-onnx模式使用int8动态量化后的ONNX图
+            kv_cache_bits: KV缓存量化位数（8 / 4，None为不量化），用于长CoT生成时节省显存
+            kv_offload: 把较早的KV块卸载到CPU内存（可与kv_cache_bits同时使用）
+            kv_block_size: 保持原精度的最近token数（也是压缩/卸载的块大小）
+            self_consistency: CoT自洽采样数k（>1时每条样本共享prefill采样k条推理，按答案重叠投票）
+            sc_temperature: 自洽采样的温度（k=1时仍用默认的0.1）
+        """
+        # local-cpu/local-onnx只是模型加载方式不同，之后的生成流程与local相同
+        self.mode = "local" if mode in ("local-cpu", "local-onnx") else mode
+        self.backend = mode
+        # prompt -> 分词结果的缓存（None为不缓存；同一评测集评测多个adapter时复用）
+        self.prompt_cache = None
+        # 投机解码器及按任务类型累计的接受率统计
+        self.speculative = None
+        self.speculative_stats = {}
+        self.compiled = None
+        # 压缩KV缓存配置（None为使用默认缓存；每次生成新建CompressedKVCache）
+        self.kv_cache_config = None
+        if kv_cache_bits or kv_offload:
+            if draft_model_path or prompt_lookup or compile_decode or mode == "local-onnx":
+                raise ValueError("压缩KV缓存只能用于普通generate（不能与投机解码、编译解码、local-onnx同时使用）")
+            self.kv_cache_config = dict(nbits=kv_cache_bits, offload=kv_offload, block_size=kv_block_size)
+        self.self_consistency = self_consistency
+        self.sc_temperature = sc_temperature
+        if self_consistency > 1:
+            if mode == "api" or draft_model_path or prompt_lookup or compile_decode or mode == "local-onnx":
+                raise ValueError("自洽采样只能用于本地模型的普通generate（不能与API、投机解码、编译解码、local-onnx同时使用）")
         
-        if mode == "local":
-            print("🔧 加载本地LoRA模型...")
+        if mode in ("local", "local-cpu", "local-onnx"):
+            if mode == "local-onnx" and (draft_model_path or prompt_lookup or compile_decode):
+                raise ValueError("local-onnx模式不支持投机解码和编译解码")
+            if mode in ("local-cpu", "local-onnx"):
+                from src.cpu_engine import configure_cpu
+                cpu = configure_cpu(num_threads, numa_node)
+                print(f"🔧 加载CPU推理模型... (线程 {cpu['num_threads']}, "
+                      f"NUMA节点 {cpu['numa_node'] if cpu['numa_node'] is not None else '未绑定'})")
+            else:
+                print("🔧 加载本地LoRA模型...")
+            start_time = time.time()
             self.tokenizer = AutoTokenizer.from_pretrained(
                 model_path,
                 trust_remote_code=True
             )
             
-            # 加载基座模型
-            self.base_model = AutoModelForCausalLM.from_pretrained(
-                model_path,
-                torch_dtype=torch.bfloat16,
-                device_map="auto",
-                trust_remote_code=True
-            )
+            if mode == "local-cpu":
+                from src.cpu_engine import load_cpu_model
+                self.model = load_cpu_model(model_path, lora_path, cpu_precision, merged_cache)
+            elif mode == "local-onnx":
+                from src.onnx_engine import load_onnx_model
+                self.model = load_onnx_model(model_path, lora_path, onnx_cache, onnx_int8, num_threads)
+            elif merged_cache:
+                from src.merged_cache import load_merged_model
+                self.model = load_merged_model(model_path, lora_path, merged_cache)
+            else:
+                # 加载基座模型
+                self.base_model = AutoModelForCausalLM.from_pretrained(
+                    model_path,
+                    torch_dtype=torch.bfloat16,
+                    device_map="auto",
+                    trust_remote_code=True
+                )
+                
+                # 加载LoRA权重（lora_path为空时只评测基座模型）
+                self.model = PeftModel.from_pretrained(
+                    self.base_model,
+                    lora_path,
+                    torch_dtype=torch.bfloat16
+                ) if lora_path else self.base_model
+            if mode != "local-onnx":
+                self.model.eval()
             
-            # 加载LoRA权重
-            self.model = PeftModel.from_pretrained(
-                self.base_model,
-                lora_path,
-                torch_dtype=torch.bfloat16
-            )
-            self.model.eval()
-            print("✓ 模型加载完成")
+            if draft_model_path:
+                from src.speculative import DraftModelProposer, SpeculativeDecoder
+                draft_model = AutoModelForCausalLM.from_pretrained(
+                    draft_model_path,
+                    torch_dtype=torch.bfloat16,
+                    device_map="auto",
+                    trust_remote_code=True
+                )
+                draft_model.eval()
+                self.speculative = SpeculativeDecoder(
+                    self.model, DraftModelProposer(draft_model), num_draft_tokens
+                )
+                print(f"✓ 投机解码: draft={draft_model_path}, 每轮提议{num_draft_tokens}个token")
+            elif prompt_lookup:
+                from src.speculative import PromptLookupProposer, SpeculativeDecoder
+                self.speculative = SpeculativeDecoder(self.model, PromptLookupProposer(), num_draft_tokens)
+                print(f"✓ 投机解码: prompt lookup, 每轮最多提议{num_draft_tokens}个token")
+            self.load_time = time.time() - start_time
+            print(f"✓ 模型加载完成 ({self.load_time:.1f}秒{', 合并权重' if merged_cache and lora_path else ''})")
+            if self.kv_cache_config:
+                from src.kv_cache import describe_kv_cache
+                print(f"✓ KV缓存: {describe_kv_cache(kv_cache_bits, kv_offload)}（最近{kv_block_size}个token保持原精度）")
+            
+            if compile_decode:
+                from src.compiled_engine import CompiledDecoder
+                print(f"⏳ 预热编译解码引擎（静态KV缓存长度 {max_cache_len}）...")
+                self.compiled = CompiledDecoder(self.model, max_cache_len)
+                self.compiled.warmup()
+                print(f"✓ 编译完成 ({self.compiled.compile_time:.1f}秒)")
             
         elif mode == "api":
             print("🔧 配置API评测...")
@@ -54,6 +150,25 @@ class ModelEvaluator:
             self.api_config = api_config
             print("✓ API配置完成")
     
+    def swap_adapter(self, lora_path: str, adapter_name: str = None) -> float:
+        """
+        热切换LoRA adapter：在已加载的基座模型上挂载新adapter并设为当前，再卸载旧adapter
+        
+        Returns:
+            切换耗时（秒）
+        """
+        if not isinstance(self.model, PeftModel):
+            raise ValueError("热切换adapter需要PeftModel（不能与合并权重缓存一起使用）")
+        start_time = time.time()
+        adapter_name = adapter_name or os.path.basename(os.path.normpath(lora_path))
+        old_adapter = self.model.active_adapter
+        self.model.load_adapter(lora_path, adapter_name=adapter_name)
+        self.model.set_adapter(adapter_name)
+        if old_adapter != adapter_name:
+            self.model.delete_adapter(old_adapter)
+        self.model.eval()
+        return time.time() - start_time
+    
     def generate(self, prompt: str, max_tokens: int = 2048, temperature: float = 0.1) -> str:
         """生成回答"""
         if self.mode == "local":
@@ -63,11 +178,53 @@ class ModelEvaluator:
     
     def _generate_local(self, prompt: str, max_tokens: int, temperature: float) -> str:
         """本地模型生成"""
+        inputs = self._tokenize_local(prompt)
+        outputs = self._generate_ids(inputs, max_tokens, temperature)
+        return self._decode_local(inputs, outputs)
+    
+    def _tokenize_local(self, prompt: str):
+        """分词并拷贝到模型所在设备"""
+        if self.prompt_cache is not None and prompt in self.prompt_cache:
+            return self.prompt_cache[prompt]
         inputs = self.tokenizer(prompt, return_tensors="pt").to(self.model.device)
-        
+        if self.prompt_cache is not None:
+            self.prompt_cache[prompt] = inputs
+        return inputs
+    
+    def _generate_ids(self, inputs, max_tokens: int, temperature: float, task_type: str = "knowledge_qa"):
+        """本地模型生成token id（启用投机解码时为贪心解码并按任务类型记录接受率；启用编译时走静态KV缓存引擎）"""
+        if self.backend == "local-onnx":
+            return self.model.generate(
+                inputs.input_ids,
+                max_tokens,
+                temperature=temperature,
+                top_p=0.9,
+                repetition_penalty=1.1,
+                eos_token_id=self.tokenizer.eos_token_id
+            )
+        if self.speculative is not None:
+            from src.speculative import merge_stats
+            outputs, stats = self.speculative.generate(
+                inputs.input_ids,
+                max_tokens,
+                eos_token_id=self.tokenizer.eos_token_id,
+                repetition_penalty=1.1
+            )
+            merge_stats(self.speculative_stats, task_type, stats)
+            return outputs
+        if self.compiled is not None and self.compiled.fits(inputs.input_ids.shape[1], max_tokens):
+            return self.compiled.generate(
+                inputs.input_ids,
+                max_tokens,
+                temperature=temperature,
+                top_p=0.9,
+                repetition_penalty=1.1,
+                eos_token_id=self.tokenizer.eos_token_id
+            )
         with torch.no_grad():
             outputs = self.model.generate(
                 **inputs,
+                past_key_values=self._new_kv_cache(),
                 max_new_tokens=max_tokens,
                 temperature=temperature,
                 do_sample=temperature > 0,
@@ -76,7 +233,42 @@ class ModelEvaluator:
                 pad_token_id=self.tokenizer.pad_token_id,
                 eos_token_id=self.tokenizer.eos_token_id
             )
-        
+        return outputs
+    
+    def _new_kv_cache(self):
+        """按配置新建压缩KV缓存（未配置时返回None，使用默认缓存）"""
+        if not self.kv_cache_config:
+            return None
+        from src.kv_cache import CompressedKVCache
+        return CompressedKVCache(self.model.config, **self.kv_cache_config)
+    
+    def _sample_self_consistency(self, inputs, max_tokens: int):
+        """共享prefill采样self_consistency条CoT推理，返回 (k, L+n)"""
+        from src.self_consistency import sample_with_shared_prefill
+        return sample_with_shared_prefill(
+            self.model,
+            inputs.input_ids,
+            self.self_consistency,
+            max_tokens,
+            temperature=self.sc_temperature,
+            top_p=0.9,
+            repetition_penalty=1.1,
+            pad_token_id=self.tokenizer.pad_token_id,
+            eos_token_id=self.tokenizer.eos_token_id,
+            cache=self._new_kv_cache()
+        )
+    
+    def _vote_local(self, inputs, outputs) -> Tuple[str, List[str], float]:
+        """解码k条推理并投票，返回 (选中的完整输出, 各条提取的答案, 选中答案的一致度)"""
+        from src.prompt_builder import extract_answer_from_cot
+        from src.self_consistency import vote_answers
+        samples = [self._decode_local(inputs, outputs[i:i + 1]) for i in range(outputs.shape[0])]
+        extracted = [extract_answer_from_cot(sample) for sample in samples]
+        best, scores = vote_answers([a for a, _ in extracted], [t for _, t in extracted])
+        return samples[best], [a for a, _ in extracted], scores[best]
+    
+    def _decode_local(self, inputs, outputs) -> str:
+        """解码新生成的部分"""
         generated_text = self.tokenizer.decode(
             outputs[0][len(inputs.input_ids[0]):],
             skip_special_tokens=True
@@ -103,35 +295,14 @@ class ModelEvaluator:
                     print(f"API调用失败: {e}")
                     return ""
     
-    def _evaluate_single(
+    def _build_result(
         self,
         item: Dict[str, Any],
-        prompt_builder,
-        max_tokens: int,
-        is_cot: bool = False
+        raw_prediction: str,
+        inference_time: float,
+        is_cot: bool
     ) -> Dict[str, Any]:
-        """
-        评测单个样本
-        
-        Args:
-            item: 单个评测样本
-            prompt_builder: prompt构建函数
-            max_tokens: 最大生成token数
-            is_cot: 是否是CoT模式（需要提取答案）
-            
-        Returns:
-            评测结果
-        """
-        start_time = time.time()
-        
-        # 构建prompt
-        prompt = prompt_builder(item["full_question"])
-        
-        # 生成回答
-        raw_prediction = self.generate(prompt, max_tokens=max_tokens)
-        
-        inference_time = time.time() - start_time
-        
+        """由生成结果构建评测记录（CoT模式提取答案标签）"""
         # 如果是CoT，提取答案标签
         if is_cot:
             from src.prompt_builder import extract_answer_from_cot
@@ -192,14 +363,9 @@ class ModelEvaluator:
         if is_cot:
             print("⚠️  CoT模式：将提取<答案>标签中的内容进行评测")
         
-        if self.mode == "api" and num_workers > 1:
-            results = self._batch_evaluate_parallel(
-                eval_data, prompt_builder, mode_name, max_tokens, num_workers, is_cot
-            )
-        else:
-            results = self._batch_evaluate_sequential(
-                eval_data, prompt_builder, mode_name, max_tokens, is_cot
-            )
+        results = self._batch_evaluate_pipelined(
+            eval_data, prompt_builder, mode_name, max_tokens, num_workers, is_cot
+        )
         
         # 统计CoT标签使用情况
         if is_cot:
@@ -210,22 +376,90 @@ class ModelEvaluator:
         
         return results
     
-    def _batch_evaluate_sequential(
+    def _pipeline_stages(self, prompt_builder, max_tokens: int, num_workers: int, is_cot: bool):
+        """评测的三个阶段：准备（prompt+分词）→ 生成 → 后处理（解码、答案提取、逐条打分）"""
+        from src.eval_pipeline import Stage
+        from src.metrics import calculate_token_f1
+        from src.task_types import classify_instruction
+        
+        def prepare(item, _):
+            prompt = prompt_builder(item["full_question"])
+            if self.mode == "local":
+                return self._tokenize_local(prompt)
+            return prompt
+        
+        def generate(item, prepared):
+            if self.mode == "local":
+                if is_cot and self.self_consistency > 1:
+                    return prepared, self._sample_self_consistency(prepared, max_tokens)
+                task_type = classify_instruction(item.get("instruction"))
+                return prepared, self._generate_ids(prepared, max_tokens, 0.1, task_type)
+            return None, self._generate_api(prepared, max_tokens, 0.1)
+        
+        def postprocess(item, generated):
+            inputs, output = generated
+            t0 = time.time()
+            voted = self.mode == "local" and is_cot and self.self_consistency > 1
+            if voted:
+                raw_prediction, sc_answers, sc_agreement = self._vote_local(inputs, output)
+            elif self.mode == "local":
+                raw_prediction = self._decode_local(inputs, output)
+            else:
+                raw_prediction = output
+            decode_time = time.time() - t0
+            result = self._build_result(item, raw_prediction, decode_time, is_cot)
+            if voted:
+                result["sc_answers"] = sc_answers
+                result["sc_agreement"] = sc_agreement
+            result["f1"] = calculate_token_f1(result["prediction"], result["reference"])["f1"]
+            return result
+        
+        workers = num_workers if self.mode == "api" else 1
+        return [
+            Stage("准备", prepare),
+            Stage("生成", generate, workers=workers),
+            Stage("后处理", postprocess),
+        ]
+    
+    def _finish_result(self, idx: int, item: Dict[str, Any], result, timings: Dict[str, float]) -> Dict[str, Any]:
+        """失败样本记为空预测；成功样本的推理时间 = 准备 + 生成 + 解码（不含排队等待和打分）"""
+        from src.eval_pipeline import StageError
+        
+        if isinstance(result, StageError):
+            print(f"\n样本 {idx} 评测失败（{result.stage}）: {result.error}")
+            return {
+                "id": item["id"],
+                "reference": item.get("output", ""),
+                "prediction": "",
+                "inference_time": 0,
+                "error": str(result.error)
+            }
+        result["inference_time"] += timings["准备"] + timings["生成"]
+        return result
+    
+    def evaluate_item(
         self,
-        eval_data: List[Dict[str, Any]],
+        idx: int,
+        item: Dict[str, Any],
         prompt_builder,
-        mode_name: str,
         max_tokens: int,
-        is_cot: bool
-    ) -> List[Dict[str, Any]]:
-        """串行评测"""
-        results = []
-        for item in tqdm(eval_data, desc=f"{mode_name}评测"):
-            result = self._evaluate_single(item, prompt_builder, max_tokens, is_cot)
-            results.append(result)
-        return results
+        is_cot: bool = False
+    ) -> Dict[str, Any]:
+        """不经流水线、依次运行各阶段评测单条样本（数据并行的worker进程逐条领取样本时使用）"""
+        from src.eval_pipeline import StageError
+        
+        payload, timings = None, {}
+        for stage in self._pipeline_stages(prompt_builder, max_tokens, 1, is_cot):
+            t0 = time.time()
+            try:
+                payload = stage.fn(item, payload)
+            except Exception as e:
+                payload = StageError(stage.name, e)
+                break
+            timings[stage.name] = time.time() - t0
+        return self._finish_result(idx, item, payload, timings)
     
-    def _batch_evaluate_parallel(
+    def _batch_evaluate_pipelined(
         self,
         eval_data: List[Dict[str, Any]],
         prompt_builder,
@@ -234,49 +468,60 @@ class ModelEvaluator:
         num_workers: int,
         is_cot: bool
     ) -> List[Dict[str, Any]]:
-        """并行评测（API模式）"""
-        results = [None] * len(eval_data)
+        """
+        流水线评测：准备（prompt+分词）→ 生成 → 后处理（解码、答案提取、逐条打分）
         
-        with ThreadPoolExecutor(max_workers=num_workers) as executor:
-            future_to_idx = {
-                executor.submit(
-                    self._evaluate_single, 
-                    item, 
-                    prompt_builder, 
-                    max_tokens,
-                    is_cot
-                ): idx
-                for idx, item in enumerate(eval_data)
-            }
-            
-            with tqdm(total=len(eval_data), desc=f"{mode_name}评测(并发)") as pbar:
-                for future in as_completed(future_to_idx):
-                    idx = future_to_idx[future]
-                    try:
-                        result = future.result()
-                        results[idx] = result
-                    except Exception as e:
-                        print(f"\n样本 {idx} 评测失败: {e}")
-                        results[idx] = {
-                            "id": eval_data[idx]["id"],
-                            "prediction": "",
-                            "inference_time": 0,
-                            "error": str(e)
-                        }
-                    pbar.update(1)
+        各阶段在独立线程中运行、用有界队列连接；生成阶段在API模式下有num_workers个并发，
+        本地模式为1。结束后打印各阶段占用情况
+        """
+        from src.eval_pipeline import StagedPipeline, print_stage_report
+        
+        self.speculative_stats = {}
         
+        workers = num_workers if self.mode == "api" else 1
+        pipeline = StagedPipeline(
+            self._pipeline_stages(prompt_builder, max_tokens, num_workers, is_cot),
+            queue_size=max(4, workers * 2)
+        )
+        
+        results = [None] * len(eval_data)
+        with tqdm(total=len(eval_data), desc=f"{mode_name}评测") as pbar:
+            for idx, item, result, timings in pipeline.run(eval_data):
+                results[idx] = self._finish_result(idx, item, result, timings)
+                pbar.update(1)
+        
+        print_stage_report(pipeline.report(), pipeline.wall)
+        if self.speculative_stats:
+            from src.speculative import print_acceptance_report
+            print_acceptance_report(self.speculative_stats)
         return results
 
+def load_eval_data(file_path: str, split: str = "test") -> List[Dict[str, Any]]:
+    """
+    加载评测数据
+
+    .json 整体读入；.jsonl / .parquet / save_to_disk目录 返回按需读取的EvalSource
+    （支持len、下标、切片和shard，不会把整个评测集读入内存）
+    """
+    if file_path.endswith(".json"):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data
+    from src.eval_source import open_eval_source
+    return open_eval_source(file_path, split)
 
-def load_eval_data(file_path: str) -> List[Dict[str, Any]]:
-    """加载评测数据"""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    return data
 
+def save_results(results: List[Dict[str, Any]], output_path: str, eval_file: str = None):
+    """
+    保存评测结果
 
-def save_results(results: List[Dict[str, Any]], output_path: str):
-    """保存评测结果"""
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
+    .json 保存完整记录；.parquet / .jsonl.zst 只保存id、生成字段、耗时和逐条得分，
+    问题和参考答案读取时从eval_file关联（见 src/result_store.py）
+    """
+    if output_path.endswith(".json"):
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    else:
+        from src.result_store import write_result_store
+        write_result_store(results, output_path, eval_file)
     print(f"✓ 结果已保存: {output_path}")
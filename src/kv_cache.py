@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+压缩KV缓存（长CoT生成）
+最近的 block_size 个token保持原精度，更早的KV按块压缩：int8/int4分组量化（key按通道、value按token分组），
+可选把这些旧块放到CPU内存，每步解码时再搬回计算设备；纯PyTorch实现，不依赖quanto/hqq
+"""
+import math
+from typing import List, Optional, Tuple
+
+import torch
+from transformers.cache_utils import Cache, DynamicLayer
+
+KV_CACHE_BITS = (8, 4)
+
+
+def quantize_groups(x: torch.Tensor, nbits: int, group_size: int) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    """
+    沿最后一维按 group_size 分组做非对称量化
+
+    Returns:
+        (q, scale, minimum)：q为uint8（int4时两个值打包成一个字节），scale/minimum为float16
+    """
+    levels = 2 ** nbits - 1
+    groups = x.float().unflatten(-1, (-1, group_size))
+    minimum = groups.amin(dim=-1, keepdim=True)
+    scale = (groups.amax(dim=-1, keepdim=True) - minimum).clamp(min=1e-6) / levels
+    q = ((groups - minimum) / scale).round_().clamp_(0, levels).to(torch.uint8).flatten(-2)
+    if nbits == 4:
+        q = q[..., 0::2] | (q[..., 1::2] << 4)
+    return q, scale.half(), minimum.half()
+
+
+def dequantize_groups(q: torch.Tensor, scale: torch.Tensor, minimum: torch.Tensor, nbits: int,
+                      dtype: torch.dtype) -> torch.Tensor:
+    """quantize_groups 的逆变换"""
+    if nbits == 4:
+        q = torch.stack([q & 0x0F, q >> 4], dim=-1).flatten(-2)
+    groups = q.unflatten(-1, (scale.shape[-2], -1)).float()
+    return (groups * scale.float() + minimum.float()).flatten(-2).to(dtype)
+
+
+class CompressedKVLayer(DynamicLayer):
+    """单层压缩KV缓存：self.keys/self.values 为原精度的最近部分，self.blocks 为压缩后的旧块"""
+
+    is_croppable = False
+
+    def __init__(self, nbits: Optional[int] = 8, offload: bool = False, block_size: int = 128,
+                 group_size: int = 64):
+        super().__init__()
+        if nbits is not None and nbits not in KV_CACHE_BITS:
+            raise ValueError(f"不支持的KV缓存位数: {nbits}（可选: {KV_CACHE_BITS}）")
+        if block_size % 2:
+            raise ValueError("block_size 需为偶数")
+        self.nbits = nbits
+        self.offload = offload
+        self.block_size = block_size
+        self.group_size = group_size
+        self.cumulative_length = 0
+        self.blocks: List[tuple] = []
+
+    def _compress(self, keys: torch.Tensor, values: torch.Tensor) -> tuple:
+        if self.nbits is not None:
+            # key的离群值集中在少数通道，按通道（块内全部token为一组）量化；value按token在head_dim上分组
+            head_dim = values.shape[-1]
+            group_size = math.gcd(self.group_size, head_dim)
+            block = (*quantize_groups(keys.transpose(-1, -2), self.nbits, keys.shape[-2]),
+                     *quantize_groups(values, self.nbits, group_size))
+        else:
+            block = (keys, values)
+        if self.offload:
+            block = tuple(t.to("cpu") for t in block)
+        return block
+
+    def _decompress(self, block: tuple) -> Tuple[torch.Tensor, torch.Tensor]:
+        block = tuple(t.to(self.device, non_blocking=True) for t in block)
+        if self.nbits is None:
+            return block
+        keys = dequantize_groups(*block[:3], self.nbits, self.dtype).transpose(-1, -2)
+        values = dequantize_groups(*block[3:], self.nbits, self.dtype)
+        return keys, values
+
+    def update(self, key_states: torch.Tensor, value_states: torch.Tensor, *args, **kwargs
+               ) -> Tuple[torch.Tensor, torch.Tensor]:
+        if not self.is_initialized:
+            self.lazy_initialization(key_states, value_states)
+        self.cumulative_length += key_states.shape[-2]
+        self.keys = torch.cat([self.keys, key_states], dim=-2)
+        self.values = torch.cat([self.values, value_states], dim=-2)
+
+        restored = [self._decompress(block) for block in self.blocks]
+        keys = torch.cat([k for k, _ in restored] + [self.keys], dim=-2)
+        values = torch.cat([v for _, v in restored] + [self.values], dim=-2)
+
+        # 超出block_size的最早部分按块压缩（本步注意力仍用原精度）
+        while self.keys.shape[-2] > self.block_size:
+            self.blocks.append(self._compress(self.keys[..., :self.block_size, :], self.values[..., :self.block_size, :]))
+            self.keys = self.keys[..., self.block_size:, :].clone()
+            self.values = self.values[..., self.block_size:, :].clone()
+        return keys, values
+
+    def get_seq_length(self) -> int:
+        return self.cumulative_length
+
+    def nbytes(self) -> int:
+        """缓存占用字节数（含CPU上的旧块）"""
+        if not self.is_initialized:
+            return 0
+        tensors = [self.keys, self.values] + [t for block in self.blocks for t in block]
+        return sum(t.numel() * t.element_size() for t in tensors)
+
+    def _map_batch(self, fn):
+        if not self.is_initialized:
+            return
+        self.keys, self.values = fn(self.keys), fn(self.values)
+        self.blocks = [tuple(fn(t) for t in block) for block in self.blocks]
+
+    def reorder_cache(self, beam_idx: torch.LongTensor) -> None:
+        self._map_batch(lambda t: t.index_select(0, beam_idx.to(t.device)))
+
+    def batch_select_indices(self, indices: torch.Tensor) -> None:
+        self._map_batch(lambda t: t[indices.to(t.device)])
+
+    def batch_repeat_interleave(self, repeats: int) -> None:
+        self._map_batch(lambda t: t.repeat_interleave(repeats, dim=0))
+
+    def reset(self) -> None:
+        self.blocks = []
+        super().reset()
+
+
+class CompressedKVCache(Cache):
+    """
+    压缩KV缓存，可直接作为 model.generate(past_key_values=...) 传入（每次生成新建一个）
+
+    Args:
+        nbits: 8 / 4，None为不量化（只做CPU卸载）
+        offload: 把压缩后的旧块放在CPU内存
+        block_size: 保持原精度的最近token数，也是压缩块的大小
+        group_size: value量化的分组大小（沿head_dim）
+    """
+
+    def __init__(self, config, nbits: Optional[int] = 8, offload: bool = False, block_size: int = 128,
+                 group_size: int = 64):
+        config = config.get_text_config(decoder=True)
+        super().__init__(layers=[
+            CompressedKVLayer(nbits, offload, block_size, group_size) for _ in range(config.num_hidden_layers)
+        ])
+
+    def nbytes(self) -> int:
+        return sum(layer.nbytes() for layer in self.layers)
+
+
+def dynamic_cache_nbytes(cache: Cache) -> int:
+    """普通DynamicCache的占用字节数（与CompressedKVCache.nbytes对比用）"""
+    return sum(layer.keys.numel() * layer.keys.element_size() * 2 for layer in cache.layers if layer.is_initialized)
+
+
+def describe_kv_cache(nbits: Optional[int], offload: bool) -> str:
+    name = f"int{nbits}" if nbits else "原精度"
+    return name + ("+CPU卸载" if offload else "")
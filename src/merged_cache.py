@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合并LoRA权重缓存
+首次使用时把LoRA合并进基座权重，按 基座模型+adapter 的指纹保存为分片safetensors；
+之后直接从缓存加载（safetensors按内存映射读取），推理时不再有LoRA旁路的额外矩阵乘
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Optional
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer
+
+MARKER = "merged.json"
+
+
+def _hash_file(h, path: str):
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+
+
+def resolve_model_dir(model_path: str) -> Optional[str]:
+    """本地目录原样返回；Hub模型ID解析为本地缓存的快照目录，尚未下载时返回None"""
+    if os.path.isdir(model_path):
+        return model_path
+    try:
+        from huggingface_hub import snapshot_download
+        return snapshot_download(model_path, local_files_only=True)
+    except Exception:
+        return None
+
+
+def merged_cache_key(model_path: str, lora_path: Optional[str], dtype: torch.dtype = torch.bfloat16) -> str:
+    """
+    基座模型 + adapter 的指纹
+
+    adapter（几百MB以内）按内容哈希；基座权重文件很大，按 文件名+大小 计入，
+    配置文件按内容计入；lora_path为空时只计基座模型。
+    model_path可以是Hub模型ID（按本地缓存的快照计算，尚未下载时只计模型ID）
+    """
+    h = hashlib.sha256()
+    h.update(str(dtype).encode())
+    model_dir = resolve_model_dir(model_path)
+    if model_dir is None:
+        h.update(model_path.encode('utf-8'))
+    for name in sorted(os.listdir(model_dir)) if model_dir else []:
+        path = os.path.join(model_dir, name)
+        if not os.path.isfile(path):
+            continue
+        h.update(name.encode('utf-8'))
+        if name.endswith((".json", ".txt", ".model", ".tiktoken")):
+            _hash_file(h, path)
+        else:
+            h.update(str(os.path.getsize(path)).encode())
+    for name in sorted(os.listdir(lora_path)) if lora_path else []:
+        path = os.path.join(lora_path, name)
+        if os.path.isfile(path) and name.startswith("adapter_"):
+            h.update(name.encode('utf-8'))
+            _hash_file(h, path)
+    return h.hexdigest()[:16]
+
+
+def build_merged_checkpoint(model_path: str, lora_path: str, output_dir: str,
+                            dtype: torch.dtype = torch.bfloat16, max_shard_size: str = "2GB"):
+    """合并LoRA并保存为分片safetensors（先写临时目录，完成后再改名，中断不会留下半成品）"""
+    from peft import PeftModel
+
+    tmp_dir = output_dir + ".tmp"
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    t0 = time.time()
+    base = AutoModelForCausalLM.from_pretrained(model_path, torch_dtype=dtype, trust_remote_code=True)
+    model = PeftModel.from_pretrained(base, lora_path, torch_dtype=dtype).merge_and_unload()
+    model.save_pretrained(tmp_dir, safe_serialization=True, max_shard_size=max_shard_size)
+    AutoTokenizer.from_pretrained(model_path, trust_remote_code=True).save_pretrained(tmp_dir)
+    with open(os.path.join(tmp_dir, MARKER), 'w', encoding='utf-8') as f:
+        json.dump({
+            "model_path": os.path.abspath(model_path) if os.path.isdir(model_path) else model_path,
+            "lora_path": os.path.abspath(lora_path),
+            "dtype": str(dtype),
+            "merge_time": time.time() - t0
+        }, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_dir, output_dir)
+
+
+def merged_checkpoint_dir(model_path: str, lora_path: str, cache_root: str = "models/merged",
+                          dtype: torch.dtype = torch.bfloat16) -> str:
+    """返回合并权重目录，不存在时先构建"""
+    name = f"{os.path.basename(os.path.normpath(lora_path))}-{merged_cache_key(model_path, lora_path, dtype)}"
+    output_dir = os.path.join(cache_root, name)
+    if not os.path.exists(os.path.join(output_dir, MARKER)):
+        print(f"⏳ 首次使用，合并LoRA权重并缓存到 {output_dir} ...")
+        os.makedirs(cache_root, exist_ok=True)
+        build_merged_checkpoint(model_path, lora_path, output_dir, dtype)
+    return output_dir
+
+
+def load_merged_model(model_path: str, lora_path: Optional[str], cache_root: str = "models/merged",
+                      dtype: torch.dtype = torch.bfloat16, device_map: Optional[str] = "auto"):
+    """加载合并后的模型（有缓存时直接内存映射读取；lora_path为空时没有可合并的权重，直接加载基座模型）"""
+    output_dir = merged_checkpoint_dir(model_path, lora_path, cache_root, dtype) if lora_path else model_path
+    return AutoModelForCausalLM.from_pretrained(
+        output_dir,
+        torch_dtype=dtype,
+        device_map=device_map,
+        trust_remote_code=True
+    )
@@ -76,6 +76,10 @@ def calculate_avg_f1(results: List[Dict[str, Any]]) -> float:
     """计算平均F1分数"""
     f1_scores = []
     for result in results:
+        if "f1" in result:
+            # 保存结果时已计算过逐条得分
+            f1_scores.append(result["f1"])
+            continue
         f1_data = calculate_token_f1(result["prediction"], result["reference"])
         f1_scores.append(f1_data["f1"])
     
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多数据源按比例流式混合
+  - 按权重确定性交错（步长调度，任意前缀上的比例都接近目标比例）
+  - Bloom过滤器精确去重（内存固定，与数据规模无关）
+  - 按字符数/token数过滤
+  - 固定大小的打乱缓冲区
+"""
+import math
+import random
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from src.dataset_export import training_query
+from src.splitting import expand_sources, iter_source_range, source_units
+
+
+def parse_sources(spec: str) -> List[Tuple[str, str, float]]:
+    """
+    解析数据源配置
+
+    Args:
+        spec: "名称=路径:权重,..."，如 "tcm=data/raw/tcm_sft:0.9,coig=data/raw/coig:0.1"
+
+    Returns:
+        [(名称, 路径, 归一化后的权重)]
+    """
+    sources = []
+    for part in spec.split(','):
+        name, rest = part.split('=', 1)
+        path, weight = rest.rsplit(':', 1)
+        sources.append((name.strip(), path.strip(), float(weight)))
+    total = sum(w for _, _, w in sources)
+    if total <= 0:
+        raise ValueError(f"权重之和必须大于0: {spec}")
+    return [(name, path, w / total) for name, path, w in sources]
+
+
+class MixtureScheduler:
+    """
+    步长调度（stride scheduling）
+
+    每个数据源维护一个进度值，每次选进度最小的数据源并把它的进度加上 1/权重，
+    结果是确定性的，且任意前缀中各数据源的条数与目标比例之差不超过1
+    """
+
+    def __init__(self, weights: List[float]):
+        self.strides = [1.0 / w if w > 0 else math.inf for w in weights]
+        self.passes = [stride / 2 for stride in self.strides]
+        self.active = [w > 0 for w in weights]
+
+    def next(self) -> Optional[int]:
+        """下一个数据源编号（所有数据源都已移除时返回None）"""
+        best = None
+        for i, active in enumerate(self.active):
+            if active and (best is None or self.passes[i] < self.passes[best]):
+                best = i
+        if best is not None:
+            self.passes[best] += self.strides[best]
+        return best
+
+    def remove(self, i: int):
+        self.active[i] = False
+
+
+class BloomFilter:
+    """
+    Bloom过滤器（用于去重，内存固定）
+
+    以64位内容哈希为输入，双重哈希生成k个位置；
+    误判（把新数据当成重复）的概率约为error_rate
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 1e-4):
+        self.num_bits = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def add(self, key: int) -> bool:
+        """加入一个哈希值，返回它之前是否（可能）已经存在"""
+        h1 = key & 0xFFFFFFFF
+        h2 = (key >> 32) | 1
+        present = True
+        for i in range(self.num_hashes):
+            bit = (h1 + i * h2) % self.num_bits
+            byte, mask = bit >> 3, 1 << (bit & 7)
+            if not self.bits[byte] & mask:
+                present = False
+                self.bits[byte] |= mask
+        return present
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+
+class ShuffleBuffer:
+    """固定大小的打乱缓冲区（缓冲区满后每进一条随机出一条）"""
+
+    def __init__(self, size: int, seed: int = 42):
+        self.size = size
+        self.rng = random.Random(seed)
+        self.buffer = []
+
+    def push(self, item: Any) -> Optional[Any]:
+        if self.size <= 1:
+            return item
+        if len(self.buffer) < self.size:
+            self.buffer.append(item)
+            return None
+        i = self.rng.randrange(self.size)
+        out, self.buffer[i] = self.buffer[i], item
+        return out
+
+    def drain(self) -> Iterator[Any]:
+        self.rng.shuffle(self.buffer)
+        yield from self.buffer
+        self.buffer = []
+
+
+class LengthFilter:
+    """按字符数（以及可选的token数）过滤样本"""
+
+    def __init__(self, min_chars: int = 1, max_chars: Optional[int] = None,
+                 tokenizer=None, max_tokens: Optional[int] = None, overhead: int = 0):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.overhead = overhead
+
+    def __call__(self, items: List[Dict[str, Any]]) -> List[bool]:
+        keep = []
+        for item in items:
+            output = (item.get("output") or "").strip()
+            n = len(training_query(item)) + len(output)
+            keep.append(bool(output) and n >= self.min_chars and (self.max_chars is None or n <= self.max_chars))
+        if self.tokenizer is not None and self.max_tokens:
+            texts = [training_query(item) + (item.get("output") or "") for item in items]
+            ids = self.tokenizer(texts, add_special_tokens=False)["input_ids"]
+            keep = [k and len(x) + self.overhead <= self.max_tokens for k, x in zip(keep, ids)]
+        return keep
+
+
+def source_stream(path: str, length_filter: LengthFilter, stats: Dict[str, int],
+                  batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+    """
+    逐条读取一个数据源（Arrow目录 / JSONL文件 / JSONL分片目录）中通过长度过滤的样本
+
+    Args:
+        stats: 计数（read / filtered），原地更新
+    """
+    def flush(batch):
+        if not batch:
+            return
+        for item, ok in zip(batch, length_filter(batch)):
+            if ok:
+                yield item
+            else:
+                stats["filtered"] += 1
+
+    batch = []
+    for source in expand_sources(path):
+        for item in iter_source_range(source, 0, source_units(source)[1]):
+            stats["read"] += 1
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield from flush(batch)
+                batch = []
+    yield from flush(batch)
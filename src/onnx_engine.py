@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ONNX Runtime 推理后端
+把（合并LoRA后的）因果语言模型导出为带 past_key_values 输入/输出的ONNX图，
+按 基座模型+adapter 指纹缓存导出结果（可选int8权重量化），推理时用ONNX Runtime逐token解码
+"""
+import json
+import os
+import shutil
+import time
+from typing import Iterable, List, Optional, Union
+
+import numpy as np
+import torch
+from transformers import DynamicCache
+
+from src.compiled_engine import build_logits_processors, select_next_token
+from src.merged_cache import merged_cache_key
+
+META_FILE = "onnx_meta.json"
+MODEL_FILE = "model.onnx"
+INT8_MODEL_FILE = "model_int8.onnx"
+
+
+class _PastKeyValuesWrapper(torch.nn.Module):
+    """把Cache对象展开成逐层的key/value张量，便于导出为ONNX的输入输出"""
+
+    def __init__(self, model, num_layers: int):
+        super().__init__()
+        self.model = model
+        self.num_layers = num_layers
+
+    def forward(self, input_ids, attention_mask, position_ids, *past):
+        cache = DynamicCache()
+        for i in range(self.num_layers):
+            cache.update(past[2 * i], past[2 * i + 1], i)
+        outputs = self.model(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            position_ids=position_ids,
+            past_key_values=cache,
+            use_cache=True
+        )
+        present = []
+        for layer in outputs.past_key_values.layers:
+            present += [layer.keys, layer.values]
+        return (outputs.logits, *present)
+
+
+def _kv_names(prefix: str, num_layers: int) -> List[str]:
+    return [f"{prefix}.{i}.{kv}" for i in range(num_layers) for kv in ("key", "value")]
+
+
+def export_onnx(model_path: str, lora_path: Optional[str], output_dir: str, opset: int = 17):
+    """
+    导出ONNX（fp32，LoRA先合并；先写临时目录再改名）
+
+    使用eager注意力导出，mask由attention_mask显式计算，prefill（past长度为0）和逐token解码共用一张图
+    """
+    from src.cpu_engine import load_cpu_model
+
+    tmp_dir = output_dir + ".tmp"
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+    t0 = time.time()
+
+    model = load_cpu_model(model_path, lora_path, precision="fp32")
+    model.set_attn_implementation("eager")
+    config = model.config
+    num_layers = config.num_hidden_layers
+    num_kv_heads = config.num_key_value_heads
+    head_dim = getattr(config, "head_dim", None) or config.hidden_size // config.num_attention_heads
+
+    past_len, query_len = 4, 3
+    past = [torch.zeros(1, num_kv_heads, past_len, head_dim) for _ in range(2 * num_layers)]
+    example = (
+        torch.ones((1, query_len), dtype=torch.long),
+        torch.ones((1, past_len + query_len), dtype=torch.long),
+        torch.arange(past_len, past_len + query_len).unsqueeze(0),
+        *past
+    )
+    past_names = _kv_names("past_key_values", num_layers)
+    present_names = _kv_names("present", num_layers)
+    dynamic_axes = {
+        "input_ids": {1: "query_length"},
+        "attention_mask": {1: "total_length"},
+        "position_ids": {1: "query_length"},
+        "logits": {1: "query_length"},
+    }
+    dynamic_axes.update({name: {2: "past_length"} for name in past_names})
+    dynamic_axes.update({name: {2: "total_length"} for name in present_names})
+
+    with torch.no_grad():
+        torch.onnx.export(
+            _PastKeyValuesWrapper(model, num_layers),
+            example,
+            os.path.join(tmp_dir, MODEL_FILE),
+            input_names=["input_ids", "attention_mask", "position_ids"] + past_names,
+            output_names=["logits"] + present_names,
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            dynamo=False
+        )
+
+    with open(os.path.join(tmp_dir, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump({
+            "model_path": os.path.abspath(model_path),
+            "lora_path": os.path.abspath(lora_path) if lora_path else None,
+            "num_layers": num_layers,
+            "num_kv_heads": num_kv_heads,
+            "head_dim": head_dim,
+            "opset": opset,
+            "export_time": time.time() - t0
+        }, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_dir, output_dir)
+
+
+def quantize_onnx_int8(model_dir: str):
+    """对导出的图做int8动态量化（MatMul/Gather权重int8存储）"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    tmp_path = os.path.join(model_dir, INT8_MODEL_FILE + ".tmp")
+    quantize_dynamic(
+        os.path.join(model_dir, MODEL_FILE),
+        tmp_path,
+        weight_type=QuantType.QInt8,
+        use_external_data_format=True
+    )
+    os.replace(tmp_path, os.path.join(model_dir, INT8_MODEL_FILE))
+
+
+def onnx_model_dir(model_path: str, lora_path: Optional[str] = None, cache_root: str = "models/onnx",
+                   int8: bool = False) -> str:
+    """返回ONNX缓存目录，不存在时先导出（int8版本按需另外生成）"""
+    name = os.path.basename(os.path.normpath(lora_path or model_path))
+    model_dir = os.path.join(cache_root, f"{name}-{merged_cache_key(model_path, lora_path, torch.float32)}")
+    if not os.path.exists(os.path.join(model_dir, META_FILE)):
+        print(f"⏳ 首次使用，导出ONNX到 {model_dir} ...")
+        os.makedirs(cache_root, exist_ok=True)
+        export_onnx(model_path, lora_path, model_dir)
+    if int8 and not os.path.exists(os.path.join(model_dir, INT8_MODEL_FILE)):
+        print("⏳ int8量化ONNX权重 ...")
+        quantize_onnx_int8(model_dir)
+    return model_dir
+
+
+class OnnxCausalLM:
+    """ONNX Runtime因果语言模型（batch size 1），generate与CompiledDecoder接口相同"""
+
+    def __init__(self, model_dir: str, int8: bool = False, num_threads: Optional[int] = None):
+        import onnxruntime as ort
+
+        with open(os.path.join(model_dir, META_FILE), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = num_threads or torch.get_num_threads()
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        path = os.path.join(model_dir, INT8_MODEL_FILE if int8 else MODEL_FILE)
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.device = torch.device("cpu")
+        self.num_layers = self.meta["num_layers"]
+        self.past_names = _kv_names("past_key_values", self.num_layers)
+
+    def _empty_past(self) -> List[np.ndarray]:
+        shape = (1, self.meta["num_kv_heads"], 0, self.meta["head_dim"])
+        return [np.zeros(shape, dtype=np.float32) for _ in self.past_names]
+
+    def forward(self, input_ids: np.ndarray, past: List[np.ndarray]):
+        """返回 (logits, present)"""
+        past_len = past[0].shape[2]
+        query_len = input_ids.shape[1]
+        feed = {
+            "input_ids": input_ids,
+            "attention_mask": np.ones((1, past_len + query_len), dtype=np.int64),
+            "position_ids": np.arange(past_len, past_len + query_len, dtype=np.int64)[None],
+        }
+        feed.update(zip(self.past_names, past))
+        outputs = self.session.run(None, feed)
+        return outputs[0], outputs[1:]
+
+    def generate(
+        self,
+        input_ids: torch.Tensor,
+        max_new_tokens: int,
+        temperature: float = 0.0,
+        top_p: float = 1.0,
+        repetition_penalty: float = 1.0,
+        eos_token_id: Optional[Union[int, Iterable[int]]] = None
+    ) -> torch.Tensor:
+        """采样参数与 model.generate 相同（temperature为0时贪心），返回 prompt+生成部分 (1, L+n)"""
+        if isinstance(eos_token_id, int):
+            eos_token_id = [eos_token_id]
+        eos = set(eos_token_id or [])
+        processors = build_logits_processors(temperature, top_p, repetition_penalty)
+
+        ids = input_ids.cpu()
+        logits, past = self.forward(ids.numpy().astype(np.int64), self._empty_past())
+        for step in range(max_new_tokens):
+            scores = processors(ids, torch.from_numpy(logits[:, -1]).float())
+            token = select_next_token(scores, temperature > 0)
+            ids = torch.cat([ids, token.to(ids.dtype)], dim=1)
+            if int(token) in eos or step == max_new_tokens - 1:
+                break
+            logits, past = self.forward(token.numpy().astype(np.int64), past)
+        return ids
+
+
+def load_onnx_model(model_path: str, lora_path: Optional[str] = None, cache_root: str = "models/onnx",
+                    int8: bool = False, num_threads: Optional[int] = None) -> OnnxCausalLM:
+    """加载（必要时先导出/量化）ONNX模型"""
+    return OnnxCausalLM(onnx_model_dir(model_path, lora_path, cache_root, int8), int8, num_threads)
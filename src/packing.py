@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+预分词 + 序列打包
+用Qwen对话模板一次性分词，多条样本打包进固定长度序列：
+  - attention_mask 为段编号（1,2,3...，padding为0），与LLaMA-Factory neat_packing 一致，
+    不同样本之间互不可见
+  - position_ids 在每条样本开头重新从0计数
+  - labels 中prompt部分为 -100，只对回答计算loss
+结果写成可内存映射的定长二进制分片
+"""
+import bisect
+import hashlib
+import json
+import os
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+
+from src.dataset_export import training_query
+
+IGNORE_INDEX = -100
+PACKING_VERSION = 1
+
+# 各字段的存储类型
+FIELDS = {
+    "input_ids": np.int32,
+    "labels": np.int32,
+    "attention_mask": np.int16,
+    "position_ids": np.int16,
+}
+
+
+def packing_fingerprint(tokenizer, sources: List[str], seq_len: int, truncate: bool) -> str:
+    """
+    打包结果的指纹，任何一项变化都需要重新构建：
+    分词器词表、对话模板、打包参数、数据源（路径、大小、修改时间）
+    """
+    h = hashlib.sha256()
+    h.update(tokenizer.backend_tokenizer.to_str().encode("utf-8"))
+    h.update((tokenizer.chat_template or "").encode("utf-8"))
+    h.update(json.dumps({"seq_len": seq_len, "truncate": truncate, "version": PACKING_VERSION}).encode())
+    for path in sources:
+        files = [path]
+        if os.path.isdir(path):
+            files = sorted(os.path.join(path, f) for f in os.listdir(path))
+        for f in files:
+            st = os.stat(f)
+            h.update(f"{os.path.abspath(f)}:{st.st_size}:{int(st.st_mtime)}".encode("utf-8"))
+    return h.hexdigest()
+
+
+def tokenize_samples(tokenizer, items: List[Dict[str, Any]]) -> List[Tuple[List[int], int]]:
+    """
+    按对话模板分词
+
+    Returns:
+        [(input_ids, prompt_len)]，prompt_len之前的token不计算loss
+    """
+    full_texts = []
+    prompt_texts = []
+    for item in items:
+        user = [{"role": "user", "content": training_query(item)}]
+        prompt_texts.append(tokenizer.apply_chat_template(user, tokenize=False, add_generation_prompt=True))
+        full_texts.append(tokenizer.apply_chat_template(
+            user + [{"role": "assistant", "content": item.get("output") or ""}], tokenize=False
+        ))
+    full_ids = tokenizer(full_texts, add_special_tokens=False)["input_ids"]
+    prompt_ids = tokenizer(prompt_texts, add_special_tokens=False)["input_ids"]
+    # 模板的特殊token把prompt和回答隔开，prompt的分词结果是完整分词结果的前缀
+    return [(ids, len(p)) for ids, p in zip(full_ids, prompt_ids)]
+
+
+def pack_lengths(lengths: List[int], seq_len: int) -> List[List[int]]:
+    """
+    Best-Fit-Decreasing 装箱
+
+    从长到短放入剩余空间最小且放得下的序列；剩余空间用有序列表+二分查找维护
+
+    Args:
+        lengths: 每条样本的长度（均不超过seq_len）
+        seq_len: 序列长度
+
+    Returns:
+        每个序列包含的样本下标
+    """
+    order = sorted(range(len(lengths)), key=lambda i: -lengths[i])
+    bins = []
+    free = []  # 有序的 (剩余空间, 序列编号)
+    for i in order:
+        n = lengths[i]
+        pos = bisect.bisect_left(free, (n, -1))
+        if pos < len(free):
+            space, b = free.pop(pos)
+            bins[b].append(i)
+        else:
+            space, b = seq_len, len(bins)
+            bins.append([i])
+        if space - n > 0:
+            bisect.insort(free, (space - n, b))
+    return bins
+
+
+def build_packed_arrays(
+    samples: List[Tuple[List[int], int]],
+    bins: List[List[int]],
+    seq_len: int,
+    pad_id: int
+) -> Dict[str, np.ndarray]:
+    """把装箱结果写成定长数组"""
+    n = len(bins)
+    arrays = {
+        "input_ids": np.full((n, seq_len), pad_id, dtype=FIELDS["input_ids"]),
+        "labels": np.full((n, seq_len), IGNORE_INDEX, dtype=FIELDS["labels"]),
+        "attention_mask": np.zeros((n, seq_len), dtype=FIELDS["attention_mask"]),
+        "position_ids": np.zeros((n, seq_len), dtype=FIELDS["position_ids"]),
+    }
+    for row, members in enumerate(bins):
+        pos = 0
+        for segment, i in enumerate(members, start=1):
+            ids, prompt_len = samples[i]
+            length = len(ids)
+            arrays["input_ids"][row, pos:pos + length] = ids
+            arrays["labels"][row, pos + prompt_len:pos + length] = ids[prompt_len:]
+            arrays["attention_mask"][row, pos:pos + length] = segment
+            arrays["position_ids"][row, pos:pos + length] = np.arange(length)
+            pos += length
+    return arrays
+
+
+class PackedShardWriter:
+    """追加写入定长二进制分片（内存占用只与一个窗口有关）"""
+
+    def __init__(self, shard_dir: str, seq_len: int):
+        os.makedirs(shard_dir, exist_ok=True)
+        self.shard_dir = shard_dir
+        self.seq_len = seq_len
+        self.rows = 0
+        self._files = {k: open(f"{shard_dir}/{k}.bin", 'wb') for k in FIELDS}
+
+    def write(self, arrays: Dict[str, np.ndarray]):
+        for k, f in self._files.items():
+            f.write(np.ascontiguousarray(arrays[k], dtype=FIELDS[k]).tobytes())
+        self.rows += len(arrays["input_ids"])
+
+    def close(self) -> Dict[str, Any]:
+        for f in self._files.values():
+            f.close()
+        meta = {
+            "rows": self.rows,
+            "seq_len": self.seq_len,
+            "dtypes": {k: np.dtype(v).name for k, v in FIELDS.items()}
+        }
+        with open(f"{self.shard_dir}/meta.json", 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        return meta
+
+
+class WindowPacker:
+    """
+    流式打包：逐条加入样本，按批分词，凑满一个窗口后装箱写出
+
+    超长样本默认截断到seq_len（截断后没有回答token的样本丢弃），drop_long时直接丢弃
+    """
+
+    def __init__(self, tokenizer, writer: PackedShardWriter, seq_len: int,
+                 window: int = 20000, batch_size: int = 1000, drop_long: bool = False):
+        self.tokenizer = tokenizer
+        self.writer = writer
+        self.seq_len = seq_len
+        self.window = window
+        self.batch_size = batch_size
+        self.drop_long = drop_long
+        self.pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+        self.stats = {"samples": 0, "tokens": 0, "truncated": 0, "dropped": 0}
+        self.lengths = []
+        self._batch = []
+        self._pending = []
+
+    def add(self, item: Dict[str, Any]):
+        self._batch.append(item)
+        if len(self._batch) >= self.batch_size:
+            self._tokenize_batch()
+            if len(self._pending) >= self.window:
+                self._pack_pending()
+
+    def flush(self):
+        """把缓冲中的样本全部打包写出"""
+        self._tokenize_batch()
+        self._pack_pending()
+
+    def _tokenize_batch(self):
+        if not self._batch:
+            return
+        for ids, prompt_len in tokenize_samples(self.tokenizer, self._batch):
+            if len(ids) > self.seq_len:
+                if self.drop_long or prompt_len >= self.seq_len:
+                    self.stats["dropped"] += 1
+                    continue
+                ids = ids[:self.seq_len]
+                self.stats["truncated"] += 1
+            self._pending.append((ids, prompt_len))
+            self.lengths.append(len(ids))
+            self.stats["samples"] += 1
+            self.stats["tokens"] += len(ids)
+        self._batch = []
+
+    def _pack_pending(self):
+        if not self._pending:
+            return
+        bins = pack_lengths([len(ids) for ids, _ in self._pending], self.seq_len)
+        self.writer.write(build_packed_arrays(self._pending, bins, self.seq_len, self.pad_id))
+        self._pending = []
+
+
+class PackedDataset:
+    """
+    打包数据集读取器（np.memmap，按需读取）
+
+    用法:
+        ds = PackedDataset("data/packed/tcm_train-xxxx")
+        batch = ds[0]  # {"input_ids": [seq_len], "labels": ..., "attention_mask": ..., "position_ids": ...}
+    """
+
+    def __init__(self, root: str):
+        with open(f"{root}/manifest.json", 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        self.seq_len = self.manifest["seq_len"]
+        self.shards = []
+        offsets = [0]
+        for name in self.manifest["shards"]:
+            shard_dir = f"{root}/{name}"
+            with open(f"{shard_dir}/meta.json", 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            arrays = {
+                k: np.memmap(f"{shard_dir}/{k}.bin", dtype=meta["dtypes"][k], mode='r',
+                             shape=(meta["rows"], meta["seq_len"]))
+                for k in FIELDS
+            } if meta["rows"] else None
+            self.shards.append(arrays)
+            offsets.append(offsets[-1] + meta["rows"])
+        self.offsets = np.array(offsets)
+
+    def __len__(self) -> int:
+        return int(self.offsets[-1])
+
+    def __getitem__(self, idx: int) -> Dict[str, np.ndarray]:
+        if idx < 0:
+            idx += len(self)
+        s = int(np.searchsorted(self.offsets, idx, side="right") - 1)
+        local = idx - self.offsets[s]
+        return {k: np.asarray(v[local]) for k, v in self.shards[s].items()}
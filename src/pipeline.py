@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量流水线
+每个阶段声明 命令 / 输入 / 输出 / 参数，按内容哈希计算指纹；
+指纹与上次成功运行一致且输出未被改动的阶段直接跳过，互不依赖的阶段并行运行
+"""
+import hashlib
+import json
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, List, Optional
+
+import yaml
+
+
+class Stage:
+    """流水线中的一个阶段"""
+
+    def __init__(self, name: str, cmd: str, deps: List[str] = None, outs: List[str] = None,
+                 params: Dict[str, Any] = None, after: List[str] = None):
+        """
+        Args:
+            name: 阶段名称
+            cmd: shell命令，可用 {参数名} 引用params
+            deps: 输入文件/目录（脚本本身也应列出），与cmd一样可引用params
+            outs: 输出文件/目录，与cmd一样可引用params
+            params: 参数（参与指纹计算）
+            after: 显式依赖的阶段（输入是其他阶段输出时会自动推断）
+        """
+        self.name = name
+        self.params = params or {}
+        self.cmd = cmd.format(**self.params)
+        self.deps = [d.format(**self.params) for d in deps or []]
+        self.outs = [o.format(**self.params) for o in outs or []]
+        self.after = list(after or [])
+
+
+def load_pipeline(path: str) -> Dict[str, Stage]:
+    """读取流水线定义（YAML，stages: {名称: {cmd, deps, outs, params, after}}）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    stages = {name: Stage(name, **spec) for name, spec in config["stages"].items()}
+
+    # 输入是其他阶段的输出（或位于其输出目录内）时，自动加入依赖
+    for stage in stages.values():
+        for other in stages.values():
+            if other is stage or other.name in stage.after:
+                continue
+            if any(_covers(out, dep) for dep in stage.deps for out in other.outs):
+                stage.after.append(other.name)
+        for name in stage.after:
+            if name not in stages:
+                raise ValueError(f"阶段 {stage.name} 依赖未定义的阶段 {name}")
+    return stages
+
+
+def _covers(out: str, dep: str) -> bool:
+    out, dep = os.path.normpath(out), os.path.normpath(dep)
+    return dep == out or dep.startswith(out + os.sep)
+
+
+class HashCache:
+    """文件内容哈希缓存（按 路径+大小+修改时间，未变化的文件不重复读取）"""
+
+    def __init__(self, entries: Optional[Dict[str, List]] = None):
+        self.entries = entries or {}
+
+    def file_hash(self, path: str) -> str:
+        st = os.stat(path)
+        cached = self.entries.get(path)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        digest = h.hexdigest()
+        self.entries[path] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def path_hash(self, path: str) -> Optional[str]:
+        """文件或目录的内容指纹；路径不存在返回None"""
+        if os.path.isfile(path):
+            return self.file_hash(path)
+        if not os.path.isdir(path):
+            return None
+        h = hashlib.sha256()
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+            for name in sorted(files):
+                full = os.path.join(root, name)
+                h.update(os.path.relpath(full, path).encode('utf-8'))
+                h.update(self.file_hash(full).encode('ascii'))
+        return h.hexdigest()
+
+
+class PipelineRunner:
+    """按依赖顺序运行阶段，跳过指纹未变化的阶段"""
+
+    def __init__(self, stages: Dict[str, Stage], state_dir: str = ".pipeline", jobs: int = 1,
+                 force: List[str] = None, dry_run: bool = False):
+        self.stages = stages
+        self.state_dir = state_dir
+        self.jobs = jobs
+        self.force = set(force or [])
+        self.dry_run = dry_run
+        os.makedirs(f"{state_dir}/logs", exist_ok=True)
+        self.state_file = f"{state_dir}/state.json"
+        state = {}
+        if os.path.exists(self.state_file):
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        self.records = state.get("stages", {})
+        self.cache = HashCache(state.get("hashes"))
+
+    def _save_state(self):
+        with open(self.state_file, 'w', encoding='utf-8') as f:
+            # 复制一份再写出（并行阶段可能同时在更新）
+            json.dump({"stages": dict(self.records), "hashes": dict(self.cache.entries)}, f, ensure_ascii=False, indent=1)
+
+    def plan(self, targets: List[str] = None) -> List[str]:
+        """目标阶段及其全部上游，按拓扑顺序"""
+        order, visiting = [], set()
+
+        def visit(name):
+            if name in order:
+                return
+            if name in visiting:
+                raise ValueError(f"阶段存在循环依赖: {name}")
+            visiting.add(name)
+            for dep in self.stages[name].after:
+                visit(dep)
+            visiting.discard(name)
+            order.append(name)
+
+        for name in targets or list(self.stages):
+            if name not in self.stages:
+                raise KeyError(f"未定义的阶段: {name}")
+            visit(name)
+        return order
+
+    def fingerprint(self, stage: Stage) -> str:
+        """命令 + 参数 + 全部输入内容的指纹"""
+        payload = {
+            "cmd": stage.cmd,
+            "params": stage.params,
+            "deps": {d: self.cache.path_hash(d) for d in stage.deps},
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _outs_hash(self, stage: Stage) -> Dict[str, Optional[str]]:
+        return {o: self.cache.path_hash(o) for o in stage.outs}
+
+    def is_fresh(self, stage: Stage, fingerprint: str) -> bool:
+        """上次成功运行的指纹一致，且输出都存在、未被改动"""
+        record = self.records.get(stage.name)
+        if stage.name in self.force or not record or record.get("fingerprint") != fingerprint:
+            return False
+        outs = self._outs_hash(stage)
+        return all(h is not None for h in outs.values()) and outs == record.get("outs")
+
+    def _execute(self, stage: Stage) -> Dict[str, Any]:
+        fingerprint = self.fingerprint(stage)
+        if self.is_fresh(stage, fingerprint):
+            return {"status": "skipped", "elapsed": 0.0, "saved": self.records[stage.name].get("elapsed", 0.0)}
+        missing = [d for d in stage.deps if not os.path.exists(d)]
+        if missing:
+            return {"status": "failed", "elapsed": 0.0, "error": f"缺少输入: {', '.join(missing)}"}
+        if self.dry_run:
+            return {"status": "would_run", "elapsed": 0.0}
+
+        print(f"▶ [{stage.name}] {stage.cmd}")
+        log_path = f"{self.state_dir}/logs/{stage.name}.log"
+        t0 = time.time()
+        if self.jobs > 1:
+            # 并行时各阶段输出写入单独的日志，避免交错
+            with open(log_path, 'w', encoding='utf-8') as log:
+                code = subprocess.call(stage.cmd, shell=True, stdout=log, stderr=subprocess.STDOUT)
+        else:
+            code = subprocess.call(stage.cmd, shell=True)
+        elapsed = time.time() - t0
+        if code != 0:
+            error = f"退出码 {code}" + (f"（日志: {log_path}）" if self.jobs > 1 else "")
+            return {"status": "failed", "elapsed": elapsed, "error": error}
+
+        self.records[stage.name] = {
+            "fingerprint": fingerprint,
+            "outs": self._outs_hash(stage),
+            "elapsed": elapsed,
+            "finished_at": time.time()
+        }
+        return {"status": "ran", "elapsed": elapsed}
+
+    def run(self, targets: List[str] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        运行目标阶段（及上游）
+
+        Returns:
+            {阶段名: {"status": ran/skipped/failed/blocked/would_run, "elapsed": 秒, ...}}
+        """
+        order = self.plan(targets)
+        results = {}
+        pending = list(order)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            while pending or running:
+                for name in list(pending):
+                    deps = self.stages[name].after
+                    if any(results.get(d, {}).get("status") in ("failed", "blocked") for d in deps):
+                        results[name] = {"status": "blocked", "elapsed": 0.0}
+                        pending.remove(name)
+                    elif any(results.get(d, {}).get("status") == "would_run" for d in deps):
+                        # 预演时上游会重新运行，下游的输入随之变化
+                        results[name] = {"status": "would_run", "elapsed": 0.0}
+                        pending.remove(name)
+                    elif all(d in results for d in deps) and len(running) < self.jobs:
+                        running[executor.submit(self._execute, self.stages[name])] = name
+                        pending.remove(name)
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        results[name] = {"status": "failed", "elapsed": 0.0, "error": str(e)}
+                    status = results[name]["status"]
+                    if status in ("ran", "failed"):
+                        print(f"{'✓' if status == 'ran' else '✗'} [{name}] {status} "
+                              f"({results[name]['elapsed']:.1f}秒) {results[name].get('error', '')}")
+                    if not self.dry_run:
+                        self._save_state()
+
+        return {name: results[name] for name in order}
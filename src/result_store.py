@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+评测结果存储（列式）
+每次评测只保存 id、生成字段、耗时和逐条得分，写成 Parquet(zstd) 或 zstd压缩的JSONL；
+instruction / input / full_question / reference 不重复保存，读取时按 id 从评测集关联。
+读取时可只取需要的列，旧版 predictions.json 仍可读取
+"""
+import json
+import os
+from typing import Dict, Any, Iterable, List, Optional
+
+# 评测集中已有、读取时按id关联的列 -> 评测集字段
+EVAL_COLUMNS = {
+    "instruction": "instruction",
+    "input": "input",
+    "full_question": "full_question",
+    "reference": "output",
+}
+
+# 结果文件中保存的列
+RESULT_COLUMNS = (
+    "id", "prediction", "raw_prediction", "has_answer_tags", "error",
+    "inference_time", "prediction_chars", "f1", "exact_match",
+)
+
+# 由 score_results 计算的逐条得分
+SCORE_COLUMNS = ("prediction_chars", "f1", "exact_match")
+
+RESULT_FILES = ("predictions.parquet", "predictions.jsonl.zst", "predictions.json")
+
+
+def score_results(results: List[Dict[str, Any]], with_f1: bool = True):
+    """为每条结果补充逐条得分（f1、exact_match、prediction_chars），已有的f1不重复计算"""
+    from src.metrics import calculate_token_f1
+    for r in results:
+        prediction = r.get("prediction") or ""
+        reference = r.get("reference") or ""
+        if with_f1 and "f1" not in r:
+            r["f1"] = calculate_token_f1(prediction, reference)["f1"]
+        r["exact_match"] = prediction.strip() == reference.strip()
+        r["prediction_chars"] = len(prediction)
+
+
+def _to_record(result: Dict[str, Any]) -> Dict[str, Any]:
+    return {c: result.get(c) for c in RESULT_COLUMNS}
+
+
+def write_result_store(results: List[Dict[str, Any]], output_path: str, eval_file: Optional[str] = None):
+    """
+    写出结果文件（按后缀选择格式：.parquet 或 .jsonl.zst）
+
+    Args:
+        results: batch_evaluate 的返回值
+        output_path: 输出路径
+        eval_file: 评测集路径（记录在文件中，读取时据此关联问题和参考答案）
+    """
+    score_results(results)
+    meta = {"eval_file": eval_file, "rows": len(results)}
+
+    if output_path.endswith(".parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pydict({c: [r.get(c) for r in results] for c in RESULT_COLUMNS})
+        table = table.replace_schema_metadata({"result_store": json.dumps(meta, ensure_ascii=False)})
+        pq.write_table(table, output_path, compression="zstd")
+    elif output_path.endswith(".jsonl.zst"):
+        from src.dataset_export import ShardWriter
+        writer = ShardWriter(output_path, compress="zstd")
+        writer.write({"_meta": meta})
+        for r in results:
+            writer.write(_to_record(r))
+        writer.close()
+    else:
+        raise ValueError(f"不支持的结果文件格式: {output_path}")
+
+
+def save_run_config(run_dir: str, config: Dict[str, Any]):
+    """保存本次运行的配置（run_dir/config.json，结果库导入时读取）"""
+    os.makedirs(run_dir, exist_ok=True)
+    with open(os.path.join(run_dir, "config.json"), 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+
+
+def read_result_meta(path: str) -> Dict[str, Any]:
+    """读取结果文件中记录的元信息（评测集路径、条数）"""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        metadata = pq.read_schema(path).metadata or {}
+        return json.loads(metadata.get(b"result_store", b"{}"))
+    if path.endswith(".jsonl.zst"):
+        return next(_iter_zst_records(path)).get("_meta", {})
+    return {}
+
+
+def _iter_zst_records(path: str) -> Iterable[Dict[str, Any]]:
+    import io
+    import zstandard
+    with open(path, 'rb') as f:
+        reader = io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(f), encoding='utf-8')
+        for line in reader:
+            if line.strip():
+                yield json.loads(line)
+
+
+def find_results(run_dir: str) -> str:
+    """在一次评测的输出目录（如 .../zero_shot）中查找结果文件，优先列式格式"""
+    for name in RESULT_FILES:
+        path = os.path.join(run_dir, name)
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"{run_dir} 下没有结果文件（{' / '.join(RESULT_FILES)}）")
+
+
+def _join_eval_columns(rows: List[Dict[str, Any]], eval_file: str, columns: List[str]):
+    """按id从评测集补充问题/参考答案列（单遍扫描评测集，只保留需要的id）"""
+    from src.eval_source import open_eval_source
+    wanted = {}
+    for row in rows:
+        wanted.setdefault(row["id"], []).append(row)
+    for item in open_eval_source(eval_file):
+        if item["id"] not in wanted:
+            continue
+        for row in wanted.pop(item["id"]):
+            for c in columns:
+                row[c] = item.get(EVAL_COLUMNS[c]) or ""
+        if not wanted:
+            break
+    for missing in wanted.values():
+        for row in missing:
+            for c in columns:
+                row[c] = ""
+
+
+def load_results(
+    path: str,
+    columns: Optional[List[str]] = None,
+    limit: Optional[int] = None,
+    eval_file: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    读取评测结果
+
+    Args:
+        path: 结果文件或评测输出目录（目录下查找 predictions.parquet / .jsonl.zst / .json）
+        columns: 需要的列（默认全部）；instruction / input / full_question / reference 从评测集关联
+        limit: 只读取前limit条
+        eval_file: 评测集路径（默认使用结果文件中记录的路径）
+
+    Returns:
+        结果列表，每条只包含请求的列
+    """
+    if os.path.isdir(path):
+        path = find_results(path)
+
+    if path.endswith(".json"):
+        # 旧版结果文件：完整记录，直接截取需要的列
+        with open(path, 'r', encoding='utf-8') as f:
+            rows = json.load(f)[:limit]
+        if columns is None or set(SCORE_COLUMNS) & set(columns):
+            score_results(rows, with_f1=columns is None or "f1" in columns)
+        if columns is not None:
+            rows = [{c: r.get(c) for c in columns} for r in rows]
+        return rows
+
+    columns = list(columns) if columns is not None else list(RESULT_COLUMNS) + list(EVAL_COLUMNS)
+    stored = [c for c in columns if c in RESULT_COLUMNS]
+    joined = [c for c in columns if c in EVAL_COLUMNS]
+    if joined and "id" not in stored:
+        stored.append("id")
+
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        if limit is None:
+            rows = pq.read_table(path, columns=stored).to_pylist()
+        else:
+            rows = []
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=max(limit, 1), columns=stored):
+                rows = batch.to_pylist()[:limit]
+                break
+    else:
+        rows = []
+        records = _iter_zst_records(path)
+        next(records)
+        for record in records:
+            if limit is not None and len(rows) >= limit:
+                break
+            rows.append({c: record.get(c) for c in stored})
+
+    if joined:
+        eval_file = eval_file or read_result_meta(path).get("eval_file")
+        if not eval_file:
+            raise ValueError(f"{path} 没有记录评测集路径，请通过 eval_file 指定")
+        _join_eval_columns(rows, eval_file, joined)
+        if "id" not in columns:
+            for row in rows:
+                del row["id"]
+    return rows
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+跨运行结果库（SQLite）
+把每次运行的配置、汇总指标和逐条得分导入同一个数据库，
+按 运行 / 样本id / 任务类型 建索引，运行间对比和回退查询无需重新加载结果文件
+"""
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, Any, List, Optional
+
+from src.result_store import find_results, load_results, read_result_meta
+from src.task_types import classify_instruction
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    result_file TEXT NOT NULL,
+    file_mtime REAL NOT NULL,
+    eval_file TEXT,
+    config TEXT,
+    metrics TEXT,
+    num_items INTEGER,
+    avg_f1 REAL,
+    ingested_at REAL
+);
+CREATE TABLE IF NOT EXISTS items (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    item_id NOT NULL,
+    task_type TEXT,
+    f1 REAL,
+    exact_match INTEGER,
+    prediction_chars INTEGER,
+    inference_time REAL,
+    has_answer_tags INTEGER,
+    PRIMARY KEY (run_id, item_id)
+);
+CREATE INDEX IF NOT EXISTS idx_items_item ON items(item_id, run_id);
+CREATE INDEX IF NOT EXISTS idx_items_task ON items(task_type, run_id);
+"""
+
+ITEM_COLUMNS = ["id", "instruction", "f1", "exact_match", "prediction_chars", "inference_time", "has_answer_tags"]
+
+
+class ResultsCatalog:
+    """结果库（一个SQLite文件）"""
+
+    def __init__(self, db_path: str = "outputs/results.db"):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    # ------------------------------------------------------------------
+    # 导入
+    # ------------------------------------------------------------------
+    def ingest_run(self, run_dir: str, name: Optional[str] = None, force: bool = False) -> bool:
+        """
+        导入一次运行（run_dir为包含结果文件的目录，如 outputs/comparison_v2/api_baseline/cot）
+
+        结果文件未变化时跳过；返回是否实际导入
+        """
+        result_file = find_results(run_dir)
+        name = name or os.path.relpath(run_dir)
+        mtime = os.path.getmtime(result_file)
+        row = self.conn.execute("SELECT file_mtime FROM runs WHERE name = ?", (name,)).fetchone()
+        if row is not None and row["file_mtime"] == mtime and not force:
+            return False
+
+        metrics = {}
+        metrics_file = os.path.join(run_dir, "metrics.json")
+        if os.path.exists(metrics_file):
+            with open(metrics_file, 'r', encoding='utf-8') as f:
+                metrics = json.load(f)
+        config = {}
+        config_file = os.path.join(run_dir, "config.json")
+        if os.path.exists(config_file):
+            with open(config_file, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        meta = read_result_meta(result_file)
+        eval_file = meta.get("eval_file") or config.get("eval_file")
+
+        results = load_results(result_file, ITEM_COLUMNS, eval_file=eval_file)
+        items = [
+            (r["id"], classify_instruction(r.get("instruction")), r["f1"],
+             None if r.get("exact_match") is None else int(r["exact_match"]),
+             r.get("prediction_chars"), r.get("inference_time"),
+             None if r.get("has_answer_tags") is None else int(r["has_answer_tags"]))
+            for r in results
+        ]
+        avg_f1 = sum(i[2] for i in items) / len(items) if items else None
+
+        with self.conn:
+            self.conn.execute("DELETE FROM runs WHERE name = ?", (name,))
+            cur = self.conn.execute(
+                "INSERT INTO runs (name, result_file, file_mtime, eval_file, config, metrics, "
+                "num_items, avg_f1, ingested_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (name, result_file, mtime, eval_file, json.dumps(config, ensure_ascii=False),
+                 json.dumps(metrics, ensure_ascii=False), len(items), avg_f1, time.time())
+            )
+            run_id = cur.lastrowid
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(run_id,) + i for i in items]
+            )
+        return True
+
+    def ingest_tree(self, roots: List[str], force: bool = False) -> Dict[str, int]:
+        """递归查找结果文件并导入，返回 {"ingested": n, "skipped": m}"""
+        from src.coreset import find_prediction_files
+        stats = {"ingested": 0, "skipped": 0}
+        for path in find_prediction_files(roots):
+            if self.ingest_run(os.path.dirname(path), force=force):
+                stats["ingested"] += 1
+            else:
+                stats["skipped"] += 1
+        return stats
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+    def runs(self, last: Optional[int] = None, pattern: Optional[str] = None) -> List[Dict[str, Any]]:
+        """运行列表（按结果文件修改时间即运行时间倒序），pattern为SQL LIKE模式"""
+        sql = "SELECT run_id, name, eval_file, num_items, avg_f1, metrics, ingested_at FROM runs"
+        params = []
+        if pattern:
+            sql += " WHERE name LIKE ?"
+            params.append(pattern)
+        sql += " ORDER BY file_mtime DESC"
+        if last:
+            sql += " LIMIT ?"
+            params.append(last)
+        rows = []
+        for r in self.conn.execute(sql, params):
+            row = dict(r)
+            row["metrics"] = json.loads(row["metrics"] or "{}")
+            rows.append(row)
+        return rows
+
+    def _run(self, name: str) -> sqlite3.Row:
+        """按名称查找运行；没有完全匹配时按名称后缀匹配，取最近运行的一个"""
+        row = self.conn.execute("SELECT run_id, name, eval_file FROM runs WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            suffix = name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            row = self.conn.execute(
+                "SELECT run_id, name, eval_file FROM runs WHERE name LIKE ? ESCAPE '\\' ORDER BY file_mtime DESC",
+                (f"%{suffix}",)
+            ).fetchone()
+        if row is None:
+            raise KeyError(f"结果库中没有运行: {name}")
+        return row
+
+    def _paired_runs(self, base: str, new: str, allow_mismatch: bool = False):
+        """
+        配对对比的两次运行 (new_id, base_id)
+
+        样本id只在同一评测集内有意义：两次运行的eval_file不同时拒绝对比（allow_mismatch时只警告）
+        """
+        b, n = self._run(base), self._run(new)
+        b_file, n_file = (os.path.normpath(r["eval_file"]) if r["eval_file"] else None for r in (b, n))
+        if b_file != n_file:
+            message = f"两次运行的评测集不同: {b['name']} ({b_file}) vs {n['name']} ({n_file})"
+            if not allow_mismatch:
+                raise ValueError(message + "，按样本id配对没有意义")
+            print(f"⚠️  {message}，仍按样本id配对")
+        return n["run_id"], b["run_id"]
+
+    def regressions(self, base: str, new: str, threshold: float = 0.2, limit: Optional[int] = None,
+                    allow_mismatch: bool = False) -> List[Dict[str, Any]]:
+        """
+        new 相对 base F1下降超过threshold的样本（按样本id配对）
+
+        Args:
+            base: 对照运行名（可以是名称后缀，如 lora_finetuned/zero_shot）
+            new: 对比运行名
+            allow_mismatch: 两次运行的评测集不同时仍然配对（默认报错）
+        """
+        sql = """
+            SELECT b.item_id, b.task_type, b.f1 AS base_f1, n.f1 AS new_f1, n.f1 - b.f1 AS delta,
+                   b.prediction_chars AS base_chars, n.prediction_chars AS new_chars
+            FROM items b JOIN items n ON n.item_id = b.item_id AND n.run_id = ?
+            WHERE b.run_id = ? AND n.f1 - b.f1 < ?
+            ORDER BY delta
+        """
+        params = [*self._paired_runs(base, new, allow_mismatch), -threshold]
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [dict(r) for r in self.conn.execute(sql, params)]
+
+    def compare(self, base: str, new: str, allow_mismatch: bool = False) -> Dict[str, Any]:
+        """两次运行在共同样本上的配对对比（提升/下降/持平条数和平均差值），评测集需相同"""
+        row = self.conn.execute("""
+            SELECT COUNT(*) AS n, AVG(n.f1 - b.f1) AS mean_delta,
+                   SUM(n.f1 > b.f1) AS improved, SUM(n.f1 < b.f1) AS regressed, SUM(n.f1 = b.f1) AS tied
+            FROM items b JOIN items n ON n.item_id = b.item_id AND n.run_id = ?
+            WHERE b.run_id = ?
+        """, self._paired_runs(base, new, allow_mismatch)).fetchone()
+        return dict(row)
+
+    def per_task_f1(self, last: int = 20, pattern: Optional[str] = None) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """
+        最近last次运行的分任务平均F1
+
+        Returns:
+            {运行名: {任务类型: {"n": 条数, "f1": 平均F1}}}
+        """
+        runs = self.runs(last=last, pattern=pattern)
+        if not runs:
+            return {}
+        ids = [r["run_id"] for r in runs]
+        names = {r["run_id"]: r["name"] for r in runs}
+        placeholders = ",".join("?" * len(ids))
+        result = {r["name"]: {} for r in runs}
+        for row in self.conn.execute(
+            f"SELECT run_id, task_type, COUNT(*) AS n, AVG(f1) AS f1 FROM items "
+            f"WHERE run_id IN ({placeholders}) GROUP BY run_id, task_type", ids
+        ):
+            result[names[row["run_id"]]][row["task_type"]] = {"n": row["n"], "f1": row["f1"]}
+        return result
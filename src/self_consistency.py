@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CoT自洽采样（self-consistency）
+同一prompt只prefill一次，KV缓存复制成k份后用一次 generate(num_return_sequences=k) 采样k条推理，
+分别提取<答案>，按答案之间的token重叠（平均token F1）投票，取与其余答案最一致的一条
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch
+from transformers import DynamicCache
+
+from src.metrics import calculate_token_f1
+
+
+def sample_with_shared_prefill(
+    model,
+    input_ids: torch.Tensor,
+    num_samples: int,
+    max_new_tokens: int,
+    temperature: float = 0.7,
+    top_p: float = 0.9,
+    repetition_penalty: float = 1.1,
+    pad_token_id: Optional[int] = None,
+    eos_token_id=None,
+    cache=None
+) -> torch.Tensor:
+    """
+    采样num_samples条续写，返回 (num_samples, L+n)
+
+    Args:
+        cache: 空的KV缓存对象（默认DynamicCache，也可传入压缩KV缓存）
+    """
+    cache = cache if cache is not None else DynamicCache()
+    if input_ids.shape[1] > 1:
+        # prompt除最后一个token外只算一次；generate只处理未缓存的最后一个token
+        with torch.no_grad():
+            model(input_ids=input_ids[:, :-1], past_key_values=cache, use_cache=True)
+        cache.batch_repeat_interleave(num_samples)
+    with torch.no_grad():
+        return model.generate(
+            input_ids=input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            past_key_values=cache,
+            num_return_sequences=num_samples,
+            max_new_tokens=max_new_tokens,
+            do_sample=True,
+            temperature=temperature,
+            top_p=top_p,
+            repetition_penalty=repetition_penalty,
+            pad_token_id=pad_token_id,
+            eos_token_id=eos_token_id
+        )
+
+
+def vote_answers(answers: List[str], has_tags: Optional[List[bool]] = None) -> Tuple[int, List[float]]:
+    """
+    按token重叠投票
+
+    每条答案的得分为它与其余候选答案的平均token F1；有<答案>标签的样本优先（都没有标签时全部参与），
+    得分相同取靠前的一条
+
+    Returns:
+        (选中的下标, 各条得分)，未参与投票的样本得分为0
+    """
+    candidates = [i for i in range(len(answers)) if not has_tags or has_tags[i]] or list(range(len(answers)))
+    scores = [0.0] * len(answers)
+    if len(candidates) == 1:
+        scores[candidates[0]] = 1.0
+        return candidates[0], scores
+    for i in candidates:
+        others = [j for j in candidates if j != i]
+        scores[i] = sum(calculate_token_f1(answers[i], answers[j])["f1"] for j in others) / len(others)
+    best = max(candidates, key=lambda i: (scores[i], -i))
+    return best, scores
+
+
+def summarize_votes(results: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """汇总自洽投票（每条结果的 sc_answers / sc_agreement），没有自洽结果时返回None"""
+    voted = [r for r in results if r.get("sc_answers")]
+    if not voted:
+        return None
+    return {
+        "num_samples": len(voted[0]["sc_answers"]),
+        "items": len(voted),
+        "avg_agreement": sum(r["sc_agreement"] for r in voted) / len(voted),
+        # 所有样本答案完全相同的比例
+        "unanimous_ratio": sum(len(set(r["sc_answers"])) == 1 for r in voted) / len(voted),
+    }
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+序贯检验工具（配对F1差值的置信序列）
+在评测过程中随时检查两组实验的差异，结论明确后即可提前停止
+"""
+import math
+from typing import List, Dict, Any, Optional
+
+
+class PairedSequentialTest:
+    """
+    配对差值的渐近置信序列（Waudby-Smith et al., asymptotic confidence sequence）
+
+    每加入一对样本（同一题目在A、B两组上的F1），更新差值 d = f1_b - f1_a 的
+    均值与方差，并给出对任意停止时刻都有效的置信区间：
+      - 下界 > 0: B 显著优于 A
+      - 上界 < 0: A 显著优于 B
+      - 区间落在 [-margin, margin] 内: 两者持平
+    """
+
+    def __init__(
+        self,
+        name: str,
+        arm_a: str,
+        arm_b: str,
+        alpha: float = 0.05,
+        margin: float = 0.02,
+        min_items: int = 30,
+        target_items: int = 100
+    ):
+        """
+        Args:
+            name: 对比名称
+            arm_a: 对照组名称
+            arm_b: 实验组名称
+            alpha: 显著性水平（对整个序列有效）
+            margin: 判定持平的差值范围
+            min_items: 最少样本数（渐近置信序列需要一定的预热）
+            target_items: 置信序列最紧的样本数（用于选择混合参数）
+        """
+        self.name = name
+        self.arm_a = arm_a
+        self.arm_b = arm_b
+        self.alpha = alpha
+        self.margin = margin
+        self.min_items = min_items
+
+        # 混合参数 rho^2，使边界在 target_items 附近最紧
+        log_term = -2 * math.log(alpha)
+        self.rho_sq = (log_term + math.log(log_term + 1)) / max(target_items, 1)
+
+        # Welford在线均值/方差
+        self.n = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+        self.decision = None
+        self.decided_at = None
+
+    def update(self, f1_a: float, f1_b: float):
+        """加入一对样本"""
+        diff = f1_b - f1_a
+        self.n += 1
+        delta = diff - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (diff - self.mean)
+
+    def variance(self) -> float:
+        """差值的样本方差（下限保护，避免早期方差为0）"""
+        if self.n < 2:
+            return 0.25
+        return max(self._m2 / (self.n - 1), 1e-4)
+
+    def radius(self) -> float:
+        """当前置信序列半径"""
+        if self.n == 0:
+            return float("inf")
+        t = self.n
+        v = t * self.variance() * self.rho_sq + 1
+        return math.sqrt(2 * v / (t * t * self.rho_sq) * math.log(math.sqrt(v) / self.alpha))
+
+    def bounds(self) -> Dict[str, float]:
+        """当前均值与置信区间"""
+        r = self.radius()
+        return {"mean": self.mean, "lower": self.mean - r, "upper": self.mean + r}
+
+    def check(self) -> Optional[str]:
+        """
+        检查是否可以停止
+
+        Returns:
+            None（继续）/ "b_better" / "a_better" / "tie"
+        """
+        if self.decision is not None:
+            return self.decision
+        if self.n < self.min_items:
+            return None
+
+        b = self.bounds()
+        if b["lower"] > 0:
+            self.decision = "b_better"
+        elif b["upper"] < 0:
+            self.decision = "a_better"
+        elif b["lower"] >= -self.margin and b["upper"] <= self.margin:
+            self.decision = "tie"
+
+        if self.decision is not None:
+            self.decided_at = self.n
+        return self.decision
+
+    def report(self, total_items: int) -> Dict[str, Any]:
+        """生成对比报告"""
+        b = self.bounds()
+        used = self.decided_at if self.decided_at is not None else self.n
+        return {
+            "name": self.name,
+            "arm_a": self.arm_a,
+            "arm_b": self.arm_b,
+            "decision": self.decision or "undecided",
+            "items_used": used,
+            "total_items": total_items,
+            "f1_diff": b["mean"],
+            "ci_lower": b["lower"],
+            "ci_upper": b["upper"],
+            "alpha": self.alpha,
+            "margin": self.margin
+        }
+
+
+def active_arms(tests: List[PairedSequentialTest]) -> List[str]:
+    """仍有未决对比的实验组"""
+    arms = []
+    for test in tests:
+        if test.decision is None:
+            for arm in (test.arm_a, test.arm_b):
+                if arm not in arms:
+                    arms.append(arm)
+    return arms
+
+
+def compute_savings(
+    arm_items: Dict[str, int],
+    arm_avg_time: Dict[str, float],
+    total_items: int
+) -> Dict[str, Any]:
+    """
+    统计提前停止节省的计算量
+
+    Args:
+        arm_items: 每组实际评测的样本数
+        arm_avg_time: 每组平均推理时间（秒）
+        total_items: 评测集总样本数
+
+    Returns:
+        节省统计
+    """
+    per_arm = {}
+    used_calls = 0
+    full_calls = 0
+    saved_time = 0.0
+    for arm, n in arm_items.items():
+        skipped = total_items - n
+        est_saved = skipped * arm_avg_time.get(arm, 0.0)
+        per_arm[arm] = {
+            "items_evaluated": n,
+            "items_skipped": skipped,
+            "est_time_saved": est_saved
+        }
+        used_calls += n
+        full_calls += total_items
+        saved_time += est_saved
+
+    return {
+        "per_arm": per_arm,
+        "calls_used": used_calls,
+        "calls_full": full_calls,
+        "calls_saved_ratio": 1 - used_calls / full_calls if full_calls else 0.0,
+        "est_time_saved": saved_time
+    }
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+投机解码（贪心）
+提议器（draft小模型，或在已有文本中查找n-gram的prompt lookup）一次提议若干token，
+目标模型（LoRA模型）一次前向并行验证，
+接受与目标模型贪心结果一致的前缀，再补上目标模型自己的下一个token；
+输出与目标模型逐token贪心解码相同，只是每次前向可以前进多个token
+（fp32下逐token一致；bf16下多token前向与单token前向的舍入不同，极少数接近并列的位置可能选出不同token）
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import torch
+from transformers import DynamicCache
+
+from src.task_types import TASK_TYPES
+
+
+def crop_cache(cache: DynamicCache, num_valid: int):
+    """只保留前num_valid个位置的缓存"""
+    excess = cache.get_seq_length() - num_valid
+    if excess > 0:
+        cache.crop(-excess)
+
+
+def apply_repetition_penalty(logits: torch.Tensor, context: torch.Tensor, penalty: float) -> torch.Tensor:
+    """与transformers的RepetitionPenaltyLogitsProcessor相同：出现过的token，正分除以penalty、负分乘以penalty"""
+    if penalty == 1.0:
+        return logits
+    score = logits.gather(0, context)
+    score = torch.where(score < 0, score * penalty, score / penalty)
+    return logits.scatter(0, context, score)
+
+
+class DraftModelProposer:
+    """用小模型贪心提议后续token（与目标模型共用tokenizer），自己维护KV缓存"""
+
+    def __init__(self, model):
+        self.model = model
+        self.cache = None
+
+    def reset(self):
+        self.cache = DynamicCache()
+
+    def propose(self, ids: torch.Tensor, k: int, repetition_penalty: float = 1.0) -> List[int]:
+        """在当前序列 ids (1, L) 之后提议k个token"""
+        device = self.model.device
+        seq = ids[0].to(device)
+        new = ids[:, self.cache.get_seq_length():].to(device)
+        draft = []
+        for _ in range(k):
+            logits = self.model(input_ids=new, past_key_values=self.cache, use_cache=True).logits[0, -1].float()
+            token = int(apply_repetition_penalty(logits, seq, repetition_penalty).argmax())
+            draft.append(token)
+            new = torch.tensor([[token]], device=device)
+            seq = torch.cat([seq, new[0]])
+        return draft
+
+    def sync(self, num_valid: int):
+        """目标模型验证后，只保留与新序列一致的前num_valid个位置的缓存"""
+        crop_cache(self.cache, num_valid)
+
+
+class PromptLookupProposer:
+    """
+    不需要draft模型：用序列末尾的n-gram在prompt（及已生成部分）中查找相同片段，
+    把其后的token作为提议。适合出处查找、古文翻译、医案等大段照抄输入的任务
+    """
+
+    def __init__(self, max_ngram: int = 3, min_ngram: int = 1):
+        self.max_ngram = max_ngram
+        self.min_ngram = min_ngram
+
+    def reset(self):
+        pass
+
+    def propose(self, ids: torch.Tensor, k: int, repetition_penalty: float = 1.0) -> List[int]:
+        """从长到短尝试末尾n-gram，取第一个后面还有token的匹配位置"""
+        seq = ids[0]
+        for n in range(self.max_ngram, self.min_ngram - 1, -1):
+            if seq.shape[0] <= n:
+                continue
+            windows = seq.unfold(0, n, 1)[:-1]
+            starts = (windows == seq[-n:]).all(dim=1).nonzero().flatten().tolist()
+            for start in starts:
+                following = seq[start + n:start + n + k]
+                if following.shape[0] > 0:
+                    return following.tolist()
+        return []
+
+    def sync(self, num_valid: int):
+        pass
+
+
+class SpeculativeDecoder:
+    """投机解码器（batch size 1，贪心）"""
+
+    def __init__(self, model, proposer, num_draft_tokens: int = 5):
+        """
+        Args:
+            model: 目标模型（PeftModel或合并后的模型）
+            proposer: 提议器（DraftModelProposer / PromptLookupProposer），
+                      提供 reset() / propose(ids, k, repetition_penalty) / sync(num_valid)
+            num_draft_tokens: 每轮提议的token数
+        """
+        self.model = model
+        self.proposer = proposer
+        self.num_draft_tokens = num_draft_tokens
+
+    @torch.no_grad()
+    def generate(
+        self,
+        input_ids: torch.Tensor,
+        max_new_tokens: int,
+        eos_token_id: Optional[Union[int, Iterable[int]]] = None,
+        repetition_penalty: float = 1.0
+    ) -> Tuple[torch.Tensor, Dict[str, int]]:
+        """
+        Returns:
+            (prompt+生成部分的token id (1, L+n)，统计 {steps, proposed, accepted, new_tokens})
+        """
+        if isinstance(eos_token_id, int):
+            eos_token_id = [eos_token_id]
+        eos = set(eos_token_id or [])
+        device = self.model.device
+        ids = input_ids.to(device)
+        prompt_len = ids.shape[1]
+
+        # 目标模型缓存始终覆盖 ids[:-1]，最后一个token和提议一起送入
+        cache = DynamicCache()
+        if prompt_len > 1:
+            self.model(input_ids=ids[:, :-1], past_key_values=cache, use_cache=True)
+        self.proposer.reset()
+
+        stats = {"steps": 0, "proposed": 0, "accepted": 0, "new_tokens": 0}
+        finished = False
+        while not finished and ids.shape[1] - prompt_len < max_new_tokens:
+            remaining = max_new_tokens - (ids.shape[1] - prompt_len)
+            k = min(self.num_draft_tokens, remaining - 1)
+            draft = self.proposer.propose(ids, k, repetition_penalty) if k > 0 else []
+
+            block = torch.cat([ids[:, -1:], torch.tensor([draft], dtype=ids.dtype, device=device)], dim=1)
+            logits = self.model(input_ids=block, past_key_values=cache, use_cache=True).logits[0].float()
+
+            # 逐位置取目标模型的贪心token（重复惩罚的上下文包含前面已接受的提议）
+            new_tokens = []
+            matched = 0
+            for j in range(len(draft) + 1):
+                context = torch.cat([ids[0], torch.tensor(new_tokens, dtype=ids.dtype, device=device)])
+                token = int(apply_repetition_penalty(logits[j], context, repetition_penalty).argmax())
+                new_tokens.append(token)
+                if token in eos:
+                    finished = True
+                    break
+                if j < len(draft) and token == draft[j]:
+                    matched += 1
+                    continue
+                break
+
+            num_valid = ids.shape[1] + len(new_tokens) - 1
+            crop_cache(cache, num_valid)
+            self.proposer.sync(num_valid)
+            ids = torch.cat([ids, torch.tensor([new_tokens], dtype=ids.dtype, device=device)], dim=1)
+
+            stats["steps"] += 1
+            stats["proposed"] += len(draft)
+            stats["accepted"] += matched
+
+        ids = ids[:, :prompt_len + max_new_tokens]
+        stats["new_tokens"] = ids.shape[1] - prompt_len
+        return ids, stats
+
+
+def merge_stats(total: Dict[str, Dict[str, int]], task_type: str, stats: Dict[str, int]):
+    """按任务类型累加统计"""
+    bucket = total.setdefault(task_type, defaultdict(int))
+    bucket["items"] += 1
+    for key, value in stats.items():
+        bucket[key] += value
+
+
+def print_acceptance_report(total: Dict[str, Dict[str, int]]):
+    """打印各任务类型的接受率和每次前向平均前进的token数"""
+    print(f"\n{'任务类型':<14} {'条数':>6} {'接受率':>8} {'token/前向':>10}")
+    print("-" * 44)
+    rows = list(total.items())
+    if len(rows) > 1:
+        overall = defaultdict(int)
+        for _, s in rows:
+            for key, value in s.items():
+                overall[key] += value
+        rows.append(("合计", overall))
+    for task, s in rows:
+        rate = s["accepted"] / s["proposed"] if s["proposed"] else 0.0
+        per_step = s["new_tokens"] / s["steps"] if s["steps"] else 0.0
+        print(f"{TASK_TYPES.get(task, task):<14} {s['items']:>6} {rate:>8.1%} {per_step:>10.2f}")
+    print("-" * 44)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基于内容哈希的流式数据划分
+每条数据按内容的稳定哈希分配到 train/val/test，与行顺序和数据规模无关：
+  - 重复内容一定落在同一划分（不会跨训练/测试泄漏）
+  - 在原数据后追加新数据时，旧数据的划分不变，可增量处理
+评测子集用另一个哈希做 bottom-k 抽样，不需要全量打乱
+"""
+import hashlib
+import heapq
+import json
+import os
+from typing import Dict, Any, Iterator, List, Tuple
+
+import numpy as np
+
+# 默认划分比例：训练集95% / 验证集2% / 测试集3%
+DEFAULT_RATIOS = (("train", 0.95), ("val", 0.02), ("test", 0.03))
+
+HASH_SPACE = 1 << 64
+
+
+def row_key(item: Dict[str, Any], salt: str = "") -> int:
+    """
+    计算一条数据的64位稳定哈希
+
+    Args:
+        item: 包含instruction/input/output的数据
+        salt: 盐值（不同用途使用不同的盐，互不相关）
+    """
+    content = "\x1f".join([
+        salt,
+        (item.get("instruction") or "").strip(),
+        (item.get("input") or "").strip(),
+        (item.get("output") or "").strip(),
+    ])
+    digest = hashlib.blake2b(content.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def assign_split(item: Dict[str, Any], ratios=DEFAULT_RATIOS, salt: str = "split") -> str:
+    """根据内容哈希分配划分"""
+    position = row_key(item, salt) / HASH_SPACE
+    cumulative = 0.0
+    for name, ratio in ratios:
+        cumulative += ratio
+        if position < cumulative:
+            return name
+    return ratios[-1][0]
+
+
+class BottomK:
+    """
+    保留哈希值最小的k条数据（流式均匀抽样）
+    k条中的前n条恰好是bottom-n，所以eval_100是eval_500的子集
+    内容完全相同的数据哈希相同，只保留一条
+    """
+
+    def __init__(self, k: int):
+        self.k = k
+        self._heap = []  # 最大堆：(-key, row)
+        self._keys = set()
+
+    def add(self, key: int, row: Dict[str, Any]):
+        if self.k <= 0 or key in self._keys:
+            return
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, (-key, row))
+            self._keys.add(key)
+        elif key < -self._heap[0][0]:
+            removed, _ = heapq.heapreplace(self._heap, (-key, row))
+            self._keys.discard(-removed)
+            self._keys.add(key)
+
+    def items(self) -> List[Tuple[int, Dict[str, Any]]]:
+        """按哈希值从小到大返回 [(key, row)]"""
+        return sorted(((-neg, row) for neg, row in self._heap), key=lambda x: x[0])
+
+
+def source_units(source: str) -> Tuple[str, int]:
+    """
+    数据源的长度
+
+    Returns:
+        ("rows", 行数) 对于Arrow目录；("bytes", 字节数) 对于JSONL文件
+    """
+    if os.path.isdir(source):
+        return "rows", len(load_arrow_split(source))
+    return "bytes", os.path.getsize(source)
+
+
+def expand_sources(path: str) -> List[str]:
+    """Arrow目录 / JSONL文件 / JSONL分片目录 -> 数据源列表"""
+    if os.path.isdir(path):
+        is_arrow = (os.path.exists(os.path.join(path, "state.json")) or
+                    os.path.exists(os.path.join(path, "dataset_dict.json")))
+        if not is_arrow:
+            files = sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+                if name.endswith(".jsonl")
+            )
+            if files:
+                return files
+    return [path]
+
+
+def load_arrow_split(source: str, split: str = "train"):
+    """load_from_disk（内存映射，不会整体读入内存）"""
+    from datasets import load_from_disk, DatasetDict
+    ds = load_from_disk(source)
+    if isinstance(ds, DatasetDict):
+        ds = ds[split]
+    return ds
+
+
+def iter_source_positions(source: str, start: int, end: int,
+                          batch_size: int = 10000) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    逐条读取数据源的一个区间，同时返回每条数据的位置
+
+    Arrow目录按行号区间读取，位置为行号；JSONL文件按字节区间读取，位置为行首字节偏移
+    （起始位置落在区间内的行属于该区间）
+    """
+    if os.path.isdir(source):
+        ds = load_arrow_split(source)
+        row = start
+        for batch in ds.select(range(start, end)).iter(batch_size=batch_size):
+            keys = list(batch.keys())
+            for values in zip(*(batch[k] for k in keys)):
+                yield row, dict(zip(keys, values))
+                row += 1
+        return
+
+    with open(source, 'rb') as f:
+        if start > 0:
+            f.seek(start - 1)
+            f.readline()
+        while f.tell() < end:
+            position = f.tell()
+            line = f.readline()
+            if not line:
+                break
+            line = line.strip()
+            if line:
+                yield position, json.loads(line)
+
+
+def iter_source_range(source: str, start: int, end: int, batch_size: int = 10000) -> Iterator[Dict[str, Any]]:
+    """逐条读取数据源的一个区间（见 iter_source_positions）"""
+    for _, item in iter_source_positions(source, start, end, batch_size):
+        yield item
+
+
+def read_source_rows(source: str, positions: List[int], batch_size: int = 10000) -> Iterator[Dict[str, Any]]:
+    """
+    按位置读取数据（位置来自 iter_source_positions，需升序）
+
+    JSONL按字节偏移跳读，Arrow按行号批量读取
+    """
+    if os.path.isdir(source):
+        ds = load_arrow_split(source)
+        for i in range(0, len(positions), batch_size):
+            batch = ds.select(positions[i:i + batch_size]).to_dict()
+            keys = list(batch.keys())
+            for values in zip(*(batch[k] for k in keys)):
+                yield dict(zip(keys, values))
+        return
+
+    with open(source, 'rb') as f:
+        for position in positions:
+            f.seek(position)
+            yield json.loads(f.readline())
+
+
+def stratified_bottom_k(keys: np.ndarray, strata: np.ndarray, k: int) -> np.ndarray:
+    """
+    分层bottom-k抽样：按各层规模比例分配名额（总数恰好为k），
+    每层取哈希值最小的若干条（等价于以哈希为随机数的蓄水池抽样，结果与行顺序无关）
+
+    Args:
+        keys: 每条数据的哈希值
+        strata: 每条数据的分层编号
+        k: 抽样总数
+
+    Returns:
+        被选中数据的下标（升序）
+    """
+    from src.coreset import allocate
+
+    codes, counts = np.unique(strata, return_counts=True)
+    alloc = allocate(dict(zip(codes.tolist(), counts.tolist())), k)
+    selected = []
+    for code in codes.tolist():
+        members = np.flatnonzero(strata == code)
+        n = alloc[code]
+        if n >= len(members):
+            selected.append(members)
+        elif n > 0:
+            selected.append(members[np.argpartition(keys[members], n - 1)[:n]])
+    if not selected:
+        return np.zeros(0, dtype=np.int64)
+    return np.sort(np.concatenate(selected))
+
+
+def split_ranges(start: int, end: int, parts: int) -> List[Tuple[int, int]]:
+    """把 [start, end) 均分成若干区间"""
+    parts = max(1, min(parts, end - start)) if end > start else 1
+    step = (end - start) / parts
+    bounds = [start + int(round(step * i)) for i in range(parts)] + [end]
+    return [(bounds[i], bounds[i + 1]) for i in range(parts) if bounds[i] < bounds[i + 1]]
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任务类型划分
+根据instruction模板把样本归入几类主要任务，并按答案长度分桶
+"""
+from typing import Dict, Any
+
+# 任务类型 -> 中文名称
+TASK_TYPES = {
+    "source_lookup": "古文出处查找",
+    "translation": "古文翻译",
+    "case_diagnosis": "医案诊疗",
+    "knowledge_qa": "药物/知识问答",
+}
+
+# 答案长度分桶（字符数上界）
+LENGTH_BUCKETS = [
+    ("short", 20),
+    ("medium", 80),
+    ("long", 200),
+    ("xlong", float("inf")),
+]
+
+
+def classify_instruction(instruction: str) -> str:
+    """
+    根据instruction判断任务类型
+
+    Args:
+        instruction: 原始instruction字段
+
+    Returns:
+        TASK_TYPES中的键
+    """
+    instruction = (instruction or "").strip()
+
+    if "古文原文与出处" in instruction or ("出处" in instruction and "古文" in instruction):
+        return "source_lookup"
+    if "翻译成现代文" in instruction or "翻译成古文" in instruction:
+        return "translation"
+    if instruction.startswith("基于输入的患者医案记录"):
+        return "case_diagnosis"
+    # 其余为单条问答（instruction为空时问题在input中）
+    return "knowledge_qa"
+
+
+def length_bucket(text: str) -> str:
+    """按字符数给文本分桶"""
+    n = len(text or "")
+    for name, upper in LENGTH_BUCKETS:
+        if n < upper:
+            return name
+    return LENGTH_BUCKETS[-1][0]
+
+
+def item_stratum(item: Dict[str, Any]) -> str:
+    """
+    样本所属分层（任务类型 + 参考答案长度）
+
+    Args:
+        item: 评测样本（需包含instruction和output/reference）
+    """
+    reference = item.get("output", item.get("reference", ""))
+    return f"{classify_instruction(item.get('instruction', ''))}/{length_bucket(reference)}"
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Token长度统计
+按训练时的拼接方式（Qwen对话模板）计算每条样本的token数，并给出分布与cutoff建议
+"""
+import json
+from typing import Dict, Any, List
+
+import numpy as np
+
+from src.dataset_export import training_query
+from src.task_types import TASK_TYPES, classify_instruction
+
+TASK_CODES = list(TASK_TYPES)
+
+# 直方图分桶（token数上界）
+HISTOGRAM_EDGES = [0, 64, 128, 256, 512, 1024, 2048, 4096, 8192, np.iinfo(np.uint32).max]
+
+
+def load_tokenizer(model_path: str):
+    """加载fast tokenizer"""
+    from transformers import AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(model_path, trust_remote_code=True, use_fast=True)
+    if not tokenizer.is_fast:
+        print("⚠️  未找到fast tokenizer，统计会很慢")
+    return tokenizer
+
+
+def template_overhead(tokenizer) -> int:
+    """
+    对话模板本身占用的token数（system提示、角色标记、结束符）
+
+    样本总长度 = 用户输入token + 回答token + 模板开销
+    """
+    messages = [
+        {"role": "user", "content": ""},
+        {"role": "assistant", "content": ""}
+    ]
+    return len(tokenizer.apply_chat_template(messages, tokenize=True))
+
+
+def encode_lengths(tokenizer, items: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """
+    批量计算一批样本的token长度
+
+    Returns:
+        {"prompt": uint32[n], "response": uint32[n], "task": uint8[n]}
+    """
+    queries = [training_query(item) for item in items]
+    outputs = [item.get("output") or "" for item in items]
+    prompt_ids = tokenizer(queries, add_special_tokens=False)["input_ids"]
+    response_ids = tokenizer(outputs, add_special_tokens=False)["input_ids"]
+    return {
+        "prompt": np.fromiter((len(x) for x in prompt_ids), dtype=np.uint32, count=len(items)),
+        "response": np.fromiter((len(x) for x in response_ids), dtype=np.uint32, count=len(items)),
+        "task": np.fromiter(
+            (TASK_CODES.index(classify_instruction(item.get("instruction", ""))) for item in items),
+            dtype=np.uint8,
+            count=len(items)
+        )
+    }
+
+
+def summarize_lengths(total: np.ndarray, cutoff: int) -> Dict[str, Any]:
+    """长度分布摘要"""
+    if len(total) == 0:
+        return {"count": 0}
+    q = np.percentile(total, [50, 90, 99, 99.9])
+    counts, _ = np.histogram(total, bins=HISTOGRAM_EDGES)
+    labels = [f"<{HISTOGRAM_EDGES[i + 1]}" for i in range(len(HISTOGRAM_EDGES) - 2)]
+    labels.append(f">={HISTOGRAM_EDGES[-2]}")
+    over = total > cutoff
+    return {
+        "count": int(len(total)),
+        "mean": float(total.mean()),
+        "p50": float(q[0]),
+        "p90": float(q[1]),
+        "p99": float(q[2]),
+        "p99.9": float(q[3]),
+        "max": int(total.max()),
+        "over_cutoff": int(over.sum()),
+        "over_cutoff_ratio": float(over.mean()),
+        # 超出cutoff被截掉的token占比
+        "truncated_token_ratio": float((total[over] - cutoff).sum() / total.sum()),
+        "histogram": dict(zip(labels, counts.tolist()))
+    }
+
+
+def padding_ratio(total: np.ndarray, batch_size: int, cutoff: int) -> float:
+    """
+    按顺序组batch、每个batch补齐到最长样本时的padding占比
+    （LLaMA-Factory默认的动态padding）
+    """
+    lengths = np.minimum(total, cutoff).astype(np.int64)
+    n = len(lengths) - len(lengths) % batch_size
+    if n == 0:
+        return 0.0
+    batches = lengths[:n].reshape(-1, batch_size)
+    padded = batches.max(axis=1).sum() * batch_size
+    return float(1 - batches.sum() / padded)
+
+
+def suggest_cutoff(total: np.ndarray, coverage: float = 0.99, multiple: int = 128) -> int:
+    """覆盖coverage比例样本的最小cutoff（向上取整到multiple）"""
+    if len(total) == 0:
+        return multiple
+    value = float(np.quantile(total, coverage))
+    return int(np.ceil(value / multiple) * multiple)
+
+
+def save_profile(path: str, lengths: Dict[str, np.ndarray], meta: Dict[str, Any]):
+    """保存逐条长度（npz）与元信息（同名.json）"""
+    np.savez(path, **lengths)
+    with open(path.replace(".npz", ".json"), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
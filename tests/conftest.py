@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试公共夹具：随机初始化的小型Qwen2模型（不需要下载任何权重）
+"""
+import os
+import sys
+
+import pytest
+import torch
+from transformers import Qwen2Config, Qwen2ForCausalLM
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+VOCAB_SIZE = 2000
+PAD_ID, UNK_ID, EOS_ID = 0, 1, 2
+
+
+def tiny_config(**overrides) -> Qwen2Config:
+    """2层、hidden 64、GQA（4个注意力头 / 2个KV头）的Qwen2配置"""
+    config = dict(
+        vocab_size=VOCAB_SIZE,
+        hidden_size=64,
+        intermediate_size=128,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        max_position_embeddings=512,
+        pad_token_id=PAD_ID,
+        eos_token_id=EOS_ID,
+        tie_word_embeddings=False,
+        attn_implementation="eager",
+    )
+    config.update(overrides)
+    return Qwen2Config(**config)
+
+
+def tiny_model(seed: int = 0, **overrides) -> Qwen2ForCausalLM:
+    torch.manual_seed(seed)
+    model = Qwen2ForCausalLM(tiny_config(**overrides))
+    model.generation_config.pad_token_id = PAD_ID
+    model.generation_config.eos_token_id = EOS_ID
+    return model.eval()
+
+
+def greedy_reference(model, input_ids: torch.Tensor, max_new_tokens: int, **kwargs) -> torch.Tensor:
+    """model.generate 的贪心结果（与评测默认一致，repetition_penalty=1.1）"""
+    with torch.no_grad():
+        return model.generate(
+            input_ids=input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            max_new_tokens=max_new_tokens,
+            do_sample=False,
+            repetition_penalty=1.1,
+            pad_token_id=PAD_ID,
+            eos_token_id=EOS_ID,
+            **kwargs
+        )
+
+
+@pytest.fixture(scope="session")
+def model():
+    return tiny_model(seed=0)
+
+
+@pytest.fixture(scope="session")
+def draft_model():
+    return tiny_model(seed=1, num_hidden_layers=1)
+
+
+@pytest.fixture
+def prompt_ids():
+    # 含重复片段，prompt lookup能提出候选
+    torch.manual_seed(42)
+    ids = torch.randint(3, VOCAB_SIZE, (1, 12))
+    return torch.cat([ids, ids[:, :8], ids[:, 4:10]], dim=1)
+
+
+@pytest.fixture(scope="session")
+def model_dir(tmp_path_factory):
+    """保存到磁盘的小模型 + 逐字切分的tokenizer（ModelEvaluator / 评测子进程从路径加载）"""
+    from tokenizers import Regex, Tokenizer, models, pre_tokenizers
+    from transformers import PreTrainedTokenizerFast
+
+    path = str(tmp_path_factory.mktemp("tiny_qwen"))
+    tiny_model(seed=0).save_pretrained(path)
+
+    specials = ["<pad>", "<unk>", "<eos>"]
+    chars = [chr(c) for c in range(0x20, 0x7F)] + [chr(c) for c in range(0x4E00, 0x4E00 + VOCAB_SIZE)]
+    vocab = {token: i for i, token in enumerate((specials + chars)[:VOCAB_SIZE])}
+    backend = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    backend.pre_tokenizer = pre_tokenizers.Split(Regex("."), behavior="isolated")
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=backend, pad_token="<pad>", unk_token="<unk>", eos_token="<eos>"
+    )
+    tokenizer.save_pretrained(path)
+    return path
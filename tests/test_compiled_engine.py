@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+静态KV缓存解码引擎与 model.generate 贪心结果逐token一致
+"""
+import pytest
+import torch
+
+from conftest import EOS_ID, greedy_reference
+from src.compiled_engine import CompiledDecoder
+
+MAX_NEW_TOKENS = 24
+
+
+def test_compiled_decoder_static_cache_matches_generate(model, prompt_ids):
+    # compile=False：静态KV缓存 + 分块prefill的结果应与动态缓存一致（torch.compile不改变计算）
+    decoder = CompiledDecoder(model, max_cache_len=64, prefill_chunks=(16, 4), compile=False)
+    expected = greedy_reference(model, prompt_ids, MAX_NEW_TOKENS)
+    for _ in range(2):
+        # 第二次验证缓存和attention mask在两次生成之间正确重置
+        output = decoder.generate(prompt_ids, MAX_NEW_TOKENS, repetition_penalty=1.1, eos_token_id=EOS_ID)
+        assert torch.equal(output, expected)
+
+
+def test_compiled_decoder_rejects_overlong_prompt(model, prompt_ids):
+    decoder = CompiledDecoder(model, max_cache_len=32, compile=False)
+    assert not decoder.fits(prompt_ids.shape[1], MAX_NEW_TOKENS)
+    with pytest.raises(ValueError):
+        decoder.generate(prompt_ids, MAX_NEW_TOKENS)
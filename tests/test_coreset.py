@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分层核心子集：最大余数分配与层内交换优化
+"""
+import random
+from collections import Counter
+
+from src.coreset import CoresetSelector, allocate
+from src.task_types import item_stratum
+
+
+def test_allocate_is_proportional_and_exact():
+    alloc = allocate({"a": 50, "b": 30, "c": 20}, 10)
+    assert alloc == {"a": 5, "b": 3, "c": 2}
+    # 最大余数：7*0.5=3.5, 7*0.3=2.1, 7*0.2=1.4 -> 余数最大的a多拿一个
+    assert allocate({"a": 50, "b": 30, "c": 20}, 7) == {"a": 4, "b": 2, "c": 1}
+
+
+def test_allocate_respects_stratum_sizes():
+    alloc = allocate({"big": 100, "tiny": 1}, 100)
+    assert sum(alloc.values()) == 100
+    assert alloc["tiny"] <= 1
+    # 要求超过总数时每层取满
+    assert allocate({"a": 2, "b": 3}, 10) == {"a": 2, "b": 3}
+
+
+def make_pool(n: int = 200):
+    rng = random.Random(0)
+    instructions = ["请给出以下古文原文与出处", "将下列内容翻译成现代文", "基于输入的患者医案记录，给出诊断", ""]
+    pool = [
+        {"id": i, "instruction": rng.choice(instructions), "output": "答" * rng.choice([5, 50, 150, 300])}
+        for i in range(n)
+    ]
+    scores = {
+        run: {item["id"]: min(1.0, max(0.0, rng.gauss(mean, 0.3))) for item in pool}
+        for run, mean in [("base", 0.3), ("lora", 0.5), ("cot", 0.6)]
+    }
+    return pool, scores
+
+
+def test_selected_subset_keeps_strata_and_beats_random():
+    pool, scores = make_pool()
+    selector = CoresetSelector(pool, scores, seed=0)
+    selected = selector.select(20, restarts=3, iterations=500)
+    assert len(selected) == len(set(selected)) == 20
+
+    # 层内交换不改变分层比例
+    strata = {item["id"]: item_stratum(item) for item in pool}
+    expected = allocate(Counter(strata.values()), 20)
+    assert Counter(strata[i] for i in selected) == Counter({h: n for h, n in expected.items() if n})
+
+    fidelity = selector.fidelity(selected)
+    _, random_err = selector.baseline_fidelity(20, trials=50)
+    assert fidelity["mean_abs_error"] < random_err
+    assert fidelity["rank_agreement"] == 1.0
+
+
+def test_pool_restricted_to_items_scored_by_every_run():
+    pool, scores = make_pool(20)
+    del scores["lora"][3]
+    selector = CoresetSelector(pool, scores)
+    assert 3 not in {item["id"] for item in selector.pool}
+    assert len(selector.pool) == 19
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+列式数据质量审计：与逐条Python实现对照（字符统计、哈希、任务分类、重复与模板频次）
+"""
+import json
+
+import pyarrow as pa
+
+from src.data_audit import SplitAuditor, char_counts, classify_instructions, iter_batches, string_hashes
+from src.task_types import TASK_TYPES, classify_instruction
+
+ROWS = [
+    {"instruction": "将下列内容翻译成现代文", "input": "学而时习之", "output": "学习并时常温习"},
+    {"instruction": "将下列内容翻译成现代文", "input": "学而时习之", "output": "学习并时常温习"},
+    {"instruction": "将下列内容翻译成现代文", "input": "学而时习之", "output": "另一种译法"},
+    {"instruction": "请给出这段古文原文与出处", "input": "", "output": "《论语》"},
+    {"instruction": "基于输入的患者医案记录，给出诊断", "input": "发热 恶寒", "output": "风寒表证"},
+    {"instruction": "What is qi?", "input": None, "output": "   "},
+]
+
+
+def test_char_counts_match_python():
+    texts = ["黄芪 补气", "", "abc def", "中文English混合", "\t\n", "㐀龥"]
+    visible, cjk = char_counts(pa.array(texts))
+    assert visible.tolist() == [sum(not c.isspace() for c in t) for t in texts]
+    assert cjk.tolist() == [sum(0x4000 <= ord(c) <= 0x9FFF for c in t) for t in texts]
+    # 切片后的数组（非零offset）
+    visible, _ = char_counts(pa.array(texts).slice(2, 3))
+    assert visible.tolist() == [6, 11, 0]
+
+
+def test_string_hashes_depend_only_on_content():
+    texts = ["", "a", "a\0", "黄芪补气", "x" * 8, "x" * 9, "黄芪补气"]
+    hashes = string_hashes(pa.array(texts)).tolist()
+    assert hashes[3] == hashes[6]
+    assert len(set(hashes)) == 6
+    # 与所在批次和位置无关
+    assert string_hashes(pa.array(["前缀", "黄芪补气"]).slice(1)).tolist() == [hashes[3]]
+
+
+def test_classify_instructions_matches_python():
+    instructions = pa.array([r["instruction"] for r in ROWS])
+    codes = classify_instructions(instructions).to_pylist()
+    assert [list(TASK_TYPES)[c] for c in codes] == [classify_instruction(r["instruction"]) for r in ROWS]
+
+
+def test_split_auditor_report(tmp_path):
+    path = tmp_path / "data.jsonl"
+    path.write_text("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in ROWS), encoding="utf-8")
+    auditor = SplitAuditor(top_templates=2)
+    for batch in iter_batches(str(path), batch_size=2):
+        auditor.update(batch)
+    auditor.resolve_templates(iter_batches(str(path)))
+    report = auditor.report()
+
+    assert report["rows"] == len(ROWS)
+    assert report["fields"]["output"]["empty"] == 1
+    assert report["fields"]["output"]["whitespace_only"] == 1
+    assert report["fields"]["input"]["empty"] == 2
+    assert report["fields"]["instruction"]["non_cjk_rows"] == 1
+    assert report["task_types"]["translation"] == 3
+    assert report["duplicates"]["duplicate_rows"] == 1
+    assert report["duplicates"]["conflicting_prompts"] == 1
+    assert report["top_instructions"][0] == {
+        "count": 3, "ratio": 0.5, "instruction": "将下列内容翻译成现代文"
+    }
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据并行评测：worker绑定与结果按评测集顺序合并
+"""
+from src.data_parallel import DataParallelEvaluator, assign_devices, split_cpus
+from src.prompt_builder import build_zero_shot_prompt
+
+
+def test_split_cpus():
+    assert split_cpus([0, 1, 2, 3, 4], 2) == [[0, 1, 2], [3, 4]]
+    assert split_cpus([0, 1], 3) == [[0], [1], [0]]
+
+
+def test_assign_devices_cpu():
+    bindings = assign_devices(2, ["cpu"])
+    assert all("cpus" in b for b in bindings)
+
+
+def test_data_parallel_preserves_order(model_dir):
+    eval_data = [
+        {"id": 100 - i, "instruction": f"问题{i}", "input": "", "full_question": f"问题{i}" * (1 + i % 3),
+         "output": "回答"}
+        for i in range(6)
+    ]
+    kwargs = dict(mode="local-cpu", model_path=model_dir, lora_path=None, cpu_precision="fp32")
+
+    evaluator = DataParallelEvaluator(2, kwargs)
+    try:
+        assert all("cpus" in b for b in evaluator.bindings)
+        results = evaluator.batch_evaluate(eval_data, build_zero_shot_prompt, "数据并行", max_tokens=8)
+    finally:
+        evaluator.close()
+    assert [r["id"] for r in results] == [item["id"] for item in eval_data]
+    assert not any("error" in r for r in results)
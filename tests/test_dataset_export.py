@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LLaMA-Factory数据导出：记录格式、dataset_info合并与分片索引
+"""
+import json
+
+import numpy as np
+import pytest
+
+from src.dataset_export import ShardWriter, dataset_info_entry, format_record, training_query, update_dataset_info
+
+ITEM = {"instruction": "解释下列方剂", "input": "四君子汤", "output": "益气健脾"}
+
+
+def test_format_record():
+    assert format_record(ITEM, "alpaca") == ITEM
+    assert format_record({"instruction": "问题", "input": None, "output": "答"})["input"] == ""
+    conversations = format_record(ITEM, "sharegpt")["conversations"]
+    assert conversations == [
+        {"from": "human", "value": "解释下列方剂\n四君子汤"},
+        {"from": "gpt", "value": "益气健脾"},
+    ]
+    assert training_query({"instruction": "", "input": "问题"}) == "问题"
+
+
+def test_update_dataset_info_keeps_other_entries(tmp_path):
+    info_path = tmp_path / "dataset_info.json"
+    info_path.write_text(json.dumps({"tcm_train": {"file_name": "old"}}), encoding="utf-8")
+    update_dataset_info(str(info_path), {"tcm_full": dataset_info_entry("jsonl/tcm_full", "sharegpt")})
+    info = json.loads(info_path.read_text(encoding="utf-8"))
+    assert info["tcm_train"] == {"file_name": "old"}
+    assert info["tcm_full"]["formatting"] == "sharegpt"
+    assert info["tcm_full"]["columns"] == {"messages": "conversations"}
+
+
+def test_shard_writer_line_offsets(tmp_path):
+    path = tmp_path / "part-00000.jsonl"
+    writer = ShardWriter(str(path))
+    records = [format_record({**ITEM, "output": f"答案{i}"}) for i in range(5)]
+    for record in records:
+        writer.write(record)
+    meta = writer.close(index_path=str(tmp_path / "part-00000.idx"))
+    assert meta["lines"] == 5 and meta["bytes"] == path.stat().st_size
+
+    offsets = np.fromfile(tmp_path / "part-00000.idx", dtype=np.uint64)
+    with open(path, "rb") as f:
+        for offset, record in zip(offsets, records):
+            f.seek(int(offset))
+            assert json.loads(f.readline()) == record
+
+
+def test_shard_writer_zstd_frames(tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    path = tmp_path / "part-00000.jsonl.zst"
+    writer = ShardWriter(str(path), compress="zstd", block_lines=2)
+    records = [{"output": str(i)} for i in range(5)]
+    for record in records:
+        writer.write(record)
+    writer.close(index_path=str(tmp_path / "part-00000.idx"))
+
+    # 多帧拼接是合法的zstd流；每个偏移处是一个可单独解压的帧
+    data = path.read_bytes()
+    reader = zstandard.ZstdDecompressor().stream_reader(data, read_across_frames=True)
+    assert [json.loads(line) for line in reader.read().splitlines()] == records
+    offsets = np.fromfile(tmp_path / "part-00000.idx", dtype=np.uint64)
+    assert len(offsets) == 3
+    frame = zstandard.ZstdDecompressor().decompressobj().decompress(data[int(offsets[1]):])
+    assert [json.loads(line) for line in frame.splitlines()] == records[2:4]
+
+
+def test_shard_writer_rejects_unknown_compression(tmp_path):
+    with pytest.raises(ValueError):
+        ShardWriter(str(tmp_path / "x.jsonl"), compress="gzip")
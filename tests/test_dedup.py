@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MinHash-LSH：签名估计的Jaccard、分带参数、分桶与并查集
+"""
+import numpy as np
+
+from src.dedup import (EMPTY_HASH, MinHasher, UnionFind, band_hashes, bucket_groups, dedup_text, estimate_jaccard,
+                       is_empty, optimal_bands)
+
+BASE = "黄芪味甘性微温，归脾肺经，具有补气升阳、固表止汗、利水消肿、托毒生肌的功效，常用于气虚乏力、食少便溏。"
+
+
+def jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b)
+
+
+def test_signature_estimates_jaccard():
+    hasher = MinHasher(num_perm=256, ngram=3)
+    similar = BASE[:-6] + "中气下陷等证。"
+    exact = jaccard(hasher.shingles(BASE), hasher.shingles(similar))
+    estimate = estimate_jaccard(hasher.signature(BASE), hasher.signature(similar))
+    assert abs(estimate - exact) < 0.1
+    assert estimate_jaccard(hasher.signature(BASE), hasher.signature(BASE)) == 1.0
+    assert estimate_jaccard(hasher.signature(BASE), hasher.signature("当归补血活血，调经止痛，润肠通便。")) < 0.1
+
+
+def test_signature_ignores_whitespace_and_flags_empty():
+    hasher = MinHasher(num_perm=64)
+    assert (hasher.signature(BASE) == hasher.signature(" ".join(BASE))).all()
+    signatures = np.stack([hasher.signature(""), hasher.signature(BASE)])
+    assert (signatures[0] == EMPTY_HASH).all()
+    assert is_empty(signatures).tolist() == [True, False]
+
+
+def test_optimal_bands_knee_below_threshold():
+    bands, rows = optimal_bands(128, 0.8)
+    assert bands * rows == 128
+    assert (1 / bands) ** (1 / rows) <= 0.8
+
+
+def test_dedup_text_drops_template_instruction():
+    item = {"instruction": "将下列内容翻译成现代文", "input": "原文", "output": "译文"}
+    assert dedup_text(item) == "原文\n译文"
+    item = {"instruction": "黄芪的功效是什么？", "input": "", "output": "补气"}
+    assert dedup_text(item) == "黄芪的功效是什么？\n\n补气"
+
+
+def test_lsh_buckets_group_near_duplicates():
+    hasher = MinHasher(num_perm=128, ngram=3)
+    texts = [BASE, "当归补血活血，调经止痛，润肠通便，用于血虚萎黄、眩晕心悸、月经不调。", BASE + "。"]
+    signatures = np.stack([hasher.signature(t) for t in texts])
+    bands, rows = optimal_bands(128, 0.7)
+    hashes = band_hashes(signatures, bands, rows)
+    keys = np.stack([
+        np.repeat(np.arange(bands), len(texts)),
+        hashes.T.reshape(-1),
+        np.tile(np.arange(len(texts)), bands),
+    ], axis=1)
+    groups = bucket_groups(keys)
+    assert groups
+    assert all(sorted(g.tolist()) == [0, 2] for g in groups)
+
+    uf = UnionFind(len(texts))
+    for g in groups:
+        for other in g[1:]:
+            uf.union(int(g[0]), int(other))
+    # 簇代表为最早出现的一条
+    assert [uf.find(i) for i in range(len(texts))] == [0, 1, 0]
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+评测数据源：各格式按下标读取结果一致，区间视图与分片覆盖全部样本
+"""
+import json
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from src.eval_source import open_eval_source, shard_eval_data, to_eval_item
+from src.prompt_builder import format_question
+
+ROWS = [{"instruction": f"问题{i}", "input": "原文" if i % 2 else None, "output": f"答案{i}"} for i in range(10)]
+
+
+@pytest.fixture(params=["json", "jsonl", "parquet"])
+def source(request, tmp_path):
+    path = tmp_path / f"eval.{request.param}"
+    if request.param == "json":
+        path.write_text(json.dumps(ROWS, ensure_ascii=False), encoding="utf-8")
+    elif request.param == "jsonl":
+        # 空行不计入
+        path.write_text("".join(json.dumps(r, ensure_ascii=False) + "\n\n" for r in ROWS), encoding="utf-8")
+    else:
+        pq.write_table(pa.Table.from_pylist(ROWS), str(path), row_group_size=3)
+    return open_eval_source(str(path))
+
+
+def test_rows_match_to_eval_item(source):
+    expected = [to_eval_item(row, i) for i, row in enumerate(ROWS)]
+    assert len(source) == len(ROWS)
+    assert list(source) == expected
+    assert source[-1] == expected[-1]
+    assert source[3]["full_question"] == format_question("问题3", "原文")
+    with pytest.raises(IndexError):
+        source[len(ROWS)]
+
+
+def test_views_keep_global_ids(source):
+    view = source[2:8]
+    assert len(view) == 6
+    assert [item["id"] for item in view.select(1, 3)] == [3, 4]
+    assert [item["id"] for item in source[::4]] == [0, 4, 8]
+
+
+def test_shards_cover_all_rows(source):
+    ids = [item["id"] for k in range(3) for item in source.shard(3, k)]
+    assert ids == list(range(len(ROWS)))
+    # 样本数少于分片数时多出的分片为空
+    assert len(shard_eval_data(source[:2], 4, 3)) == 0
+    assert shard_eval_data(list(range(5)), 2, 1) == [2, 3, 4]
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+压缩KV缓存：分组量化的往返误差、与默认DynamicCache的生成结果/显存对比
+"""
+import pytest
+import torch
+from transformers import DynamicCache
+
+from conftest import greedy_reference
+from src.kv_cache import CompressedKVCache, CompressedKVLayer, dequantize_groups, dynamic_cache_nbytes, quantize_groups
+
+MAX_NEW_TOKENS = 24
+
+
+def roundtrip_bound(x: torch.Tensor, nbits: int, group_size: int) -> torch.Tensor:
+    """逐元素误差上界：半个量化步长 + scale/minimum按float16存储的舍入误差（相对误差2^-11）"""
+    groups = x.unflatten(-1, (-1, group_size))
+    minimum = groups.amin(dim=-1, keepdim=True)
+    value_range = groups.amax(dim=-1, keepdim=True) - minimum
+    bound = value_range / (2 ** nbits - 1) / 2 + (minimum.abs() + value_range) * 2 ** -10
+    return bound.expand_as(groups).flatten(-2)
+
+
+@pytest.mark.parametrize("nbits", [8, 4])
+def test_quantize_groups_roundtrip_error_bound(nbits):
+    torch.manual_seed(0)
+    x = torch.randn(2, 3, 8, 32) * 4
+    q, scale, minimum = quantize_groups(x, nbits, group_size=16)
+    assert q.dtype == torch.uint8
+    # int4两个值打包成一个字节
+    assert q.shape[-1] == (32 if nbits == 8 else 16)
+    restored = dequantize_groups(q, scale, minimum, nbits, torch.float32)
+    assert restored.shape == x.shape
+    assert ((restored - x).abs() <= roundtrip_bound(x, nbits, 16)).all()
+
+
+def test_int4_nibble_packing():
+    # 每组的最小值量化为0、最大值为15，两两打包：低4位在前
+    x = torch.tensor([[0.0, 15.0, 3.0, 12.0]])
+    q, scale, minimum = quantize_groups(x, 4, group_size=4)
+    assert q.tolist() == [[0xF0, 0xC3]]
+    assert dequantize_groups(q, scale, minimum, 4, torch.float32).tolist() == x.tolist()
+
+
+@pytest.mark.parametrize("nbits", [8, 4])
+def test_key_block_quantized_per_channel(nbits):
+    # 某个通道整体偏移很大（key的离群通道），按通道分组时其他通道的精度不受影响
+    torch.manual_seed(0)
+    keys = torch.randn(1, 2, 8, 16)
+    keys[..., 3] += 100
+    values = torch.randn(1, 2, 8, 16)
+    layer = CompressedKVLayer(nbits=nbits, block_size=8)
+    layer.lazy_initialization(keys, values)
+    restored_keys, restored_values = layer._decompress(layer._compress(keys, values))
+    bound = roundtrip_bound(keys.transpose(-1, -2), nbits, keys.shape[-2]).transpose(-1, -2)
+    assert ((restored_keys - keys).abs() <= bound).all()
+    assert ((restored_values - values).abs() <= roundtrip_bound(values, nbits, 16)).all()
+
+
+@pytest.mark.parametrize("offload", [False, True])
+def test_uncompressed_kv_cache_matches_default(model, prompt_ids, offload):
+    # nbits=None：旧块只分块（可选卸载到CPU），不量化，生成结果应与默认缓存完全一致
+    cache = CompressedKVCache(model.config, nbits=None, offload=offload, block_size=8)
+    expected = greedy_reference(model, prompt_ids, MAX_NEW_TOKENS)
+    output = greedy_reference(model, prompt_ids, MAX_NEW_TOKENS, past_key_values=cache)
+    assert torch.equal(output, expected)
+    assert cache.get_seq_length() == expected.shape[1] - 1
+
+
+@pytest.mark.parametrize("offload", [False, True])
+@pytest.mark.parametrize("nbits", [8, 4])
+def test_quantized_kv_cache_generate(model, prompt_ids, nbits, offload):
+    # 量化会改变生成的token，固定生成长度后比较形状与缓存占用
+    baseline = DynamicCache(config=model.config)
+    greedy_reference(model, prompt_ids, MAX_NEW_TOKENS, min_new_tokens=MAX_NEW_TOKENS, past_key_values=baseline)
+    cache = CompressedKVCache(model.config, nbits=nbits, offload=offload, block_size=8)
+    output = greedy_reference(model, prompt_ids, MAX_NEW_TOKENS, min_new_tokens=MAX_NEW_TOKENS, past_key_values=cache)
+    assert output.shape == (1, prompt_ids.shape[1] + MAX_NEW_TOKENS)
+    assert cache.get_seq_length() == output.shape[1] - 1
+    assert all(layer.blocks for layer in cache.layers)
+    assert cache.nbytes() < dynamic_cache_nbytes(baseline)
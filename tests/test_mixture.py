@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多数据源混合：步长调度的比例误差、Bloom过滤器、打乱缓冲区与长度过滤
+"""
+import random
+
+import pytest
+
+from src.mixture import BloomFilter, LengthFilter, MixtureScheduler, ShuffleBuffer, parse_sources
+
+
+def test_parse_sources_normalizes_weights():
+    sources = parse_sources("tcm=data/processed/train:9, coig=data/raw/coig:1")
+    assert sources == [("tcm", "data/processed/train", 0.9), ("coig", "data/raw/coig", 0.1)]
+    with pytest.raises(ValueError):
+        parse_sources("a=x:0,b=y:0")
+
+
+def test_scheduler_prefix_counts_within_one():
+    weights = [0.6, 0.3, 0.1]
+    scheduler = MixtureScheduler(weights)
+    counts = [0, 0, 0]
+    for n in range(1, 1001):
+        counts[scheduler.next()] += 1
+        assert all(abs(c - n * w) <= 1 for c, w in zip(counts, weights))
+
+
+def test_scheduler_remove_and_zero_weight():
+    scheduler = MixtureScheduler([0.5, 0.5, 0.0])
+    assert {scheduler.next() for _ in range(10)} == {0, 1}
+    scheduler.remove(0)
+    assert {scheduler.next() for _ in range(10)} == {1}
+    scheduler.remove(1)
+    assert scheduler.next() is None
+
+
+def test_bloom_filter_no_false_negatives_and_bounded_error():
+    rng = random.Random(0)
+    keys = [rng.getrandbits(64) for _ in range(12000)]
+    bloom = BloomFilter(capacity=10000, error_rate=1e-3)
+    false_positives = sum(bloom.add(k) for k in keys[:10000])
+    assert false_positives <= 30
+    assert all(bloom.add(k) for k in keys[:10000])
+    # 未加入过的key误判率接近设定值（add会写入，每次探测后恢复位数组）
+    bits = bytes(bloom.bits)
+    probes = 0
+    for k in keys[10000:12000]:
+        probes += bloom.add(k)
+        bloom.bits = bytearray(bits)
+    assert probes <= 2000 * 1e-3 * 5
+
+
+def test_shuffle_buffer_is_a_permutation():
+    buffer = ShuffleBuffer(size=16, seed=0)
+    out = [x for x in (buffer.push(i) for i in range(100)) if x is not None]
+    out.extend(buffer.drain())
+    assert sorted(out) == list(range(100))
+    assert out != list(range(100))
+    assert ShuffleBuffer(size=1).push("x") == "x"
+
+
+def test_length_filter():
+    keep = LengthFilter(min_chars=4, max_chars=10)([
+        {"instruction": "问题", "input": "", "output": "答案"},
+        {"instruction": "问", "input": "", "output": "答"},
+        {"instruction": "问题", "input": "", "output": ""},
+        {"instruction": "问题" * 5, "input": "", "output": "答案"},
+    ])
+    assert keep == [True, False, False, False]
+
+
+def test_length_filter_counts_template_overhead():
+    class CharTokenizer:
+        def __call__(self, texts, add_special_tokens=False):
+            return {"input_ids": [list(t) for t in texts]}
+
+    items = [{"instruction": "问题", "input": "", "output": "答" * n} for n in (3, 4)]
+    keep = LengthFilter(tokenizer=CharTokenizer(), max_tokens=10, overhead=5)(items)
+    assert keep == [True, False]
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+序列打包：装箱、段编号/位置/labels，以及分片写出与内存映射读取
+"""
+import json
+import random
+
+import numpy as np
+
+from src.packing import IGNORE_INDEX, PackedDataset, PackedShardWriter, build_packed_arrays, pack_lengths
+
+
+def test_pack_lengths_fits_every_sample_once():
+    rng = random.Random(0)
+    lengths = [rng.randint(1, 512) for _ in range(500)]
+    bins = pack_lengths(lengths, 512)
+    assert sorted(i for b in bins for i in b) == list(range(len(lengths)))
+    assert all(sum(lengths[i] for i in b) <= 512 for b in bins)
+    # 序列数接近下界 总长度/seq_len（随机长度下BFD几乎没有浪费）
+    assert len(bins) <= 11 / 9 * (sum(lengths) / 512) + 1
+
+
+def test_pack_lengths_best_fit():
+    # 从长到短：7、6各开一个序列，4和3分别放进恰好能装下的剩余空间
+    assert pack_lengths([6, 7, 3, 4], 10) == [[1, 2], [0, 3]]
+    assert pack_lengths([10, 10], 10) == [[0], [1]]
+
+
+def test_build_packed_arrays_segments():
+    samples = [([11, 12, 13, 14], 2), ([21, 22, 23], 1)]
+    arrays = build_packed_arrays(samples, [[0, 1]], seq_len=9, pad_id=0)
+    assert arrays["input_ids"][0].tolist() == [11, 12, 13, 14, 21, 22, 23, 0, 0]
+    assert arrays["labels"][0].tolist() == [IGNORE_INDEX] * 2 + [13, 14] + [IGNORE_INDEX, 22, 23] + [IGNORE_INDEX] * 2
+    assert arrays["attention_mask"][0].tolist() == [1, 1, 1, 1, 2, 2, 2, 0, 0]
+    assert arrays["position_ids"][0].tolist() == [0, 1, 2, 3, 0, 1, 2, 0, 0]
+
+
+def test_shards_roundtrip_through_memmap(tmp_path):
+    samples = [([i + 1] * (i + 2), 1) for i in range(6)]
+    shards = []
+    expected = []
+    for s, chunk in enumerate([samples[:4], samples[4:]]):
+        bins = pack_lengths([len(ids) for ids, _ in chunk], 8)
+        arrays = build_packed_arrays(chunk, bins, seq_len=8, pad_id=0)
+        writer = PackedShardWriter(str(tmp_path / f"shard-{s}"), seq_len=8)
+        writer.write(arrays)
+        assert writer.close()["rows"] == len(bins)
+        shards.append(f"shard-{s}")
+        expected.extend(arrays["input_ids"].tolist())
+    (tmp_path / "manifest.json").write_text(json.dumps({"seq_len": 8, "shards": shards}))
+
+    ds = PackedDataset(str(tmp_path))
+    assert len(ds) == len(expected)
+    assert [ds[i]["input_ids"].tolist() for i in range(len(ds))] == expected
+    assert ds[-1]["input_ids"].tolist() == expected[-1]
+    assert ds[0]["attention_mask"].dtype == np.int16
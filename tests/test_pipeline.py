@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量流水线：依赖推断、内容指纹、跳过未变化的阶段与阻塞下游
+"""
+import os
+import sys
+
+import pytest
+
+from src.pipeline import HashCache, PipelineRunner, Stage, _covers, load_pipeline
+
+PIPELINE = """
+stages:
+  make:
+    cmd: {python} -c "open('{out}', 'w').write(open('{src}').read().upper())"
+    params:
+      out: build/upper.txt
+    deps:
+      - input.txt
+    outs:
+      - "{out}"
+  count:
+    cmd: {python} -c "open('build/count.txt', 'w').write(str(len(open('build/upper.txt').read())))"
+    deps:
+      - build/upper.txt
+    outs:
+      - build/count.txt
+"""
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "input.txt").write_text("abc")
+    (tmp_path / "build").mkdir()
+    (tmp_path / "pipeline.yaml").write_text(
+        PIPELINE.replace("{python}", sys.executable.replace("\\", "/")).replace("{src}", "input.txt"))
+    return tmp_path
+
+
+def edit(path, text):
+    """改写文件并把修改时间推后（HashCache按 大小+修改时间 判断是否需要重新哈希）"""
+    mtime = os.stat(path).st_mtime_ns
+    path.write_text(text)
+    os.utime(path, ns=(mtime + 10 ** 9, mtime + 10 ** 9))
+
+
+def test_covers():
+    assert _covers("outputs/run", "outputs/run")
+    assert _covers("outputs/run", "outputs/run/zero_shot/metrics.json")
+    assert _covers("outputs/run/", "outputs/./run/x")
+    assert not _covers("outputs/run", "outputs/run_v2")
+
+
+def test_stage_formats_params_and_infers_after(workdir):
+    stages = load_pipeline("pipeline.yaml")
+    assert stages["make"].outs == ["build/upper.txt"]
+    assert stages["count"].after == ["make"]
+    stage = Stage("s", "echo {x}", deps=["{x}.txt"], params={"x": "a"})
+    assert (stage.cmd, stage.deps) == ("echo a", ["a.txt"])
+
+
+def test_path_hash_of_directory_tracks_content(tmp_path):
+    cache = HashCache()
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "a.py").write_text("x = 1")
+    before = cache.path_hash(str(tmp_path / "pkg"))
+    (tmp_path / "pkg" / "__pycache__").mkdir()
+    (tmp_path / "pkg" / "__pycache__" / "a.pyc").write_bytes(b"\0")
+    assert cache.path_hash(str(tmp_path / "pkg")) == before
+    edit(tmp_path / "pkg" / "a.py", "x = 2")
+    assert cache.path_hash(str(tmp_path / "pkg")) != before
+    assert cache.path_hash(str(tmp_path / "missing")) is None
+
+
+def statuses(results):
+    return {name: r["status"] for name, r in results.items()}
+
+
+def test_runner_skips_fresh_stages_and_reruns_on_change(workdir):
+    run = lambda **kw: PipelineRunner(load_pipeline("pipeline.yaml"), **kw).run()
+    assert statuses(run()) == {"make": "ran", "count": "ran"}
+    assert (workdir / "build/count.txt").read_text() == "3"
+    assert statuses(run()) == {"make": "skipped", "count": "skipped"}
+
+    # 输入内容变化：上游重跑；输出内容不变时下游仍跳过
+    edit(workdir / "input.txt", "ABC")
+    assert statuses(run()) == {"make": "ran", "count": "skipped"}
+    edit(workdir / "input.txt", "abcd")
+    assert statuses(run(dry_run=True)) == {"make": "would_run", "count": "would_run"}
+    assert statuses(run()) == {"make": "ran", "count": "ran"}
+
+    # 输出被改动或删除、或指定force时不算新鲜
+    edit(workdir / "build/count.txt", "0")
+    assert statuses(run()) == {"make": "skipped", "count": "ran"}
+    assert statuses(run(force=["make"])) == {"make": "ran", "count": "skipped"}
+    os.remove(workdir / "build/upper.txt")
+    assert statuses(run()) == {"make": "ran", "count": "skipped"}
+
+
+def test_is_fresh_requires_matching_fingerprint(workdir):
+    runner = PipelineRunner(load_pipeline("pipeline.yaml"))
+    stage = runner.stages["make"]
+    assert not runner.is_fresh(stage, runner.fingerprint(stage))
+    runner.run(["make"])
+    fingerprint = runner.fingerprint(stage)
+    assert runner.is_fresh(stage, fingerprint)
+    assert not runner.is_fresh(stage, "0" * 64)
+
+
+def test_failed_stage_blocks_downstream(workdir):
+    os.remove(workdir / "input.txt")
+    results = PipelineRunner(load_pipeline("pipeline.yaml")).run()
+    assert results["make"]["status"] == "failed"
+    assert "input.txt" in results["make"]["error"]
+    assert results["count"]["status"] == "blocked"
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+列式结果存储：写出后按列读取，问题/参考答案按id从评测集关联
+"""
+import json
+
+import pytest
+
+from src.result_store import RESULT_COLUMNS, find_results, load_results, read_result_meta, write_result_store
+
+EVAL_ITEMS = [
+    {"id": 100 + i, "instruction": f"问题{i}", "input": "", "output": f"答案{i}", "full_question": f"问题{i}"}
+    for i in range(4)
+]
+
+
+def make_results():
+    return [
+        {"id": item["id"], "prediction": f"答案{i}" if i % 2 else "不知道", "raw_prediction": "raw",
+         "reference": item["output"], "inference_time": 0.5 * i, "has_answer_tags": False, "error": None}
+        for i, item in enumerate(EVAL_ITEMS)
+    ]
+
+
+@pytest.fixture
+def eval_file(tmp_path):
+    path = tmp_path / "eval.json"
+    path.write_text(json.dumps(EVAL_ITEMS, ensure_ascii=False), encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture(params=["parquet", "jsonl.zst"])
+def result_path(request, tmp_path):
+    if request.param == "jsonl.zst":
+        pytest.importorskip("zstandard")
+    return str(tmp_path / f"predictions.{request.param}")
+
+
+def test_roundtrip_with_joined_columns(result_path, eval_file):
+    write_result_store(make_results(), result_path, eval_file=eval_file)
+    assert read_result_meta(result_path) == {"eval_file": eval_file, "rows": 4}
+
+    rows = load_results(result_path)
+    assert set(rows[0]) == set(RESULT_COLUMNS) | {"instruction", "input", "full_question", "reference"}
+    assert [r["id"] for r in rows] == [100, 101, 102, 103]
+    assert [r["exact_match"] for r in rows] == [False, True, False, True]
+    assert rows[1]["f1"] == 1.0
+    assert rows[2]["reference"] == "答案2" and rows[2]["instruction"] == "问题2"
+    assert rows[3]["inference_time"] == 1.5
+
+
+def test_column_subset_and_limit(result_path, eval_file):
+    write_result_store(make_results(), result_path, eval_file=eval_file)
+    assert load_results(result_path, columns=["id", "f1"], limit=2) == [
+        {"id": 100, "f1": 0.0}, {"id": 101, "f1": 1.0}
+    ]
+    # 只取关联列时不返回id
+    assert load_results(result_path, columns=["reference"], limit=1) == [{"reference": "答案0"}]
+
+
+def test_missing_eval_file_requires_argument(tmp_path, eval_file):
+    path = str(tmp_path / "predictions.parquet")
+    write_result_store(make_results(), path)
+    with pytest.raises(ValueError):
+        load_results(path, columns=["reference"])
+    assert load_results(path, columns=["reference"], eval_file=eval_file)[0] == {"reference": "答案0"}
+
+
+def test_find_results_prefers_columnar_and_reads_legacy_json(tmp_path, eval_file):
+    results = make_results()
+    (tmp_path / "predictions.json").write_text(json.dumps(results, ensure_ascii=False), encoding="utf-8")
+    assert find_results(str(tmp_path)).endswith("predictions.json")
+    assert load_results(str(tmp_path), columns=["id", "exact_match"])[1] == {"id": 101, "exact_match": True}
+
+    write_result_store(make_results(), str(tmp_path / "predictions.parquet"), eval_file=eval_file)
+    assert find_results(str(tmp_path)).endswith("predictions.parquet")
+    with pytest.raises(FileNotFoundError):
+        find_results(str(tmp_path / "empty"))
+    with pytest.raises(ValueError):
+        write_result_store(results, str(tmp_path / "predictions.csv"))
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+跨运行结果库：导入（含跳过未变化的运行）、配对对比、回退与分任务F1
+"""
+import json
+import os
+
+import pytest
+
+from src.result_store import save_run_config, write_result_store
+from src.results_catalog import ResultsCatalog
+
+EVAL_ITEMS = [
+    {"id": 0, "instruction": "将下列内容翻译成现代文", "input": "学而时习之", "output": "学习 并 时常 温习"},
+    {"id": 1, "instruction": "黄芪的功效？", "input": "", "output": "补气 升阳"},
+    {"id": 2, "instruction": "当归的功效？", "input": "", "output": "补血 活血"},
+]
+
+
+def write_run(run_dir, predictions, eval_file):
+    results = [
+        {"id": item["id"], "prediction": p, "reference": item["output"], "inference_time": 1.0}
+        for item, p in zip(EVAL_ITEMS, predictions)
+    ]
+    os.makedirs(run_dir, exist_ok=True)
+    write_result_store(results, os.path.join(run_dir, "predictions.parquet"), eval_file=eval_file)
+    save_run_config(run_dir, {"eval_file": eval_file})
+    with open(os.path.join(run_dir, "metrics.json"), "w", encoding="utf-8") as f:
+        json.dump({"avg_f1": 0.5}, f)
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    eval_file = str(tmp_path / "eval.json")
+    with open(eval_file, "w", encoding="utf-8") as f:
+        json.dump(EVAL_ITEMS, f, ensure_ascii=False)
+    # base: 第0、1条答对；lora: 第1、2条答对
+    write_run(str(tmp_path / "runs/base/zero_shot"), ["学习 并 时常 温习", "补气 升阳", "不知道"], eval_file)
+    write_run(str(tmp_path / "runs/lora/zero_shot"), ["不知道", "补气 升阳", "补血 活血"], eval_file)
+    catalog = ResultsCatalog(str(tmp_path / "results.db"))
+    yield catalog
+    catalog.close()
+
+
+def test_ingest_tree_skips_unchanged_runs(catalog, tmp_path):
+    root = str(tmp_path / "runs")
+    assert catalog.ingest_tree([root]) == {"ingested": 2, "skipped": 0}
+    assert catalog.ingest_tree([root]) == {"ingested": 0, "skipped": 2}
+    assert catalog.ingest_tree([root], force=True) == {"ingested": 2, "skipped": 0}
+    runs = catalog.runs()
+    assert len(runs) == 2
+    assert all(r["num_items"] == 3 and r["metrics"] == {"avg_f1": 0.5} for r in runs)
+    assert abs(runs[0]["avg_f1"] - 2 / 3) < 1e-9
+
+
+def test_compare_and_regressions_by_suffix(catalog, tmp_path):
+    catalog.ingest_tree([str(tmp_path / "runs")])
+    comparison = catalog.compare("base/zero_shot", "lora/zero_shot")
+    assert (comparison["n"], comparison["improved"], comparison["regressed"], comparison["tied"]) == (3, 1, 1, 1)
+    assert abs(comparison["mean_delta"]) < 1e-9
+
+    regressions = catalog.regressions("base/zero_shot", "lora/zero_shot", threshold=0.5)
+    assert [(r["item_id"], r["task_type"], r["delta"]) for r in regressions] == [(0, "translation", -1.0)]
+    with pytest.raises(KeyError):
+        catalog.compare("base/zero_shot", "missing/cot")
+
+
+def test_compare_rejects_different_eval_files(catalog, tmp_path):
+    other = str(tmp_path / "other.json")
+    with open(other, "w", encoding="utf-8") as f:
+        json.dump(EVAL_ITEMS, f, ensure_ascii=False)
+    write_run(str(tmp_path / "runs/other/cot"), ["不知道"] * 3, other)
+    catalog.ingest_tree([str(tmp_path / "runs")])
+    with pytest.raises(ValueError):
+        catalog.compare("base/zero_shot", "other/cot")
+    assert catalog.compare("base/zero_shot", "other/cot", allow_mismatch=True)["regressed"] == 2
+
+
+def test_per_task_f1(catalog, tmp_path):
+    catalog.ingest_tree([str(tmp_path / "runs")])
+    per_task = catalog.per_task_f1(pattern="%lora%")
+    (name, tasks), = per_task.items()
+    assert name.endswith("lora/zero_shot")
+    assert tasks == {"translation": {"n": 1, "f1": 0.0}, "knowledge_qa": {"n": 2, "f1": 1.0}}
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+序贯检验：置信序列的判定、预热、持平与节省统计
+"""
+import random
+
+from src.sequential import PairedSequentialTest, active_arms, compute_savings
+
+
+def run(test: PairedSequentialTest, pairs):
+    for f1_a, f1_b in pairs:
+        test.update(f1_a, f1_b)
+        if test.check() is not None:
+            break
+    return test
+
+
+def test_welford_matches_batch_statistics():
+    rng = random.Random(0)
+    diffs = [rng.uniform(-1, 1) for _ in range(50)]
+    test = PairedSequentialTest("t", "a", "b")
+    for d in diffs:
+        test.update(0.0, d)
+    mean = sum(diffs) / len(diffs)
+    assert abs(test.mean - mean) < 1e-12
+    assert abs(test.variance() - sum((d - mean) ** 2 for d in diffs) / (len(diffs) - 1)) < 1e-12
+
+
+def test_radius_shrinks_with_samples():
+    test = PairedSequentialTest("t", "a", "b")
+    assert test.radius() == float("inf")
+    radii = []
+    rng = random.Random(0)
+    for _ in range(200):
+        test.update(0.5, 0.5 + rng.uniform(-0.3, 0.3))
+        radii.append(test.radius())
+    assert radii[-1] < radii[49] < radii[9]
+
+
+def test_clear_winner_stops_early():
+    rng = random.Random(0)
+    pairs = [(rng.uniform(0.0, 0.4), rng.uniform(0.6, 1.0)) for _ in range(1000)]
+    test = run(PairedSequentialTest("t", "a", "b"), pairs)
+    assert test.decision == "b_better"
+    assert test.min_items <= test.decided_at < 200
+
+    test = run(PairedSequentialTest("t", "a", "b"), [(b, a) for a, b in pairs])
+    assert test.decision == "a_better"
+
+
+def test_no_decision_before_min_items():
+    test = PairedSequentialTest("t", "a", "b", min_items=30)
+    for _ in range(29):
+        test.update(0.0, 1.0)
+        assert test.check() is None
+    test.update(0.0, 1.0)
+    assert test.check() == "b_better"
+    assert test.decided_at == 30
+
+
+def test_identical_arms_tie_and_decision_is_sticky():
+    test = run(PairedSequentialTest("t", "a", "b", margin=0.05), [(0.5, 0.5)] * 10000)
+    assert test.decision == "tie"
+    # 判定后继续加入样本不会改变结论
+    for _ in range(100):
+        test.update(0.0, 1.0)
+    assert test.check() == "tie"
+    report = test.report(total_items=10000)
+    assert report["decision"] == "tie"
+    assert report["items_used"] == test.decided_at
+
+
+def test_active_arms_and_savings():
+    decided = PairedSequentialTest("t1", "base", "lora")
+    decided.decision = "b_better"
+    pending = PairedSequentialTest("t2", "lora", "cot")
+    assert active_arms([decided, pending]) == ["lora", "cot"]
+
+    savings = compute_savings({"base": 40, "lora": 100}, {"base": 2.0, "lora": 1.0}, total_items=100)
+    assert savings["per_arm"]["base"]["items_skipped"] == 60
+    assert savings["est_time_saved"] == 120.0
+    assert savings["calls_saved_ratio"] == 1 - 140 / 200
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+投机解码（draft模型 / prompt lookup）与 model.generate 贪心结果逐token一致
+"""
+import pytest
+import torch
+
+from conftest import EOS_ID, greedy_reference
+from src.speculative import DraftModelProposer, PromptLookupProposer, SpeculativeDecoder
+
+MAX_NEW_TOKENS = 24
+
+
+@pytest.mark.parametrize("num_draft_tokens", [1, 4])
+def test_speculative_draft_matches_generate(model, draft_model, prompt_ids, num_draft_tokens):
+    expected = greedy_reference(model, prompt_ids, MAX_NEW_TOKENS)
+    decoder = SpeculativeDecoder(model, DraftModelProposer(draft_model), num_draft_tokens)
+    output, stats = decoder.generate(prompt_ids, MAX_NEW_TOKENS, eos_token_id=EOS_ID, repetition_penalty=1.1)
+    assert torch.equal(output, expected)
+    assert stats["new_tokens"] == expected.shape[1] - prompt_ids.shape[1]
+    assert stats["proposed"] > 0
+
+
+def test_speculative_draft_accepts_own_proposals(model, prompt_ids):
+    # 目标模型自己当draft模型时，提议应全部被接受
+    decoder = SpeculativeDecoder(model, DraftModelProposer(model), 4)
+    output, stats = decoder.generate(prompt_ids, MAX_NEW_TOKENS, eos_token_id=EOS_ID, repetition_penalty=1.1)
+    assert torch.equal(output, greedy_reference(model, prompt_ids, MAX_NEW_TOKENS))
+    assert stats["accepted"] == stats["proposed"]
+
+
+def test_prompt_lookup_proposes_repeated_ngram():
+    ids = torch.tensor([[5, 6, 7, 8, 9, 5, 6]])
+    # 末尾的 (5, 6) 在前面出现过，提议其后续 7, 8, 9
+    assert PromptLookupProposer().propose(ids, 3) == [7, 8, 9]
+
+
+def test_speculative_prompt_lookup_matches_generate(model, prompt_ids):
+    expected = greedy_reference(model, prompt_ids, MAX_NEW_TOKENS)
+    decoder = SpeculativeDecoder(model, PromptLookupProposer(), 5)
+    output, _ = decoder.generate(prompt_ids, MAX_NEW_TOKENS, eos_token_id=EOS_ID, repetition_penalty=1.1)
+    assert torch.equal(output, expected)
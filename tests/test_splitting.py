@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内容哈希划分：稳定性、比例、bottom-k嵌套、分层抽样与JSONL区间读取
+"""
+import json
+import random
+
+import numpy as np
+
+from src.splitting import (BottomK, assign_split, iter_source_positions, read_source_rows, row_key,
+                           split_ranges, stratified_bottom_k)
+
+
+def make_rows(n: int):
+    return [{"instruction": f"问题{i}", "input": "", "output": f"答案{i}"} for i in range(n)]
+
+
+def test_assign_split_is_content_based():
+    row = {"instruction": " 问题 ", "input": None, "output": "答案"}
+    # 首尾空白、None与空串不影响哈希
+    assert row_key(row) == row_key({"instruction": "问题", "input": "", "output": "答案 "})
+    assert assign_split(row) == assign_split(dict(row))
+    assert row_key(row, salt="a") != row_key(row, salt="b")
+
+
+def test_assign_split_follows_ratios():
+    rows = make_rows(20000)
+    counts = {"train": 0, "val": 0, "test": 0}
+    for row in rows:
+        counts[assign_split(row)] += 1
+    assert abs(counts["train"] / len(rows) - 0.95) < 0.01
+    assert abs(counts["val"] / len(rows) - 0.02) < 0.005
+    assert abs(counts["test"] / len(rows) - 0.03) < 0.005
+
+
+def test_bottom_k_is_order_independent_and_nested():
+    rows = make_rows(1000)
+    keys = [row_key(r, "eval") for r in rows]
+
+    def bottom(k, order):
+        sampler = BottomK(k)
+        for i in order:
+            sampler.add(keys[i], rows[i])
+        return sampler.items()
+
+    order = list(range(len(rows)))
+    random.Random(0).shuffle(order)
+    top500 = bottom(500, order)
+    assert [k for k, _ in top500] == sorted(keys)[:500]
+    assert bottom(500, range(len(rows))) == top500
+    # eval_100 是 eval_500 的前100条
+    assert bottom(100, order) == top500[:100]
+
+
+def test_bottom_k_drops_duplicate_content():
+    sampler = BottomK(3)
+    row = make_rows(1)[0]
+    for _ in range(5):
+        sampler.add(row_key(row), row)
+    assert len(sampler.items()) == 1
+
+
+def test_stratified_bottom_k_exact_and_nested():
+    rng = np.random.default_rng(0)
+    keys = rng.integers(0, 1 << 62, size=1000).astype(np.uint64)
+    strata = np.array([0] * 600 + [1] * 300 + [2] * 100, dtype=np.uint8)
+    rng.shuffle(strata)
+
+    selected = stratified_bottom_k(keys, strata, 50)
+    assert len(selected) == 50
+    assert (np.diff(selected) > 0).all()
+    assert np.bincount(strata[selected]).tolist() == [30, 15, 5]
+    # 每层取的是哈希值最小的那些
+    for code, n in enumerate([30, 15, 5]):
+        members = np.flatnonzero(strata == code)
+        assert set(selected[strata[selected] == code]) == set(members[np.argsort(keys[members])[:n]])
+
+    # 30%子集包含在50%子集中（各层名额都增加时严格成立）
+    small, large = stratified_bottom_k(keys, strata, 300), stratified_bottom_k(keys, strata, 500)
+    assert set(small) <= set(large)
+
+
+def test_stratified_bottom_k_edge_cases():
+    keys = np.arange(5, dtype=np.uint64)[::-1].copy()
+    strata = np.zeros(5, dtype=np.uint8)
+    assert stratified_bottom_k(keys, strata, 10).tolist() == [0, 1, 2, 3, 4]
+    assert stratified_bottom_k(keys, strata, 2).tolist() == [3, 4]
+    assert len(stratified_bottom_k(keys, strata, 0)) == 0
+
+
+def test_jsonl_byte_ranges_partition_rows(tmp_path):
+    path = tmp_path / "data.jsonl"
+    rows = make_rows(100)
+    path.write_text("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in rows), encoding="utf-8")
+    size = path.stat().st_size
+
+    seen = []
+    for start, end in split_ranges(0, size, 7):
+        seen.extend(iter_source_positions(str(path), start, end))
+    # 区间边界落在行中间时，每行恰好属于一个区间
+    assert [item for _, item in seen] == rows
+
+    positions = [seen[i][0] for i in (3, 50, 99)]
+    assert list(read_source_rows(str(path), positions)) == [rows[3], rows[50], rows[99]]
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Token长度统计：逐条长度、分布摘要、padding占比与cutoff建议
+"""
+import numpy as np
+
+from src.token_stats import TASK_CODES, encode_lengths, padding_ratio, suggest_cutoff, summarize_lengths
+
+
+class CharTokenizer:
+    """逐字切分（长度即字符数）"""
+
+    def __call__(self, texts, add_special_tokens=False):
+        return {"input_ids": [list(t) for t in texts]}
+
+
+def test_encode_lengths():
+    items = [
+        {"instruction": "将下列内容翻译成现代文", "input": "学而时习之", "output": "学习并时常温习"},
+        {"instruction": "黄芪的功效？", "input": "", "output": "补气"},
+    ]
+    lengths = encode_lengths(CharTokenizer(), items)
+    # prompt = instruction + "\n" + input
+    assert lengths["prompt"].tolist() == [11 + 1 + 5, 6]
+    assert lengths["response"].tolist() == [7, 2]
+    assert [TASK_CODES[t] for t in lengths["task"]] == ["translation", "knowledge_qa"]
+
+
+def test_summarize_lengths():
+    total = np.array([10, 100, 1000, 3000], dtype=np.uint32)
+    summary = summarize_lengths(total, cutoff=2048)
+    assert summary["count"] == 4 and summary["max"] == 3000
+    assert summary["over_cutoff"] == 1
+    assert abs(summary["truncated_token_ratio"] - (3000 - 2048) / total.sum()) < 1e-12
+    assert summary["histogram"]["<64"] == 1
+    assert summary["histogram"]["<4096"] == 1
+    assert sum(summary["histogram"].values()) == 4
+    assert summarize_lengths(np.array([], dtype=np.uint32), 2048) == {"count": 0}
+
+
+def test_padding_ratio():
+    # 两个batch：[1,3]补齐到3，[2,2]无padding -> 2/10
+    assert abs(padding_ratio(np.array([1, 3, 2, 2]), batch_size=2, cutoff=100) - 0.2) < 1e-12
+    # 超过cutoff的部分截断，不足一个batch的尾部不计
+    assert padding_ratio(np.array([5, 100, 7]), batch_size=2, cutoff=5) == 0.0
+    assert padding_ratio(np.array([5]), batch_size=2, cutoff=5) == 0.0
+
+
+def test_suggest_cutoff():
+    total = np.arange(1, 1001)
+    assert suggest_cutoff(total, coverage=0.99, multiple=128) == 1024
+    assert suggest_cutoff(total, coverage=0.5, multiple=100) == 600
+    assert suggest_cutoff(np.array([]), multiple=128) == 128